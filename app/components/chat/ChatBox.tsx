@@ -511,6 +511,7 @@ export function ChatBox({
         timeline_state: timelineState,
         mediabin_items: mediaBinItems,
         chat_history: chatHistoryPayload,
+        pixels_per_second: pixelsPerSecond,
       });
 
       // Be resilient to provider response shapes; avoid hard Zod failure on client
@@ -31,7 +31,7 @@ import { cn } from "~/lib/utils";
 
 // Components
 import LeftPanel, { type LeftPanelSection } from "~/components/editor/LeftPanel";
-import { timelineStateForPersistence } from "~/utils/timeline-persist";
+import { diffTimeline, timelineStateForPersistence } from "~/utils/timeline-persist";
 import { VideoPlayer } from "~/video-compositions/VideoPlayer";
 import { InspectorPanel } from "~/components/editor/InspectorPanel";
 import { ExportPanel } from "~/components/editor/ExportPanel";
@@ -121,6 +121,9 @@ export default function TimelineEditor() {
   const [saveStatus, setSaveStatus] = useState<"saved" | "saving" | "unsaved">("saved");
   const saveTimerRef = useRef<ReturnType<typeof setTimeout> | null>(null);
   const skipNextAutoSave = useRef(false);
+  // Last timeline the server acknowledged and its revision; saves send a
+  // patch against it when they can (see saveTimelineSilently).
+  const savedTimelineRef = useRef<{ timeline: TimelineState; revision: number } | null>(null);
   const isInitialMountRef = useRef(true);
 
   // video player media selection state
@@ -294,6 +297,7 @@ export default function TimelineEditor() {
     let isMounted = true;
     (async () => {
       if (!projectId) return;
+      savedTimelineRef.current = null;
       try {
         const { data } = await axios.get(`/backend/projects/${encodeURIComponent(projectId)}`, {
           withCredentials: true,
@@ -321,6 +325,11 @@ export default function TimelineEditor() {
           };
           skipNextAutoSave.current = true;
           setTimelineFromServer(tlWithoutHidden);
+          // Diff against what is stored, not the schema-normalised copy.
+          const rawTimeline: unknown = data?.timeline;
+          if (typeof parsed.data.revision === "number" && rawTimeline && typeof rawTimeline === "object") {
+            savedTimelineRef.current = { timeline: rawTimeline as TimelineState, revision: parsed.data.revision };
+          }
           setSaveStatus("saved");
 
           // Restore text media bin items from the saved timeline scrubbers.
@@ -424,13 +433,35 @@ export default function TimelineEditor() {
     const id = projectId;
     if (!id) throw new Error("No project ID");
     setSaveStatus("saving");
-    await axios.put(
-      `/backend/projects/${encodeURIComponent(id)}`,
-      timelineStateForPersistence(getTimelineState()),
-      {
-        withCredentials: true,
-      },
-    );
+    const url = `/backend/projects/${encodeURIComponent(id)}`;
+    const timeline = timelineStateForPersistence(getTimelineState());
+    const saved = savedTimelineRef.current;
+    const patch = saved ? diffTimeline(saved.timeline, timeline) : null;
+    let revision: unknown;
+    if (saved && patch) {
+      if (patch.length === 0) {
+        setSaveStatus("saved");
+        return;
+      }
+      try {
+        const { data } = await axios.patch(
+          `${url}/timeline`,
+          { base_revision: saved.revision, patch },
+          { withCredentials: true },
+        );
+        revision = data?.revision;
+      } catch (error) {
+        // Saved elsewhere since (409) or not applicable server-side (422):
+        // fall back to a full save.
+        const code = axios.isAxiosError(error) ? error.response?.status : undefined;
+        if (code !== 409 && code !== 422) throw error;
+      }
+    }
+    if (revision === undefined) {
+      const { data } = await axios.put(url, timeline, { withCredentials: true });
+      revision = data?.revision;
+    }
+    savedTimelineRef.current = typeof revision === "number" ? { timeline, revision } : null;
     setSaveStatus("saved");
   }, [getTimelineState, projectId]);
 
@@ -46,12 +46,13 @@ export default function Profile() {
     })();
     (async () => {
       try {
-        const res = await fetch("/backend/projects", { credentials: "include" });
+        // Only the total is needed; one row keeps the response small.
+        const res = await fetch("/backend/projects?limit=1", { credentials: "include" });
         if (!res.ok) return;
         const j = await res.json();
         if (!cancelled) {
           const parsed = BackendProjectsResponseSchema.safeParse(j);
-          setProjectCount(parsed.success ? parsed.data.projects.length : 0);
+          setProjectCount(parsed.success ? (parsed.data.total ?? parsed.data.projects.length) : 0);
         }
       } catch (error) {
         console.error("Failed to fetch projects:", error);
@@ -16,6 +16,7 @@ export const BackendProjectsResponseSchema = z.object({
       created_at: z.string().optional(),
     }),
   ),
+  total: z.number().int().nonnegative().nullish(),
 });
 
 export const GitHubRepoStatsSchema = z.object({
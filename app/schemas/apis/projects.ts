@@ -32,6 +32,7 @@ export const ProjectStateResponseSchema = z.object({
   project: ProjectMetaSchema,
   timeline: timelineField,
   textBinItems: z.array(MediaBinItemSchema).default([]),
+  revision: z.number().int().nonnegative().optional(),
 });
 
 export const CreateProjectBodySchema = z.object({ name: z.string().min(1).max(120).default("Untitled Project") });
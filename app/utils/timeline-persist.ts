@@ -9,3 +9,67 @@ export function timelineStateForPersistence(timeline: TimelineState): TimelineSt
     }),
   };
 }
+
+export type JsonPatchOperation =
+  | { op: "add" | "replace"; path: string; value: unknown }
+  | { op: "remove"; path: string };
+
+/** Past this many ops a full save is both simpler and not much larger. */
+export const MAX_TIMELINE_PATCH_OPS = 500;
+
+const escapePointerToken = (token: string) => token.replace(/~/g, "~0").replace(/\//g, "~1");
+
+const isPlainObject = (value: unknown): value is Record<string, unknown> =>
+  typeof value === "object" && value !== null && !Array.isArray(value);
+
+function diffValue(prev: unknown, next: unknown, path: string, ops: JsonPatchOperation[]): void {
+  // Unchanged subtrees keep their identity across immutable state updates.
+  if (prev === next) return;
+  if (Array.isArray(prev) && Array.isArray(next)) {
+    // Keep the common prefix and suffix, so inserting or deleting a clip is one
+    // op rather than a copy of the whole track (jsonb_patch_diff does the same).
+    let head = 0;
+    while (head < prev.length && head < next.length && prev[head] === next[head]) head++;
+    let tail = 0;
+    while (
+      tail < prev.length - head &&
+      tail < next.length - head &&
+      prev[prev.length - 1 - tail] === next[next.length - 1 - tail]
+    ) {
+      tail++;
+    }
+    const paired = Math.min(prev.length, next.length) - head - tail;
+    for (let i = head; i < head + paired; i++) diffValue(prev[i], next[i], `${path}/${i}`, ops);
+    for (let i = next.length; i < prev.length; i++) ops.push({ op: "remove", path: `${path}/${head + paired}` });
+    for (let i = head + paired; i < next.length - tail; i++) {
+      ops.push({ op: "add", path: `${path}/${i}`, value: next[i] });
+    }
+    return;
+  }
+  if (isPlainObject(prev) && isPlainObject(next)) {
+    for (const key of Object.keys(prev)) {
+      if (prev[key] !== undefined && next[key] === undefined) {
+        ops.push({ op: "remove", path: `${path}/${escapePointerToken(key)}` });
+      }
+    }
+    for (const key of Object.keys(next)) {
+      if (next[key] === undefined) continue;
+      const childPath = `${path}/${escapePointerToken(key)}`;
+      if (prev[key] === undefined) ops.push({ op: "add", path: childPath, value: next[key] });
+      else diffValue(prev[key], next[key], childPath, ops);
+    }
+    return;
+  }
+  // Scalars and type changes are replaced wholesale.
+  if (JSON.stringify(prev) !== JSON.stringify(next)) ops.push({ op: "replace", path, value: next });
+}
+
+/**
+ * RFC 6902 patch turning the last saved timeline into `next`, for delta saves
+ * (PATCH /projects/{id}/timeline). Returns null when a full save is cheaper.
+ */
+export function diffTimeline(prev: TimelineState, next: TimelineState): JsonPatchOperation[] | null {
+  const ops: JsonPatchOperation[] = [];
+  diffValue(prev, next, "", ops);
+  return ops.length > MAX_TIMELINE_PATCH_OPS ? null : ops;
+}
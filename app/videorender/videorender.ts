@@ -952,12 +952,9 @@ app.get("/storage", async (req: Request, res: Response): Promise<void> => {
   }
 
   try {
+    // Kept in step with assets by a trigger (migrations/006_user_storage_usage.sql).
     const { rows } = await db.query<{ used_bytes: string }>(
-      `SELECT COALESCE(SUM(file_size), 0)::bigint AS used_bytes
-         FROM assets
-        WHERE user_id = $1
-          AND deleted_at IS NULL
-          AND status = 'ready'`,
+      `SELECT used_bytes FROM user_storage_usage WHERE user_id = $1`,
       [userId],
     );
 
@@ -977,6 +974,8 @@ type AssetDeleteRow = {
   status: string;
 };
 
+// An asset still being probed by the backend ('pending') holds its object as
+// much as a 'ready' one.
 async function shouldDeleteR2Object(client: PoolClient, row: AssetDeleteRow): Promise<boolean> {
   if (!row.r2_key || row.status !== "ready") return false;
 
@@ -985,7 +984,7 @@ async function shouldDeleteR2Object(client: PoolClient, row: AssetDeleteRow): Pr
 
     const { rows: refRows } = await client.query<{ count: string }>(
       `SELECT COUNT(*) AS count FROM assets
-        WHERE content_hash=$1 AND deleted_at IS NULL AND status='ready'`,
+        WHERE content_hash=$1 AND deleted_at IS NULL AND status IN ('pending', 'ready')`,
       [row.content_hash],
     );
     const remaining = parseInt(refRows[0]?.count ?? "0", 10);
@@ -998,14 +997,14 @@ async function shouldDeleteR2Object(client: PoolClient, row: AssetDeleteRow): Pr
 
   await client.query(
     `SELECT 1 FROM assets
-      WHERE r2_key=$1 AND deleted_at IS NULL AND status='ready'
+      WHERE r2_key=$1 AND deleted_at IS NULL AND status IN ('pending', 'ready')
       FOR UPDATE`,
     [row.r2_key],
   );
 
   const { rows: directRefRows } = await client.query<{ count: string }>(
     `SELECT COUNT(*) AS count FROM assets
-      WHERE r2_key=$1 AND deleted_at IS NULL AND status='ready'`,
+      WHERE r2_key=$1 AND deleted_at IS NULL AND status IN ('pending', 'ready')`,
     [row.r2_key],
   );
   const remainingDirect = parseInt(directRefRows[0]?.count ?? "0", 10);
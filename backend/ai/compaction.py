@@ -0,0 +1,278 @@
+"""
+Compact timeline / media-bin context for AI prompts.
+
+The editor sends its full ScrubberState / MediaBinItem objects, most of which
+(player layout, drag state, upload progress, transitions, keyframes, ...) no
+tool in ai/schema.py can use. This module projects them down to what the model
+needs, converts timeline pixels to seconds, and renders each track as a
+pipe-separated table. When the result exceeds a token budget, clips are kept
+in priority order — mentioned clips first, then the clips closest in time to
+them — and the rest are summarised as omitted.
+"""
+
+import json
+import os
+from collections.abc import Iterable
+from dataclasses import dataclass
+from typing import Any
+
+# Scrubber left/width are in pixels at the editor's current zoom; callers pass
+# the client's scale, defaulting to the base PIXELS_PER_SECOND in
+# app/components/timeline/types.ts.
+_PIXELS_PER_SECOND = 100
+# Rough chars-per-token ratio for English/JSON-ish text; good enough for budgeting.
+_CHARS_PER_TOKEN = 4
+
+PROMPT_COMPACTION_ENABLED = os.getenv("AI_TIMELINE_COMPACTION", "true") != "false"
+_DEFAULT_TOKEN_BUDGET = int(os.getenv("AI_PROMPT_TOKEN_BUDGET", "100000"))
+
+TIMELINE_COLUMNS = "id | name | type | start_s | end_s | extra"
+MEDIABIN_COLUMNS = "id | name | type | duration_s | size"
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + _CHARS_PER_TOKEN - 1) // _CHARS_PER_TOKEN
+
+
+@dataclass(frozen=True, slots=True)
+class CompactionReport:
+    original_bytes: int
+    compact_bytes: int
+    original_tokens: int
+    compact_tokens: int
+    clips_total: int
+    clips_kept: int
+    media_total: int
+    media_kept: int
+
+    def as_log_fields(self) -> str:
+        return (
+            f"bytes {self.original_bytes}->{self.compact_bytes} "
+            f"tokens~{self.original_tokens}->{self.compact_tokens} "
+            f"clips {self.clips_kept}/{self.clips_total} "
+            f"media {self.media_kept}/{self.media_total}"
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class CompactContext:
+    timeline: str
+    mediabin: str
+    report: CompactionReport
+
+
+@dataclass(frozen=True, slots=True)
+class _Row:
+    seq: int
+    id: str
+    track_index: int
+    start: float
+    end: float
+    line: str
+
+
+def _seconds(pixels: Any, pixels_per_second: float) -> float:
+    try:
+        return round(float(pixels) / pixels_per_second, 3)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _number(value: Any) -> float | None:
+    """`value` if the client sent a number there, else None (the field is skipped)."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return None
+
+
+def _fmt(value: float) -> str:
+    return f"{value:g}"
+
+
+def _quote(value: Any) -> str:
+    # JSON-quoting keeps names containing "|" or newlines unambiguous.
+    return json.dumps(str(value or ""), ensure_ascii=False)
+
+
+def _scrubber_extra(scrubber: dict[str, Any]) -> str:
+    parts: list[str] = []
+    rate = _number(scrubber.get("playbackRate"))
+    if rate not in (None, 1.0):
+        parts.append(f"rate={_fmt(rate)}")
+    volume = _number(scrubber.get("volume"))
+    if volume not in (None, 1.0):
+        parts.append(f"vol={_fmt(volume)}")
+    if scrubber.get("muted"):
+        parts.append("muted")
+    text = scrubber.get("text")
+    if isinstance(text, dict):
+        parts.append(f"text={_quote(text.get('textContent'))}")
+        style = [
+            f"{text['fontSize']}px" if text.get("fontSize") else "",
+            str(text.get("fontFamily") or ""),
+            str(text.get("color") or ""),
+            str(text.get("textAlign") or ""),
+            str(text.get("fontWeight") or ""),
+        ]
+        parts.append(" ".join(s for s in style if s))
+    children = scrubber.get("groupped_scrubbers")
+    if isinstance(children, list) and children:
+        parts.append(f"group_of={len(children)}")
+    return " ".join(parts)
+
+
+def _timeline_rows(
+    timeline: dict[str, Any], pixels_per_second: float
+) -> tuple[list[str], list[_Row]]:
+    track_ids: list[str] = []
+    rows: list[_Row] = []
+    tracks = timeline.get("tracks")
+    if not isinstance(tracks, list):
+        return track_ids, rows
+    for index, track in enumerate(tracks):
+        if not isinstance(track, dict):
+            continue
+        track_ids.append(str(track.get("id") or f"track-{index + 1}"))
+        for scrubber in track.get("scrubbers") or []:
+            if not isinstance(scrubber, dict):
+                continue
+            start = _seconds(scrubber.get("left"), pixels_per_second)
+            end = round(start + _seconds(scrubber.get("width"), pixels_per_second), 3)
+            line = " | ".join(
+                (
+                    str(scrubber.get("id", "")),
+                    _quote(scrubber.get("name")),
+                    str(scrubber.get("mediaType", "")),
+                    _fmt(start),
+                    _fmt(end),
+                    _scrubber_extra(scrubber),
+                )
+            ).rstrip(" |")
+            rows.append(
+                _Row(len(rows), str(scrubber.get("id", "")), index, start, end, line)
+            )
+    return track_ids, rows
+
+
+def _prioritise(rows: list[_Row], mentioned: set[str]) -> list[_Row]:
+    anchors = [row for row in rows if row.id in mentioned]
+    if not anchors:
+        return sorted(rows, key=lambda row: (row.start, row.track_index))
+
+    def distance(row: _Row) -> tuple[int, float, float]:
+        if row.id in mentioned:
+            return (0, 0.0, row.start)
+        gap = min(
+            max(0.0, anchor.start - row.end, row.start - anchor.end)
+            # Same-track neighbours break ties ahead of other tracks.
+            + (0.0 if anchor.track_index == row.track_index else 0.001)
+            for anchor in anchors
+        )
+        return (1, gap, row.start)
+
+    return sorted(rows, key=distance)
+
+
+def _take_within_budget(
+    lines: Iterable[str], budget_chars: int
+) -> tuple[set[int], int]:
+    kept: set[int] = set()
+    used = 0
+    for i, line in enumerate(lines):
+        cost = len(line) + 1
+        if used + cost > budget_chars:
+            break
+        kept.add(i)
+        used += cost
+    return kept, used
+
+
+def _render_timeline(track_ids: list[str], rows: list[_Row], kept: set[int]) -> str:
+    out = [f"Columns: {TIMELINE_COLUMNS}"]
+    by_track: dict[int, list[_Row]] = {}
+    omitted: dict[int, int] = {}
+    for row in rows:
+        if row.seq in kept:
+            by_track.setdefault(row.track_index, []).append(row)
+        else:
+            omitted[row.track_index] = omitted.get(row.track_index, 0) + 1
+    for index, track_id in enumerate(track_ids):
+        out.append(f"## Track {index + 1} ({track_id})")
+        out.extend(
+            row.line
+            for row in sorted(by_track.get(index, []), key=lambda row: row.start)
+        )
+        if omitted.get(index):
+            out.append(f"... {omitted[index]} more clips omitted")
+    return "\n".join(out)
+
+
+def _mediabin_line(item: dict[str, Any]) -> str:
+    size = ""
+    if item.get("media_width") and item.get("media_height"):
+        size = f"{item['media_width']}x{item['media_height']}"
+    duration = _number(item.get("durationInSeconds"))
+    return " | ".join(
+        (
+            str(item.get("id", "")),
+            _quote(item.get("name")),
+            str(item.get("mediaType", "")),
+            _fmt(round(duration, 3)) if duration else "",
+            size,
+        )
+    ).rstrip(" |")
+
+
+def compact_context(
+    timeline: dict[str, Any],
+    mediabin: list[dict[str, Any]],
+    mentioned_ids: list[str] | None = None,
+    token_budget: int = _DEFAULT_TOKEN_BUDGET,
+    original_bytes: int | None = None,
+    pixels_per_second: float = _PIXELS_PER_SECOND,
+) -> CompactContext:
+    """
+    Build the compact timeline and media-bin text for a prompt. `original_bytes`
+    can be passed when the caller already serialised the raw payloads.
+    """
+    mentioned = set(mentioned_ids or [])
+    budget_chars = token_budget * _CHARS_PER_TOKEN
+
+    items = [item for item in mediabin if isinstance(item, dict)]
+    items.sort(key=lambda item: item.get("id") not in mentioned)
+    media_lines = [_mediabin_line(item) for item in items]
+    # Reserve up to a fifth of the budget so a huge timeline can't starve the bin.
+    media_reserve = min(sum(len(line) + 1 for line in media_lines), budget_chars // 5)
+
+    track_ids, rows = _timeline_rows(timeline, pixels_per_second)
+    ordered = _prioritise(rows, mentioned)
+    kept_idx, used = _take_within_budget(
+        (row.line for row in ordered), budget_chars - media_reserve
+    )
+    kept_rows = {ordered[i].seq for i in kept_idx}
+    timeline_text = _render_timeline(track_ids, rows, kept_rows)
+
+    media_idx, _ = _take_within_budget(media_lines, max(budget_chars - used, 0))
+    mediabin_text = "\n".join(
+        [f"Columns: {MEDIABIN_COLUMNS}"]
+        + [line for i, line in enumerate(media_lines) if i in media_idx]
+    )
+    if len(media_idx) < len(media_lines):
+        mediabin_text += f"\n... {len(media_lines) - len(media_idx)} more items omitted"
+
+    if original_bytes is None:
+        original_bytes = len(json.dumps(timeline, ensure_ascii=False).encode()) + len(
+            json.dumps(mediabin, ensure_ascii=False).encode()
+        )
+    compact_text = timeline_text + mediabin_text
+    report = CompactionReport(
+        original_bytes=original_bytes,
+        compact_bytes=len(compact_text.encode()),
+        original_tokens=(original_bytes + _CHARS_PER_TOKEN - 1) // _CHARS_PER_TOKEN,
+        compact_tokens=estimate_tokens(compact_text),
+        clips_total=len(rows),
+        clips_kept=len(kept_rows),
+        media_total=len(media_lines),
+        media_kept=len(media_idx),
+    )
+    return CompactContext(timeline=timeline_text, mediabin=mediabin_text, report=report)
@@ -0,0 +1,163 @@
+"""
+Gemini cached-content management for AI prompts.
+
+A cache entry holds the static system instruction plus one project's compacted
+timeline / media-bin snapshot, keyed by a hash of (user, instruction, snapshot).
+Follow-up questions against an unchanged timeline then send only the
+conversation turn and reference the cache, cutting input tokens and
+time-to-first-token.
+
+Entries are created in the background on first sight (that request goes out
+inline), expire locally a little before Gemini's TTL, and are LRU-evicted past
+`max_entries`; evicted or expired entries are deleted remotely, best effort.
+"""
+
+import asyncio
+import contextlib
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Protocol
+
+from ai.compaction import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_CACHE_ENABLED = os.getenv("AI_CONTEXT_CACHE", "false") == "true"
+_CONTEXT_CACHE_TTL_SECONDS = int(os.getenv("AI_CONTEXT_CACHE_TTL_SECONDS", "600"))
+_CONTEXT_CACHE_MAX_ENTRIES = int(os.getenv("AI_CONTEXT_CACHE_MAX_ENTRIES", "256"))
+# Gemini refuses to cache prompts below a model-specific minimum (1024 tokens
+# for 2.5 Flash); smaller prompts are cheap enough to send inline anyway.
+_CONTEXT_CACHE_MIN_TOKENS = int(os.getenv("AI_CONTEXT_CACHE_MIN_TOKENS", "1024"))
+# Stop handing out a cache this long before Gemini expires it, so a request in
+# flight never references content that vanished underneath it.
+_EXPIRY_MARGIN_SECONDS = 30
+
+
+class CacheBackend(Protocol):
+    async def create_cache(
+        self, system_instruction: str, contents: str, ttl_seconds: int
+    ) -> str: ...
+
+    async def delete_cache(self, name: str) -> None: ...
+
+
+@dataclass(frozen=True, slots=True)
+class _Entry:
+    name: str
+    usable_until: float  # monotonic
+
+
+class ContextCache:
+    def __init__(
+        self,
+        backend: CacheBackend,
+        ttl_seconds: int = _CONTEXT_CACHE_TTL_SECONDS,
+        max_entries: int = _CONTEXT_CACHE_MAX_ENTRIES,
+        min_tokens: int = _CONTEXT_CACHE_MIN_TOKENS,
+    ) -> None:
+        self._backend = backend
+        self._ttl_seconds = ttl_seconds
+        self._max_entries = max_entries
+        self._min_tokens = min_tokens
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._pending: dict[str, asyncio.Task[None]] = {}
+        self._deletions: set[asyncio.Task[None]] = set()
+        self.hits = 0
+        self.misses = 0
+        self.created = 0
+        self.evicted = 0
+
+    @staticmethod
+    def key_for(namespace: str, system_instruction: str, contents: str) -> str:
+        digest = hashlib.sha256()
+        for part in (namespace, system_instruction, contents):
+            digest.update(part.encode())
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def lookup(self, key: str) -> str | None:
+        """Return a usable cache name for `key`, or None."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if time.monotonic() >= entry.usable_until:
+            self._evict(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.name
+
+    def schedule(self, key: str, system_instruction: str, contents: str) -> None:
+        """Start creating a cache for `key` in the background, once."""
+        if key in self._entries or key in self._pending:
+            return
+        if estimate_tokens(system_instruction) + estimate_tokens(contents) < (
+            self._min_tokens
+        ):
+            return
+        self._pending[key] = asyncio.create_task(
+            self._create(key, system_instruction, contents)
+        )
+
+    def invalidate(self, key: str) -> None:
+        """Drop `key`, e.g. after Gemini rejected its cache name."""
+        self._evict(key)
+
+    async def close(self) -> None:
+        """Cancel pending creations and delete every cache we still own."""
+        for task in list(self._pending.values()):
+            task.cancel()
+        for key in list(self._entries):
+            self._evict(key)
+        if self._deletions:
+            await asyncio.gather(*self._deletions, return_exceptions=True)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "pending": len(self._pending),
+            "hits": self.hits,
+            "misses": self.misses,
+            "created": self.created,
+            "evicted": self.evicted,
+        }
+
+    async def _create(self, key: str, system_instruction: str, contents: str) -> None:
+        started = time.monotonic()
+        try:
+            name = await self._backend.create_cache(
+                system_instruction, contents, self._ttl_seconds
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.warning("Context cache creation failed: %s", type(exc).__name__)
+            return
+        finally:
+            self._pending.pop(key, None)
+        self.created += 1
+        self._entries[key] = _Entry(
+            name=name,
+            usable_until=started + self._ttl_seconds - _EXPIRY_MARGIN_SECONDS,
+        )
+        while len(self._entries) > self._max_entries:
+            self._evict(next(iter(self._entries)))
+
+    def _evict(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self.evicted += 1
+        task = asyncio.create_task(self._delete(entry.name))
+        self._deletions.add(task)
+        task.add_done_callback(self._deletions.discard)
+
+    async def _delete(self, name: str) -> None:
+        with contextlib.suppress(Exception):
+            await self._backend.delete_cache(name)
@@ -0,0 +1,265 @@
+"""
+Deterministic fast path for common, unambiguous editing commands.
+
+Phrases like "create 2 tracks", "clear track 3", "mute intro" or "set speed of
+b-roll to 2x" map one-to-one onto a tool call. They are matched with a small
+set of anchored patterns and resolved against the request's timeline; anything
+that does not match exactly one clip / valid track returns None and goes to the
+model as usual.
+"""
+
+import os
+import re
+from typing import Any
+
+from ai.schema import (
+    FunctionCallResponse,
+    LLMCreateTrackArgs,
+    LLMDeleteScrubbersInTrackArgs,
+    LLMSetPlaybackSpeedArgs,
+    LLMSetVolumeArgs,
+)
+
+FAST_PATH_ENABLED = os.getenv("AI_FAST_PATH", "true") != "false"
+
+_ALLOWED_PLAYBACK_RATES = (0.25, 0.5, 1.0, 1.5, 2.0, 4.0)
+_MAX_TRACKS_PER_COMMAND = 20
+
+_NUMBER_WORDS = {
+    "a": 1,
+    "an": 1,
+    "one": 1,
+    "two": 2,
+    "three": 3,
+    "four": 4,
+    "five": 5,
+    "six": 6,
+    "seven": 7,
+    "eight": 8,
+    "nine": 9,
+    "ten": 10,
+}
+_COUNT = r"(\d+|" + "|".join(_NUMBER_WORDS) + r")"
+_NUM = r"(\d+(?:\.\d+)?|\.\d+)"
+
+_POLITE_PREFIX = re.compile(
+    r"^(?:(?:hey|ok|okay)\s+)?(?:(?:please|pls|kindly)\s+)?"
+    r"(?:(?:can|could|would|will)\s+you\s+)?(?:(?:please|pls)\s+)?"
+)
+_POLITE_SUFFIX = re.compile(r"\s+(?:please|pls|thanks|thank you)$")
+
+_CREATE_TRACKS = re.compile(
+    rf"^(?:create|add|make|insert)\s+(?:{_COUNT}\s+)?(?:more\s+|new\s+|empty\s+)*"
+    r"(tracks?)$"
+)
+_CLEAR_TRACK = re.compile(
+    r"^(?:(?:delete|remove|clear)\s+(?:everything|all(?:\s+(?:of\s+)?the)?"
+    r"(?:\s+(?:clips|scrubbers|items|media))?)\s+(?:on|in|from)|clear(?:\s+out)?)"
+    rf"\s+track\s+{_COUNT}$"
+)
+_MUTE = re.compile(r"^(un)?mute\s+(.+)$")
+_VOLUME = (
+    re.compile(
+        r"^(?:set|change|turn|make)\s+(?:the\s+)?volume\s+(?:of|for|on)\s+(.+?)"
+        rf"\s+(?:to|at)\s+{_NUM}\s*(%|percent)?$"
+    ),
+    re.compile(
+        r"^(?:set|change|turn|make)\s+(.+?)(?:'s)?\s+volume\s+(?:to|at)\s+"
+        rf"{_NUM}\s*(%|percent)?$"
+    ),
+)
+_SPEED = (
+    re.compile(
+        r"^(?:set|change|make)\s+(?:the\s+)?(?:playback\s+)?(?:speed|rate)\s+"
+        rf"(?:of|for|on)\s+(.+?)\s+(?:to|at)\s+{_NUM}\s*x?$"
+    ),
+    re.compile(
+        r"^(?:set|change|make)\s+(.+?)(?:'s)?\s+(?:playback\s+)?(?:speed|rate)\s+"
+        rf"(?:to|at)\s+{_NUM}\s*x?$"
+    ),
+    re.compile(
+        r"^(?:play|make|speed up|slow down)\s+(.+?)\s+(?:at\s+|to\s+)?"
+        rf"{_NUM}\s*x(?:\s+speed)?$"
+    ),
+)
+
+_PRONOUNS = {
+    "it",
+    "this",
+    "that",
+    "this clip",
+    "that clip",
+    "the clip",
+    "selected",
+    "the selected clip",
+    "selected clip",
+}
+_AUDIBLE_TYPES = {"audio", "video"}
+
+
+def _normalise(message: str) -> str:
+    text = " ".join(message.strip().lower().split())
+    text = text.rstrip(".!? ")
+    text = _POLITE_PREFIX.sub("", text)
+    return _POLITE_SUFFIX.sub("", text)
+
+
+def _count(token: str | None) -> int:
+    if token is None:
+        return 1
+    return int(token) if token.isdigit() else _NUMBER_WORDS[token]
+
+
+def _clean_target(target: str) -> str:
+    target = target.strip().strip("\"'“”‘’`")
+    target = re.sub(r"^(?:the\s+)?(?:clip|scrubber)\s+", "", target)
+    target = re.sub(r"^the\s+", "", target)
+    target = re.sub(r"\s+(?:clip|scrubber|track audio|audio)$", "", target)
+    return target.strip().strip("\"'“”‘’`")
+
+
+def _scrubbers(timeline: dict[str, Any]) -> list[dict[str, Any]]:
+    tracks = timeline.get("tracks")
+    if not isinstance(tracks, list):
+        return []
+    return [
+        scrubber
+        for track in tracks
+        if isinstance(track, dict)
+        for scrubber in (track.get("scrubbers") or [])
+        if isinstance(scrubber, dict)
+    ]
+
+
+def _resolve_clip(
+    raw_target: str, timeline: dict[str, Any], mentioned: list[str]
+) -> dict[str, Any] | None:
+    """Return the single clip `raw_target` refers to, or None if not unique."""
+    scrubbers = _scrubbers(timeline)
+    target = _clean_target(raw_target)
+    if not target:
+        return None
+
+    if target in _PRONOUNS:
+        mentioned_set = set(mentioned)
+        candidates = [s for s in scrubbers if s.get("id") in mentioned_set]
+        return candidates[0] if len(candidates) == 1 else None
+
+    by_id = [s for s in scrubbers if str(s.get("id", "")).lower() == target]
+    if len(by_id) == 1:
+        return by_id[0]
+
+    def names(s: dict[str, Any]) -> tuple[str, str]:
+        name = str(s.get("name") or "").lower()
+        return name, name.rsplit(".", 1)[0]
+
+    exact = [s for s in scrubbers if target in names(s)]
+    if exact:
+        return exact[0] if len(exact) == 1 else None
+    partial = [s for s in scrubbers if target in names(s)[0]]
+    return partial[0] if len(partial) == 1 else None
+
+
+def _playback_rate(value: str) -> float | None:
+    rate = float(value)
+    return rate if rate in _ALLOWED_PLAYBACK_RATES else None
+
+
+def _volume(value: str, percent: str | None) -> float | None:
+    volume = float(value)
+    # "to 50" means 50%. "to 1.5" or "to 2" could be a fraction over full
+    # scale or a percentage, so it is left to the model rather than guessed.
+    if percent or (volume.is_integer() and 10 <= volume <= 100):
+        volume /= 100
+    elif volume > 1:
+        return None
+    return volume if 0.0 <= volume <= 1.0 else None
+
+
+def match_intent(
+    message: str,
+    timeline: dict[str, Any] | None,
+    mentioned_ids: list[str] | None = None,
+) -> FunctionCallResponse | None:
+    """Return a tool call for an unambiguous command, else None."""
+    text = _normalise(message)
+    timeline = timeline or {}
+    mentioned = mentioned_ids or []
+
+    if m := _CREATE_TRACKS.match(text):
+        count_token, noun = m.groups()
+        # "add tracks" without a number is ambiguous about how many.
+        if count_token is None and noun == "tracks":
+            return None
+        count = _count(count_token)
+        if not 1 <= count <= _MAX_TRACKS_PER_COMMAND:
+            return None
+        return FunctionCallResponse(
+            function_call=LLMCreateTrackArgs(
+                function_name="LLMCreateTrack", count=count
+            )
+        )
+
+    if m := _CLEAR_TRACK.match(text):
+        track_number = _count(m.group(1))
+        tracks = timeline.get("tracks")
+        if not isinstance(tracks, list) or not 1 <= track_number <= len(tracks):
+            return None
+        return FunctionCallResponse(
+            function_call=LLMDeleteScrubbersInTrackArgs(
+                function_name="LLMDeleteScrubbersInTrack", track_number=track_number
+            )
+        )
+
+    if m := _MUTE.match(text):
+        clip = _resolve_clip(m.group(2), timeline, mentioned)
+        if clip is None or clip.get("mediaType") not in _AUDIBLE_TYPES:
+            return None
+        current = clip.get("volume")
+        volume = float(current) if isinstance(current, int | float) else 1.0
+        unmute = m.group(1) is not None
+        if unmute and volume <= 0.0:
+            volume = 1.0
+        return FunctionCallResponse(
+            function_call=LLMSetVolumeArgs(
+                function_name="LLMSetVolume",
+                scrubber_id=str(clip["id"]),
+                volume=min(max(volume, 0.0), 1.0),
+                muted=not unmute,
+            )
+        )
+
+    for pattern in _VOLUME:
+        if m := pattern.match(text):
+            clip = _resolve_clip(m.group(1), timeline, mentioned)
+            level = _volume(m.group(2), m.group(3))
+            if (
+                clip is None
+                or level is None
+                or clip.get("mediaType") not in _AUDIBLE_TYPES
+            ):
+                return None
+            return FunctionCallResponse(
+                function_call=LLMSetVolumeArgs(
+                    function_name="LLMSetVolume",
+                    scrubber_id=str(clip["id"]),
+                    volume=level,
+                    muted=False,
+                )
+            )
+
+    for pattern in _SPEED:
+        if m := pattern.match(text):
+            clip = _resolve_clip(m.group(1), timeline, mentioned)
+            rate = _playback_rate(m.group(2))
+            if clip is None or rate is None:
+                return None
+            return FunctionCallResponse(
+                function_call=LLMSetPlaybackSpeedArgs(
+                    function_name="LLMSetPlaybackSpeed",
+                    scrubber_id=str(clip["id"]),
+                    playback_rate=rate,
+                )
+            )
+
+    return None
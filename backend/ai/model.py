@@ -0,0 +1,222 @@
+"""
+Model client used by the AI routes.
+
+GeminiModelClient goes through the SDK's async client (`client.aio`) so a slow
+model call never blocks the event loop. FakeModelClient returns a canned reply
+after a configurable delay; select it with AI_MODEL_BACKEND=fake for local
+development, load tests and benchmarks.
+
+Both clients also implement the context-cache backend used by ai/context_cache.py.
+
+google-genai takes most of a second to import, so GeminiModelClient loads it
+on first use; the lifespan calls warm_up() so that happens before /ready.
+"""
+
+import asyncio
+import itertools
+import json
+import os
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Protocol
+
+import metrics
+from ai.schema import FunctionCallResponse
+from utils import require_env
+
+if TYPE_CHECKING:
+    from google import genai
+
+_GEMINI_MODEL = "gemini-2.5-flash"
+
+# metrics.model_tokens kind -> field of Gemini's usage metadata. Prompt
+# tokens include the cached ones.
+_USAGE_FIELDS = {
+    "prompt": "prompt_token_count",
+    "cached": "cached_content_token_count",
+    "output": "candidates_token_count",
+    "thoughts": "thoughts_token_count",
+}
+
+
+def _count_tokens(usage: Any) -> None:
+    if usage is None:
+        return
+    for kind, field in _USAGE_FIELDS.items():
+        count = getattr(usage, field, None)
+        if count:
+            metrics.model_tokens.inc(kind, amount=count)
+
+
+@dataclass(frozen=True, slots=True)
+class ModelRequest:
+    # Per-request text. With `cached_content` set, it is appended to the cached
+    # prefix; otherwise `system_instruction` travels inline with it.
+    contents: str
+    system_instruction: str | None = None
+    cached_content: str | None = None
+
+
+class ModelClient(Protocol):
+    async def generate(self, request: ModelRequest) -> str:
+        """Return the model's full JSON reply."""
+        ...
+
+    def stream(self, request: ModelRequest) -> AsyncIterator[str]:
+        """Yield the model's JSON reply as text chunks."""
+        ...
+
+    async def create_cache(
+        self, system_instruction: str, contents: str, ttl_seconds: int
+    ) -> str:
+        """Register a reusable prompt prefix; return its cache name."""
+        ...
+
+    async def delete_cache(self, name: str) -> None: ...
+
+    async def warm_up(self) -> None:
+        """Load whatever the first call would otherwise wait for."""
+        ...
+
+
+class GeminiModelClient:
+    def __init__(self, api_key: str, model: str = _GEMINI_MODEL) -> None:
+        self._api_key = api_key
+        self._model = model
+        self._sdk_client: genai.Client | None = None
+
+    @property
+    def _client(self) -> "genai.Client":
+        if self._sdk_client is None:
+            from google import genai
+
+            self._sdk_client = genai.Client(api_key=self._api_key)
+        return self._sdk_client
+
+    async def warm_up(self) -> None:
+        # In a thread: the import would block the event loop for its duration.
+        await asyncio.to_thread(lambda: self._client)
+
+    def _config(self, request: ModelRequest) -> dict[str, Any]:
+        config: dict[str, Any] = {
+            "response_mime_type": "application/json",
+            "response_schema": FunctionCallResponse,
+        }
+        # Gemini rejects a system instruction alongside cached content; the
+        # cache already carries it.
+        if request.cached_content:
+            config["cached_content"] = request.cached_content
+        elif request.system_instruction:
+            config["system_instruction"] = request.system_instruction
+        return config
+
+    async def generate(self, request: ModelRequest) -> str:
+        response = await self._client.aio.models.generate_content(
+            model=self._model,
+            contents=request.contents,
+            config=self._config(request),  # type: ignore[arg-type]
+        )
+        _count_tokens(response.usage_metadata)
+        return response.text or ""
+
+    async def stream(self, request: ModelRequest) -> AsyncIterator[str]:
+        chunks = await self._client.aio.models.generate_content_stream(
+            model=self._model,
+            contents=request.contents,
+            config=self._config(request),  # type: ignore[arg-type]
+        )
+        usage = None
+        async for chunk in chunks:
+            # Running totals; the last chunk has the final counts.
+            usage = chunk.usage_metadata or usage
+            if chunk.text:
+                yield chunk.text
+        _count_tokens(usage)
+
+    async def create_cache(
+        self, system_instruction: str, contents: str, ttl_seconds: int
+    ) -> str:
+        cache = await self._client.aio.caches.create(
+            model=self._model,
+            config={
+                "system_instruction": system_instruction,
+                "contents": [contents],
+                "ttl": f"{ttl_seconds}s",
+            },
+        )
+        if not cache.name:
+            raise RuntimeError("Gemini returned a cached content without a name")
+        return cache.name
+
+    async def delete_cache(self, name: str) -> None:
+        await self._client.aio.caches.delete(name=name)
+
+
+class FakeModelClient:
+    """Deterministic stand-in for Gemini; never touches the network."""
+
+    def __init__(
+        self,
+        reply: FunctionCallResponse | None = None,
+        delay_seconds: float = 0.0,
+        chunk_size: int = 16,
+    ) -> None:
+        self.reply = reply or FunctionCallResponse(
+            assistant_message="This is a fake reply from the local model client."
+        )
+        self.delay_seconds = delay_seconds
+        self.chunk_size = chunk_size
+        self.calls = 0
+        self.requests: list[ModelRequest] = []
+        self.caches: dict[str, tuple[str, str, int]] = {}
+        self._cache_ids = itertools.count(1)
+
+    def _reply_json(self) -> str:
+        return json.dumps(self.reply.model_dump(mode="json", exclude_none=False))
+
+    def _record(self, request: ModelRequest) -> None:
+        if request.cached_content and request.cached_content not in self.caches:
+            raise LookupError(f"Unknown cached content: {request.cached_content}")
+        self.calls += 1
+        self.requests.append(request)
+        del self.requests[:-100]
+
+    async def generate(self, request: ModelRequest) -> str:
+        self._record(request)
+        await asyncio.sleep(self.delay_seconds)
+        return self._reply_json()
+
+    async def stream(self, request: ModelRequest) -> AsyncIterator[str]:
+        self._record(request)
+        text = self._reply_json()
+        chunks = [
+            text[i : i + self.chunk_size] for i in range(0, len(text), self.chunk_size)
+        ]
+        for chunk in chunks:
+            await asyncio.sleep(self.delay_seconds / max(len(chunks), 1))
+            yield chunk
+
+    async def create_cache(
+        self, system_instruction: str, contents: str, ttl_seconds: int
+    ) -> str:
+        name = f"cachedContents/fake-{next(self._cache_ids)}"
+        self.caches[name] = (system_instruction, contents, ttl_seconds)
+        return name
+
+    async def delete_cache(self, name: str) -> None:
+        self.caches.pop(name, None)
+
+    async def warm_up(self) -> None:
+        pass
+
+
+def create_model_client() -> ModelClient:
+    """Pick the client from AI_MODEL_BACKEND ("gemini" default, or "fake")."""
+    backend = os.getenv("AI_MODEL_BACKEND", "gemini")
+    if backend == "fake":
+        return FakeModelClient(
+            delay_seconds=float(os.getenv("AI_FAKE_MODEL_DELAY_SECONDS", "0"))
+        )
+    if backend == "gemini":
+        return GeminiModelClient(api_key=require_env("GEMINI_API_KEY"))
+    raise ValueError(f"Unknown AI_MODEL_BACKEND: {backend}")
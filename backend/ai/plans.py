@@ -0,0 +1,126 @@
+"""
+Multi-step tool plans.
+
+With `allow_plans` set on a request, the model may answer with an ordered
+`function_calls` list instead of a single `function_call`. The plan is checked
+here in one pass before anything is returned, so the client either gets the
+whole plan or an error — never a partial one.
+
+Single-step plans are folded back into `function_call`, so clients that only
+understand the original shape keep working. Without `allow_plans`, a reply
+with several calls is cut down to its first, and the assistant message says
+that the rest was not applied.
+"""
+
+from typing import Any
+
+from ai.schema import (
+    FunctionCallResponse,
+    LLMAddScrubberByNameArgs,
+    LLMCreateTrackArgs,
+    LLMDeleteScrubberArgs,
+    LLMDeleteScrubbersInTrackArgs,
+    LLMMoveScrubberArgs,
+    LLMMoveScrubbersByOffsetArgs,
+    LLMResizeScrubberArgs,
+    LLMToolCall,
+)
+
+MAX_PLAN_STEPS = 20
+
+
+def _steps(response: FunctionCallResponse) -> list[LLMToolCall]:
+    steps = list(response.function_calls or [])
+    # Some replies fill both fields; treat function_call as the first step
+    # unless it just repeats it.
+    if response.function_call is not None and (
+        not steps or steps[0] != response.function_call
+    ):
+        steps.insert(0, response.function_call)
+    return steps
+
+
+def _track_count(timeline: dict[str, Any] | None) -> int | None:
+    tracks = (timeline or {}).get("tracks")
+    return len(tracks) if isinstance(tracks, list) else None
+
+
+def _referenced_ids(step: LLMToolCall) -> list[str]:
+    if isinstance(step, LLMMoveScrubbersByOffsetArgs):
+        return step.scrubber_ids
+    scrubber_id = getattr(step, "scrubber_id", None)
+    return [scrubber_id] if isinstance(scrubber_id, str) else []
+
+
+def _referenced_track(step: LLMToolCall) -> int | None:
+    if isinstance(step, LLMMoveScrubberArgs):
+        return step.new_track_number
+    if isinstance(
+        step,
+        LLMAddScrubberByNameArgs
+        | LLMDeleteScrubbersInTrackArgs
+        | LLMResizeScrubberArgs,
+    ):
+        return step.track_number
+    return None
+
+
+def _check_steps(steps: list[LLMToolCall], timeline: dict[str, Any] | None) -> None:
+    """
+    Walk the plan in order, tracking what earlier steps change: tracks created
+    and clips deleted. Raises ValueError on a step no client could apply.
+    """
+    track_count = _track_count(timeline)
+    deleted: set[str] = set()
+    for number, step in enumerate(steps, start=1):
+        stale = deleted.intersection(_referenced_ids(step))
+        if stale:
+            raise ValueError(f"Plan step {number} uses a clip deleted earlier")
+
+        track = _referenced_track(step)
+        if track is not None and (
+            track < 1 or (track_count is not None and track > track_count)
+        ):
+            raise ValueError(f"Plan step {number} targets missing track {track}")
+
+        if isinstance(step, LLMCreateTrackArgs):
+            if step.count < 1:
+                raise ValueError(f"Plan step {number} creates no tracks")
+            if track_count is not None:
+                track_count += step.count
+        elif isinstance(step, LLMDeleteScrubberArgs) and step.scrubber_id:
+            deleted.add(step.scrubber_id)
+
+
+def normalise_plan(
+    response: FunctionCallResponse,
+    allow_plans: bool,
+    timeline: dict[str, Any] | None = None,
+) -> FunctionCallResponse:
+    """
+    Return `response` in its canonical shape: no call, a single `function_call`,
+    or (plan mode only) a `function_calls` list of two or more steps; outside
+    plan mode only the first step is kept. Raises ValueError if the plan is
+    not acceptable as a whole.
+    """
+    steps = _steps(response)
+    if len(steps) > 1 and not allow_plans:
+        note = f"I did the first of {len(steps)} steps; ask again for the next one."
+        message = (
+            f"{response.assistant_message} {note}".strip()
+            if response.assistant_message
+            else note
+        )
+        response = response.model_copy(update={"assistant_message": message})
+        steps = steps[:1]
+    if len(steps) > MAX_PLAN_STEPS:
+        raise ValueError(f"Plan has more than {MAX_PLAN_STEPS} steps")
+    _check_steps(steps, timeline)
+
+    if len(steps) > 1:
+        return response.model_copy(
+            update={"function_call": None, "function_calls": steps}
+        )
+    return response.model_copy(
+        update={"function_call": steps[0] if steps else None, "function_calls": None}
+    )
@@ -0,0 +1,146 @@
+"""
+Per-user token-bucket rate limiting for the AI endpoint.
+
+Two interchangeable backends:
+- MemoryRateLimiter   — process-local; for single-node / single-worker deployments.
+- PostgresRateLimiter — shared across workers and instances; one upserted row
+                        per user, updated by a single statement (no event log,
+                        no advisory lock, no table-wide DELETE).
+
+A bucket holds up to `max_requests` tokens and refills continuously at
+`max_requests / window_seconds` tokens per second, so sustained throughput
+matches the old "N requests per rolling minute" policy while allowing bursts
+up to N.
+"""
+
+import asyncio
+import os
+import time
+from typing import Protocol
+
+from db import get_db_pool
+
+_RATE_LIMIT_TABLE = "ai_rate_limits"
+
+
+class RateLimiter(Protocol):
+    max_requests: int
+    window_seconds: int
+
+    async def hit(self, key: str) -> bool:
+        """Consume one token for `key`; return False when the limit is exceeded."""
+        ...
+
+    async def warm_up(self) -> None:
+        """Set up storage ahead of the first hit (run from the lifespan)."""
+        ...
+
+
+class MemoryRateLimiter:
+    """Token buckets held in a dict. Idle (full) buckets are swept when it grows."""
+
+    def __init__(
+        self, max_requests: int, window_seconds: int, max_keys: int = 100_000
+    ) -> None:
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+        self._refill_per_second = max_requests / window_seconds
+        self._max_keys = max_keys
+        # key -> (tokens, last refill monotonic time)
+        self._buckets: dict[str, tuple[float, float]] = {}
+
+    async def warm_up(self) -> None:
+        pass
+
+    async def hit(self, key: str) -> bool:
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (float(self.max_requests), now))
+        tokens = min(
+            float(self.max_requests),
+            tokens + (now - updated) * self._refill_per_second,
+        )
+        if tokens < 1.0:
+            self._buckets[key] = (tokens, now)
+            return False
+        self._buckets[key] = (tokens - 1.0, now)
+        if len(self._buckets) > self._max_keys:
+            self._sweep(now)
+        return True
+
+    def _sweep(self, now: float) -> None:
+        # A bucket that has refilled completely is indistinguishable from a new one.
+        full_after = self.window_seconds
+        for key, (_, updated) in list(self._buckets.items()):
+            if now - updated >= full_after:
+                del self._buckets[key]
+
+
+class PostgresRateLimiter:
+    """Token buckets stored as one row per user, consumed with a single upsert."""
+
+    def __init__(self, max_requests: int, window_seconds: int) -> None:
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+        self._refill_per_second = max_requests / window_seconds
+        self._ready = False
+        self._init_lock = asyncio.Lock()
+
+    async def warm_up(self) -> None:
+        await self.ensure_table()
+
+    async def ensure_table(self) -> None:
+        if self._ready:
+            return
+        async with self._init_lock:
+            if not self._ready:
+                pool = await get_db_pool()
+                async with pool.acquire() as conn:
+                    await conn.execute(
+                        f"""
+                        CREATE TABLE IF NOT EXISTS {_RATE_LIMIT_TABLE} (
+                            user_id    TEXT PRIMARY KEY,
+                            tokens     DOUBLE PRECISION NOT NULL,
+                            updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                        )
+                        """
+                    )
+                self._ready = True
+
+    async def hit(self, key: str) -> bool:
+        await self.ensure_table()
+        pool = await get_db_pool()
+        async with pool.acquire() as conn:
+            # The ON CONFLICT row lock serialises concurrent hits for the same
+            # user; the WHERE clause skips the update (and returns no row) when
+            # the refilled bucket has less than one token.
+            row = await conn.fetchrow(
+                f"""
+                INSERT INTO {_RATE_LIMIT_TABLE} AS r (user_id, tokens, updated_at)
+                VALUES ($1, $2::float8 - 1, now())
+                ON CONFLICT (user_id) DO UPDATE
+                SET tokens = LEAST(
+                        $2::float8,
+                        r.tokens + EXTRACT(EPOCH FROM now() - r.updated_at) * $3::float8
+                    ) - 1,
+                    updated_at = now()
+                WHERE LEAST(
+                        $2::float8,
+                        r.tokens + EXTRACT(EPOCH FROM now() - r.updated_at) * $3::float8
+                    ) >= 1
+                RETURNING tokens
+                """,
+                key,
+                float(self.max_requests),
+                self._refill_per_second,
+            )
+        return row is not None
+
+
+def create_rate_limiter(max_requests: int, window_seconds: int) -> RateLimiter:
+    """Pick the backend from AI_RATE_LIMIT_BACKEND ("postgres" default, or "memory")."""
+    backend = os.getenv("AI_RATE_LIMIT_BACKEND", "postgres")
+    if backend == "memory":
+        return MemoryRateLimiter(max_requests, window_seconds)
+    if backend == "postgres":
+        return PostgresRateLimiter(max_requests, window_seconds)
+    raise ValueError(f"Unknown AI_RATE_LIMIT_BACKEND: {backend}")
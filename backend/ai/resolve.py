@@ -0,0 +1,302 @@
+"""
+Server-side resolution and checking of tool calls against the request's
+timeline, before the response leaves the server.
+
+- Names are resolved to ids (`scrubber_name` → `scrubber_id`), so the client
+  acts on the exact clip that was checked here.
+- Calls that cannot work are caught: unknown ids or tracks, ambiguous names,
+  splits outside the clip, and placements that would overlap another clip on
+  the destination track (unless a transition joins the two).
+- `pixels_per_second` is set to the client's actual scale, and
+  `drop_left_px` (which the prompt has the model compute at 100 px/s) is
+  rescaled to it.
+
+A rejected call is replaced by an assistant_message explaining why, so the
+user can rephrase instead of the client failing on it.
+"""
+
+import os
+from typing import Any
+
+from ai.schema import (
+    FunctionCallResponse,
+    LLMAddScrubberByNameArgs,
+    LLMAddScrubberToTimelineArgs,
+    LLMCreateTrackArgs,
+    LLMDeleteScrubberArgs,
+    LLMDeleteScrubbersInTrackArgs,
+    LLMMoveScrubberArgs,
+    LLMMoveScrubbersByOffsetArgs,
+    LLMResizeScrubberArgs,
+    LLMSetPlaybackSpeedArgs,
+    LLMSetVolumeArgs,
+    LLMSplitScrubberArgs,
+    LLMToolCall,
+    LLMUpdateTextContentArgs,
+    LLMUpdateTextStyleArgs,
+)
+from ai.timeline_index import PIXELS_PER_SECOND, IndexedClip, TimelineIndex
+
+TOOL_CALL_RESOLUTION_ENABLED = os.getenv("AI_RESOLVE_TOOL_CALLS", "true") != "false"
+
+_ALLOWED_PLAYBACK_RATES = (0.25, 0.5, 1.0, 1.5, 2.0, 4.0)
+_MAX_LISTED_MATCHES = 5
+# Sub-frame slack so clips placed edge to edge don't count as overlapping.
+_EPSILON_SECONDS = 1e-3
+
+
+class ToolCallError(ValueError):
+    """A tool call that cannot be applied to the current timeline."""
+
+
+class _Resolver:
+    def __init__(self, index: TimelineIndex, mediabin: list[dict[str, Any]]) -> None:
+        self._index = index
+        self._mediabin = [item for item in mediabin if isinstance(item, dict)]
+        # Tracks / clips changed by earlier plan steps; the index no longer
+        # describes them, so time-based checks are skipped there.
+        self._touched_tracks: set[int] = set()
+        self._touched_clips: set[str] = set()
+
+    def resolve(self, call: LLMToolCall) -> LLMToolCall:
+        update: dict[str, Any] = {}
+        if isinstance(call, LLMAddScrubberToTimelineArgs):
+            self._add_by_id(call, update)
+        elif isinstance(call, LLMAddScrubberByNameArgs):
+            self._add_by_name(call, update)
+        elif isinstance(call, LLMMoveScrubberArgs):
+            self._move(call, update)
+        elif isinstance(call, LLMResizeScrubberArgs):
+            self._resize(call, update)
+        elif isinstance(call, LLMMoveScrubbersByOffsetArgs):
+            self._shift(call, update)
+        elif isinstance(call, LLMSplitScrubberArgs):
+            self._split(call, update)
+        elif isinstance(
+            call, LLMDeleteScrubberArgs | LLMSetVolumeArgs | LLMSetPlaybackSpeedArgs
+        ):
+            clip = self._clip(call.scrubber_id, call.scrubber_name)
+            update["scrubber_id"] = clip.id
+            if (
+                isinstance(call, LLMSetPlaybackSpeedArgs)
+                and call.playback_rate not in _ALLOWED_PLAYBACK_RATES
+            ):
+                raise ToolCallError(f"{call.playback_rate}× is not a supported speed.")
+            if isinstance(call, LLMDeleteScrubberArgs):
+                self._touched_clips.add(clip.id)
+        elif isinstance(call, LLMUpdateTextContentArgs | LLMUpdateTextStyleArgs):
+            clip = self._clip(call.scrubber_id, None)
+            if clip.media_type != "text":
+                raise ToolCallError(f'"{clip.name}" is not a text clip.')
+        elif isinstance(call, LLMDeleteScrubbersInTrackArgs):
+            self._require_track(call.track_number)
+            self._touched_tracks.add(call.track_number)
+        elif isinstance(call, LLMCreateTrackArgs):
+            pass
+        return call.model_copy(update=update) if update else call
+
+    def _add_by_id(
+        self, call: LLMAddScrubberToTimelineArgs, update: dict[str, Any]
+    ) -> None:
+        item = next(
+            (i for i in self._mediabin if str(i.get("id")) == call.scrubber_id), None
+        )
+        if self._mediabin and item is None:
+            raise ToolCallError("That media item is not in the media bin.")
+        track = self._index.track_number(call.track_id)
+        if track is None:
+            raise ToolCallError(f"There is no track {call.track_id}.")
+        start = call.drop_left_px / PIXELS_PER_SECOND
+        if item is not None:
+            self._check_free(track, start, start + _duration(item))
+        self._touched_tracks.add(track)
+        update["drop_left_px"] = round(start * self._index.pixels_per_second)
+
+    def _add_by_name(
+        self, call: LLMAddScrubberByNameArgs, update: dict[str, Any]
+    ) -> None:
+        self._require_track(call.track_number)
+        if self._mediabin:
+            item = self._media_item(call.scrubber_name)
+            start = call.position_seconds
+            self._check_free(call.track_number, start, start + _duration(item))
+            update["scrubber_name"] = str(item.get("name"))
+        self._touched_tracks.add(call.track_number)
+        update["pixels_per_second"] = self._pixels_per_second()
+
+    def _move(self, call: LLMMoveScrubberArgs, update: dict[str, Any]) -> None:
+        clip = self._clip(call.scrubber_id, None)
+        self._require_track(call.new_track_number)
+        if call.new_position_seconds < 0:
+            raise ToolCallError("Clips cannot start before 0s.")
+        end = call.new_position_seconds + clip.end - clip.start
+        self._check_free(
+            call.new_track_number, call.new_position_seconds, end, {clip.id}
+        )
+        self._touched_tracks.update((clip.track, call.new_track_number))
+        self._touched_clips.add(clip.id)
+        update["pixels_per_second"] = self._pixels_per_second()
+
+    def _resize(self, call: LLMResizeScrubberArgs, update: dict[str, Any]) -> None:
+        if call.new_duration_seconds <= 0:
+            raise ToolCallError("The new duration must be positive.")
+        if call.scrubber_id or call.scrubber_name:
+            clip = self._clip(call.scrubber_id, call.scrubber_name, call.track_number)
+        else:
+            # Same fallback as the client: the rightmost clip on the track.
+            self._require_track(call.track_number or 0)
+            found = self._index.rightmost(call.track_number or 0)
+            if found is None:
+                raise ToolCallError(f"Track {call.track_number} is empty.")
+            clip = found
+        self._check_free(
+            clip.track, clip.start, clip.start + call.new_duration_seconds, {clip.id}
+        )
+        self._touched_tracks.add(clip.track)
+        self._touched_clips.add(clip.id)
+        update["scrubber_id"] = clip.id
+        update["pixels_per_second"] = self._pixels_per_second()
+
+    def _shift(
+        self, call: LLMMoveScrubbersByOffsetArgs, update: dict[str, Any]
+    ) -> None:
+        clips = [self._clip(clip_id, None) for clip_id in call.scrubber_ids]
+        moving = {clip.id for clip in clips}
+        for clip in clips:
+            if clip.start + call.offset_seconds < -_EPSILON_SECONDS:
+                raise ToolCallError(f'That would move "{clip.name}" before 0s.')
+            self._check_free(
+                clip.track,
+                clip.start + call.offset_seconds,
+                clip.end + call.offset_seconds,
+                moving,
+            )
+        self._touched_tracks.update(clip.track for clip in clips)
+        self._touched_clips.update(moving)
+        update["pixels_per_second"] = self._pixels_per_second()
+
+    def _split(self, call: LLMSplitScrubberArgs, update: dict[str, Any]) -> None:
+        clip = self._clip(call.scrubber_id, call.scrubber_name)
+        if clip.id not in self._touched_clips and not (
+            clip.start + _EPSILON_SECONDS
+            < call.time_seconds
+            < clip.end - _EPSILON_SECONDS
+        ):
+            raise ToolCallError(
+                f'{call.time_seconds:g}s is outside "{clip.name}" '
+                f"({clip.start:g}s–{clip.end:g}s)."
+            )
+        self._touched_tracks.add(clip.track)
+        update["scrubber_id"] = clip.id
+
+    def _pixels_per_second(self) -> int:
+        return round(self._index.pixels_per_second)
+
+    def _require_track(self, number: int) -> None:
+        if not self._index.has_track(number):
+            raise ToolCallError(f"There is no track {number}.")
+
+    def _clip(
+        self, clip_id: str | None, name: str | None, track: int | None = None
+    ) -> IndexedClip:
+        if clip_id:
+            clip = self._index.clip(clip_id)
+            if clip is not None:
+                return clip
+            if not name:
+                raise ToolCallError("That clip is not on the timeline.")
+        if not name:
+            raise ToolCallError("No clip was specified.")
+        matches = self._index.find_by_name(name, track)
+        if not matches:
+            raise ToolCallError(f'No clip on the timeline matches "{name}".')
+        # find_by_name puts exact matches first; one exact match beats any
+        # number of partial ones.
+        exact = [clip for clip in matches if _exact(clip, name)]
+        if len(matches) == 1 or len(exact) == 1:
+            return matches[0]
+        listed = ", ".join(
+            f'"{clip.name}" (track {clip.track}, {clip.start:g}s)'
+            for clip in matches[:_MAX_LISTED_MATCHES]
+        )
+        raise ToolCallError(f'"{name}" matches several clips: {listed}.')
+
+    def _media_item(self, name: str) -> dict[str, Any]:
+        needle = name.strip().lower()
+        matches = [
+            item
+            for item in self._mediabin
+            if needle and needle in str(item.get("name") or "").lower()
+        ]
+        exact = [
+            item
+            for item in matches
+            if needle in _name_forms(str(item.get("name") or ""))
+        ]
+        if len(exact) == 1 or len(matches) == 1:
+            return (exact or matches)[0]
+        if not matches:
+            raise ToolCallError(f'No media item matches "{name}".')
+        listed = ", ".join(
+            f'"{item.get("name")}"' for item in matches[:_MAX_LISTED_MATCHES]
+        )
+        raise ToolCallError(f'"{name}" matches several media items: {listed}.')
+
+    def _check_free(
+        self,
+        track: int,
+        start: float,
+        end: float,
+        moving: set[str] | frozenset[str] = frozenset(),
+    ) -> None:
+        if track in self._touched_tracks:
+            return
+        for other in self._index.overlapping(
+            track, start + _EPSILON_SECONDS, end - _EPSILON_SECONDS, moving
+        ):
+            if any(self._index.linked(clip_id, other.id) for clip_id in moving):
+                continue
+            raise ToolCallError(
+                f'That would overlap "{other.name}" on track {track} '
+                f"({other.start:g}s–{other.end:g}s)."
+            )
+
+
+def _name_forms(name: str) -> tuple[str, str]:
+    lowered = name.lower()
+    return lowered, lowered.rsplit(".", 1)[0]
+
+
+def _exact(clip: IndexedClip, name: str) -> bool:
+    return name.strip().lower() in _name_forms(clip.name)
+
+
+def _duration(item: dict[str, Any]) -> float:
+    value = item.get("durationInSeconds")
+    return float(value) if isinstance(value, int | float) else 0.0
+
+
+def resolve_response(
+    response: FunctionCallResponse,
+    index: TimelineIndex,
+    mediabin: list[dict[str, Any]] | None = None,
+) -> FunctionCallResponse:
+    """
+    Resolve every call in `response` (all plan steps, in order). If any step
+    fails, the whole reply becomes an explanatory assistant_message.
+    """
+    calls: list[LLMToolCall] = list(response.function_calls or [])
+    if response.function_call is not None:
+        calls = [response.function_call]
+    if not calls:
+        return response
+    resolver = _Resolver(index, mediabin or [])
+    try:
+        resolved = [resolver.resolve(call) for call in calls]
+    except ToolCallError as exc:
+        return FunctionCallResponse(
+            assistant_message=f"I couldn't apply that edit. {exc}"
+        )
+    if response.function_call is not None:
+        return response.model_copy(update={"function_call": resolved[0]})
+    return response.model_copy(update={"function_calls": resolved})
@@ -0,0 +1,102 @@
+"""
+Single-flight coalescing and a short-lived response cache for AI requests.
+
+Double-clicked sends and client retries produce byte-identical requests within
+seconds. Keyed by a digest of the user and the fully built prompt, identical
+requests share one in-flight model call, and completed responses are replayed
+from a bounded TTL/LRU map for a short window. Failures are never cached.
+"""
+
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+
+from ai.schema import FunctionCallResponse
+
+RESPONSE_CACHE_ENABLED = os.getenv("AI_RESPONSE_CACHE", "true") != "false"
+_RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("AI_RESPONSE_CACHE_TTL_SECONDS", "30"))
+_RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("AI_RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        ttl_seconds: float = _RESPONSE_CACHE_TTL_SECONDS,
+        max_entries: int = _RESPONSE_CACHE_MAX_ENTRIES,
+    ) -> None:
+        self._ttl_seconds = ttl_seconds
+        self._max_entries = max_entries
+        # key -> (response, monotonic expiry)
+        self._done: OrderedDict[str, tuple[FunctionCallResponse, float]] = OrderedDict()
+        self._inflight: dict[str, asyncio.Task[FunctionCallResponse]] = {}
+        self.hits = 0
+        self.coalesced = 0
+        self.misses = 0
+
+    @staticmethod
+    def key_for(namespace: str, *parts: str) -> str:
+        digest = hashlib.sha256(namespace.encode())
+        for part in parts:
+            digest.update(b"\0")
+            digest.update(part.encode())
+        return digest.hexdigest()
+
+    def peek(self, key: str) -> FunctionCallResponse | None:
+        """Return a fresh completed response for `key`, counting a hit."""
+        cached = self._done.get(key)
+        if cached is None:
+            return None
+        response, expires_at = cached
+        if time.monotonic() >= expires_at:
+            del self._done[key]
+            return None
+        self._done.move_to_end(key)
+        self.hits += 1
+        return response
+
+    def store(self, key: str, response: FunctionCallResponse) -> None:
+        self._done[key] = (response, time.monotonic() + self._ttl_seconds)
+        self._done.move_to_end(key)
+        while len(self._done) > self._max_entries:
+            self._done.popitem(last=False)
+
+    async def get_or_compute(
+        self, key: str, compute: Callable[[], Awaitable[FunctionCallResponse]]
+    ) -> FunctionCallResponse:
+        cached = self.peek(key)
+        if cached is not None:
+            return cached
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            # Run in its own task so a disconnecting first caller doesn't cancel
+            # the call for everyone waiting on it.
+            task = asyncio.create_task(self._run(key, compute))
+            self._inflight[key] = task
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    async def _run(
+        self, key: str, compute: Callable[[], Awaitable[FunctionCallResponse]]
+    ) -> FunctionCallResponse:
+        try:
+            response = await compute()
+        finally:
+            self._inflight.pop(key, None)
+        self.store(key, response)
+        return response
+
+    def stats(self) -> dict[str, int | float]:
+        lookups = self.hits + self.coalesced + self.misses
+        return {
+            "size": len(self._done),
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+        }
@@ -1,26 +1,42 @@
+import asyncio
 import json
 import logging
-import asyncio
+import time
+from collections.abc import AsyncIterator, Callable
+from dataclasses import dataclass
 from typing import Any
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from google import genai
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, ConfigDict, Field
 
+import metrics
+from ai.compaction import PROMPT_COMPACTION_ENABLED, compact_context
+from ai.context_cache import CONTEXT_CACHE_ENABLED, ContextCache
+from ai.intents import FAST_PATH_ENABLED, match_intent
+from ai.model import ModelClient, ModelRequest, create_model_client
+from ai.plans import normalise_plan
+from ai.prompt import PLAN_SYSTEM_INSTRUCTION, SYSTEM_INSTRUCTION
+from ai.rate_limit import RateLimiter, create_rate_limiter
+from ai.resolve import TOOL_CALL_RESOLUTION_ENABLED, resolve_response
+from ai.response_cache import RESPONSE_CACHE_ENABLED, ResponseCache
 from ai.schema import FunctionCallResponse
+from ai.streaming import FunctionCallStreamParser, replay_events, sse_event
+from ai.timeline_index import PIXELS_PER_SECOND, TimelineIndex
 from auth.routes import get_current_user
 from auth.schema import SessionUser
-from db import get_db_pool
-from utils import require_env
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(tags=["ai"])
 
-_GEMINI_MODEL = "gemini-2.5-flash"
-
-GEMINI_API_KEY: str = require_env("GEMINI_API_KEY")
-gemini_client: genai.Client = genai.Client(api_key=GEMINI_API_KEY)
+model_client: ModelClient = create_model_client()
+context_cache: ContextCache | None = (
+    ContextCache(model_client) if CONTEXT_CACHE_ENABLED else None
+)
+response_cache: ResponseCache | None = (
+    ResponseCache() if RESPONSE_CACHE_ENABLED else None
+)
 
 _MAX_MESSAGE_LENGTH = 20_000
 _MAX_HISTORY_ITEMS = 50
@@ -29,74 +45,24 @@ _MAX_HISTORY_ITEMS = 50
 _MAX_TIMELINE_BYTES = 10 * 1024 * 1024  # 10 MB
 _MAX_MEDIABIN_BYTES = 4 * 1024 * 1024  # 4 MB
 
-# Per-user DB-backed rate limit. This is shared across worker processes and instances.
-# For higher scale, replace with Redis.
+# Per-user rate limit. The default Postgres backend is shared across worker
+# processes and instances; AI_RATE_LIMIT_BACKEND=memory suits single-node setups.
 _RATE_LIMIT_WINDOW_SECONDS = 60
 _RATE_LIMIT_MAX_REQUESTS = 60
-_RATE_LIMIT_TABLE = "ai_rate_limit_events"
-_rate_limit_ready = False
-_rate_limit_init_lock = asyncio.Lock()
-
-
-async def _ensure_rate_limit_table() -> None:
-    global _rate_limit_ready
-    if _rate_limit_ready:
-        return
-    async with _rate_limit_init_lock:
-        if _rate_limit_ready:
-            return
-        pool = await get_db_pool()
-        async with pool.acquire() as conn:
-            await conn.execute(
-                f"""
-                CREATE TABLE IF NOT EXISTS {_RATE_LIMIT_TABLE} (
-                    user_id TEXT NOT NULL,
-                    occurred_at TIMESTAMPTZ NOT NULL DEFAULT now()
-                )
-                """
-            )
-            await conn.execute(
-                f"""
-                CREATE INDEX IF NOT EXISTS idx_{_RATE_LIMIT_TABLE}_user_time
-                ON {_RATE_LIMIT_TABLE} (user_id, occurred_at)
-                """
-            )
-            await conn.execute(
-                f"""
-                CREATE INDEX IF NOT EXISTS idx_{_RATE_LIMIT_TABLE}_time
-                ON {_RATE_LIMIT_TABLE} (occurred_at)
-                """
-            )
-        _rate_limit_ready = True
+rate_limiter: RateLimiter = create_rate_limiter(
+    _RATE_LIMIT_MAX_REQUESTS, _RATE_LIMIT_WINDOW_SECONDS
+)
 
 
 async def _enforce_rate_limit(user_id: str) -> None:
-    await _ensure_rate_limit_table()
-    pool = await get_db_pool()
-    async with pool.acquire() as conn:
-        async with conn.transaction():
-            await conn.execute("SELECT pg_advisory_xact_lock(hashtext($1))", user_id)
-            await conn.execute(
-                f"""
-                DELETE FROM {_RATE_LIMIT_TABLE}
-                WHERE occurred_at < now() - make_interval(secs => $1::int)
-                """,
-                _RATE_LIMIT_WINDOW_SECONDS,
-            )
-            count_row = await conn.fetchrow(
-                f"SELECT COUNT(*)::int AS request_count FROM {_RATE_LIMIT_TABLE} WHERE user_id = $1",
-                user_id,
-            )
-            request_count = int(count_row["request_count"]) if count_row else 0
-            if request_count >= _RATE_LIMIT_MAX_REQUESTS:
-                raise HTTPException(
-                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                    detail=f"Rate limit exceeded: {_RATE_LIMIT_MAX_REQUESTS} requests per minute",
-                )
-            await conn.execute(
-                f"INSERT INTO {_RATE_LIMIT_TABLE} (user_id) VALUES ($1)",
-                user_id,
-            )
+    with metrics.span("rate_limit"):
+        allowed = await rate_limiter.hit(user_id)
+    if not allowed:
+        metrics.ai_rate_limit_rejections.inc()
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Rate limit exceeded: {_RATE_LIMIT_MAX_REQUESTS} requests per minute",
+        )
 
 
 class Message(BaseModel):
@@ -107,15 +73,71 @@ class Message(BaseModel):
     timeline_state: dict[str, Any] | None = None
     mediabin_items: list[dict[str, Any]] | None = None
     chat_history: list[dict[str, Any]] | None = None
+    # Opt in to multi-step replies (FunctionCallResponse.function_calls).
+    allow_plans: bool = False
+    # The editor's current (zoomed) scale; scrubber left/width are in these pixels.
+    pixels_per_second: float | None = Field(default=None, gt=0)
 
 
-@router.post("/ai")
-async def process_ai_message(
+def _match_fast_path(request: Message) -> FunctionCallResponse | None:
+    """
+    Resolve simple commands locally; these skip the model (and its rate limit).
+    """
+    fast = match_intent(
+        request.message, request.timeline_state, request.mentioned_scrubber_ids
+    )
+    if fast is not None and fast.function_call is not None:
+        logger.info("AI fast path: %s", fast.function_call.function_name)
+    return fast
+
+
+@dataclass(frozen=True, slots=True)
+class _Prompt:
+    # Project snapshot (cacheable per timeline) and the conversational turn.
+    context: str
+    turn: str
+    instruction: str = SYSTEM_INSTRUCTION
+
+
+def _tool_call_checker(
     request: Message,
-    user: SessionUser = Depends(get_current_user),
-) -> FunctionCallResponse:
-    await _enforce_rate_limit(user.user_id)
+) -> Callable[[FunctionCallResponse], FunctionCallResponse]:
+    """
+    Resolve tool calls against the request's timeline. The index is built on
+    first use and shared by the stream preview and the final reply.
+    """
+    index: TimelineIndex | None = None
+
+    def check(response: FunctionCallResponse) -> FunctionCallResponse:
+        nonlocal index
+        if not TOOL_CALL_RESOLUTION_ENABLED or request.timeline_state is None:
+            return response
+        if response.function_call is None and not response.function_calls:
+            return response
+        if index is None:
+            index = TimelineIndex(
+                request.timeline_state,
+                request.pixels_per_second or PIXELS_PER_SECOND,
+            )
+        with metrics.span("resolve"):
+            return resolve_response(response, index, request.mediabin_items)
+
+    return check
+
+
+def _response_cache_key(request: Message, prompt: _Prompt, user_id: str) -> str:
+    # The resolved reply also depends on the client's scale, which the raw
+    # (uncompacted) prompt does not carry.
+    return ResponseCache.key_for(
+        user_id,
+        prompt.instruction,
+        prompt.context,
+        prompt.turn,
+        str(request.pixels_per_second),
+    )
 
+
+def _build_prompt(request: Message) -> _Prompt:
     # Bound the serialized payload before forwarding to Gemini to cap token spend.
     timeline_json = json.dumps(request.timeline_state or {}, ensure_ascii=False)
     if len(timeline_json) > _MAX_TIMELINE_BYTES:
@@ -133,76 +155,149 @@ async def process_ai_message(
     # Truncate history to last N items to limit prompt size
     history = (request.chat_history or [])[-_MAX_HISTORY_ITEMS:]
 
-    prompt = f"""
-You are Kimu, an AI video-editing assistant.
-
-## Response rules
-- Call ONE tool when the user explicitly requests an editing action.
-- Set function_call to null and return a short assistant_message for greetings, questions, or when the action is ambiguous.
-- Never guess IDs — use scrubber_name or look them up in the timeline/media-bin data provided.
-- Always use pixels_per_second=100 unless the user states otherwise.
-- Tracks are 1-based: "track 1" → track_number=1, track_id="track-1".
-
-## Tool catalogue
-
-### Adding clips
-- **LLMAddScrubberByName** — preferred when user says a clip name, track, and time.
-  Args: scrubber_name (substring match), track_number (1-based), position_seconds, pixels_per_second=100
-- **LLMAddScrubberToTimeline** — when you have the exact media-bin item id.
-  Args: scrubber_id (exact), track_id ("track-N"), drop_left_px
-
-### Moving & resizing
-- **LLMMoveScrubber** — move a clip to a new time/track.
-  Args: scrubber_id, new_position_seconds, new_track_number, pixels_per_second=100
-- **LLMResizeScrubber** — change a clip's displayed duration.
-  Args: scrubber_id (or scrubber_name+track_number), new_duration_seconds, pixels_per_second=100
-- **LLMMoveScrubbersByOffset** — shift multiple clips forward/back by a delta.
-  Args: scrubber_ids (list), offset_seconds (positive=right, negative=left), pixels_per_second=100
-
-### Deleting
-- **LLMDeleteScrubber** — remove one clip.
-  Args: scrubber_id (or scrubber_name)
-- **LLMDeleteScrubbersInTrack** — clear all clips from a track.
-  Args: track_number
-
-### Splitting
-- **LLMSplitScrubber** — split a clip into two at a specific timeline time.
-  Args: scrubber_id (or scrubber_name), time_seconds (absolute timeline position)
-
-### Tracks
-- **LLMCreateTrack** — add new empty track(s).
-  Args: count=1
-
-### Audio / video properties
-- **LLMSetVolume** — set volume or mute for an audio/video clip.
-  Args: scrubber_id (or scrubber_name), volume (0.0–1.0), muted=false
-- **LLMSetPlaybackSpeed** — change playback speed. Allowed values: 0.25, 0.5, 1, 1.5, 2, 4.
-  Args: scrubber_id (or scrubber_name), playback_rate
-
-### Text clips
-- **LLMUpdateTextContent** — change the text in a text clip.
-  Args: scrubber_id, new_text_content
-- **LLMUpdateTextStyle** — change font/size/colour/alignment.
-  Args: scrubber_id, fontSize (px), fontFamily, color (hex), textAlign (left/center/right), fontWeight (normal/bold)
-
-## Context
+    if PROMPT_COMPACTION_ENABLED:
+        compact = compact_context(
+            request.timeline_state or {},
+            request.mediabin_items or [],
+            request.mentioned_scrubber_ids,
+            original_bytes=len(timeline_json.encode()) + len(mediabin_json.encode()),
+            pixels_per_second=request.pixels_per_second or PIXELS_PER_SECOND,
+        )
+        logger.info("AI prompt context compacted: %s", compact.report.as_log_fields())
+        context_block = f"""Timeline (times in seconds; drop_left_px = seconds * 100; one clip per row):
+{compact.timeline}
+Media bin:
+{compact.mediabin}"""
+    else:
+        context_block = f"""Timeline state: {timeline_json}
+Media bin: {mediabin_json}"""
+
+    turn = f"""## Request
 Conversation history (oldest first): {json.dumps(history, ensure_ascii=False)}
 User message: {json.dumps(request.message, ensure_ascii=False)}
 Mentioned clip IDs: {json.dumps(request.mentioned_scrubber_ids or [])}
-Timeline state: {timeline_json}
-Media bin: {mediabin_json}
 """
+    return _Prompt(
+        context=f"## Project context\n{context_block}\n",
+        turn=turn,
+        instruction=PLAN_SYSTEM_INSTRUCTION
+        if request.allow_plans
+        else SYSTEM_INSTRUCTION,
+    )
+
+
+def _inline_request(prompt: _Prompt) -> ModelRequest:
+    return ModelRequest(
+        contents=f"{prompt.context}\n{prompt.turn}",
+        system_instruction=prompt.instruction,
+    )
+
+
+def _plan_model_request(
+    prompt: _Prompt, user_id: str
+) -> tuple[ModelRequest, str | None]:
+    """
+    Use a cached (instruction + project context) prefix when one is ready;
+    otherwise go inline and start caching this context for follow-up turns.
+    Returns the request and the cache key it depends on, if any.
+    """
+    if context_cache is None:
+        return _inline_request(prompt), None
+    key = ContextCache.key_for(user_id, prompt.instruction, prompt.context)
+    cached_name = context_cache.lookup(key)
+    if cached_name is None:
+        context_cache.schedule(key, prompt.instruction, prompt.context)
+        return _inline_request(prompt), None
+    return ModelRequest(contents=prompt.turn, cached_content=cached_name), key
+
+
+def _observe_model_call(operation: str, outcome: str, started: float) -> None:
+    elapsed = time.perf_counter() - started
+    metrics.model_request_duration.observe(elapsed, operation, outcome)
+    metrics.add_span("model", elapsed)
 
+
+async def _call_model(model_request: ModelRequest) -> str:
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        reply = await model_client.generate(model_request)
+        outcome = "ok"
+        return reply
+    finally:
+        _observe_model_call("generate", outcome, started)
+
+
+async def _stream_model(model_request: ModelRequest) -> AsyncIterator[str]:
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        async for chunk in model_client.stream(model_request):
+            yield chunk
+        outcome = "ok"
+    except (GeneratorExit, asyncio.CancelledError):
+        # The client went away mid-stream.
+        outcome = "cancelled"
+        raise
+    finally:
+        _observe_model_call("stream", outcome, started)
+
+
+async def _generate(prompt: _Prompt, user_id: str) -> str:
+    model_request, cache_key = _plan_model_request(prompt, user_id)
+    try:
+        return await _call_model(model_request)
+    except Exception:
+        if cache_key is None or context_cache is None:
+            raise
+        # The cache may have been evicted remotely; retry once without it.
+        logger.warning("Cached-content call failed; retrying inline")
+        context_cache.invalidate(cache_key)
+        return await _call_model(_inline_request(prompt))
+
+
+async def _stream(prompt: _Prompt, user_id: str) -> AsyncIterator[str]:
+    model_request, cache_key = _plan_model_request(prompt, user_id)
+    started = False
     try:
-        response = gemini_client.models.generate_content(
-            model=_GEMINI_MODEL,
-            contents=prompt,
-            config={
-                "response_mime_type": "application/json",
-                "response_schema": FunctionCallResponse,
-            },
+        async for chunk in _stream_model(model_request):
+            started = True
+            yield chunk
+    except Exception:
+        if started or cache_key is None or context_cache is None:
+            raise
+        logger.warning("Cached-content stream failed; retrying inline")
+        context_cache.invalidate(cache_key)
+        async for chunk in _stream_model(_inline_request(prompt)):
+            yield chunk
+
+
+@router.post("/ai")
+async def process_ai_message(
+    request: Message,
+    user: SessionUser = Depends(get_current_user),
+) -> FunctionCallResponse:
+    if FAST_PATH_ENABLED and (fast := _match_fast_path(request)) is not None:
+        return fast
+
+    await _enforce_rate_limit(user.user_id)
+    with metrics.span("prompt"):
+        prompt = _build_prompt(request)
+
+    async def respond() -> FunctionCallResponse:
+        reply = await _generate(prompt, user.user_id)
+        response = normalise_plan(
+            FunctionCallResponse.model_validate_json(reply),
+            request.allow_plans,
+            request.timeline_state,
         )
-        return FunctionCallResponse.model_validate(response.parsed)
+        return _tool_call_checker(request)(response)
+
+    try:
+        if response_cache is None:
+            return await respond()
+        key = _response_cache_key(request, prompt, user.user_id)
+        return await response_cache.get_or_compute(key, respond)
     except ValueError as exc:
         # Don't include user content (timeline / messages) in logs — log the type only.
         logger.warning("AI response validation failed: %s", type(exc).__name__)
@@ -214,3 +309,66 @@ Media bin: {mediabin_json}
         raise HTTPException(
             status_code=500, detail="AI service temporarily unavailable"
         ) from exc
+
+
+async def _stream_ai_events(
+    request: Message, prompt: _Prompt, user_id: str
+) -> AsyncIterator[str]:
+    key: str | None = None
+    if response_cache is not None:
+        key = _response_cache_key(request, prompt, user_id)
+        cached = response_cache.peek(key)
+        if cached is not None:
+            for event in replay_events(cached):
+                yield event
+            return
+
+    check = _tool_call_checker(request)
+    parser = FunctionCallStreamParser(allow_plans=request.allow_plans, check=check)
+    try:
+        async for chunk in _stream(prompt, user_id):
+            for event in parser.feed(chunk):
+                yield event
+        response = check(
+            normalise_plan(parser.finish(), request.allow_plans, request.timeline_state)
+        )
+    except ValueError as exc:
+        logger.warning("AI stream validation failed: %s", type(exc).__name__)
+        yield sse_event("error", {"detail": "Invalid response from AI model"})
+        return
+    except Exception:
+        logger.exception("Unexpected error in AI stream for user %s", user_id)
+        yield sse_event("error", {"detail": "AI service temporarily unavailable"})
+        return
+    if response_cache is not None and key is not None:
+        response_cache.store(key, response)
+    yield sse_event("done", response.model_dump(mode="json"))
+
+
+@router.post("/ai/stream")
+async def stream_ai_message(
+    request: Message,
+    user: SessionUser = Depends(get_current_user),
+) -> StreamingResponse:
+    """
+    Same contract as POST /ai, delivered as Server-Sent Events: assistant_delta
+    frames while the message is generated, function_call once the tool call is
+    complete (function_calls for a multi-step plan), then done (or error).
+    """
+    if FAST_PATH_ENABLED and (fast := _match_fast_path(request)) is not None:
+        return StreamingResponse(
+            iter(replay_events(fast)),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    # Rate-limit and size checks run before the stream opens so they still
+    # surface as plain 429/413 responses.
+    await _enforce_rate_limit(user.user_id)
+    with metrics.span("prompt"):
+        prompt = _build_prompt(request)
+    return StreamingResponse(
+        _stream_ai_events(request, prompt, user.user_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -188,21 +188,26 @@ class LLMUpdateTextStyleArgs(BaseSchema):
     fontWeight: Literal["normal", "bold"] | None = Field(default=None, description="Font weight")
 
 
+LLMToolCall = (
+    LLMAddScrubberToTimelineArgs
+    | LLMAddScrubberByNameArgs
+    | LLMMoveScrubberArgs
+    | LLMResizeScrubberArgs
+    | LLMDeleteScrubberArgs
+    | LLMDeleteScrubbersInTrackArgs
+    | LLMSetVolumeArgs
+    | LLMSetPlaybackSpeedArgs
+    | LLMSplitScrubberArgs
+    | LLMCreateTrackArgs
+    | LLMMoveScrubbersByOffsetArgs
+    | LLMUpdateTextContentArgs
+    | LLMUpdateTextStyleArgs
+)
+
+
 class FunctionCallResponse(BaseSchema):
-    function_call: (
-        LLMAddScrubberToTimelineArgs
-        | LLMAddScrubberByNameArgs
-        | LLMMoveScrubberArgs
-        | LLMResizeScrubberArgs
-        | LLMDeleteScrubberArgs
-        | LLMDeleteScrubbersInTrackArgs
-        | LLMSetVolumeArgs
-        | LLMSetPlaybackSpeedArgs
-        | LLMSplitScrubberArgs
-        | LLMCreateTrackArgs
-        | LLMMoveScrubbersByOffsetArgs
-        | LLMUpdateTextContentArgs
-        | LLMUpdateTextStyleArgs
-        | None
-    ) = None
+    function_call: LLMToolCall | None = None
+    # Multi-step plan mode: ordered tool calls applied as one unit. Only set
+    # when the request opted into plans and the plan has more than one step.
+    function_calls: list[LLMToolCall] | None = None
     assistant_message: str | None = None
@@ -0,0 +1,210 @@
+"""
+Incremental parsing of a streamed FunctionCallResponse JSON reply into
+Server-Sent Events.
+
+Events:
+- assistant_delta — {"text": "..."} as soon as characters of
+                    `assistant_message` arrive
+- function_call   — the validated tool call, as soon as its JSON value closes
+- function_calls  — plan mode only: the validated steps of a multi-step plan,
+                    once the whole list has closed
+- done            — the complete FunctionCallResponse
+- error           — {"detail": "..."}; terminates the stream
+"""
+
+import json
+from collections.abc import Callable
+from typing import Any
+
+from pydantic import ValidationError
+
+from ai.schema import FunctionCallResponse
+
+_WHITESPACE = " \t\r\n"
+_CALL_KEYS = ("function_call", "function_calls")
+
+
+def sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def replay_events(response: FunctionCallResponse) -> list[str]:
+    """The frames a live stream would have produced for an already-known reply."""
+    events: list[str] = []
+    if response.function_call is not None:
+        events.append(
+            sse_event("function_call", response.function_call.model_dump(mode="json"))
+        )
+    if response.function_calls:
+        events.append(
+            sse_event(
+                "function_calls",
+                [step.model_dump(mode="json") for step in response.function_calls],
+            )
+        )
+    if response.assistant_message:
+        events.append(
+            sse_event("assistant_delta", {"text": response.assistant_message})
+        )
+    events.append(sse_event("done", response.model_dump(mode="json")))
+    return events
+
+
+def _decode_partial_string(raw: str) -> str:
+    """Decode the body of a JSON string that may end mid-escape."""
+    # An escape is at most 6 chars (\\uXXXX); trim until what's left decodes.
+    for trim in range(min(len(raw), 6) + 1):
+        try:
+            decoded: str = json.loads(f'"{raw[: len(raw) - trim]}"')
+            return decoded
+        except json.JSONDecodeError:
+            continue
+    return ""
+
+
+class FunctionCallStreamParser:
+    """
+    Single-pass scanner over the top-level object of the model's reply. Only
+    keys at depth 1 are tracked, so "assistant_message" appearing inside a
+    tool argument (e.g. text content) cannot be mistaken for the real field.
+
+    Early function_call / function_calls frames are passed through `check`
+    (the same resolution the final reply gets) and dropped if it rejects them;
+    the done frame is authoritative.
+    """
+
+    def __init__(
+        self,
+        allow_plans: bool = False,
+        check: Callable[[FunctionCallResponse], FunctionCallResponse] | None = None,
+    ) -> None:
+        self._allow_plans = allow_plans
+        self._check = check
+        self._buf = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._expect_key = False
+        self._key_start = -1
+        self._key: str | None = None
+        self._value_key: str | None = None
+        self._value_start = -1
+        self._message_start = -1
+        self._message_emitted = ""
+        self._function_call_sent = False
+        self._function_calls_sent = False
+
+    def feed(self, chunk: str) -> list[str]:
+        """Consume a chunk of model output and return any SSE frames it completes."""
+        events: list[str] = []
+        self._buf += chunk
+        buf = self._buf
+        for i in range(self._pos, len(buf)):
+            c = buf[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._key_start >= 0:
+                        self._key = json.loads(buf[self._key_start : i + 1])
+                        self._key_start = -1
+                    elif self._message_start >= 0:
+                        self._emit_message(buf[self._message_start : i], events)
+                        self._message_start = -1
+                continue
+
+            if self._depth == 1 and self._value_start < 0 and self._value_key:
+                if c in _WHITESPACE:
+                    continue
+                self._value_start = i
+                if self._value_key == "assistant_message" and c == '"':
+                    self._message_start = i + 1
+
+            if c == '"':
+                self._in_string = True
+                if self._depth == 1 and self._expect_key:
+                    self._key_start = i
+            elif c in "{[":
+                self._depth += 1
+                if self._depth == 1:
+                    self._expect_key = True
+            elif c in "}]":
+                self._depth -= 1
+                if self._depth == 1 and self._value_key in _CALL_KEYS:
+                    self._emit_calls(buf[self._value_start : i + 1], events)
+                elif self._depth == 0:
+                    self._end_value(buf, i, events)
+            elif self._depth == 1 and c == ":":
+                self._expect_key = False
+                self._value_key = self._key
+                self._value_start = -1
+            elif self._depth == 1 and c == ",":
+                self._end_value(buf, i, events)
+                self._expect_key = True
+        self._pos = len(buf)
+
+        if self._message_start >= 0:
+            self._emit_message(buf[self._message_start :], events)
+        return events
+
+    def finish(self) -> FunctionCallResponse:
+        """Validate the complete reply. Raises ValueError on malformed output."""
+        return FunctionCallResponse.model_validate_json(self._buf)
+
+    def _end_value(self, buf: str, i: int, events: list[str]) -> None:
+        # Scalars (e.g. `"function_call": null`) only end at "," or "}".
+        if self._value_key in _CALL_KEYS and self._value_start >= 0:
+            self._emit_calls(buf[self._value_start : i], events)
+        self._value_key = None
+        self._value_start = -1
+
+    def _emit_message(self, raw: str, events: list[str]) -> None:
+        decoded = _decode_partial_string(raw)
+        if len(decoded) > len(self._message_emitted):
+            events.append(
+                sse_event(
+                    "assistant_delta", {"text": decoded[len(self._message_emitted) :]}
+                )
+            )
+            self._message_emitted = decoded
+
+    def _emit_calls(self, raw: str, events: list[str]) -> None:
+        key = self._value_key
+        if key is None:
+            return
+        try:
+            parsed = FunctionCallResponse.model_validate({key: json.loads(raw)})
+        except (json.JSONDecodeError, ValidationError):
+            # Leave it to finish() to report the error for the whole reply.
+            return
+        steps = parsed.function_calls or []
+        if parsed.function_call is not None:
+            preview = FunctionCallResponse(function_call=parsed.function_call)
+        elif len(steps) == 1:
+            preview = FunctionCallResponse(function_call=steps[0])
+        elif steps and self._allow_plans:
+            preview = FunctionCallResponse(function_calls=steps)
+        else:
+            return
+        if self._check is not None:
+            preview = self._check(preview)
+
+        if preview.function_calls and not self._function_calls_sent:
+            self._function_calls_sent = True
+            events.append(
+                sse_event(
+                    "function_calls",
+                    [step.model_dump(mode="json") for step in preview.function_calls],
+                )
+            )
+        elif preview.function_call is not None and not self._function_call_sent:
+            self._function_call_sent = True
+            events.append(
+                sse_event(
+                    "function_call", preview.function_call.model_dump(mode="json")
+                )
+            )
@@ -0,0 +1,296 @@
+"""
+Read-only index over a request's timeline (the TimelineState / TrackState /
+ScrubberState shape from ai/schema.py, as a plain dict).
+
+The AI routes use it to resolve and check tool calls before they reach the
+client, so lookups have to stay cheap on timelines with tens of thousands of
+clips:
+
+- by id: a dict;
+- by name: an inverted index from name tokens to clips, with the sorted
+  vocabulary (and its reversal) standing in for a prefix / suffix trie.
+  Candidates are verified with a plain substring test, so results match the
+  client's `name.toLowerCase().includes(...)` exactly;
+- by time: per track, clips sorted by start with a running maximum of end
+  times, so an overlap query is a bisect plus a short backwards scan.
+
+Everything is built lazily on first use. Name indexes are also kept across
+requests, keyed by a digest of the names: moving or resizing clips between
+chat messages does not change them.
+"""
+
+import hashlib
+import re
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+
+PIXELS_PER_SECOND = 100.0
+
+_TOKEN = re.compile(r"\w+")
+_NAME_INDEX_CACHE_SIZE = 8
+
+
+@dataclass(frozen=True, slots=True)
+class IndexedClip:
+    id: str
+    name: str
+    track: int  # 1-based, like the tool arguments
+    start: float  # seconds
+    end: float  # seconds
+    media_type: str
+
+
+@dataclass(frozen=True, slots=True)
+class _TrackIndex:
+    clips: list[IndexedClip]  # sorted by start
+    starts: list[float]
+    max_ends: list[float]  # max end over clips[: i + 1]
+
+
+def _number(value: Any) -> float:
+    return float(value) if isinstance(value, int | float) else 0.0
+
+
+class _NameIndex:
+    """Token → positions in a list of lower-cased names."""
+
+    def __init__(self, names: list[str]) -> None:
+        self.names = names
+        self._postings: dict[str, list[int]] = {}
+        for position, tokens in enumerate(map(_TOKEN.findall, names)):
+            for token in tokens:
+                positions = self._postings.setdefault(token, [])
+                if not positions or positions[-1] != position:
+                    positions.append(position)
+        self._vocab = sorted(self._postings)
+        self._reversed_vocab = sorted(token[::-1] for token in self._postings)
+        self._vocab_text = "\n".join(self._vocab)
+        self._vocab_offsets: list[int] = []
+        offset = 0
+        for token in self._vocab:
+            self._vocab_offsets.append(offset)
+            offset += len(token) + 1
+
+    def find(self, needle: str) -> list[int]:
+        """Positions of names containing `needle`, in order."""
+        return [i for i in self._candidates(needle) if needle in self.names[i]]
+
+    def _candidates(self, needle: str) -> list[int]:
+        tokens = _TOKEN.findall(needle)
+        if not tokens:
+            return list(range(len(self.names)))
+        if len(tokens) == 1:
+            groups = [self._containing(tokens[0])]
+        else:
+            # A query token followed by a separator must end a name token, one
+            # preceded by a separator must start one, and tokens in between
+            # must match whole. Use the most selective constraint.
+            groups = [
+                self._ending_with(tokens[0]),
+                self._starting_with(tokens[-1]),
+                *([token] for token in tokens[1:-1]),
+            ]
+        best = min(groups, key=self._posting_count)
+        if len(best) == 1:
+            return self._postings.get(best[0], [])
+        return sorted({i for token in best for i in self._postings.get(token, [])})
+
+    def _posting_count(self, tokens: list[str]) -> int:
+        return sum(len(self._postings.get(token, ())) for token in tokens)
+
+    def _starting_with(self, prefix: str) -> list[str]:
+        lo = bisect_left(self._vocab, prefix)
+        hi = bisect_left(self._vocab, prefix + "\U0010ffff")
+        return self._vocab[lo:hi]
+
+    def _ending_with(self, suffix: str) -> list[str]:
+        reversed_suffix = suffix[::-1]
+        lo = bisect_left(self._reversed_vocab, reversed_suffix)
+        hi = bisect_left(self._reversed_vocab, reversed_suffix + "\U0010ffff")
+        return [token[::-1] for token in self._reversed_vocab[lo:hi]]
+
+    def _containing(self, fragment: str) -> list[str]:
+        found: list[str] = []
+        pos = self._vocab_text.find(fragment)
+        while pos >= 0:
+            i = bisect_right(self._vocab_offsets, pos) - 1
+            if not found or found[-1] != self._vocab[i]:
+                found.append(self._vocab[i])
+            pos = self._vocab_text.find(fragment, pos + 1)
+        return found
+
+
+_name_indexes: OrderedDict[bytes, _NameIndex] = OrderedDict()
+
+
+def _name_index(names: list[str]) -> _NameIndex:
+    key = hashlib.blake2b("\n".join(names).encode(), digest_size=16).digest()
+    index = _name_indexes.get(key)
+    if index is None:
+        index = _NameIndex(names)
+        _name_indexes[key] = index
+        while len(_name_indexes) > _NAME_INDEX_CACHE_SIZE:
+            _name_indexes.popitem(last=False)
+    else:
+        _name_indexes.move_to_end(key)
+    return index
+
+
+class TimelineIndex:
+    def __init__(
+        self,
+        timeline: dict[str, Any] | None,
+        pixels_per_second: float = PIXELS_PER_SECOND,
+    ) -> None:
+        tracks = (timeline or {}).get("tracks")
+        self._tracks: list[dict[str, Any]] = [
+            track
+            for track in (tracks if isinstance(tracks, list) else [])
+            if isinstance(track, dict)
+        ]
+        self.pixels_per_second = pixels_per_second
+        self._flat: list[tuple[int, dict[str, Any]]] | None = None
+        self._by_id: dict[str, int] | None = None
+        self._names: _NameIndex | None = None
+        self._linked: set[tuple[str, str]] | None = None
+        self._track_index: dict[int, _TrackIndex] = {}
+
+    @property
+    def track_count(self) -> int:
+        return len(self._tracks)
+
+    def __len__(self) -> int:
+        return len(self._clips())
+
+    def has_track(self, number: int) -> bool:
+        return 1 <= number <= len(self._tracks)
+
+    def track_number(self, track_id: str) -> int | None:
+        """Map a track id ("track-3" or a stored id) to its 1-based number."""
+        for number, track in enumerate(self._tracks, start=1):
+            if track.get("id") == track_id:
+                return number
+        if track_id.startswith("track-") and track_id[6:].isdigit():
+            number = int(track_id[6:])
+            return number if self.has_track(number) else None
+        return None
+
+    def clip(self, clip_id: str) -> IndexedClip | None:
+        flat = self._clips()
+        if self._by_id is None:
+            self._by_id = {str(s["id"]): i for i, (_, s) in enumerate(flat)}
+        position = self._by_id.get(clip_id)
+        return None if position is None else self._make(*flat[position])
+
+    def clips_in_track(self, number: int) -> list[IndexedClip]:
+        return self._track(number).clips if self.has_track(number) else []
+
+    def find_by_name(self, query: str, track: int | None = None) -> list[IndexedClip]:
+        """
+        Clips whose name contains `query` (case-insensitive), in timeline order,
+        with exact name / name-without-extension matches first.
+        """
+        needle = query.strip().lower()
+        if not needle:
+            return []
+        flat = self._clips()
+        if self._names is None:
+            self._names = _name_index(
+                [str(scrubber.get("name") or "").lower() for _, scrubber in flat]
+            )
+        matches = [
+            self._make(*flat[i])
+            for i in self._names.find(needle)
+            if track is None or flat[i][0] == track
+        ]
+
+        def exact(clip: IndexedClip) -> bool:
+            name = clip.name.lower()
+            return needle in (name, name.rsplit(".", 1)[0])
+
+        return sorted(matches, key=lambda clip: not exact(clip))
+
+    def overlapping(
+        self,
+        track: int,
+        start: float,
+        end: float,
+        exclude: frozenset[str] | set[str] = frozenset(),
+    ) -> list[IndexedClip]:
+        """Clips on `track` intersecting [start, end), minus `exclude`."""
+        if not self.has_track(track) or end <= start:
+            return []
+        index = self._track(track)
+        hits: list[IndexedClip] = []
+        i = bisect_left(index.starts, end) - 1
+        while i >= 0 and index.max_ends[i] > start:
+            clip = index.clips[i]
+            if clip.end > start and clip.id not in exclude:
+                hits.append(clip)
+            i -= 1
+        hits.reverse()
+        return hits
+
+    def linked(self, a: str, b: str) -> bool:
+        """True if a transition joins the two clips (they may overlap)."""
+        if self._linked is None:
+            self._linked = set()
+            for track in self._tracks:
+                for transition in track.get("transitions") or []:
+                    if not isinstance(transition, dict):
+                        continue
+                    left = transition.get("leftScrubberId")
+                    right = transition.get("rightScrubberId")
+                    if left and right:
+                        self._linked.add((str(left), str(right)))
+                        self._linked.add((str(right), str(left)))
+        return (a, b) in self._linked
+
+    def rightmost(self, track: int) -> IndexedClip | None:
+        clips = self.clips_in_track(track)
+        return max(clips, key=lambda clip: clip.start) if clips else None
+
+    def _clips(self) -> list[tuple[int, dict[str, Any]]]:
+        if self._flat is None:
+            self._flat = [
+                (number, scrubber)
+                for number, track in enumerate(self._tracks, start=1)
+                for scrubber in track.get("scrubbers") or []
+                if isinstance(scrubber, dict) and "id" in scrubber
+            ]
+        return self._flat
+
+    def _make(self, track: int, scrubber: dict[str, Any]) -> IndexedClip:
+        start = _number(scrubber.get("left")) / self.pixels_per_second
+        return IndexedClip(
+            id=str(scrubber["id"]),
+            name=str(scrubber.get("name") or ""),
+            track=track,
+            start=start,
+            end=start + _number(scrubber.get("width")) / self.pixels_per_second,
+            media_type=str(scrubber.get("mediaType") or ""),
+        )
+
+    def _track(self, number: int) -> _TrackIndex:
+        index = self._track_index.get(number)
+        if index is None:
+            clips = sorted(
+                (
+                    self._make(number, scrubber)
+                    for scrubber in self._tracks[number - 1].get("scrubbers") or []
+                    if isinstance(scrubber, dict) and "id" in scrubber
+                ),
+                key=lambda clip: clip.start,
+            )
+            max_ends: list[float] = []
+            running = float("-inf")
+            for clip in clips:
+                running = max(running, clip.end)
+                max_ends.append(running)
+            index = _TrackIndex(
+                clips=clips, starts=[clip.start for clip in clips], max_ends=max_ends
+            )
+            self._track_index[number] = index
+        return index
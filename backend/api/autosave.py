@@ -0,0 +1,298 @@
+"""
+Full timeline saves, with optional write-behind coalescing of autosaves.
+
+The editor autosaves every few seconds while someone is working, and each
+PUT /projects/{id} is a full JSONB UPDATE plus a history row. With
+AUTOSAVE_COALESCE_SECONDS > 0, a PUT is checked, given its revision and
+acknowledged at once, and the project's timeline is written at most once per
+interval with the latest body. The revisions of the saves in between are
+acknowledged but never stored, and skipped in the history.
+
+Reads see the last acknowledged save because every other route that touches
+a project's timeline calls flush() first, and the lifespan flushes all
+pending saves on shutdown. The buffer is per process: only enable it with a
+single backend process, or with requests for a project pinned to one.
+"""
+
+import asyncio
+import contextlib
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any
+
+import asyncpg  # type: ignore[import-untyped]
+import orjson
+
+from db import get_db_pool
+
+logger = logging.getLogger(__name__)
+
+# 0 writes every save straight through.
+AUTOSAVE_COALESCE_SECONDS = float(os.getenv("AUTOSAVE_COALESCE_SECONDS", "0"))
+
+_INVALID_TIMELINE = 'Invalid timeline: expected {"tracks": [{"scrubbers": [...]}, ...]}'
+
+# Full save of $1 (raw JSON) with an optional If-Match revision list ($4),
+# recorded in project_versions (migration 007). The row is locked before it is
+# read, so the delta is computed against the timeline actually replaced. $5
+# is the revision to store when a coalesced save already acknowledged one.
+_FULL_SAVE_SQL = """
+    WITH locked AS (
+        SELECT id, timeline_state
+        FROM projects
+        WHERE id = $2 AND user_id = $3
+          AND ($4::bigint[] IS NULL OR revision = ANY($4::bigint[]))
+        FOR UPDATE
+    ), updated AS (
+        UPDATE projects p
+        SET timeline_state = assert_timeline_shape($1::jsonb),
+            revision = greatest(p.revision + 1, $5::bigint),
+            updated_at = now()
+        FROM locked
+        WHERE p.id = locked.id
+        RETURNING p.id, p.name, p.revision, p.timeline_state,
+                  locked.timeline_state AS previous
+    )
+    SELECT id, name, revision
+    FROM updated,
+         record_project_version(id, revision, previous, timeline_state)
+"""
+
+
+async def write_timeline(
+    conn: asyncpg.Connection,
+    project_id: str,
+    user_id: str,
+    body: bytes,
+    expected: list[int] | None = None,
+    revision: int | None = None,
+) -> Any:
+    """
+    Store `body` as the project's timeline; returns the (id, name, revision)
+    row, or None when the project is missing or not at an `expected` revision.
+    """
+    return await conn.fetchrow(
+        _FULL_SAVE_SQL, body, project_id, user_id, expected, revision
+    )
+
+
+def _has_nul(value: Any) -> bool:
+    """Whether a string (or key) anywhere in `value` holds U+0000."""
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            if "\x00" in item:
+                return True
+        elif isinstance(item, dict):
+            stack.extend(item)
+            stack.extend(item.values())
+        elif isinstance(item, list):
+            stack.extend(item)
+    return False
+
+
+def check_timeline_shape(body: bytes) -> None:
+    """
+    assert_timeline_shape (migration 005) in Python, for saves acknowledged
+    before they reach Postgres, plus what jsonb itself refuses and orjson
+    does not. Raises ValueError.
+    """
+    timeline = orjson.loads(body)
+    # jsonb has no U+0000 in text. The escape is all that can carry it (a raw
+    # NUL is not valid JSON), so only bodies containing it are walked.
+    if b"\\u0000" in body and _has_nul(timeline):
+        raise ValueError("Invalid timeline: strings cannot contain \\u0000")
+    tracks = timeline.get("tracks") if isinstance(timeline, dict) else None
+    if not isinstance(tracks, list):
+        raise ValueError(_INVALID_TIMELINE)
+    for track in tracks:
+        scrubbers = track.get("scrubbers", []) if isinstance(track, dict) else None
+        if not isinstance(scrubbers, list) or not all(
+            isinstance(scrubber, dict) for scrubber in scrubbers
+        ):
+            raise ValueError(_INVALID_TIMELINE)
+
+
+class RevisionMismatchError(Exception):
+    """If-Match named a revision other than the latest acknowledged one."""
+
+
+@dataclass(slots=True)
+class _Project:
+    user_id: str
+    name: str
+    stored_revision: int
+    revision: int  # latest acknowledged; ahead of stored_revision while pending
+    body: bytes | None = None  # latest unwritten timeline
+    last_write: float = 0.0  # monotonic
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)  # one write at a time
+    task: asyncio.Task[None] | None = None
+
+
+class AutosaveCoalescer:
+    """Per-project write-behind buffer for full timeline saves."""
+
+    def __init__(self, interval_seconds: float) -> None:
+        self.interval_seconds = interval_seconds
+        self._projects: dict[str, _Project] = {}
+        self._loading: dict[str, asyncio.Lock] = {}
+        self.saves = 0
+        self.writes = 0
+        self.failed_writes = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval_seconds > 0
+
+    async def save(
+        self,
+        project_id: str,
+        user_id: str,
+        body: bytes,
+        expected: list[int] | None,
+    ) -> tuple[int, str] | None:
+        """
+        Accept a full save (already checked with check_timeline_shape) and
+        return its revision and the project name, or None if the user has no
+        such project. Raises RevisionMismatchError for a failed If-Match.
+        """
+        project = await self._load(project_id, user_id)
+        if project is None:
+            return None
+        if expected is not None and project.revision not in expected:
+            raise RevisionMismatchError
+        project.revision += 1
+        project.body = body
+        self.saves += 1
+        if project.task is None:
+            project.task = asyncio.create_task(self._write_behind(project_id, project))
+        return project.revision, project.name
+
+    async def flush(self, project_id: str) -> None:
+        """Write the project's pending save, if any, and forget its state."""
+        project = self._projects.get(project_id)
+        if project is None:
+            return
+        async with project.lock:
+            if project.body is not None:
+                await self._write(project_id, project)
+            if project.body is None and self._projects.get(project_id) is project:
+                del self._projects[project_id]
+
+    def discard(self, project_id: str) -> None:
+        """Drop a project's state and pending save (it is being deleted)."""
+        project = self._projects.pop(project_id, None)
+        if project is not None:
+            project.body = None
+
+    async def close(self) -> None:
+        """Write every pending save; called on shutdown."""
+        tasks = [p.task for p in self._projects.values() if p.task is not None]
+        for project_id in list(self._projects):
+            try:
+                await self.flush(project_id)
+            except Exception:
+                logger.exception("Autosave for project %s lost on shutdown", project_id)
+        self._projects.clear()
+        for task in tasks:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+    def stats(self) -> dict[str, int | float | bool]:
+        return {
+            "enabled": self.enabled,
+            "interval_seconds": self.interval_seconds,
+            "projects": len(self._projects),
+            "pending": sum(p.body is not None for p in self._projects.values()),
+            "saves": self.saves,
+            "writes": self.writes,
+            "failed_writes": self.failed_writes,
+        }
+
+    async def _load(self, project_id: str, user_id: str) -> _Project | None:
+        project = self._projects.get(project_id)
+        if project is None:
+            lock = self._loading.setdefault(project_id, asyncio.Lock())
+            async with lock:
+                project = self._projects.get(project_id)
+                if project is None:
+                    pool = await get_db_pool()
+                    row = await pool.fetchrow(
+                        "SELECT user_id, name, revision FROM projects WHERE id = $1",
+                        project_id,
+                    )
+                    if row is not None:
+                        project = _Project(
+                            user_id=row["user_id"],
+                            name=row["name"],
+                            stored_revision=row["revision"],
+                            revision=row["revision"],
+                        )
+                        self._projects[project_id] = project
+            self._loading.pop(project_id, None)
+        if project is None or project.user_id != user_id:
+            return None
+        return project
+
+    async def _write_behind(self, project_id: str, project: _Project) -> None:
+        try:
+            while self._projects.get(project_id) is project:
+                delay = project.last_write + self.interval_seconds - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                if project.body is None:
+                    # Nothing saved for an interval: forget the project, so
+                    # only recently saved ones are kept, and the next save
+                    # reloads a revision other processes may have moved on.
+                    if self._projects.get(project_id) is project:
+                        del self._projects[project_id]
+                    break
+                async with project.lock:
+                    try:
+                        await self._write(project_id, project)
+                    except Exception:
+                        # Kept pending; retried after another interval.
+                        logger.exception(
+                            "Autosave write for project %s failed", project_id
+                        )
+        finally:
+            project.task = None
+
+    async def _write(self, project_id: str, project: _Project) -> None:
+        """Write the latest pending body, if any; the caller holds project.lock."""
+        body, revision = project.body, project.revision
+        if body is None:
+            return
+        pool = await get_db_pool()
+        try:
+            async with pool.acquire() as conn:
+                row = await write_timeline(
+                    conn, project_id, project.user_id, body, revision=revision
+                )
+        except Exception:
+            # The body stays pending, also when Postgres refused it
+            # (asyncpg.DataError) despite check_timeline_shape: it was
+            # acknowledged, so it is retried, and flush() raises, until a
+            # later save replaces it.
+            self.failed_writes += 1
+            project.last_write = time.monotonic()
+            raise
+        self.writes += 1
+        project.last_write = time.monotonic()
+        if project.body is body:
+            project.body = None
+        if row is None:
+            # Deleted meanwhile.
+            if self._projects.get(project_id) is project:
+                del self._projects[project_id]
+            return
+        # Another process may have written in between; its revision wins.
+        project.stored_revision = row["revision"]
+        project.revision = max(project.revision, row["revision"])
+
+
+autosave = AutosaveCoalescer(interval_seconds=AUTOSAVE_COALESCE_SECONDS)
@@ -0,0 +1,158 @@
+"""
+Filmstrip thumbnails of a video asset, for drawing its clips on the
+timeline.
+
+    GET /assets/{id}/filmstrip?start_s&end_s&pixels
+        which tiles to draw for start_s..end_s shown `pixels` wide: their
+        times, sheets and offsets in them
+    GET /assets/{id}/filmstrip/{level}/{sheet}.jpg
+        one sprite sheet
+
+The sheets and their layout are built by the media worker
+(media/worker.py, media/filmstrip.py). A timeline view usually needs one
+sheet. An asset's bytes never change, so both are cacheable for good.
+"""
+
+import asyncio
+from typing import Any
+from uuid import UUID
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Path,
+    Query,
+    Response,
+    status,
+)
+
+from api.schema import FilmstripResponse, FilmstripTile
+from auth.routes import get_current_user
+from auth.schema import SessionUser
+from db import get_db_pool
+from media.filmstrip import Filmstrip
+from media.worker import disabled, object_store
+
+router = APIRouter(tags=["api"])
+
+_MAX_PIXELS = 16384
+# A week: longer than any video, and short enough that pixels per second
+# never rounds to 0.
+_MAX_SECONDS = 7 * 24 * 3600.0
+_FILMSTRIP_CACHE_CONTROL = "private, max-age=31536000, immutable"
+# Until the worker has built it.
+_RETRY_AFTER_SECONDS = "10"
+
+
+async def _fetch_filmstrip(asset_id: UUID, user_id: str) -> Any:
+    """content_hash, r2_prefix and layout; 404/503 unless there is a filmstrip."""
+    pool = await get_db_pool()
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow(
+            """
+            SELECT a.status, a.stored_hash AS content_hash, p.media_type,
+                   coalesce(f.status = 'done', false) AS built,
+                   f.r2_prefix, f.layout
+            FROM assets a
+            LEFT JOIN media_probes p ON p.content_hash = a.stored_hash
+            LEFT JOIN media_filmstrips f ON f.content_hash = a.stored_hash
+            WHERE a.id = $1 AND a.user_id = $2 AND a.deleted_at IS NULL
+              AND a.status IN ('pending', 'ready')
+            """,
+            str(asset_id),
+            user_id,
+        )
+    if row is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Asset not found"
+        )
+    if not row["built"] and disabled("filmstrips"):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Filmstrips are not built on this server",
+        )
+    if row["status"] == "pending" or (
+        row["media_type"] == "video" and not row["built"]
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Filmstrip is not ready yet",
+            headers={"Retry-After": _RETRY_AFTER_SECONDS},
+        )
+    if row["media_type"] != "video" or row["r2_prefix"] is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Asset has no filmstrip"
+        )
+    return row
+
+
+@router.get("/assets/{asset_id}/filmstrip", response_model=FilmstripResponse)
+async def get_filmstrip(
+    response: Response,
+    asset_id: UUID = Path(...),
+    start_s: float = Query(default=0.0, ge=0, lt=_MAX_SECONDS, allow_inf_nan=False),
+    end_s: float = Query(..., gt=0, le=_MAX_SECONDS, allow_inf_nan=False),
+    pixels: int = Query(..., ge=1, le=_MAX_PIXELS),
+    user: SessionUser = Depends(get_current_user),
+) -> FilmstripResponse:
+    """
+    The tiles for start_s..end_s drawn `pixels` wide, from the densest level
+    whose tiles fit side by side at that zoom; each tile is drawn from its
+    time until the next one's. 404 for anything but a video, or one stored
+    before probing existed, and when this server builds no filmstrips; 503
+    with Retry-After while it is being built.
+    """
+    if end_s <= start_s:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="end_s must be after start_s",
+        )
+    row = await _fetch_filmstrip(asset_id, user.user_id)
+    filmstrip = Filmstrip(**row["layout"])
+    level, tiles = filmstrip.tiles(start_s, end_s, pixels)
+    sheets = sorted({tile.sheet for tile in tiles})
+    position = {sheet: n for n, sheet in enumerate(sheets)}
+
+    response.headers["Cache-Control"] = _FILMSTRIP_CACHE_CONTROL
+    return FilmstripResponse(
+        interval=filmstrip.levels[level]["interval"],
+        tileWidth=filmstrip.tile_width,
+        tileHeight=filmstrip.tile_height,
+        sheets=[
+            f"/assets/{asset_id}/filmstrip/{level}/{sheet}.jpg" for sheet in sheets
+        ],
+        tiles=[
+            FilmstripTile(
+                time=tile.time, sheet=position[tile.sheet], x=tile.x, y=tile.y
+            )
+            for tile in tiles
+        ],
+    )
+
+
+@router.get("/assets/{asset_id}/filmstrip/{level}/{sheet}.jpg")
+async def get_filmstrip_sheet(
+    asset_id: UUID = Path(...),
+    level: int = Path(..., ge=0),
+    sheet: int = Path(..., ge=0),
+    user: SessionUser = Depends(get_current_user),
+    if_none_match: str | None = Header(default=None),
+) -> Response:
+    row = await _fetch_filmstrip(asset_id, user.user_id)
+    levels = row["layout"]["levels"]
+    if level >= len(levels) or sheet >= levels[level]["sheets"]:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Sheet not found"
+        )
+
+    etag = f'"{row["content_hash"][:16]}-{level}-{sheet}"'
+    headers = {"ETag": etag, "Cache-Control": _FILMSTRIP_CACHE_CONTROL}
+    if if_none_match is not None and etag in if_none_match:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    async with object_store.local_copy(
+        f"{row['r2_prefix']}/{level}_{sheet}.jpg"
+    ) as path:
+        content = await asyncio.to_thread(path.read_bytes)
+    return Response(content=content, media_type="image/jpeg", headers=headers)
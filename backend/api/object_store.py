@@ -0,0 +1,77 @@
+"""
+Where uploaded asset bytes live, keyed like stored_objects.object_key
+("objects/<sha256><ext>").
+
+Backends share the ObjectStore protocol and are picked by
+ASSET_STORAGE_BACKEND:
+- LocalObjectStore — a directory on this machine (ASSET_STORAGE_DIR); for
+                     development, tests and single-node deployments.
+
+R2 is written by the renderer service (app/videorender) today, which keeps
+its objects in r2_objects; a backend for it plugs in here.
+"""
+
+import asyncio
+import os
+import shutil
+from collections.abc import AsyncIterator
+from contextlib import AbstractAsyncContextManager, asynccontextmanager
+from pathlib import Path
+from typing import Protocol
+
+_DEFAULT_DIR = Path(__file__).resolve().parents[1] / "data" / "assets"
+
+
+class ObjectStore(Protocol):
+    async def put_file(self, key: str, path: Path) -> None:
+        """Store the file at `path` under `key`; the file may be moved away."""
+        ...
+
+    async def exists(self, key: str) -> bool: ...
+
+    async def delete(self, key: str) -> None: ...
+
+    def local_copy(self, key: str) -> AbstractAsyncContextManager[Path]:
+        """The object as a file on this machine, for as long as the context is open."""
+        ...
+
+
+class LocalObjectStore:
+    """Objects as files under `root`; a put is a rename when it can be."""
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+
+    def path(self, key: str) -> Path:
+        path = (self.root / key).resolve()
+        if not path.is_relative_to(self.root.resolve()):
+            raise ValueError(f"Object key outside the store: {key!r}")
+        return path
+
+    async def put_file(self, key: str, path: Path) -> None:
+        dest = self.path(key)
+
+        def move() -> None:
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            shutil.move(path, dest)
+
+        await asyncio.to_thread(move)
+
+    async def exists(self, key: str) -> bool:
+        return await asyncio.to_thread(self.path(key).exists)
+
+    async def delete(self, key: str) -> None:
+        await asyncio.to_thread(self.path(key).unlink, missing_ok=True)
+
+    @asynccontextmanager
+    async def local_copy(self, key: str) -> AsyncIterator[Path]:
+        # Already one; objects are never rewritten in place.
+        yield self.path(key)
+
+
+def create_object_store() -> ObjectStore:
+    """Pick the backend from ASSET_STORAGE_BACKEND ("local", the default)."""
+    backend = os.getenv("ASSET_STORAGE_BACKEND", "local")
+    if backend == "local":
+        return LocalObjectStore(Path(os.getenv("ASSET_STORAGE_DIR", _DEFAULT_DIR)))
+    raise ValueError(f"Unknown ASSET_STORAGE_BACKEND: {backend}")
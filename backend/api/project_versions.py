@@ -0,0 +1,137 @@
+"""
+Rebuilding a project timeline from its history (migrations/007_project_versions.sql).
+
+Each version row is either a full snapshot or an RFC 6902 delta from the
+revision before it. Replaying deltas happens here rather than in Postgres:
+jsonb_patch_apply copies the whole document for every op, while here the
+snapshot is decoded once and each op is an in-place dict / list update.
+"""
+
+import copy
+from datetime import datetime
+from typing import Any
+from uuid import UUID
+
+import asyncpg  # type: ignore[import-untyped]
+
+
+def _pointer_tokens(pointer: str) -> list[str]:
+    if pointer == "":
+        return []
+    if not pointer.startswith("/"):
+        raise ValueError(f"JSON patch: invalid pointer {pointer!r}")
+    return [
+        token.replace("~1", "/").replace("~0", "~") for token in pointer[1:].split("/")
+    ]
+
+
+def _array_index(token: str, length: int, allow_end: bool) -> int:
+    if allow_end and token == "-":
+        return length
+    if not token.isdigit() or (token != "0" and token.startswith("0")):
+        raise ValueError(f"JSON patch: invalid array index {token!r}")
+    index = int(token)
+    if index > length or (index == length and not allow_end):
+        raise ValueError(f"JSON patch: array index {token} out of range")
+    return index
+
+
+def _resolve(doc: Any, tokens: list[str]) -> Any:
+    for token in tokens:
+        if isinstance(doc, list):
+            doc = doc[_array_index(token, len(doc), False)]
+        elif isinstance(doc, dict) and token in doc:
+            doc = doc[token]
+        else:
+            raise ValueError(f"JSON patch: path /{'/'.join(tokens)} not found")
+    return doc
+
+
+def _add(doc: Any, tokens: list[str], value: Any) -> Any:
+    if not tokens:
+        return value
+    parent = _resolve(doc, tokens[:-1])
+    if isinstance(parent, list):
+        parent.insert(_array_index(tokens[-1], len(parent), True), value)
+    elif isinstance(parent, dict):
+        parent[tokens[-1]] = value
+    else:
+        raise ValueError(f"JSON patch: no container at /{'/'.join(tokens[:-1])}")
+    return doc
+
+
+def _remove(doc: Any, tokens: list[str]) -> Any:
+    """Remove the value at `tokens` and return it."""
+    if not tokens:
+        raise ValueError("JSON patch: cannot remove the root")
+    parent = _resolve(doc, tokens[:-1])
+    if isinstance(parent, list):
+        return parent.pop(_array_index(tokens[-1], len(parent), False))
+    if isinstance(parent, dict) and tokens[-1] in parent:
+        return parent.pop(tokens[-1])
+    raise ValueError(f"JSON patch: path /{'/'.join(tokens)} not found")
+
+
+def apply_json_patch(doc: Any, patch: list[dict[str, Any]]) -> Any:
+    """
+    Apply an RFC 6902 patch, with the semantics of jsonb_patch_apply
+    (migration 005). `doc` is modified in place; the result is returned
+    because a root `add` / `replace` swaps the whole document.
+    """
+    for op in patch:
+        tokens = _pointer_tokens(op["path"])
+        match op["op"]:
+            case "add":
+                doc = _add(doc, tokens, op["value"])
+            case "remove":
+                _remove(doc, tokens)
+            case "replace":
+                if tokens:
+                    _remove(doc, tokens)
+                doc = _add(doc, tokens, op["value"])
+            case "test":
+                if _resolve(doc, tokens) != op["value"]:
+                    raise ValueError(f"JSON patch: test failed at {op['path']}")
+            case "move":
+                from_tokens = _pointer_tokens(op["from"])
+                if tokens[: len(from_tokens)] == from_tokens and tokens != from_tokens:
+                    raise ValueError("JSON patch: cannot move a value into itself")
+                doc = _add(doc, tokens, _remove(doc, from_tokens))
+            case "copy":
+                value = copy.deepcopy(_resolve(doc, _pointer_tokens(op["from"])))
+                doc = _add(doc, tokens, value)
+            case _:
+                raise ValueError(f"JSON patch: unknown op {op['op']!r}")
+    return doc
+
+
+async def load_timeline_version(
+    conn: asyncpg.Connection, project_id: UUID, user_id: str, revision: int
+) -> tuple[datetime, Any] | None:
+    """
+    The timeline as of `revision` and when that revision was saved, or None
+    if the project (owned by `user_id`) has no such version.
+    """
+    # The nearest snapshot at or before `revision`, then every delta up to it.
+    rows = await conn.fetch(
+        """
+        SELECT v.revision, v.data, v.created_at
+        FROM project_versions v
+        JOIN projects p ON p.id = v.project_id
+        WHERE v.project_id = $1 AND p.user_id = $2 AND v.revision <= $3
+          AND v.revision >= (
+            SELECT max(revision) FROM project_versions
+            WHERE project_id = $1 AND kind = 'snapshot' AND revision <= $3
+          )
+        ORDER BY v.revision
+        """,
+        str(project_id),
+        user_id,
+        revision,
+    )
+    if not rows or rows[-1]["revision"] != revision:
+        return None
+    timeline = rows[0]["data"]
+    for row in rows[1:]:
+        timeline = apply_json_patch(timeline, row["data"])
+    return rows[-1]["created_at"], timeline
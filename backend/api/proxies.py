@@ -0,0 +1,117 @@
+"""
+Proxies of large video assets: low-resolution renditions for the editor to
+play and scrub while the original is kept for export.
+
+    GET /assets/{id}/proxy
+        whether the proxy is queued, being built (with progress) or ready
+    GET /assets/{id}/proxy.mp4
+        the proxy itself, with Range requests for seeking
+
+Proxies are built by the media worker (media/worker.py, media/proxy.py) for
+ready videos larger than media.proxy.PROXY_SIZE. Poll the first endpoint
+until it says ready or failed; until then, or if it fails, play the
+original.
+"""
+
+import contextlib
+from typing import Any
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, Path, status
+from fastapi.responses import FileResponse
+from starlette.background import BackgroundTask
+
+from api.schema import ProxyResponse
+from auth.routes import get_current_user
+from auth.schema import SessionUser
+from db import get_db_pool
+from media.proxy import PROXY_SIZE
+from media.worker import disabled, object_store
+
+router = APIRouter(tags=["api"])
+
+_PROXY_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+
+async def _fetch_proxy(asset_id: UUID, user_id: str) -> Any:
+    """The asset's media_proxies row, if any; 404 unless it gets a proxy."""
+    pool = await get_db_pool()
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow(
+            """
+            SELECT a.status AS asset_status, p.media_type, p.width AS source_width,
+                   p.height AS source_height, x.status, x.progress, x.r2_key,
+                   x.width, x.height, x.file_size, x.error
+            FROM assets a
+            LEFT JOIN media_probes p ON p.content_hash = a.stored_hash
+            LEFT JOIN media_proxies x ON x.content_hash = a.stored_hash
+            WHERE a.id = $1 AND a.user_id = $2 AND a.deleted_at IS NULL
+              AND a.status IN ('pending', 'ready')
+            """,
+            str(asset_id),
+            user_id,
+        )
+    if row is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Asset not found"
+        )
+    # As chosen by media.worker.claim_proxies.
+    sizes = (row["source_width"], row["source_height"])
+    if row["asset_status"] == "ready" and (
+        row["media_type"] != "video" or (None not in sizes and min(sizes) <= PROXY_SIZE)
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Asset needs no proxy"
+        )
+    return row
+
+
+@router.get("/assets/{asset_id}/proxy", response_model=ProxyResponse)
+async def get_proxy(
+    asset_id: UUID = Path(...),
+    user: SessionUser = Depends(get_current_user),
+) -> ProxyResponse:
+    """
+    404 for anything but a video larger than the proxy size, or one stored
+    before probing existed, and when this server builds no proxies; queued
+    while the asset is still being probed.
+    """
+    row = await _fetch_proxy(asset_id, user.user_id)
+    if row["status"] is None:
+        if disabled("proxies"):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Proxies are not built on this server",
+            )
+        return ProxyResponse(status="queued", progress=0.0)
+    return ProxyResponse(
+        status=row["status"],
+        progress=row["progress"],
+        url=f"/assets/{asset_id}/proxy.mp4" if row["status"] == "ready" else None,
+        width=row["width"],
+        height=row["height"],
+        fileSize=row["file_size"],
+        error=row["error"],
+    )
+
+
+@router.get("/assets/{asset_id}/proxy.mp4")
+async def get_proxy_file(
+    asset_id: UUID = Path(...),
+    user: SessionUser = Depends(get_current_user),
+) -> FileResponse:
+    row = await _fetch_proxy(asset_id, user.user_id)
+    if row["status"] != "ready":
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Proxy is not ready"
+        )
+    # The local copy has to outlive this function: it is released once the
+    # response has been sent.
+    copies = contextlib.AsyncExitStack()
+    path = await copies.enter_async_context(object_store.local_copy(row["r2_key"]))
+    return FileResponse(
+        path,
+        media_type="video/mp4",
+        headers={"Cache-Control": _PROXY_CACHE_CONTROL},
+        background=BackgroundTask(copies.aclose),
+    )
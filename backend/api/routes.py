@@ -1,10 +1,33 @@
-import json
+import base64
+import binascii
+import hashlib
 import logging
-from typing import Any
+from datetime import datetime
+from typing import Any, Literal
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, Path, Query, status
+import asyncpg  # type: ignore[import-untyped]
+import orjson
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Path,
+    Query,
+    Request,
+    Response,
+    status,
+)
+from pydantic import BaseModel
 
+from api.autosave import (
+    RevisionMismatchError,
+    autosave,
+    check_timeline_shape,
+    write_timeline,
+)
+from api.project_versions import load_timeline_version
 from api.schema import (
     CreateProjectRequest,
     ProjectCreateResponse,
@@ -12,10 +35,15 @@ from api.schema import (
     ProjectMeta,
     ProjectMutationResponse,
     ProjectStateResponse,
+    ProjectVersionListResponse,
+    ProjectVersionMeta,
+    ProjectVersionResponse,
     RenameProjectRequest,
     StorageResponse,
+    TimelinePatchRequest,
     TimelinePayload,
 )
+from api.storage_usage import STORAGE_LIMIT_BYTES
 from auth.routes import get_current_user
 from auth.schema import SessionUser
 from db import get_db_pool
@@ -24,8 +52,78 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(tags=["api"])
 
-# 2 GB per user (per-tier limits live in user_plans table once introduced).
-_DEFAULT_STORAGE_LIMIT_BYTES = 2 * 1024 * 1024 * 1024
+
+# Postgres errors meaning "the JSON you sent is not a valid timeline":
+# malformed JSON, a \u0000 jsonb cannot store, or a failed
+# assert_timeline_shape / jsonb_patch_apply.
+_INVALID_TIMELINE_ERRORS = (
+    asyncpg.InvalidTextRepresentationError,
+    asyncpg.UntranslatableCharacterError,
+    asyncpg.InvalidParameterValueError,
+)
+
+# The stored timeline as JSON text, for passing straight through to the client.
+_TIMELINE_JSON_SQL = """
+    CASE WHEN jsonb_typeof(timeline_state) = 'object'
+         THEN timeline_state::text
+         ELSE '{"tracks": []}'
+    END
+"""
+
+# Browsers must revalidate (If-None-Match) before reusing a cached project.
+_PROJECT_CACHE_CONTROL = "private, no-cache"
+# A recorded version never changes.
+_VERSION_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+
+def _project_etag(revision: int, name: str) -> str:
+    """
+    Strong ETag for GET /projects/{id}: the timeline revision plus a short
+    hash of the name, since renames don't bump the revision.
+    """
+    name_hash = hashlib.blake2b(name.encode(), digest_size=4).hexdigest()
+    return f'"{revision}-{name_hash}"'
+
+
+def _etag_list(header: str | None) -> list[str] | None:
+    """Entity tags in an If-Match / If-None-Match header, weak prefix dropped."""
+    if header is None:
+        return None
+    return [tag.strip().removeprefix("W/") for tag in header.split(",") if tag.strip()]
+
+
+def _etag_revision(tag: str) -> int | None:
+    revision, _, _ = tag.strip('"').partition("-")
+    return int(revision) if revision.isdigit() else None
+
+
+def _if_match_revisions(if_match: str | None) -> list[int] | None:
+    """Revisions an If-Match header allows, or None when any revision will do."""
+    tags = _etag_list(if_match)
+    if tags is None or "*" in tags:
+        return None
+    return [r for r in map(_etag_revision, tags) if r is not None]
+
+
+def _inline_json_schema(model: type[BaseModel]) -> dict[str, Any]:
+    """
+    JSON schema for `model` with nested models inlined, for documenting a body
+    that the route reads itself (openapi_extra can't use local $defs).
+    """
+    schema = model.model_json_schema(ref_template="{model}")
+    defs = schema.pop("$defs", {})
+
+    def inline(node: Any) -> Any:
+        if isinstance(node, dict):
+            if "$ref" in node:
+                return inline(defs[node["$ref"]])
+            return {key: inline(value) for key, value in node.items()}
+        if isinstance(node, list):
+            return [inline(value) for value in node]
+        return node
+
+    result: dict[str, Any] = inline(schema)
+    return result
 
 
 def _row_to_meta(row: Any) -> ProjectMeta:
@@ -38,36 +136,90 @@ def _row_to_meta(row: Any) -> ProjectMeta:
     )
 
 
+def _encode_cursor(order_by: str, row: Any) -> str:
+    raw = orjson.dumps([order_by, row[order_by].isoformat(), str(row["id"])])
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def _decode_cursor(cursor: str, order_by: str) -> tuple[datetime, UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        key, position, project_id = orjson.loads(raw)
+        if key != order_by:
+            raise ValueError(key)
+        return datetime.fromisoformat(position), UUID(project_id)
+    except (binascii.Error, orjson.JSONDecodeError, TypeError, ValueError) as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor for this listing",
+        ) from exc
+
+
 @router.get("/projects", response_model=ProjectListResponse)
 async def list_projects(
     user: SessionUser = Depends(get_current_user),
     limit: int = Query(default=20, ge=1, le=100),
     offset: int = Query(default=0, ge=0),
+    cursor: str | None = Query(default=None, max_length=200),
+    order_by: Literal["created_at", "updated_at"] = Query(default="created_at"),
+    include_total: bool = Query(default=True),
 ) -> ProjectListResponse:
+    """
+    Newest first, by `order_by`. Pages can be walked with `next_cursor`
+    (keyset on (order_by, id), so deep pages cost the same as the first) or,
+    as before, with `offset`. The total is computed in the same query as the
+    page; pass include_total=false to skip it entirely.
+
+    With order_by=updated_at, a project saved while paging moves to the front
+    and is not seen again on later pages.
+    """
+    if cursor is not None and offset:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Use either cursor or offset, not both",
+        )
+    # order_by is one of two literal column names, so it is safe to format in.
+    keyset = ""
+    args: list[Any] = [user.user_id, limit + 1, offset, include_total]
+    if cursor is not None:
+        args.extend(_decode_cursor(cursor, order_by))
+        # The first condition lets the (user_id, {order_by} DESC) index of
+        # 001_projects.sql bound the scan; the row comparison breaks ties.
+        keyset = f"AND {order_by} <= $5 AND ({order_by}, id) < ($5, $6)"
+
     pool = await get_db_pool()
     async with pool.acquire() as conn:
         rows = await conn.fetch(
-            """
-            SELECT id, user_id, name, created_at, updated_at
+            f"""
+            SELECT id, user_id, name, created_at, updated_at,
+                   CASE WHEN $4::boolean
+                        THEN (SELECT COUNT(*) FROM projects WHERE user_id = $1)
+                   END AS total
             FROM projects
-            WHERE user_id = $1
-            ORDER BY created_at DESC
+            WHERE user_id = $1 {keyset}
+            ORDER BY {order_by} DESC, id DESC
             LIMIT $2 OFFSET $3
             """,
-            user.user_id,
-            limit,
-            offset,
-        )
-        total = await conn.fetchval(
-            "SELECT COUNT(*) FROM projects WHERE user_id = $1",
-            user.user_id,
+            *args,
         )
-
+        total: int | None = rows[0]["total"] if rows else None
+        if include_total and not rows:
+            # An empty first page means no projects; past the end of the list
+            # there is no row to carry the count.
+            total = 0
+            if offset or cursor is not None:
+                total = await conn.fetchval(
+                    "SELECT COUNT(*) FROM projects WHERE user_id = $1",
+                    user.user_id,
+                )
+
+    page = rows[:limit]
     return ProjectListResponse(
-        projects=[_row_to_meta(row) for row in rows],
-        total=int(total or 0),
+        projects=[_row_to_meta(row) for row in page],
+        total=total,
         limit=limit,
         offset=offset,
+        next_cursor=_encode_cursor(order_by, page[-1]) if len(rows) > limit else None,
     )
 
 
@@ -103,26 +255,88 @@ async def create_project(
     return ProjectCreateResponse(project=_row_to_meta(row))
 
 
-@router.put("/projects/{project_id}", response_model=ProjectMutationResponse)
+@router.put(
+    "/projects/{project_id}",
+    response_model=ProjectMutationResponse,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": _inline_json_schema(TimelinePayload)}
+            },
+        }
+    },
+)
 async def save_project(
-    timeline: TimelinePayload,
+    request: Request,
+    response: Response,
     project_id: UUID = Path(...),
     user: SessionUser = Depends(get_current_user),
+    if_match: str | None = Header(default=None),
 ) -> ProjectMutationResponse:
+    """
+    Full save. With If-Match (an ETag from GET, or `*`), the write only
+    happens if the stored timeline is still at that revision; otherwise 412.
+    Only the revision part of the tag is compared, so a rename in another
+    tab does not block a save.
+
+    The body is not parsed here: the raw bytes go to Postgres as JSONB and
+    assert_timeline_shape checks the TimelinePayload shape there.
+
+    With AUTOSAVE_COALESCE_SECONDS set, the save is checked and acknowledged
+    here and written later by api/autosave.py, together with any saves that
+    follow it within the interval.
+    """
+    body = await request.body()
+    expected = _if_match_revisions(if_match)
+
+    if autosave.enabled:
+        try:
+            check_timeline_shape(body)
+            saved = await autosave.save(str(project_id), user.user_id, body, expected)
+        except ValueError as exc:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+                detail=str(exc),
+            ) from exc
+        except RevisionMismatchError as exc:
+            raise HTTPException(
+                status_code=status.HTTP_412_PRECONDITION_FAILED,
+                detail="Project was saved elsewhere since it was loaded",
+            ) from exc
+        if saved is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Project not found",
+            )
+        revision, name = saved
+        response.headers["ETag"] = _project_etag(revision, name)
+        return ProjectMutationResponse(
+            ok=True, project_id=str(project_id), revision=revision
+        )
+
     pool = await get_db_pool()
     async with pool.acquire() as conn:
-        row = await conn.fetchrow(
-            """
-            UPDATE projects
-            SET timeline_state = $1::jsonb,
-                updated_at = now()
-            WHERE id = $2 AND user_id = $3
-            RETURNING id
-            """,
-            json.dumps(timeline.model_dump(mode="json")),
-            str(project_id),
-            user.user_id,
-        )
+        try:
+            row = await write_timeline(
+                conn, str(project_id), user.user_id, body, expected
+            )
+        except _INVALID_TIMELINE_ERRORS as exc:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+                detail=str(exc),
+            ) from exc
+        if row is None and expected is not None:
+            exists = await conn.fetchval(
+                "SELECT true FROM projects WHERE id = $1 AND user_id = $2",
+                str(project_id),
+                user.user_id,
+            )
+            if exists:
+                raise HTTPException(
+                    status_code=status.HTTP_412_PRECONDITION_FAILED,
+                    detail="Project was saved elsewhere since it was loaded",
+                )
 
     if row is None:
         raise HTTPException(
@@ -130,43 +344,278 @@ async def save_project(
             detail="Project not found",
         )
 
-    return ProjectMutationResponse(ok=True, project_id=str(row["id"]))
+    response.headers["ETag"] = _project_etag(row["revision"], row["name"])
+    return ProjectMutationResponse(
+        ok=True, project_id=str(row["id"]), revision=row["revision"]
+    )
+
+
+@router.patch("/projects/{project_id}/timeline", response_model=ProjectMutationResponse)
+async def patch_project_timeline(
+    body: TimelinePatchRequest,
+    response: Response,
+    project_id: UUID = Path(...),
+    user: SessionUser = Depends(get_current_user),
+) -> ProjectMutationResponse:
+    """
+    Delta save: apply an RFC 6902 patch to the stored timeline. The patch is
+    applied inside Postgres (jsonb_patch_apply, migration 005), so only the
+    changed fragments cross the wire. A patch made against an older revision
+    is rejected with 409; the client then falls back to a full PUT.
+    """
+    patch = [op.model_dump(by_alias=True, exclude_unset=True) for op in body.patch]
+    await autosave.flush(str(project_id))
+    pool = await get_db_pool()
+    async with pool.acquire() as conn:
+        try:
+            row = await conn.fetchrow(
+                """
+                WITH updated AS (
+                    UPDATE projects
+                    SET timeline_state = assert_timeline_shape(
+                            jsonb_patch_apply(
+                                COALESCE(timeline_state, '{"tracks": []}'::jsonb),
+                                $1::jsonb
+                            )
+                        ),
+                        revision = revision + 1,
+                        updated_at = now()
+                    WHERE id = $2 AND user_id = $3 AND revision = $4
+                    RETURNING id, name, revision, timeline_state
+                )
+                -- The patch doubles as the history delta: no diff needed.
+                SELECT id, name, revision
+                FROM updated,
+                     record_project_version(id, revision, NULL, timeline_state, $1)
+                """,
+                patch,
+                str(project_id),
+                user.user_id,
+                body.base_revision,
+            )
+        except _INVALID_TIMELINE_ERRORS as exc:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+                detail=str(exc),
+            ) from exc
+
+        if row is None:
+            current = await conn.fetchval(
+                "SELECT revision FROM projects WHERE id = $1 AND user_id = $2",
+                str(project_id),
+                user.user_id,
+            )
+
+    if row is None:
+        if current is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Project not found",
+            )
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Stale base revision: project is at revision {current}",
+        )
+
+    response.headers["ETag"] = _project_etag(row["revision"], row["name"])
+    return ProjectMutationResponse(
+        ok=True, project_id=str(row["id"]), revision=row["revision"]
+    )
 
 
 @router.get("/projects/{project_id}", response_model=ProjectStateResponse)
 async def get_project(
     project_id: UUID = Path(...),
     user: SessionUser = Depends(get_current_user),
-) -> ProjectStateResponse:
+    if_none_match: str | None = Header(default=None),
+) -> Response:
+    """
+    Project state with an ETag. A matching If-None-Match gets a bare 304; the
+    timeline_state column is not read (or de-TOASTed) in that case.
+
+    Otherwise the stored JSONB text is spliced into the response as is,
+    without decoding it into Python objects and encoding it again.
+    """
+    tags = _etag_list(if_none_match) or []
+    # Revisions the client claims to hold: skip the JSONB for those rows.
+    cached = [r for r in map(_etag_revision, tags) if r is not None]
+    await autosave.flush(str(project_id))
     pool = await get_db_pool()
     async with pool.acquire() as conn:
         row = await conn.fetchrow(
-            """
-            SELECT id, user_id, name, created_at, updated_at, timeline_state
+            f"""
+            SELECT id, user_id, name, created_at, updated_at, revision,
+                   CASE WHEN revision = ANY($3::bigint[]) THEN NULL
+                        ELSE {_TIMELINE_JSON_SQL}
+                   END AS timeline_json
             FROM projects
             WHERE id = $1 AND user_id = $2
             """,
             str(project_id),
             user.user_id,
+            cached,
         )
+        if row is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Project not found",
+            )
+
+        etag = _project_etag(row["revision"], row["name"])
+        headers = {"ETag": etag, "Cache-Control": _PROJECT_CACHE_CONTROL}
+        if etag in tags or "*" in tags:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        timeline_json = row["timeline_json"]
+        if timeline_json is None:
+            # Same revision but renamed since: the client needs the body after all.
+            timeline_json = await conn.fetchval(
+                f"SELECT {_TIMELINE_JSON_SQL} FROM projects WHERE id = $1",
+                str(project_id),
+            )
+
+    content = orjson.dumps(
+        {
+            "project": _row_to_meta(row).model_dump(mode="json"),
+            "timeline": orjson.Fragment(timeline_json),
+            "textBinItems": [],
+            "revision": row["revision"],
+        }
+    )
+    return Response(content=content, media_type="application/json", headers=headers)
 
-    if row is None:
+
+@router.get(
+    "/projects/{project_id}/versions", response_model=ProjectVersionListResponse
+)
+async def list_project_versions(
+    project_id: UUID = Path(...),
+    user: SessionUser = Depends(get_current_user),
+    limit: int = Query(default=50, ge=1, le=200),
+    before: int | None = Query(default=None, ge=0),
+) -> ProjectVersionListResponse:
+    """
+    Timeline history, newest first: one entry per saved revision (migration
+    007). Older pages via `before=<next_before>`.
+    """
+    await autosave.flush(str(project_id))
+    pool = await get_db_pool()
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(
+            """
+            SELECT v.revision, v.kind, pg_column_size(v.data) AS size_bytes,
+                   v.created_at
+            FROM projects p
+            JOIN project_versions v ON v.project_id = p.id
+            WHERE p.id = $1 AND p.user_id = $2
+              AND ($3::bigint IS NULL OR v.revision < $3)
+            ORDER BY v.revision DESC
+            LIMIT $4
+            """,
+            str(project_id),
+            user.user_id,
+            before,
+            limit + 1,
+        )
+        if not rows:
+            exists = await conn.fetchval(
+                "SELECT true FROM projects WHERE id = $1 AND user_id = $2",
+                str(project_id),
+                user.user_id,
+            )
+            if not exists:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Project not found",
+                )
+
+    page = rows[:limit]
+    return ProjectVersionListResponse(
+        versions=[ProjectVersionMeta(**dict(row)) for row in page],
+        next_before=page[-1]["revision"] if len(rows) > limit else None,
+    )
+
+
+@router.get(
+    "/projects/{project_id}/versions/{revision}",
+    response_model=ProjectVersionResponse,
+)
+async def get_project_version(
+    project_id: UUID = Path(...),
+    revision: int = Path(..., ge=0),
+    user: SessionUser = Depends(get_current_user),
+) -> Response:
+    """
+    The timeline as of `revision`, rebuilt from the nearest snapshot and the
+    deltas after it.
+    """
+    await autosave.flush(str(project_id))
+    pool = await get_db_pool()
+    async with pool.acquire() as conn:
+        version = await load_timeline_version(conn, project_id, user.user_id, revision)
+    if version is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="Project not found",
+            detail="Version not found",
         )
 
-    timeline_raw = row["timeline_state"]
-    if isinstance(timeline_raw, str):
-        try:
-            timeline_raw = json.loads(timeline_raw)
-        except json.JSONDecodeError:
-            timeline_raw = None
-
-    return ProjectStateResponse(
-        project=_row_to_meta(row),
-        timeline=timeline_raw if isinstance(timeline_raw, dict) else {"tracks": []},
-        textBinItems=[],
+    created_at, timeline = version
+    content = orjson.dumps(
+        {
+            "revision": revision,
+            "created_at": created_at,
+            "timeline": timeline,
+        },
+        option=orjson.OPT_UTC_Z,  # same form as the pydantic responses
+    )
+    return Response(
+        content=content,
+        media_type="application/json",
+        headers={"Cache-Control": _VERSION_CACHE_CONTROL},
+    )
+
+
+@router.post(
+    "/projects/{project_id}/versions/{revision}/restore",
+    response_model=ProjectMutationResponse,
+)
+async def restore_project_version(
+    response: Response,
+    project_id: UUID = Path(...),
+    revision: int = Path(..., ge=0),
+    user: SessionUser = Depends(get_current_user),
+    if_match: str | None = Header(default=None),
+) -> ProjectMutationResponse:
+    """
+    Make the timeline of `revision` current again. This is a new save (the
+    revision is bumped and recorded as usual), so the restore itself can be
+    undone from the history. If-Match works as for PUT /projects/{id}.
+    """
+    expected = _if_match_revisions(if_match)
+    await autosave.flush(str(project_id))
+    pool = await get_db_pool()
+    async with pool.acquire() as conn:
+        version = await load_timeline_version(conn, project_id, user.user_id, revision)
+        if version is None:
+            # Also covers a missing project: it has no versions either.
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Version not found",
+            )
+        _, timeline = version
+        row = await write_timeline(
+            conn, str(project_id), user.user_id, orjson.dumps(timeline), expected
+        )
+
+    if row is None:
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail="Project was saved elsewhere since it was loaded",
+        )
+
+    response.headers["ETag"] = _project_etag(row["revision"], row["name"])
+    return ProjectMutationResponse(
+        ok=True, project_id=str(row["id"]), revision=row["revision"]
     )
 
 
@@ -176,6 +625,7 @@ async def rename_project(
     project_id: UUID = Path(...),
     user: SessionUser = Depends(get_current_user),
 ) -> ProjectMutationResponse:
+    await autosave.flush(str(project_id))
     pool = await get_db_pool()
     async with pool.acquire() as conn:
         row = await conn.fetchrow(
@@ -203,19 +653,14 @@ async def rename_project(
 async def get_storage(user: SessionUser = Depends(get_current_user)) -> StorageResponse:
     pool = await get_db_pool()
     async with pool.acquire() as conn:
+        # Maintained by a trigger on assets (migrations/006_user_storage_usage.sql).
         used_bytes = await conn.fetchval(
-            """
-            SELECT COALESCE(SUM(file_size), 0)
-              FROM assets
-             WHERE user_id = $1
-               AND deleted_at IS NULL
-               AND status = 'ready'
-            """,
+            "SELECT used_bytes FROM user_storage_usage WHERE user_id = $1",
             user.user_id,
         )
     return StorageResponse(
         usedBytes=int(used_bytes or 0),
-        limitBytes=_DEFAULT_STORAGE_LIMIT_BYTES,
+        limitBytes=STORAGE_LIMIT_BYTES,
     )
 
 
@@ -237,5 +682,8 @@ async def delete_project(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Project not found",
         )
+    # Only once the owner's delete went through: another user's request for
+    # this id must not drop the owner's pending save.
+    autosave.discard(str(project_id))
 
     logger.info("Project deleted: %s by user %s", project_id, user.user_id)
@@ -1,7 +1,8 @@
 from datetime import datetime
-from typing import Any
+from typing import Any, Literal, Self
+from uuid import UUID
 
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, ConfigDict, Field, model_validator
 
 
 class CreateProjectRequest(BaseModel):
@@ -34,6 +35,37 @@ class TimelinePayload(BaseModel):
     )
 
 
+class JsonPatchOperation(BaseModel):
+    """One RFC 6902 operation; paths are RFC 6901 pointers into the timeline."""
+
+    model_config = ConfigDict(populate_by_name=True)
+
+    op: Literal["add", "remove", "replace", "move", "copy", "test"]
+    path: str = Field(pattern=r"^(/.*)?$")
+    value: Any = None
+    from_: str | None = Field(default=None, alias="from", pattern=r"^(/.*)?$")
+
+    @model_validator(mode="after")
+    def _check_members(self) -> Self:
+        if (
+            self.op in ("add", "replace", "test")
+            and "value" not in self.model_fields_set
+        ):
+            raise ValueError(f'"{self.op}" requires "value"')
+        if self.op in ("move", "copy") and self.from_ is None:
+            raise ValueError(f'"{self.op}" requires "from"')
+        return self
+
+
+class TimelinePatchRequest(BaseModel):
+    base_revision: int = Field(
+        ge=0, description="Revision the patch was computed against"
+    )
+    patch: list[JsonPatchOperation] = Field(
+        max_length=10_000, description="RFC 6902 operations, applied in order"
+    )
+
+
 # ─── Response models ─────────────────────────────────────────────────────────
 
 
@@ -47,9 +79,10 @@ class ProjectMeta(BaseModel):
 
 class ProjectListResponse(BaseModel):
     projects: list[ProjectMeta]
-    total: int
+    total: int | None  # None when the caller passed include_total=false
     limit: int
     offset: int
+    next_cursor: str | None = None  # pass back as ?cursor= for the next page
 
 
 class ProjectCreateResponse(BaseModel):
@@ -60,13 +93,75 @@ class ProjectStateResponse(BaseModel):
     project: ProjectMeta
     timeline: dict[str, Any]
     textBinItems: list[dict[str, Any]]
+    revision: int = 0
 
 
 class ProjectMutationResponse(BaseModel):
     ok: bool
     project_id: str
+    revision: int | None = None
+
+
+class ProjectVersionMeta(BaseModel):
+    revision: int
+    kind: Literal["snapshot", "delta"]
+    size_bytes: int  # as stored, after compression
+    created_at: datetime
+
+
+class ProjectVersionListResponse(BaseModel):
+    versions: list[ProjectVersionMeta]
+    next_before: int | None = None  # pass back as ?before= for older versions
+
+
+class ProjectVersionResponse(BaseModel):
+    revision: int
+    created_at: datetime
+    timeline: dict[str, Any]
 
 
 class StorageResponse(BaseModel):
     usedBytes: int
     limitBytes: int
+
+
+class CreateUploadRequest(BaseModel):
+    filename: str = Field(min_length=1, max_length=255)
+    fileSize: int = Field(gt=0, description="Exact size of the file in bytes")
+    mimeType: str = Field(min_length=1, max_length=255)
+    projectId: UUID | None = None
+
+
+class UploadResponse(BaseModel):
+    uploadId: str  # also the asset id once the upload is complete
+    offset: int  # bytes received; send the next chunk from here
+    fileSize: int
+    status: Literal["uploading", "pending", "ready"]  # pending: being probed
+    contentHash: str | None = None
+    deduplicated: bool = False  # the bytes were already stored, and were not kept
+
+
+class FilmstripTile(BaseModel):
+    time: float  # seconds into the asset the frame was taken at
+    sheet: int  # index into FilmstripResponse.sheets
+    x: int  # offset of the tile in the sheet, in pixels
+    y: int
+
+
+class FilmstripResponse(BaseModel):
+    interval: float  # seconds between frames at the level picked for the zoom
+    tileWidth: int
+    tileHeight: int
+    sheets: list[str]  # URLs of the JPEG sprite sheets the tiles are on
+    tiles: list[FilmstripTile]
+
+
+class ProxyResponse(BaseModel):
+    # queued: waiting for a worker (or for the asset to be probed)
+    status: Literal["queued", "running", "ready", "failed"]
+    progress: float  # 0..1
+    url: str | None = None  # the proxy, once ready; the asset stays the original
+    width: int | None = None
+    height: int | None = None
+    fileSize: int | None = None
+    error: str | None = None  # why it failed; edit with the original
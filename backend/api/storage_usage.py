@@ -0,0 +1,83 @@
+"""
+Periodic reconciliation of the user_storage_usage counters.
+
+The counters are maintained by triggers on assets (see
+migrations/006_user_storage_usage.sql), so they only drift if rows are written
+with the triggers disabled or the table is edited by hand. This job recomputes
+them in the background and logs any user it had to repair. With several
+backend processes, an advisory lock lets only one of them run it at a time.
+
+To run it by hand: `SELECT * FROM reconcile_user_storage_usage();`
+"""
+
+import asyncio
+import contextlib
+import logging
+import os
+
+from db import get_db_pool
+
+logger = logging.getLogger(__name__)
+
+# 2 GB per user (per-tier limits live in user_plans table once introduced).
+STORAGE_LIMIT_BYTES = 2 * 1024 * 1024 * 1024
+
+# 0 disables the job (e.g. when reconciliation runs from cron instead).
+STORAGE_RECONCILE_INTERVAL_SECONDS = float(
+    os.getenv("STORAGE_RECONCILE_INTERVAL_SECONDS", "3600")
+)
+_ADVISORY_LOCK_KEY = "reconcile_user_storage_usage"
+
+_reconcile_task: asyncio.Task[None] | None = None
+
+
+async def reconcile_storage_usage() -> int | None:
+    """
+    Repair drifted counters; returns how many users were off, or None if
+    another process holds the lock.
+    """
+    pool = await get_db_pool()
+    async with pool.acquire() as conn, conn.transaction():
+        locked = await conn.fetchval(
+            "SELECT pg_try_advisory_xact_lock(hashtext($1))", _ADVISORY_LOCK_KEY
+        )
+        if not locked:
+            return None
+        rows = await conn.fetch("SELECT * FROM reconcile_user_storage_usage()")
+    for row in rows:
+        logger.warning(
+            "Storage usage drift for user %s: recorded %d, actual %d bytes",
+            row["user_id"],
+            row["recorded_bytes"],
+            row["actual_bytes"],
+        )
+    return len(rows)
+
+
+async def _reconcile_forever() -> None:
+    while True:
+        await asyncio.sleep(STORAGE_RECONCILE_INTERVAL_SECONDS)
+        try:
+            await reconcile_storage_usage()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Storage usage reconciliation failed")
+
+
+async def start_storage_reconciler() -> None:
+    """Start the background job; no-op when the interval is 0."""
+    global _reconcile_task
+    if STORAGE_RECONCILE_INTERVAL_SECONDS <= 0 or _reconcile_task is not None:
+        return
+    _reconcile_task = asyncio.create_task(_reconcile_forever())
+
+
+async def stop_storage_reconciler() -> None:
+    global _reconcile_task
+    if _reconcile_task is None:
+        return
+    _reconcile_task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await _reconcile_task
+    _reconcile_task = None
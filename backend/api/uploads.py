@@ -0,0 +1,585 @@
+"""
+Resumable, content-addressed asset uploads.
+
+    POST   /uploads        declare the file; returns its uploadId
+    PATCH  /uploads/{id}   append the body at the Upload-Offset header
+    GET    /uploads/{id}   the offset to resume from after a dropped connection
+    DELETE /uploads/{id}   give up
+
+An upload is its assets row in status 'uploading'. Chunks are appended to a
+staging file and SHA-256 hashed as they stream in, holding at most
+_WRITE_BYTES of the body in memory. The chunk that completes the file
+finishes the upload: if stored_objects already has the hash, the staged
+copy is dropped and the asset points at the stored object; otherwise the
+file goes into the object store (api/object_store.py) first. Either way
+the asset becomes 'pending' until the media worker (media/worker.py) has
+read its duration and frame size, then 'ready', when it counts towards the
+user's storage.
+
+Dedup uses the hash computed here, never one the client claims: a hash
+alone does not prove the caller has the file. So it saves storage, not the
+transfer.
+
+Staging files and hash state belong to this process: run uploads on one
+node (or share UPLOAD_STAGING_DIR) and send one chunk at a time per upload.
+A resumed upload whose hash state is gone (restart, another worker) rehashes
+its staged bytes first. Uploads idle for UPLOAD_EXPIRE_HOURS are marked
+'failed' and their staged bytes removed.
+
+Stored objects are this backend's, not the renderer's r2_objects, while the
+object store is not R2 (migrations/014_stored_objects.sql). The same hourly
+job deletes those no live asset refers to any more, with what the media
+worker built from them.
+"""
+
+import asyncio
+import contextlib
+import hashlib
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path as FilePath
+from pathlib import PurePath
+from typing import IO, Any
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Path, Request, status
+
+from api.object_store import create_object_store
+from api.schema import CreateUploadRequest, UploadResponse
+from api.storage_usage import STORAGE_LIMIT_BYTES
+from auth.routes import get_current_user
+from auth.schema import SessionUser
+from db import get_db_pool
+from media.worker import derived_keys
+from media.worker import wake as wake_media_probes
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=["api"])
+
+UPLOAD_STAGING_DIR = FilePath(
+    os.getenv(
+        "UPLOAD_STAGING_DIR",
+        FilePath(__file__).resolve().parents[1] / "data" / "uploads",
+    )
+)
+# 0 disables expiry (e.g. when staging is cleaned up some other way).
+UPLOAD_EXPIRE_HOURS = float(os.getenv("UPLOAD_EXPIRE_HOURS", "24"))
+_CLEANUP_INTERVAL_SECONDS = 3600.0
+# A stored object no asset came to refer to (its upload failed after storing
+# it) is left this long before it counts as abandoned.
+_ABANDONED_OBJECT_HOURS = 24.0
+_CLEANUP_BATCH = 100
+
+# Body bytes gathered before each write + hash, which run in a thread.
+_WRITE_BYTES = 4 * 1024 * 1024
+_MEDIA_TYPES = ("video", "audio", "image")
+
+object_store = create_object_store()
+
+
+@dataclass
+class _Upload:
+    """Hash state of an upload being received by this process."""
+
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    hasher: Any = field(default_factory=hashlib.sha256)
+    hashed: int = 0  # leading bytes of the staging file fed to `hasher`
+
+
+_uploads: dict[str, _Upload] = {}
+_cleanup_task: asyncio.Task[None] | None = None
+
+
+def stats() -> dict[str, int]:
+    return {"active": len(_uploads)}
+
+
+def _staging_path(upload_id: str) -> FilePath:
+    return UPLOAD_STAGING_DIR / f"{upload_id}.part"
+
+
+def _staged_size(path: FilePath) -> int:
+    try:
+        return path.stat().st_size
+    except FileNotFoundError:
+        return 0
+
+
+def _open_staging(path: FilePath) -> IO[bytes]:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return path.open("ab")
+
+
+def _rehash(path: FilePath) -> Any:
+    hasher = hashlib.sha256()
+    with contextlib.suppress(FileNotFoundError), path.open("rb") as file:
+        while chunk := file.read(_WRITE_BYTES):
+            hasher.update(chunk)
+    return hasher
+
+
+def _append(file: IO[bytes], upload: _Upload, data: bytearray) -> None:
+    file.write(data)
+    upload.hasher.update(data)
+    upload.hashed += len(data)
+
+
+async def _fetch_upload(upload_id: str, user_id: str) -> Any:
+    pool = await get_db_pool()
+    async with pool.acquire() as conn:
+        return await conn.fetchrow(
+            """
+            SELECT filename, file_size, mime_type, status, stored_hash
+            FROM assets
+            WHERE id = $1 AND user_id = $2 AND deleted_at IS NULL
+            """,
+            upload_id,
+            user_id,
+        )
+
+
+def _finished(upload_id: str, row: Any) -> UploadResponse | None:
+    """The response for a finished upload; 404/410 unless it is in progress."""
+    if row is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Upload not found"
+        )
+    if row["status"] in ("pending", "ready"):
+        return UploadResponse(
+            uploadId=upload_id,
+            offset=row["file_size"],
+            fileSize=row["file_size"],
+            status=row["status"],
+            contentHash=row["stored_hash"],
+        )
+    if row["status"] != "uploading":
+        # Failed while stored: the media worker gave up probing the file.
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Upload has expired"
+            if row["stored_hash"] is None
+            else "Uploaded file could not be read",
+        )
+    return None
+
+
+@router.post(
+    "/uploads", response_model=UploadResponse, status_code=status.HTTP_201_CREATED
+)
+async def create_upload(
+    body: CreateUploadRequest,
+    user: SessionUser = Depends(get_current_user),
+) -> UploadResponse:
+    """
+    Declare a file of `fileSize` bytes. Uploads in progress (and finished
+    ones not yet probed) count towards the storage limit, so parallel
+    uploads cannot overrun it together.
+    """
+    media_type = body.mimeType.split("/", 1)[0]
+    if media_type not in _MEDIA_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Only video, audio and image files can be uploaded",
+        )
+
+    pool = await get_db_pool()
+    async with pool.acquire() as conn, conn.transaction():
+        # One check-and-insert per user at a time, or concurrent uploads
+        # could each pass the check and go over the limit together.
+        await conn.execute(
+            "SELECT pg_advisory_xact_lock(hashtext($1))", f"upload-quota:{user.user_id}"
+        )
+        # Maintained by a trigger on assets (migrations/006_user_storage_usage.sql).
+        committed = await conn.fetchval(
+            """
+            SELECT coalesce(
+                       (SELECT used_bytes FROM user_storage_usage WHERE user_id = $1),
+                       0)
+                 + coalesce(
+                       (SELECT sum(file_size) FROM assets
+                        WHERE user_id = $1 AND status IN ('uploading', 'pending')
+                          AND deleted_at IS NULL),
+                       0)
+            """,
+            user.user_id,
+        )
+        if committed + body.fileSize > STORAGE_LIMIT_BYTES:
+            raise HTTPException(
+                status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+                detail="Storage limit reached",
+            )
+        upload_id = await conn.fetchval(
+            """
+            INSERT INTO assets
+                (user_id, project_id, filename, file_size, mime_type, media_type,
+                 status)
+            SELECT $1, $2, $3, $4, $5, $6, 'uploading'
+            WHERE $2::uuid IS NULL
+               OR EXISTS (SELECT 1 FROM projects WHERE id = $2 AND user_id = $1)
+            RETURNING id
+            """,
+            user.user_id,
+            str(body.projectId) if body.projectId else None,
+            body.filename,
+            body.fileSize,
+            body.mimeType,
+            media_type,
+        )
+    if upload_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Project not found"
+        )
+
+    logger.info(
+        "Upload started: %s (%d bytes) by user %s",
+        upload_id,
+        body.fileSize,
+        user.user_id,
+    )
+    return UploadResponse(
+        uploadId=str(upload_id), offset=0, fileSize=body.fileSize, status="uploading"
+    )
+
+
+@router.get("/uploads/{upload_id}", response_model=UploadResponse)
+async def get_upload(
+    upload_id: UUID = Path(...),
+    user: SessionUser = Depends(get_current_user),
+) -> UploadResponse:
+    key = str(upload_id)
+    row = await _fetch_upload(key, user.user_id)
+    finished = _finished(key, row)
+    if finished is not None:
+        return finished
+    offset = await asyncio.to_thread(_staged_size, _staging_path(key))
+    return UploadResponse(
+        uploadId=key, offset=offset, fileSize=row["file_size"], status="uploading"
+    )
+
+
+@router.patch("/uploads/{upload_id}", response_model=UploadResponse)
+async def append_upload_chunk(
+    request: Request,
+    upload_id: UUID = Path(...),
+    user: SessionUser = Depends(get_current_user),
+    upload_offset: int = Header(ge=0),
+) -> UploadResponse:
+    """
+    Append the raw request body. Upload-Offset must be the upload's current
+    offset (409 with the right one otherwise), so a retried chunk is never
+    written twice. The chunk that completes the file finishes the upload;
+    resending it after that returns the finished upload.
+    """
+    key = str(upload_id)
+    row = await _fetch_upload(key, user.user_id)
+    finished = _finished(key, row)
+    if finished is not None:
+        return finished
+
+    upload = _uploads.setdefault(key, _Upload())
+    if upload.lock.locked():
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A chunk for this upload is already being received",
+        )
+    async with upload.lock:
+        path = _staging_path(key)
+        offset = await asyncio.to_thread(_staged_size, path)
+        if upload_offset != offset:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Upload is at offset {offset}",
+                headers={"Upload-Offset": str(offset)},
+            )
+        if upload.hashed != offset:
+            upload.hasher = await asyncio.to_thread(_rehash, path)
+            upload.hashed = offset
+
+        offset = await _receive(request, path, upload, offset, row["file_size"])
+        if offset < row["file_size"]:
+            return UploadResponse(
+                uploadId=key,
+                offset=offset,
+                fileSize=row["file_size"],
+                status="uploading",
+            )
+        try:
+            return await _finish(key, row, upload.hasher.hexdigest(), path)
+        finally:
+            _uploads.pop(key, None)
+
+
+async def _receive(
+    request: Request, path: FilePath, upload: _Upload, offset: int, file_size: int
+) -> int:
+    """Append the request body to the staging file; returns the new offset."""
+    file = await asyncio.to_thread(_open_staging, path)
+    buffer = bytearray()
+    try:
+        async for chunk in request.stream():
+            if offset + len(buffer) + len(chunk) > file_size:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Chunk runs past the declared file size",
+                )
+            buffer += chunk
+            if len(buffer) >= _WRITE_BYTES:
+                data, buffer = buffer, bytearray()
+                await asyncio.to_thread(_append, file, upload, data)
+                offset += len(data)
+    finally:
+        # Keep what did arrive, also from a dropped connection: the client
+        # resumes after it.
+        if buffer:
+            await asyncio.to_thread(_append, file, upload, buffer)
+            offset += len(buffer)
+        await asyncio.to_thread(file.close)
+    return offset
+
+
+async def _set_stored(conn: Any, upload_id: str, content_hash: str) -> Any:
+    """Point the asset at its stored object; None when it was cancelled meanwhile."""
+    return await conn.fetchval(
+        """
+        UPDATE assets
+        SET stored_hash = $2, status = 'pending'
+        WHERE id = $1 AND status = 'uploading'
+        RETURNING id
+        """,
+        upload_id,
+        content_hash,
+    )
+
+
+async def _finish(
+    upload_id: str, row: Any, content_hash: str, path: FilePath
+) -> UploadResponse:
+    object_key = f"objects/{content_hash}{PurePath(row['filename']).suffix.lower()}"
+    pool = await get_db_pool()
+    async with pool.acquire() as conn, conn.transaction():
+        # As in the renderer's initiate-upload, the update makes RETURNING
+        # report an existing row too; it gives the new asset a fresh round
+        # of probe attempts. It also locks the row, so the cleanup cannot
+        # delete the object before the asset refers to it.
+        stored = await conn.fetchrow(
+            """
+            INSERT INTO stored_objects (content_hash, object_key, file_size, mime_type, status)
+            VALUES ($1, $2, $3, $4, 'pending')
+            ON CONFLICT (content_hash)
+                DO UPDATE SET probe_attempts = 0, probe_after = NULL
+            RETURNING object_key, status
+            """,
+            content_hash,
+            object_key,
+            row["file_size"],
+            row["mime_type"],
+        )
+        deduplicated = stored["status"] == "ready"
+        if deduplicated:
+            updated = await _set_stored(conn, upload_id, content_hash)
+    if deduplicated:
+        await asyncio.to_thread(path.unlink, missing_ok=True)
+    else:
+        # 'pending' can also be a concurrent upload of the same bytes; both
+        # write the same content under the same key.
+        await object_store.put_file(stored["object_key"], path)
+        async with pool.acquire() as conn, conn.transaction():
+            # An upsert, in case the cleanup took the row for an abandoned
+            # one meanwhile.
+            await conn.execute(
+                """
+                INSERT INTO stored_objects (content_hash, object_key, file_size, mime_type, status)
+                VALUES ($1, $2, $3, $4, 'ready')
+                ON CONFLICT (content_hash) DO UPDATE SET status = 'ready'
+                """,
+                content_hash,
+                stored["object_key"],
+                row["file_size"],
+                row["mime_type"],
+            )
+            updated = await _set_stored(conn, upload_id, content_hash)
+    if updated is None:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE, detail="Upload was cancelled"
+        )
+    wake_media_probes()
+
+    logger.info(
+        "Upload finished: %s (%s…)%s",
+        upload_id,
+        content_hash[:8],
+        ", deduplicated" if deduplicated else "",
+    )
+    return UploadResponse(
+        uploadId=upload_id,
+        offset=row["file_size"],
+        fileSize=row["file_size"],
+        status="pending",
+        contentHash=content_hash,
+        deduplicated=deduplicated,
+    )
+
+
+@router.delete("/uploads/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def cancel_upload(
+    upload_id: UUID = Path(...),
+    user: SessionUser = Depends(get_current_user),
+) -> None:
+    key = str(upload_id)
+    pool = await get_db_pool()
+    async with pool.acquire() as conn:
+        result = await conn.execute(
+            """
+            DELETE FROM assets
+            WHERE id = $1 AND user_id = $2 AND status IN ('uploading', 'failed')
+            """,
+            key,
+            user.user_id,
+        )
+    if result == "DELETE 0":
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Upload not found"
+        )
+    _uploads.pop(key, None)
+    await asyncio.to_thread(_staging_path(key).unlink, missing_ok=True)
+
+
+def _idle_since(path: FilePath) -> float:
+    try:
+        return path.stat().st_mtime
+    except FileNotFoundError:
+        return 0.0
+
+
+async def expire_uploads() -> int:
+    """Fail uploads that got no bytes for UPLOAD_EXPIRE_HOURS; returns how many."""
+    max_age = UPLOAD_EXPIRE_HOURS * 3600
+    pool = await get_db_pool()
+    rows = await pool.fetch(
+        """
+        SELECT id FROM assets
+        WHERE status = 'uploading' AND created_at < now() - make_interval(secs => $1)
+        """,
+        max_age,
+    )
+    cutoff = time.time() - max_age
+    stale = [
+        str(row["id"])
+        for row in rows
+        if await asyncio.to_thread(_idle_since, _staging_path(str(row["id"]))) < cutoff
+    ]
+    if not stale:
+        return 0
+    await pool.execute(
+        """
+        UPDATE assets SET status = 'failed'
+        WHERE id = ANY($1::uuid[]) AND status = 'uploading'
+        """,
+        stale,
+    )
+    for upload_id in stale:
+        _uploads.pop(upload_id, None)
+        await asyncio.to_thread(_staging_path(upload_id).unlink, missing_ok=True)
+    logger.info("Expired %d idle uploads", len(stale))
+    return len(stale)
+
+
+async def delete_unused_objects() -> int:
+    """Delete stored objects no live asset refers to; returns how many."""
+    pool = await get_db_pool()
+    deleted = 0
+    while True:
+        async with pool.acquire() as conn, conn.transaction():
+            # NO KEY UPDATE: a media build claiming its row for the object (a
+            # foreign key check) is not held up; its claim is then deleted
+            # with the object, and the build cleans up after itself.
+            candidates = await conn.fetch(
+                """
+                SELECT content_hash FROM stored_objects o
+                WHERE (o.status = 'ready'
+                       OR o.updated_at < now() - make_interval(hours => $1))
+                  AND NOT EXISTS (
+                      SELECT 1 FROM assets a
+                      WHERE a.stored_hash = o.content_hash AND a.deleted_at IS NULL
+                  )
+                LIMIT $2
+                FOR NO KEY UPDATE SKIP LOCKED
+                """,
+                _ABANDONED_OBJECT_HOURS,
+                _CLEANUP_BATCH,
+            )
+            if not candidates:
+                break
+            # Checked again once locked: an upload deduplicating against the
+            # object held the lock until its asset referred to it.
+            unused = await conn.fetch(
+                """
+                SELECT content_hash FROM stored_objects o
+                WHERE o.content_hash = ANY($1::text[])
+                  AND NOT EXISTS (
+                      SELECT 1 FROM assets a
+                      WHERE a.stored_hash = o.content_hash AND a.deleted_at IS NULL
+                  )
+                """,
+                [row["content_hash"] for row in candidates],
+            )
+            hashes = [row["content_hash"] for row in unused]
+            keys = await derived_keys(conn, hashes)
+            # Soft-deleted assets let go of the object (ON DELETE SET NULL),
+            # and media_* rows built from it go with it (ON DELETE CASCADE).
+            objects = await conn.fetch(
+                """
+                DELETE FROM stored_objects
+                WHERE content_hash = ANY($1::text[])
+                RETURNING object_key
+                """,
+                hashes,
+            )
+            keys += [row["object_key"] for row in objects]
+        # Outside the transaction; a file left behind by a failure here
+        # takes space but is never served.
+        for key in keys:
+            try:
+                await object_store.delete(key)
+            except Exception:
+                logger.exception("Deleting %s failed", key)
+        deleted += len(objects)
+        if len(candidates) < _CLEANUP_BATCH:
+            break
+    if deleted:
+        logger.info("Deleted %d unused stored objects", deleted)
+    return deleted
+
+
+async def _clean_up_forever() -> None:
+    while True:
+        await asyncio.sleep(_CLEANUP_INTERVAL_SECONDS)
+        try:
+            if UPLOAD_EXPIRE_HOURS > 0:
+                await expire_uploads()
+            await delete_unused_objects()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Upload cleanup failed")
+
+
+async def start_upload_cleanup() -> None:
+    """Start the background job: upload expiry and unused object deletion."""
+    global _cleanup_task
+    if _cleanup_task is not None:
+        return
+    _cleanup_task = asyncio.create_task(_clean_up_forever())
+
+
+async def stop_upload_cleanup() -> None:
+    global _cleanup_task
+    if _cleanup_task is None:
+        return
+    _cleanup_task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await _cleanup_task
+    _cleanup_task = None
@@ -0,0 +1,101 @@
+"""
+GET /assets/{id}/waveform: the waveform of an audio or video asset, drawn
+for `pixels` pixels between start_s and end_s.
+
+The body is `pixels` (min, max) pairs of signed bytes, -127..127 for full
+scale, one pair per pixel and (0, 0) past the end of the audio; 2 bytes a
+pixel, so a timeline row is a few KB whatever the zoom. The peaks are
+precomputed by the media worker (media/worker.py, media/waveform.py), so a
+request reads only the pages of one pyramid level it needs. An asset's
+bytes never change, so responses are cacheable for good.
+"""
+
+import asyncio
+from pathlib import Path as FilePath
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Response, status
+
+from auth.routes import get_current_user
+from auth.schema import SessionUser
+from db import get_db_pool
+from media.waveform import Peaks
+from media.worker import disabled, object_store
+
+router = APIRouter(tags=["api"])
+
+_MAX_PIXELS = 8192
+# Far past the end of any file; keeps the peak arithmetic in range.
+_MAX_SECONDS = 7 * 24 * 3600.0
+_WAVEFORM_CACHE_CONTROL = "private, max-age=31536000, immutable"
+# Until the worker has built it (seconds, for most files).
+_RETRY_AFTER_SECONDS = "5"
+
+
+def _draw(path: FilePath, start_s: float, end_s: float, pixels: int) -> bytes:
+    return Peaks(path).query(start_s, end_s, pixels).tobytes()
+
+
+@router.get("/assets/{asset_id}/waveform")
+async def get_waveform(
+    asset_id: UUID = Path(...),
+    start_s: float = Query(default=0.0, ge=0, lt=_MAX_SECONDS, allow_inf_nan=False),
+    end_s: float = Query(..., gt=0, le=_MAX_SECONDS, allow_inf_nan=False),
+    pixels: int = Query(..., ge=1, le=_MAX_PIXELS),
+    user: SessionUser = Depends(get_current_user),
+) -> Response:
+    """
+    404 for an image, a file without sound, or one stored before probing
+    existed (nothing builds its waveform), and when this server builds no
+    waveforms (no ffmpeg); 503 with Retry-After while the file is still
+    being probed or its waveform built.
+    """
+    if end_s <= start_s:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="end_s must be after start_s",
+        )
+    pool = await get_db_pool()
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow(
+            """
+            SELECT a.status, p.media_type,
+                   coalesce(w.status = 'done', false) AS built, w.r2_key
+            FROM assets a
+            LEFT JOIN media_probes p ON p.content_hash = a.stored_hash
+            LEFT JOIN media_waveforms w ON w.content_hash = a.stored_hash
+            WHERE a.id = $1 AND a.user_id = $2 AND a.deleted_at IS NULL
+              AND a.status IN ('pending', 'ready')
+            """,
+            str(asset_id),
+            user.user_id,
+        )
+    if row is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Asset not found"
+        )
+    if not row["built"] and disabled("waveforms"):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Waveforms are not built on this server",
+        )
+    if row["status"] == "pending" or (
+        row["media_type"] in ("audio", "video") and not row["built"]
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Waveform is not ready yet",
+            headers={"Retry-After": _RETRY_AFTER_SECONDS},
+        )
+    if row["media_type"] not in ("audio", "video") or row["r2_key"] is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Asset has no waveform"
+        )
+
+    async with object_store.local_copy(row["r2_key"]) as path:
+        content = await asyncio.to_thread(_draw, path, start_s, end_s, pixels)
+    return Response(
+        content=content,
+        media_type="application/octet-stream",
+        headers={"Cache-Control": _WAVEFORM_CACHE_CONTROL},
+    )
@@ -4,6 +4,7 @@ from urllib.parse import unquote
 from fastapi import APIRouter, Depends, HTTPException, Request, status
 
 from auth.schema import SessionUser
+from auth.session_cache import SESSION_CACHE_ENABLED, session_cache
 from db import get_db_pool
 
 logger = logging.getLogger(__name__)
@@ -49,11 +50,18 @@ async def get_current_user(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated"
         )
 
+    if SESSION_CACHE_ENABLED:
+        cached = session_cache.get(session_token)
+        if cached is not None:
+            return cached
+    generation = session_cache.generation
+
     pool = await get_db_pool()
     async with pool.acquire() as conn:
         row = await conn.fetchrow(
             """
-            SELECT u.id, u.name, u.email, u.image
+            SELECT s.id AS session_id, s."expiresAt" AS expires_at,
+                   u.id, u.name, u.email, u.image
             FROM session s
             JOIN "user" u ON u.id = s."userId"
             WHERE s.token = $1 AND s."expiresAt" > now()
@@ -68,12 +76,21 @@ async def get_current_user(
             detail="Invalid or expired session",
         )
 
-    return SessionUser(
+    user = SessionUser(
         user_id=str(row["id"]),
         email=str(row["email"]),
         name=str(row["name"]),
         image=str(row["image"]) if row["image"] else None,
     )
+    if SESSION_CACHE_ENABLED:
+        session_cache.put(
+            session_token,
+            str(row["session_id"]),
+            user,
+            row["expires_at"],
+            generation,
+        )
+    return user
 
 
 @router.get("/me", response_model=SessionUser)
@@ -0,0 +1,213 @@
+"""
+In-process cache for resolved BetterAuth sessions.
+
+Every authenticated request goes through get_current_user, so caching the
+session → user lookup removes one pool acquire + JOIN per request. Entries are
+bounded (LRU), expire after a short TTL or at the session's own expiresAt,
+whichever comes first, and are dropped eagerly when Postgres reports a change
+to the session or user row (see migrations/004_session_invalidation.sql).
+"""
+
+import asyncio
+import contextlib
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+
+import asyncpg  # type: ignore[import-untyped]
+
+from auth.schema import SessionUser
+from db import connect_standalone
+
+logger = logging.getLogger(__name__)
+
+SESSION_CACHE_ENABLED = os.getenv("AUTH_SESSION_CACHE", "true") != "false"
+_SESSION_CACHE_TTL_SECONDS = float(os.getenv("AUTH_SESSION_CACHE_TTL_SECONDS", "60"))
+_SESSION_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_SESSION_CACHE_MAX_ENTRIES", "10000"))
+
+# Must match the channel used by the triggers in 004_session_invalidation.sql.
+_INVALIDATION_CHANNEL = "auth_session_invalidate"
+_LISTENER_RETRY_SECONDS = 5.0
+
+
+@dataclass(frozen=True, slots=True)
+class _Entry:
+    user: SessionUser
+    session_id: str
+    expires_at: float  # session "expiresAt" as a unix timestamp
+    stale_at: float  # monotonic deadline for the TTL
+
+
+class SessionCache:
+    """Bounded TTL/LRU map of session token → SessionUser."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float) -> None:
+        self._max_entries = max_entries
+        self._ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        # Secondary indexes so invalidations by session id / user id are O(k).
+        self._tokens_by_session: dict[str, str] = {}
+        self._tokens_by_user: dict[str, set[str]] = {}
+        # Bumped on every invalidation; lets callers discard a DB result that
+        # raced with a change notification instead of caching a stale row.
+        self.generation = 0
+        # Only cache while the invalidation listener is connected; otherwise a
+        # logout could stay valid here for up to a full TTL.
+        self.active = False
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, token: str) -> SessionUser | None:
+        entry = self._entries.get(token)
+        if entry is None:
+            self.misses += 1
+            return None
+        if time.monotonic() >= entry.stale_at or time.time() >= entry.expires_at:
+            self._remove(token)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(token)
+        self.hits += 1
+        return entry.user
+
+    def put(
+        self,
+        token: str,
+        session_id: str,
+        user: SessionUser,
+        expires_at: datetime,
+        generation: int,
+    ) -> None:
+        """Cache a lookup unless an invalidation arrived since `generation`."""
+        if not self.active or generation != self.generation:
+            return
+        if token in self._entries:
+            self._remove(token)
+        self._entries[token] = _Entry(
+            user=user,
+            session_id=session_id,
+            expires_at=expires_at.timestamp(),
+            stale_at=time.monotonic() + self._ttl_seconds,
+        )
+        self._tokens_by_session[session_id] = token
+        self._tokens_by_user.setdefault(user.user_id, set()).add(token)
+        while len(self._entries) > self._max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+
+    def invalidate_session(self, session_id: str) -> None:
+        self.generation += 1
+        self.invalidations += 1
+        token = self._tokens_by_session.get(session_id)
+        if token is not None:
+            self._remove(token)
+
+    def invalidate_user(self, user_id: str) -> None:
+        self.generation += 1
+        self.invalidations += 1
+        for token in list(self._tokens_by_user.get(user_id, ())):
+            self._remove(token)
+
+    def clear(self) -> None:
+        self.generation += 1
+        self._entries.clear()
+        self._tokens_by_session.clear()
+        self._tokens_by_user.clear()
+
+    def stats(self) -> dict[str, int | float | bool]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": SESSION_CACHE_ENABLED,
+            "active": self.active,
+            "size": len(self._entries),
+            "max_entries": self._max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+    def _remove(self, token: str) -> None:
+        entry = self._entries.pop(token, None)
+        if entry is None:
+            return
+        self._tokens_by_session.pop(entry.session_id, None)
+        user_tokens = self._tokens_by_user.get(entry.user.user_id)
+        if user_tokens is not None:
+            user_tokens.discard(token)
+            if not user_tokens:
+                del self._tokens_by_user[entry.user.user_id]
+
+
+session_cache = SessionCache(
+    max_entries=_SESSION_CACHE_MAX_ENTRIES,
+    ttl_seconds=_SESSION_CACHE_TTL_SECONDS,
+)
+
+_listener_task: asyncio.Task[None] | None = None
+
+
+def _on_notification(
+    _conn: asyncpg.Connection, _pid: int, _channel: str, payload: str
+) -> None:
+    # Payload is "session:<id>" or "user:<id>" — never the token itself.
+    kind, _, key = payload.partition(":")
+    if kind == "session":
+        session_cache.invalidate_session(key)
+    elif kind == "user":
+        session_cache.invalidate_user(key)
+    else:
+        logger.warning("Unknown session invalidation payload kind: %s", kind)
+
+
+async def _listen_once() -> None:
+    conn = await connect_standalone()
+    try:
+        closed = asyncio.Event()
+        conn.add_termination_listener(lambda _conn: closed.set())
+        await conn.add_listener(_INVALIDATION_CHANNEL, _on_notification)
+        session_cache.clear()
+        session_cache.active = True
+        logger.info("Listening for session invalidations")
+        await closed.wait()
+        logger.warning("Session invalidation listener disconnected")
+    finally:
+        # While disconnected we cannot trust the cache.
+        session_cache.active = False
+        session_cache.clear()
+        if not conn.is_closed():
+            with contextlib.suppress(Exception):
+                await conn.close()
+
+
+async def _listen_forever() -> None:
+    while True:
+        try:
+            await _listen_once()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Session invalidation listener failed")
+        await asyncio.sleep(_LISTENER_RETRY_SECONDS)
+
+
+async def start_session_cache_listener() -> None:
+    """Start the LISTEN task; no-op when the cache is disabled."""
+    global _listener_task
+    if not SESSION_CACHE_ENABLED or _listener_task is not None:
+        return
+    _listener_task = asyncio.create_task(_listen_forever())
+
+
+async def stop_session_cache_listener() -> None:
+    global _listener_task
+    if _listener_task is None:
+        return
+    _listener_task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await _listener_task
+    _listener_task = None
@@ -0,0 +1,140 @@
+"""
+Whether other routes stay responsive while /ai calls wait on the model: the
+latency of GET /projects on its own, then with --inflight /ai requests
+waiting on a model that takes --model-delay seconds to answer.
+
+    uv run python -m benchmarks.bench_ai_concurrency --inflight 16 --model-delay 2
+
+The model is the local fake (AI_MODEL_BACKEND=fake), which waits with
+asyncio.sleep, as the async Gemini client does on the network. A model call
+that blocked the event loop would hold a GET for the whole delay. GETs are
+sent one after another from when the calls start until they have all been
+answered; the run fails (exit status 1) if any of them took half the model
+delay or more, i.e. waited on a model call. Building the prompts of
+--inflight calls at once, at the start, does cost the loop some time; that
+shows in the max, and should stay well under the delay.
+Creates a throwaway user with a real session; needs DATABASE_URL pointing
+at a disposable database with the migrations applied.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+load_dotenv(Path(__file__).resolve().parents[2] / ".env")
+os.environ["AI_MODEL_BACKEND"] = "fake"
+
+import httpx  # noqa: E402
+
+from ai import routes as ai_routes  # noqa: E402
+from ai.model import FakeModelClient  # noqa: E402
+from ai.rate_limit import create_rate_limiter  # noqa: E402
+from benchmarks.synthetic import synthetic_media_bin, synthetic_timeline  # noqa: E402
+from db import close_db_pool, get_db_pool  # noqa: E402
+from main import app  # noqa: E402
+
+_SESSION_COOKIE = "better-auth.session_token"
+
+
+async def _time_get(client: httpx.AsyncClient) -> float:
+    started = time.perf_counter()
+    (await client.get("/projects")).raise_for_status()
+    return time.perf_counter() - started
+
+
+async def _run(args: argparse.Namespace) -> bool:
+    if not isinstance(ai_routes.model_client, FakeModelClient):
+        raise RuntimeError("the run must use the fake model client")
+    ai_routes.model_client.delay_seconds = args.model_delay
+    ai_routes.rate_limiter = create_rate_limiter(10**9, 60)
+
+    user_id = f"bench-{uuid.uuid4()}"
+    token = uuid.uuid4().hex
+    pool = await get_db_pool()
+    await pool.execute(
+        'INSERT INTO "user" (id, name, email) VALUES ($1, $2, $3)',
+        user_id,
+        "bench",
+        f"{user_id}@example.com",
+    )
+    await pool.execute(
+        'INSERT INTO session (token, "userId", "expiresAt") VALUES ($1, $2, $3)',
+        token,
+        user_id,
+        datetime.now(UTC) + timedelta(days=1),
+    )
+    try:
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app),
+            base_url="http://bench",
+            cookies={_SESSION_COOKIE: f"{token}.bench"},
+            timeout=60,
+        ) as client:
+            (await client.post("/projects", json={"name": "bench"})).raise_for_status()
+            timeline = synthetic_timeline(args.scrubbers, 4)
+            media_bin = synthetic_media_bin(50)
+            for _ in range(10):  # warm up
+                await _time_get(client)
+            idle = [await _time_get(client) for _ in range(args.requests)]
+
+            async def ask(i: int) -> None:
+                response = await client.post(
+                    "/ai",
+                    json={
+                        # A new message each time, so the response cache never answers.
+                        "message": f"Make the opening feel more cinematic, take {i}",
+                        "timeline_state": timeline,
+                        "mediabin_items": media_bin,
+                    },
+                )
+                response.raise_for_status()
+
+            calls = [asyncio.create_task(ask(i)) for i in range(args.inflight)]
+            busy = []
+            while not all(call.done() for call in calls):
+                busy.append(await _time_get(client))
+            await asyncio.gather(*calls)
+    finally:
+        await pool.execute('DELETE FROM "user" WHERE id = $1', user_id)
+        await pool.execute("DELETE FROM ai_rate_limits WHERE user_id = $1", user_id)
+
+    for label, samples in (("idle", idle), (f"{args.inflight} /ai in flight", busy)):
+        print(
+            f"GET /projects, {label:>16}: median"
+            f" {statistics.median(samples) * 1000:6.1f} ms,"
+            f" max {max(samples) * 1000:7.1f} ms over {len(samples)} requests"
+        )
+    ok: bool = max(busy) < args.model_delay / 2
+    print("ok" if ok else "FAIL: a GET waited on a model call")
+    return ok
+
+
+async def _main(args: argparse.Namespace) -> bool:
+    try:
+        async with app.router.lifespan_context(app):
+            return await _run(args)
+    finally:
+        await close_db_pool()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--inflight", type=int, default=16)
+    parser.add_argument("--model-delay", type=float, default=2.0)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--scrubbers", type=int, default=400)
+    args = parser.parse_args()
+    if not asyncio.run(_main(args)):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Autosave coalescing: PUT latency and database writes for editors autosaving
+hot projects, with AUTOSAVE_COALESCE_SECONDS off and on.
+
+    uv run python -m benchmarks.bench_autosave --clips 2000 --editors 20 --seconds 10
+
+Creates a throwaway user and one project per editor, then has every editor
+send a full PUT every `--every` seconds for `--seconds`, first writing each
+save through and then with saves coalesced per `--interval` seconds. Needs
+DATABASE_URL pointing at a disposable database with the migrations applied.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from pathlib import Path
+from typing import Any
+
+from dotenv import load_dotenv
+
+load_dotenv(Path(__file__).resolve().parents[2] / ".env")
+
+import httpx  # noqa: E402
+
+from api.autosave import autosave  # noqa: E402
+from auth.routes import get_current_user  # noqa: E402
+from auth.schema import SessionUser  # noqa: E402
+from benchmarks.synthetic import synthetic_timeline  # noqa: E402
+from db import close_db_pool, get_db_pool  # noqa: E402
+from main import app  # noqa: E402
+
+
+async def _editor(
+    client: httpx.AsyncClient,
+    timeline: dict[str, Any],
+    every: float,
+    seconds: float,
+    timings: list[float],
+) -> str:
+    """One open editor autosaving its own project; returns the project id."""
+    created = await client.post("/projects", json={"name": "bench"})
+    project_id: str = created.json()["project"]["id"]
+    deadline = time.monotonic() + seconds
+    step = 0
+    while time.monotonic() < deadline:
+        timeline["tracks"][0]["scrubbers"][0]["left"] = 100_000 + step
+        started = time.perf_counter()
+        response = await client.put(f"/projects/{project_id}", json=timeline)
+        timings.append(time.perf_counter() - started)
+        response.raise_for_status()
+        step += 1
+        await asyncio.sleep(every)
+    return project_id
+
+
+async def _run(
+    client: httpx.AsyncClient, args: argparse.Namespace, interval: float
+) -> tuple[list[float], int, int]:
+    """PUT timings, saves acknowledged and versions written with `interval`."""
+    autosave.interval_seconds = interval
+    timings: list[float] = []
+    project_ids = await asyncio.gather(
+        *(
+            _editor(
+                client,
+                synthetic_timeline(args.clips, args.tracks),
+                args.every,
+                args.seconds,
+                timings,
+            )
+            for _ in range(args.editors)
+        )
+    )
+    await autosave.close()
+    pool = await get_db_pool()
+    written = await pool.fetchval(
+        "SELECT count(*) FROM project_versions WHERE project_id = ANY($1::uuid[])",
+        project_ids,
+    )
+    return timings, len(timings), written
+
+
+def _ms(samples: list[float], quantile: int) -> float:
+    return statistics.quantiles(samples, n=100)[quantile - 1] * 1000
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clips", type=int, default=2000)
+    parser.add_argument("--tracks", type=int, default=10)
+    parser.add_argument("--editors", type=int, default=20)
+    parser.add_argument("--every", type=float, default=0.5)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--interval", type=float, default=2)
+    args = parser.parse_args()
+
+    user_id = f"bench-{uuid.uuid4()}"
+    app.dependency_overrides[get_current_user] = lambda: SessionUser(
+        user_id=user_id, email=f"{user_id}@example.com", name="bench"
+    )
+    pool = await get_db_pool()
+    await pool.execute(
+        'INSERT INTO "user" (id, name, email) VALUES ($1, $2, $3)',
+        user_id,
+        "bench",
+        f"{user_id}@example.com",
+    )
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench"
+        ) as client:
+            print(
+                f"timeline {args.clips} clips, {args.editors} editors saving"
+                f" every {args.every}s for {args.seconds}s"
+            )
+            for name, interval in (
+                ("write-through", 0.0),
+                (f"coalesced {args.interval}s", args.interval),
+            ):
+                timings, saves, written = await _run(client, args, interval)
+                print(
+                    f"  {name:<15} PUT p50 {_ms(timings, 50):>7.2f} ms"
+                    f"  p95 {_ms(timings, 95):>7.2f} ms"
+                    f"  {saves} saves, {written} written"
+                )
+    finally:
+        await pool.execute('DELETE FROM "user" WHERE id = $1', user_id)
+        await close_db_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,236 @@
+"""
+Whether coalesced autosaves (api/autosave.py) keep what they acknowledge:
+each check saves through PUT /projects/{id} with AUTOSAVE_COALESCE_SECONDS
+on and reads back what Postgres holds.
+
+    uv run python -m benchmarks.bench_autosave_durability --saves 50
+
+- ordering: acknowledged revisions only go up, and the last save wins, both
+  after the write-behind interval and for a read that flushes first;
+- shutdown: saves still pending when the buffer is closed are written;
+- failed write: a write that fails leaves the save pending (and a read
+  fails rather than return older data) until it goes through;
+- refused body: a body jsonb cannot store (a \\u0000) is refused with 422
+  before it is acknowledged.
+
+The failed write is a real asyncpg.DataError injected into the autosave
+module's write_timeline. Prints each check and exits with status 1 if any
+failed. Creates a throwaway user; needs DATABASE_URL pointing at a
+disposable database with the migrations applied.
+"""
+
+import argparse
+import asyncio
+import sys
+import uuid
+from pathlib import Path
+from typing import Any
+
+from dotenv import load_dotenv
+
+load_dotenv(Path(__file__).resolve().parents[2] / ".env")
+
+import asyncpg  # type: ignore[import-untyped]  # noqa: E402
+import httpx  # noqa: E402
+
+from api import autosave as autosave_module  # noqa: E402
+from api.autosave import autosave  # noqa: E402
+from auth.routes import get_current_user  # noqa: E402
+from auth.schema import SessionUser  # noqa: E402
+from db import close_db_pool, get_db_pool  # noqa: E402
+from main import app  # noqa: E402
+
+
+def _timeline(marker: int) -> dict[str, Any]:
+    return {"tracks": [{"scrubbers": [{"id": "clip", "left": marker}]}]}
+
+
+async def _stored(project_id: str) -> tuple[int, int | None]:
+    """(revision, marker) as Postgres has them, bypassing the buffer."""
+    pool = await get_db_pool()
+    row = await pool.fetchrow(
+        """
+        SELECT revision,
+               (timeline_state #>> '{tracks,0,scrubbers,0,left}')::int AS marker
+          FROM projects WHERE id = $1
+        """,
+        project_id,
+    )
+    return row["revision"], row["marker"]
+
+
+class _Checks:
+    def __init__(self) -> None:
+        self.failed = 0
+
+    def expect(self, name: str, ok: bool, detail: str) -> None:
+        print(f"{'ok  ' if ok else 'FAIL'} {name}: {detail}")
+        self.failed += not ok
+
+
+async def _new_project(client: httpx.AsyncClient) -> str:
+    created = await client.post("/projects", json={"name": "durability"})
+    created.raise_for_status()
+    project_id: str = created.json()["project"]["id"]
+    return project_id
+
+
+async def _save(client: httpx.AsyncClient, project_id: str, marker: int) -> int:
+    response = await client.put(f"/projects/{project_id}", json=_timeline(marker))
+    response.raise_for_status()
+    revision: int = response.json()["revision"]
+    return revision
+
+
+async def _ordering(
+    client: httpx.AsyncClient, args: argparse.Namespace, checks: _Checks
+) -> None:
+    project_id = await _new_project(client)
+    revisions = [await _save(client, project_id, n) for n in range(args.saves)]
+    checks.expect(
+        "ordering: revisions",
+        all(a < b for a, b in zip(revisions, revisions[1:], strict=False)),
+        f"{args.saves} saves acknowledged as {revisions[0]}..{revisions[-1]}",
+    )
+    await asyncio.sleep(args.interval * 2.5)
+    revision, marker = await _stored(project_id)
+    checks.expect(
+        "ordering: written behind",
+        (revision, marker) == (revisions[-1], args.saves - 1),
+        f"stored revision {revision}, save {marker} of {args.saves - 1}",
+    )
+
+    last = await _save(client, project_id, 10**6)
+    read = await client.get(f"/projects/{project_id}")
+    scrubber = read.json()["timeline"]["tracks"][0]["scrubbers"][0]
+    checks.expect(
+        "ordering: read flushes",
+        scrubber["left"] == 10**6 and await _stored(project_id) == (last, 10**6),
+        f"read save {scrubber['left']}, stored {await _stored(project_id)}",
+    )
+
+
+async def _shutdown(
+    client: httpx.AsyncClient, args: argparse.Namespace, checks: _Checks
+) -> None:
+    project_ids = [await _new_project(client) for _ in range(args.projects)]
+    acknowledged = {}
+    for project_id in project_ids:
+        for n in range(3):
+            acknowledged[project_id] = (await _save(client, project_id, n), n)
+    pending = autosave.stats()["pending"]
+    await autosave.close()
+    stored = {project_id: await _stored(project_id) for project_id in project_ids}
+    checks.expect(
+        "shutdown: flushed",
+        stored == acknowledged and autosave.stats()["projects"] == 0,
+        f"{pending} pending at close, {sum(stored[p] == acknowledged[p] for p in project_ids)}"
+        f" of {len(project_ids)} projects stored as acknowledged",
+    )
+
+
+async def _failed_write(
+    client: httpx.AsyncClient, args: argparse.Namespace, checks: _Checks
+) -> None:
+    project_id = await _new_project(client)
+    before = await _stored(project_id)
+    real_write = autosave_module.write_timeline
+    failures = 0
+
+    async def failing_write(*call: Any, **kwargs: Any) -> Any:
+        nonlocal failures
+        failures += 1
+        raise asyncpg.DataError("injected")
+
+    autosave_module.write_timeline = failing_write
+    try:
+        revision = await _save(client, project_id, 7)
+        await asyncio.sleep(args.interval * 1.5)
+        read = await client.get(f"/projects/{project_id}")
+        pending = autosave.stats()["pending"]
+    finally:
+        autosave_module.write_timeline = real_write
+    checks.expect(
+        "failed write: kept pending",
+        failures >= 2 and pending == 1 and await _stored(project_id) == before,
+        f"{failures} failed writes, {pending} pending, read answered {read.status_code}",
+    )
+    checks.expect(
+        "failed write: read refused",
+        read.status_code >= 500,
+        f"read during the failure answered {read.status_code}",
+    )
+    read = await client.get(f"/projects/{project_id}")
+    checks.expect(
+        "failed write: written once it works",
+        read.status_code == 200 and await _stored(project_id) == (revision, 7),
+        f"stored {await _stored(project_id)}, acknowledged ({revision}, 7)",
+    )
+
+
+async def _refused_body(client: httpx.AsyncClient, checks: _Checks) -> None:
+    project_id = await _new_project(client)
+    revision = await _save(client, project_id, 1)
+    response = await client.put(
+        f"/projects/{project_id}",
+        content=b'{"tracks": [{"scrubbers": [{"id": "a\\u0000", "left": 2}]}]}',
+        headers={"Content-Type": "application/json"},
+    )
+    read = await client.get(f"/projects/{project_id}")
+    checks.expect(
+        "refused body: 422",
+        response.status_code == 422 and await _stored(project_id) == (revision, 1),
+        f"PUT answered {response.status_code}, read {read.status_code},"
+        f" stored {await _stored(project_id)}",
+    )
+
+
+async def _run(args: argparse.Namespace) -> bool:
+    user_id = f"bench-{uuid.uuid4()}"
+    app.dependency_overrides[get_current_user] = lambda: SessionUser(
+        user_id=user_id, email=f"{user_id}@example.com", name="bench"
+    )
+    pool = await get_db_pool()
+    await pool.execute(
+        'INSERT INTO "user" (id, name, email) VALUES ($1, $2, $3)',
+        user_id,
+        "bench",
+        f"{user_id}@example.com",
+    )
+    autosave.interval_seconds = args.interval
+    checks = _Checks()
+    try:
+        async with httpx.AsyncClient(
+            # Errors come back as 500s, as a client would see them.
+            transport=httpx.ASGITransport(app=app, raise_app_exceptions=False),
+            base_url="http://bench",
+        ) as client:
+            await _ordering(client, args, checks)
+            await _shutdown(client, args, checks)
+            await _failed_write(client, args, checks)
+            await _refused_body(client, checks)
+            await autosave.close()
+    finally:
+        await pool.execute('DELETE FROM "user" WHERE id = $1', user_id)
+    return checks.failed == 0
+
+
+async def _main(args: argparse.Namespace) -> bool:
+    try:
+        return await _run(args)
+    finally:
+        await close_db_pool()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--saves", type=int, default=50)
+    parser.add_argument("--projects", type=int, default=10)
+    parser.add_argument("--interval", type=float, default=0.5)
+    args = parser.parse_args()
+    if not asyncio.run(_main(args)):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
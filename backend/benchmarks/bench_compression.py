@@ -0,0 +1,93 @@
+"""
+Body compression: bytes saved against CPU spent, per encoding and level, on
+the JSON the editor actually sends: GET /projects/{id} bodies (the timeline)
+and POST /ai bodies (timeline plus media bin).
+
+    uv run python -m benchmarks.bench_compression --clips 200,2000,20000
+
+Times compression.compress()/decompress() directly, so numbers are pure
+CPU on this machine; zstd and br rows need the zstandard/brotli packages.
+No database needed.
+"""
+
+import argparse
+import statistics
+import time
+from collections.abc import Callable
+from functools import partial
+
+import orjson
+
+import compression
+from benchmarks.synthetic import synthetic_media_bin, synthetic_timeline
+
+# Levels to sweep; the middleware's own settings are marked in the output.
+_LEVELS = {
+    "gzip": ("GZIP_LEVEL", (1, 6, 9)),
+    "zstd": ("ZSTD_LEVEL", (1, 3, 9)),
+    "br": ("BROTLI_QUALITY", (1, 4, 6, 9)),
+}
+
+
+def _payloads(clips: int, tracks: int) -> dict[str, bytes]:
+    timeline = synthetic_timeline(clips, tracks)
+    return {
+        "timeline": orjson.dumps(timeline),
+        "ai request": orjson.dumps(
+            {
+                "message": "Make the opening feel more cinematic",
+                "timeline_state": timeline,
+                "mediabin_items": synthetic_media_bin(clips),
+            }
+        ),
+    }
+
+
+def _seconds(func: Callable[[], bytes], repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clips", default="200,2000,20000")
+    parser.add_argument("--tracks", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    encodings = [e for e in _LEVELS if e in compression.ENCODINGS]
+    for clips in map(int, args.clips.split(",")):
+        for name, data in _payloads(clips, args.tracks).items():
+            size = len(data)
+            print(f"{name}, {clips} clips: {size / 1024:,.0f} KiB")
+            for encoding in encodings:
+                setting, levels = _LEVELS[encoding]
+                default = getattr(compression, setting)
+                for level in levels:
+                    setattr(compression, setting, level)
+                    compressed = compression.compress(encoding, data)
+                    encode = _seconds(
+                        partial(compression.compress, encoding, data), args.repeat
+                    )
+                    decode = _seconds(
+                        partial(compression.decompress, encoding, compressed, size),
+                        args.repeat,
+                    )
+                    marker = "*" if level == default else " "
+                    print(
+                        f"  {encoding:<4} {level:>2}{marker}"
+                        f" {len(compressed) / 1024:>9,.1f} KiB"
+                        f" ({size / len(compressed):>5.1f}x)"
+                        f"  compress {encode * 1000:>8.2f} ms"
+                        f" ({size / encode / 2**20:>6.0f} MiB/s)"
+                        f"  decompress {decode * 1000:>7.2f} ms"
+                    )
+                setattr(compression, setting, default)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Reopening a large project: full GET /projects/{id} vs a revalidation with
+If-None-Match that the server answers with 304.
+
+    uv run python -m benchmarks.bench_conditional_get --clips 40000 --repeat 20
+
+Same setup as bench_delta_save (throwaway user, in-process ASGI app); needs
+DATABASE_URL pointing at a disposable database with the migrations applied.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+load_dotenv(Path(__file__).resolve().parents[2] / ".env")
+
+import httpx  # noqa: E402
+
+from auth.routes import get_current_user  # noqa: E402
+from auth.schema import SessionUser  # noqa: E402
+from benchmarks.synthetic import synthetic_timeline  # noqa: E402
+from db import close_db_pool, get_db_pool  # noqa: E402
+from main import app  # noqa: E402
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clips", type=int, default=40_000)
+    parser.add_argument("--tracks", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    user_id = f"bench-{uuid.uuid4()}"
+    app.dependency_overrides[get_current_user] = lambda: SessionUser(
+        user_id=user_id, email=f"{user_id}@example.com", name="bench"
+    )
+    pool = await get_db_pool()
+    await pool.execute(
+        'INSERT INTO "user" (id, name, email) VALUES ($1, $2, $3)',
+        user_id,
+        "bench",
+        f"{user_id}@example.com",
+    )
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench"
+        ) as client:
+            created = await client.post("/projects", json={"name": "bench"})
+            url = f"/projects/{created.json()['project']['id']}"
+            await client.put(url, json=synthetic_timeline(args.clips, args.tracks))
+
+            for name, headers in (
+                ("full", {}),
+                ("304", {"If-None-Match": (await client.get(url)).headers["ETag"]}),
+            ):
+                sizes: list[int] = []
+                samples: list[float] = []
+                for _ in range(args.repeat):
+                    started = time.perf_counter()
+                    response = await client.get(url, headers=headers)
+                    samples.append(time.perf_counter() - started)
+                    sizes.append(len(response.content))
+                print(
+                    f"{name:<5} {response.status_code}"
+                    f" {statistics.median(sizes) / 1024:>10.1f} KiB"
+                    f"  p50 {statistics.median(samples) * 1000:>8.2f} ms"
+                )
+    finally:
+        await pool.execute('DELETE FROM "user" WHERE id = $1', user_id)
+        await close_db_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
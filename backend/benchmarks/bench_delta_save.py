@@ -0,0 +1,127 @@
+"""
+Full PUT vs delta PATCH for a small edit on a large timeline.
+
+    uv run python -m benchmarks.bench_delta_save --clips 5000 --repeat 30
+
+Creates a throwaway user and project, stores a synthetic timeline, then times
+moving one clip through PUT /projects/{id} (whole timeline in the body) and
+through PATCH /projects/{id}/timeline (one `replace` op). Requests go through
+the ASGI app in-process, so the numbers are server + database time without
+the network. Needs DATABASE_URL pointing at a disposable database with the
+migrations applied.
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import uuid
+from pathlib import Path
+from typing import Any
+
+from dotenv import load_dotenv
+
+load_dotenv(Path(__file__).resolve().parents[2] / ".env")
+
+import httpx  # noqa: E402
+
+from auth.routes import get_current_user  # noqa: E402
+from auth.schema import SessionUser  # noqa: E402
+from benchmarks.synthetic import synthetic_timeline  # noqa: E402
+from db import close_db_pool, get_db_pool  # noqa: E402
+from main import app  # noqa: E402
+
+
+def _summary(name: str, sizes: list[int], samples: list[float]) -> str:
+    samples.sort()
+    return (
+        f"{name:<6} {statistics.median(sizes) / 1024:>9.1f} KiB/request"
+        f"  p50 {statistics.median(samples) * 1000:>8.2f} ms"
+        f"  p95 {samples[int(len(samples) * 0.95) - 1] * 1000:>8.2f} ms"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clips", type=int, default=5000)
+    parser.add_argument("--tracks", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+
+    user_id = f"bench-{uuid.uuid4()}"
+    app.dependency_overrides[get_current_user] = lambda: SessionUser(
+        user_id=user_id, email=f"{user_id}@example.com", name="bench"
+    )
+    pool = await get_db_pool()
+    await pool.execute(
+        'INSERT INTO "user" (id, name, email) VALUES ($1, $2, $3)',
+        user_id,
+        "bench",
+        f"{user_id}@example.com",
+    )
+    timeline = synthetic_timeline(args.clips, args.tracks)
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench"
+        ) as client:
+            created = await client.post("/projects", json={"name": "bench"})
+            project_id = created.json()["project"]["id"]
+            saved = await client.put(f"/projects/{project_id}", json=timeline)
+            revision = saved.json()["revision"]
+            print(
+                f"timeline {args.clips} clips, "
+                f"{len(json.dumps(timeline)) / 1024 / 1024:.1f} MiB"
+            )
+
+            put_sizes: list[int] = []
+            put_times: list[float] = []
+            patch_sizes: list[int] = []
+            patch_times: list[float] = []
+            for step in range(args.repeat):
+                left = 100_000 + step
+                timeline["tracks"][0]["scrubbers"][0]["left"] = left
+                body = json.dumps(timeline).encode()
+                started = time.perf_counter()
+                response = await client.put(
+                    f"/projects/{project_id}",
+                    content=body,
+                    headers={"content-type": "application/json"},
+                )
+                put_times.append(time.perf_counter() - started)
+                put_sizes.append(len(body))
+                response.raise_for_status()
+                revision = response.json()["revision"]
+
+                body = json.dumps(
+                    {
+                        "base_revision": revision,
+                        "patch": [
+                            {
+                                "op": "replace",
+                                "path": "/tracks/0/scrubbers/0/left",
+                                "value": left + 1,
+                            }
+                        ],
+                    }
+                ).encode()
+                started = time.perf_counter()
+                response = await client.patch(
+                    f"/projects/{project_id}/timeline",
+                    content=body,
+                    headers={"content-type": "application/json"},
+                )
+                patch_times.append(time.perf_counter() - started)
+                patch_sizes.append(len(body))
+                response.raise_for_status()
+
+            print(_summary("PUT", put_sizes, put_times))
+            print(_summary("PATCH", patch_sizes, patch_times))
+    finally:
+        await pool.execute('DELETE FROM "user" WHERE id = $1', user_id)
+        await close_db_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
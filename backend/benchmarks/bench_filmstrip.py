@@ -0,0 +1,99 @@
+"""
+Filmstrips (media/filmstrip.py): the one-off build per video, then what a
+timeline view costs against seeking for each thumbnail.
+
+    FFMPEG_PATH=ffmpeg uv run python -m benchmarks.bench_filmstrip ~/Videos/*.mp4
+
+For each file: build time, sheet count and bytes per level; then, for a
+--pixels wide view at several zoom levels, the median time of
+Filmstrip.tiles (as in GET /assets/{id}/filmstrip), how many tiles and
+sheets a view needs and the bytes of those sheets. The "seek" line is the
+per-tile approach: one ffmpeg seek and decode per thumbnail, here for the
+tiles of a single view. No database needed.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+from media.filmstrip import Filmstrip, build_filmstrip
+from media.probe import probe_file
+
+# Seconds of video across the view.
+_SPANS = (10.0, 60.0, 600.0, 3600.0)
+# Thumbnails decoded for the "seek" line.
+_SEEKS = 20
+
+
+def _seek_seconds(ffmpeg: str, path: str, times: list[float]) -> float:
+    """Decode one scaled frame per time, one process each."""
+    started = time.perf_counter()
+    for at in times:
+        subprocess.run(
+            [ffmpeg, "-nostdin", "-v", "error", "-ss", str(at), "-i", path,
+             "-frames:v", "1", "-vf", "scale=-2:72", "-f", "mjpeg", "-"],
+            capture_output=True,
+            check=True,
+        )  # fmt: skip
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("files", nargs="+", type=Path)
+    parser.add_argument("--pixels", type=int, default=1600)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    ffmpeg = os.getenv("FFMPEG_PATH", "ffmpeg")
+
+    for source in args.files:
+        duration = probe_file(str(source)).duration_seconds
+        with tempfile.TemporaryDirectory() as dest:
+            started = time.perf_counter()
+            layout = build_filmstrip(ffmpeg, str(source), dest, duration)
+            built = time.perf_counter() - started
+            print(
+                f"{source.name}: {duration or 0:,.0f} s of video, built in"
+                f" {built:.2f} s, tiles {layout['tile_width']}x{layout['tile_height']}"
+            )
+            sizes: dict[tuple[int, int], int] = {}
+            for level, info in enumerate(layout["levels"]):
+                for sheet in range(info["sheets"]):
+                    sizes[level, sheet] = (
+                        Path(dest, f"{level}_{sheet}.jpg").stat().st_size
+                    )
+                total = sum(size for (at, _), size in sizes.items() if at == level)
+                print(
+                    f"  level {level} ({info['interval']:g} s): {info['frames']:,}"
+                    f" frames on {info['sheets']} sheets, {total / 1024:,.0f} KiB"
+                )
+
+        filmstrip = Filmstrip(**layout)
+        end = duration or 0
+        for span in _SPANS:
+            if span > end * 2:
+                continue
+            samples = []
+            for n in range(args.repeat):
+                start = max(end - span, 0) * n / max(args.repeat - 1, 1)
+                started = time.perf_counter()
+                level, tiles = filmstrip.tiles(start, start + span, args.pixels)
+                samples.append(time.perf_counter() - started)
+            sheets = {tile.sheet for tile in tiles}
+            print(
+                f"  {span:>6,.0f} s view: {statistics.median(samples) * 1e6:>5,.0f} µs,"
+                f" {len(tiles)} tiles on {len(sheets)} sheet(s),"
+                f" {sum(sizes[level, s] for s in sheets) / 1024:,.0f} KiB"
+            )
+        seek = _seek_seconds(
+            ffmpeg, str(source), [end * n / _SEEKS for n in range(_SEEKS)]
+        )
+        print(f"  seek per tile: {seek / _SEEKS * 1000:,.0f} ms a thumbnail")
+
+
+if __name__ == "__main__":
+    main()
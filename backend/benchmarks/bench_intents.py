@@ -0,0 +1,170 @@
+"""
+Precision and speed of the local intent fast path (ai/intents.py).
+
+    uv run python -m benchmarks.bench_intents
+
+Runs a labelled corpus of chat messages against a fixed timeline. Each case
+expects either a specific tool call or a fall-through to the model (None).
+Reports precision (matched calls that are exactly right), how many model calls
+the fast path avoids, and the mean parse time. Exits non-zero on any wrong
+match, so it doubles as a regression check.
+"""
+
+import sys
+import time
+from typing import Any
+
+from ai.intents import match_intent
+
+_TIMELINE: dict[str, Any] = {
+    "tracks": [
+        {
+            "id": "track-1",
+            "scrubbers": [
+                {"id": "v-intro", "name": "Intro.mp4", "mediaType": "video"},
+                {"id": "v-broll", "name": "b-roll city.mp4", "mediaType": "video"},
+                {"id": "v-broll2", "name": "b-roll beach.mp4", "mediaType": "video"},
+            ],
+        },
+        {
+            "id": "track-2",
+            "scrubbers": [
+                {
+                    "id": "a-music",
+                    "name": "background music.mp3",
+                    "mediaType": "audio",
+                    "volume": 0.8,
+                },
+                {"id": "a-vo", "name": "voiceover.wav", "mediaType": "audio"},
+            ],
+        },
+        {
+            "id": "track-3",
+            "scrubbers": [
+                {"id": "t-title", "name": "Title", "mediaType": "text"},
+                {"id": "i-logo", "name": "logo.png", "mediaType": "image"},
+            ],
+        },
+    ]
+}
+
+
+def _call(function_name: str, **args: Any) -> dict[str, Any]:
+    return {"function_name": function_name, **args}
+
+
+def _volume(scrubber_id: str, volume: float, muted: bool) -> dict[str, Any]:
+    return _call(
+        "LLMSetVolume",
+        scrubber_id=scrubber_id,
+        scrubber_name=None,
+        volume=volume,
+        muted=muted,
+    )
+
+
+def _speed(scrubber_id: str, rate: float) -> dict[str, Any]:
+    return _call(
+        "LLMSetPlaybackSpeed",
+        scrubber_id=scrubber_id,
+        scrubber_name=None,
+        playback_rate=rate,
+    )
+
+
+# (message, mentioned ids, expected function_call or None for "ask the model")
+CORPUS: list[tuple[str, list[str], dict[str, Any] | None]] = [
+    ("create 2 tracks", [], _call("LLMCreateTrack", count=2)),
+    ("Add a new track", [], _call("LLMCreateTrack", count=1)),
+    ("add track", [], _call("LLMCreateTrack", count=1)),
+    ("please create three new tracks.", [], _call("LLMCreateTrack", count=3)),
+    ("can you add 4 empty tracks", [], _call("LLMCreateTrack", count=4)),
+    ("make one more track", [], _call("LLMCreateTrack", count=1)),
+    ("add tracks", [], None),
+    ("add 500 tracks", [], None),
+    (
+        "delete everything on track 3",
+        [],
+        _call("LLMDeleteScrubbersInTrack", track_number=3),
+    ),
+    (
+        "remove all clips from track 2",
+        [],
+        _call("LLMDeleteScrubbersInTrack", track_number=2),
+    ),
+    ("Clear track 1", [], _call("LLMDeleteScrubbersInTrack", track_number=1)),
+    (
+        "delete all of the clips in track two",
+        [],
+        _call("LLMDeleteScrubbersInTrack", track_number=2),
+    ),
+    ("clear track 9", [], None),
+    ("delete track 2", [], None),
+    ("mute intro", [], _volume("v-intro", 1.0, True)),
+    ("Mute the background music", [], _volume("a-music", 0.8, True)),
+    ("unmute voiceover", [], _volume("a-vo", 1.0, False)),
+    ("mute it", ["a-vo"], _volume("a-vo", 1.0, True)),
+    ("mute it", [], None),
+    ("mute b-roll", [], None),
+    ("mute the title", [], None),
+    ("mute everything", [], None),
+    ("set volume of voiceover to 50%", [], _volume("a-vo", 0.5, False)),
+    ("set the volume of background music to 0.3", [], _volume("a-music", 0.3, False)),
+    ("turn intro's volume to 20", [], _volume("v-intro", 0.2, False)),
+    ("set volume of voiceover to 250%", [], None),
+    ("set speed of clip b-roll city to 2x", [], _speed("v-broll", 2.0)),
+    ("change the playback speed of intro to 0.5", [], _speed("v-intro", 0.5)),
+    ("set intro speed to 1.5x", [], _speed("v-intro", 1.5)),
+    ("play voiceover at 4x", [], _speed("a-vo", 4.0)),
+    ("make it 2x", ["v-broll2"], _speed("v-broll2", 2.0)),
+    ("set speed of intro to 3x", [], None),
+    ("set speed of b-roll to 2x", [], None),
+    ("move intro to 5 seconds", [], None),
+    ("make the title bold", [], None),
+    ("split the intro at 3s", [], None),
+    ("hi!", [], None),
+    ("what can you do?", [], None),
+    ("add the beach clip to track 2 at 10s", [], None),
+]
+
+
+def main() -> int:
+    matched = correct = wrong = missed = 0
+    for message, mentioned, expected in CORPUS:
+        result = match_intent(message, _TIMELINE, mentioned)
+        actual = (
+            result.function_call.model_dump()
+            if result is not None and result.function_call is not None
+            else None
+        )
+        if actual is not None:
+            matched += 1
+            if actual == expected:
+                correct += 1
+            else:
+                wrong += 1
+                print(f"WRONG  {message!r}: got {actual}, expected {expected}")
+        elif expected is not None:
+            missed += 1
+            print(f"MISSED {message!r}: expected {expected}")
+
+    iterations = 2000
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for message, mentioned, _expected in CORPUS:
+            match_intent(message, _TIMELINE, mentioned)
+    per_parse_us = (time.perf_counter() - started) / (iterations * len(CORPUS)) * 1e6
+
+    answerable = sum(1 for *_, expected in CORPUS if expected is not None)
+    print(f"cases               {len(CORPUS)}")
+    print(f"precision           {correct}/{matched} = {correct / max(matched, 1):.1%}")
+    print(
+        f"recall              {correct}/{answerable} = {correct / max(answerable, 1):.1%}"
+    )
+    print(f"model calls avoided {correct}/{len(CORPUS)} = {correct / len(CORPUS):.1%}")
+    print(f"mean parse time     {per_parse_us:.1f} µs")
+    return 1 if wrong else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
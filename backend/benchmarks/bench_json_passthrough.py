@@ -0,0 +1,145 @@
+"""
+Timeline save / load: the old decode-validate-encode pipeline vs the JSONB
+passthrough in api/routes.py.
+
+    uv run python -m benchmarks.bench_json_passthrough --sizes-mb 1 10
+
+"legacy" replays what save_project / get_project used to do per request
+(json.loads → TimelinePayload → model_dump → json.dumps → text JSONB on save;
+text JSONB → json.loads → ProjectStateResponse → json.dumps on load) on a
+connection without the orjson codecs. "passthrough" sends the request bytes
+as binary JSONB checked by assert_timeline_shape, and splices the stored
+JSONB text into the response. Needs DATABASE_URL pointing at a disposable
+database with the migrations applied.
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import uuid
+from collections.abc import Awaitable, Callable
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+
+from dotenv import load_dotenv
+
+load_dotenv(Path(__file__).resolve().parents[2] / ".env")
+
+import asyncpg  # type: ignore[import-untyped]  # noqa: E402
+import orjson  # noqa: E402
+
+from api.schema import ProjectMeta, ProjectStateResponse, TimelinePayload  # noqa: E402
+from benchmarks.synthetic import synthetic_timeline  # noqa: E402
+from db import DATABASE_URL, connect_standalone  # noqa: E402
+
+_SAVE = """
+    UPDATE projects SET timeline_state = {value}, updated_at = now()
+    WHERE id = $2
+"""
+
+
+def _meta(project_id: str, user_id: str) -> dict[str, Any]:
+    return ProjectMeta(
+        id=project_id,
+        user_id=user_id,
+        name="bench",
+        created_at=datetime.now(UTC),
+        updated_at=datetime.now(UTC),
+    ).model_dump(mode="json")
+
+
+async def _p50_ms(fn: Callable[[], Awaitable[object]], repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes-mb", type=float, nargs="+", default=[1.0, 10.0])
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    legacy_conn = await asyncpg.connect(DATABASE_URL)  # jsonb as str, json module
+    conn = await connect_standalone()  # orjson codecs, as in the app's pool
+    user_id = f"bench-{uuid.uuid4()}"
+    await conn.execute(
+        'INSERT INTO "user" (id, name, email) VALUES ($1, $2, $3)',
+        user_id,
+        "bench",
+        f"{user_id}@example.com",
+    )
+    project_id = str(
+        await conn.fetchval(
+            "INSERT INTO projects (user_id, name) VALUES ($1, 'bench') RETURNING id",
+            user_id,
+        )
+    )
+    meta = _meta(project_id, user_id)
+    bytes_per_clip = len(orjson.dumps(synthetic_timeline(1000, 10))) / 1000
+
+    try:
+        for size_mb in args.sizes_mb:
+            clips = int(size_mb * 1024 * 1024 / bytes_per_clip)
+            body = orjson.dumps(synthetic_timeline(clips, 10))
+
+            async def legacy_save(body: bytes = body) -> None:
+                timeline = TimelinePayload.model_validate(json.loads(body))
+                await legacy_conn.execute(
+                    _SAVE.format(value="$1::jsonb"),
+                    json.dumps(timeline.model_dump(mode="json")),
+                    project_id,
+                )
+
+            async def passthrough_save(body: bytes = body) -> None:
+                await conn.execute(
+                    _SAVE.format(value="assert_timeline_shape($1::jsonb)"),
+                    body,
+                    project_id,
+                )
+
+            async def legacy_load() -> bytes:
+                raw = await legacy_conn.fetchval(
+                    "SELECT timeline_state FROM projects WHERE id = $1", project_id
+                )
+                response = ProjectStateResponse.model_validate(
+                    {"project": meta, "timeline": json.loads(raw), "textBinItems": []}
+                )
+                return json.dumps(response.model_dump(mode="json")).encode()
+
+            async def passthrough_load() -> bytes:
+                raw = await conn.fetchval(
+                    "SELECT timeline_state::text FROM projects WHERE id = $1",
+                    project_id,
+                )
+                return orjson.dumps(
+                    {
+                        "project": meta,
+                        "timeline": orjson.Fragment(raw),
+                        "textBinItems": [],
+                        "revision": 0,
+                    }
+                )
+
+            print(f"timeline {len(body) / 1024 / 1024:.1f} MiB ({clips} clips)")
+            for name, fn in (
+                ("save  legacy", legacy_save),
+                ("save  passthrough", passthrough_save),
+                ("load  legacy", legacy_load),
+                ("load  passthrough", passthrough_load),
+            ):
+                print(f"  {name:<18} p50 {await _p50_ms(fn, args.repeat):>8.2f} ms")
+    finally:
+        await conn.execute('DELETE FROM "user" WHERE id = $1', user_id)
+        await legacy_conn.close()
+        await conn.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
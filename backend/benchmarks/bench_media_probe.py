@@ -0,0 +1,103 @@
+"""
+Media probing (media/probe.py, media/worker.py): probes per second for the
+given files, and how long the event loop stalls meanwhile, probing inline on
+the loop against the worker's process pool.
+
+    uv run python -m benchmarks.bench_media_probe ~/Videos/*.mp4 --probes 2000
+
+Each file is probed --probes / len(files) times, --batch at a time as the
+worker claims them (MEDIA_PROBE_BATCH). Loop lag is the worst delay
+of a 1 ms timer running alongside, i.e. how long a request could wait
+behind the probes; inline probing holds the loop for whole probes, the pool
+only for handing them off. Long recordings (large moov boxes) are where the
+difference shows. No database needed.
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import time
+from collections.abc import Awaitable, Callable
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any
+
+from media.probe import ProbeError, probe_file
+
+
+async def _max_lag(stop: asyncio.Event) -> float:
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.001)
+        worst = max(worst, time.perf_counter() - started - 0.001)
+    return worst
+
+
+async def _measure(
+    name: str, probe: Callable[[str], Awaitable[Any]], paths: list[str], batch: int
+) -> None:
+    stop = asyncio.Event()
+    lag = asyncio.create_task(_max_lag(stop))
+    await asyncio.sleep(0.01)
+    started = time.perf_counter()
+    for start in range(0, len(paths), batch):
+        await asyncio.gather(*map(probe, paths[start : start + batch]))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    print(
+        f"{name:<22} {len(paths) / elapsed:>9,.0f} probes/s"
+        f"  max loop lag {await lag * 1000:>8.1f} ms"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("files", nargs="+", type=Path)
+    parser.add_argument("--probes", type=int, default=1000)
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    files = []
+    for path in args.files:
+        try:
+            probe_file(str(path))
+        except (OSError, ProbeError) as exc:
+            print(f"skipping {path}: {exc}")
+        else:
+            files.append(str(path))
+    paths = files * max(args.probes // len(files), 1)
+    total = sum(os.path.getsize(path) for path in files)
+    print(f"{len(files)} files, {total / 2**20:,.1f} MiB, {len(paths)} probes")
+
+    async def inline(path: str) -> Any:
+        return probe_file(path)
+
+    await _measure("inline on the loop", inline, paths, args.batch)
+
+    loop = asyncio.get_running_loop()
+    # As media/worker.py sets it up.
+    executor = ProcessPoolExecutor(
+        max_workers=args.workers, mp_context=multiprocessing.get_context("spawn")
+    )
+    try:
+        # Start the processes first: spawning is a one-off cost at startup.
+        await asyncio.gather(
+            *(
+                loop.run_in_executor(executor, probe_file, files[0])
+                for _ in range(args.workers)
+            )
+        )
+
+        async def pooled(path: str) -> Any:
+            return await loop.run_in_executor(executor, probe_file, path)
+
+        await _measure(f"pool of {args.workers} processes", pooled, paths, args.batch)
+    finally:
+        executor.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,147 @@
+"""
+Cost of the metrics middleware on cheap requests: a 304 revalidation of
+GET /projects/{id} and a POST /ai answered by the fake model, with
+MetricsMiddleware off, on, and on with the Server-Timing header; then how
+long rendering GET /metrics takes.
+
+    uv run python -m benchmarks.bench_metrics --repeat 500 --rounds 5
+
+Statement and pool-acquire timing (db.py) stays on in every run. Same setup
+as bench_delta_save (throwaway user, in-process ASGI app, AI_MODEL_BACKEND=fake
+recommended); needs DATABASE_URL pointing at a disposable database with the
+migrations applied.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from pathlib import Path
+from typing import cast
+
+from dotenv import load_dotenv
+
+load_dotenv(Path(__file__).resolve().parents[2] / ".env")
+
+import httpx  # noqa: E402
+from starlette.middleware import Middleware  # noqa: E402
+
+import metrics  # noqa: E402
+from ai import routes as ai_routes  # noqa: E402
+from ai.rate_limit import MemoryRateLimiter  # noqa: E402
+from auth.routes import get_current_user  # noqa: E402
+from auth.schema import SessionUser  # noqa: E402
+from benchmarks.synthetic import synthetic_timeline  # noqa: E402
+from db import close_db_pool, get_db_pool  # noqa: E402
+from main import app  # noqa: E402
+
+
+def _set_middleware(enabled: bool, server_timing: bool) -> None:
+    """Add or drop MetricsMiddleware; Starlette rebuilds the stack on next call."""
+    app.user_middleware = [
+        m
+        for m in app.user_middleware
+        if cast("object", m.cls) is not metrics.MetricsMiddleware
+    ]
+    if enabled:
+        app.user_middleware.insert(0, Middleware(metrics.MetricsMiddleware))
+    app.middleware_stack = None
+    metrics.SERVER_TIMING_ENABLED = server_timing
+
+
+async def _time(
+    client: httpx.AsyncClient,
+    samples: list[float],
+    method: str,
+    url: str,
+    repeat: int,
+    **kwargs: object,
+) -> None:
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = await client.request(method, url, **kwargs)  # type: ignore[arg-type]
+        samples.append(time.perf_counter() - started)
+        if response.is_error:
+            response.raise_for_status()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clips", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    # Thousands of /ai calls from one user; keep the per-user limit out of it.
+    ai_routes.rate_limiter = MemoryRateLimiter(10**9, 60)
+    user_id = f"bench-{uuid.uuid4()}"
+    app.dependency_overrides[get_current_user] = lambda: SessionUser(
+        user_id=user_id, email=f"{user_id}@example.com", name="bench"
+    )
+    pool = await get_db_pool()
+    await pool.execute(
+        'INSERT INTO "user" (id, name, email) VALUES ($1, $2, $3)',
+        user_id,
+        "bench",
+        f"{user_id}@example.com",
+    )
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench"
+        ) as client:
+            created = await client.post("/projects", json={"name": "bench"})
+            url = f"/projects/{created.json()['project']['id']}"
+            await client.put(url, json=synthetic_timeline(args.clips, 4))
+            etag = (await client.get(url)).headers["ETag"]
+
+            configs = {
+                "no middleware": (False, False),
+                "middleware": (True, False),
+                "+ Server-Timing": (True, True),
+            }
+            # Interleaved rounds, so warm-up and drift hit every config alike.
+            samples: dict[str, tuple[list[float], list[float]]] = {
+                name: ([], []) for name in configs
+            }
+            for _ in range(args.rounds):
+                for name, (enabled, server_timing) in configs.items():
+                    _set_middleware(enabled, server_timing)
+                    revalidate, ai = samples[name]
+                    await _time(
+                        client,
+                        revalidate,
+                        "GET",
+                        url,
+                        args.repeat,
+                        headers={"If-None-Match": etag},
+                    )
+                    await _time(
+                        client,
+                        ai,
+                        "POST",
+                        "/ai",
+                        args.repeat,
+                        json={"message": "hello"},
+                    )
+            for name, (revalidate, ai) in samples.items():
+                print(
+                    f"  {name:<16}"
+                    f" GET 304 p50 {statistics.median(revalidate) * 1e6:>7.1f} µs"
+                    f"   POST /ai p50 {statistics.median(ai) * 1e6:>7.1f} µs"
+                )
+
+            started = time.perf_counter()
+            text = metrics.render()
+            print(
+                f"  render /metrics {(time.perf_counter() - started) * 1000:.2f} ms,"
+                f" {len(text) / 1024:.1f} KiB"
+            )
+    finally:
+        await pool.execute('DELETE FROM "user" WHERE id = $1', user_id)
+        await close_db_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
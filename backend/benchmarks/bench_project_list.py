@@ -0,0 +1,124 @@
+"""
+GET /projects for a user with many projects: OFFSET pages vs keyset cursor
+pages, with and without the total.
+
+    uv run python -m benchmarks.bench_project_list --projects 20000 --repeat 30
+
+Creates a throwaway user with `--projects` rows and times a page of `--limit`
+at several depths through the ASGI app in-process. Needs DATABASE_URL
+pointing at a disposable database with the migrations applied.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from pathlib import Path
+from typing import Any
+
+from dotenv import load_dotenv
+
+load_dotenv(Path(__file__).resolve().parents[2] / ".env")
+
+import httpx  # noqa: E402
+
+from auth.routes import get_current_user  # noqa: E402
+from auth.schema import SessionUser  # noqa: E402
+from db import close_db_pool, get_db_pool  # noqa: E402
+from main import app  # noqa: E402
+
+
+async def _p50_ms(
+    client: httpx.AsyncClient, params: dict[str, Any], repeat: int
+) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = await client.get("/projects", params=params)
+        samples.append(time.perf_counter() - started)
+        response.raise_for_status()
+    return statistics.median(samples) * 1000
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--projects", type=int, default=20_000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+
+    user_id = f"bench-{uuid.uuid4()}"
+    app.dependency_overrides[get_current_user] = lambda: SessionUser(
+        user_id=user_id, email=f"{user_id}@example.com", name="bench"
+    )
+    pool = await get_db_pool()
+    await pool.execute(
+        'INSERT INTO "user" (id, name, email) VALUES ($1, $2, $3)',
+        user_id,
+        "bench",
+        f"{user_id}@example.com",
+    )
+    await pool.execute(
+        """
+        INSERT INTO projects (user_id, name, created_at)
+        SELECT $1, 'project ' || n, now() - n * interval '1 second'
+          FROM generate_series(1, $2) AS n
+        """,
+        user_id,
+        args.projects,
+    )
+    await pool.execute("ANALYZE projects")
+
+    depths = sorted(
+        {0, args.projects // 100, args.projects // 10, args.projects // 2}
+        | {args.projects - args.limit}
+    )
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench"
+        ) as client:
+            # Cursors at each depth, collected by walking the list once.
+            cursors: dict[int, str | None] = {0: None}
+            cursor: str | None = None
+            for depth in range(args.limit, max(depths) + 1, args.limit):
+                params: dict[str, Any] = {"limit": args.limit, "include_total": False}
+                if cursor:
+                    params["cursor"] = cursor
+                cursor = (await client.get("/projects", params=params)).json()[
+                    "next_cursor"
+                ]
+                if depth in depths:
+                    cursors[depth] = cursor
+
+            print(f"{args.projects} projects, {args.limit} per page (p50, ms)")
+            print(
+                f"{'depth':>7} {'offset':>9} {'offset-nt':>10} {'cursor':>9} "
+                f"{'cursor-nt':>10}"
+            )
+            for depth in depths:
+                offset = {"limit": args.limit, "offset": depth}
+                keyset: dict[str, Any] = {"limit": args.limit}
+                if cursors.get(depth):
+                    keyset["cursor"] = cursors[depth]
+                plain, plain_nt, keyed, keyed_nt = [
+                    await _p50_ms(client, params, args.repeat)
+                    for params in (
+                        offset,
+                        {**offset, "include_total": False},
+                        keyset,
+                        {**keyset, "include_total": False},
+                    )
+                ]
+                print(
+                    f"{depth:>7} {plain:>9.2f} {plain_nt:>10.2f}"
+                    f" {keyed:>9.2f} {keyed_nt:>10.2f}"
+                )
+    finally:
+        await pool.execute('DELETE FROM "user" WHERE id = $1', user_id)
+        await close_db_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,205 @@
+"""
+Version history cost: what recording a version adds to a save, how much the
+history stores compared with a full copy per save, and how long rebuilding
+and restoring a version take.
+
+    uv run python -m benchmarks.bench_project_versions --clips 5000 --saves 200
+
+Creates a throwaway user and project with a synthetic timeline, then makes
+`--saves` small edits (move, add or remove a clip): most through PATCH
+/projects/{id}/timeline, every fifth through a full PUT. The same edits are
+first made on a second project with record_project_version swapped for a
+no-op, as the baseline. Needs DATABASE_URL pointing at a disposable database
+with the migrations applied; the real function is put back on exit.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from pathlib import Path
+from typing import Any
+
+from dotenv import load_dotenv
+
+load_dotenv(Path(__file__).resolve().parents[2] / ".env")
+
+import httpx  # noqa: E402
+
+from api.project_versions import apply_json_patch  # noqa: E402
+from auth.routes import get_current_user  # noqa: E402
+from auth.schema import SessionUser  # noqa: E402
+from benchmarks.synthetic import synthetic_timeline  # noqa: E402
+from db import close_db_pool, get_db_pool  # noqa: E402
+from main import app  # noqa: E402
+
+_SIGNATURE = "record_project_version(UUID, BIGINT, JSONB, JSONB, JSONB)"
+_DISABLE_HISTORY = f"""
+    ALTER FUNCTION {_SIGNATURE} RENAME TO record_project_version_bench;
+    CREATE FUNCTION record_project_version(
+      pid UUID, rev BIGINT, prev JSONB, next JSONB, delta JSONB DEFAULT NULL
+    ) RETURNS VOID AS $$ $$ LANGUAGE sql;
+"""
+_ENABLE_HISTORY = f"""
+    DROP FUNCTION {_SIGNATURE};
+    ALTER FUNCTION record_project_version_bench(UUID, BIGINT, JSONB, JSONB, JSONB)
+      RENAME TO record_project_version;
+"""
+
+
+def _edit(step: int, tracks: int) -> list[dict[str, Any]]:
+    """A small edit of the kind the editor sends: move, add or remove a clip."""
+    track = step % tracks
+    if step % 3 == 0:
+        return [
+            {
+                "op": "replace",
+                "path": f"/tracks/{track}/scrubbers/0/left",
+                "value": 100_000 + step,
+            }
+        ]
+    if step % 3 == 1:
+        clip = synthetic_timeline(1, 1)["tracks"][0]["scrubbers"][0]
+        clip["id"] = str(uuid.UUID(int=1_000_000 + step))
+        return [{"op": "add", "path": f"/tracks/{track}/scrubbers/3", "value": clip}]
+    return [{"op": "remove", "path": f"/tracks/{track}/scrubbers/3"}]
+
+
+async def _save_all(
+    client: httpx.AsyncClient, timeline: dict[str, Any], saves: int, tracks: int
+) -> tuple[str, dict[str, list[float]]]:
+    """Create a project and make every edit; returns its id and save times."""
+    created = await client.post("/projects", json={"name": "bench"})
+    project_id = created.json()["project"]["id"]
+    response = await client.put(f"/projects/{project_id}", json=timeline)
+    revision = response.json()["revision"]
+    timings: dict[str, list[float]] = {"PUT": [], "PATCH": []}
+    for step in range(saves):
+        patch = _edit(step, tracks)
+        timeline = apply_json_patch(timeline, patch)
+        method = "PUT" if step % 5 == 4 else "PATCH"
+        started = time.perf_counter()
+        if method == "PUT":
+            response = await client.put(f"/projects/{project_id}", json=timeline)
+        else:
+            response = await client.patch(
+                f"/projects/{project_id}/timeline",
+                json={"base_revision": revision, "patch": patch},
+            )
+        timings[method].append(time.perf_counter() - started)
+        response.raise_for_status()
+        revision = response.json()["revision"]
+    return project_id, timings
+
+
+async def _p50_ms(
+    client: httpx.AsyncClient, method: str, url: str, repeat: int
+) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = await client.request(method, url)
+        samples.append(time.perf_counter() - started)
+        response.raise_for_status()
+    return statistics.median(samples) * 1000
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clips", type=int, default=5000)
+    parser.add_argument("--tracks", type=int, default=10)
+    parser.add_argument("--saves", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    user_id = f"bench-{uuid.uuid4()}"
+    app.dependency_overrides[get_current_user] = lambda: SessionUser(
+        user_id=user_id, email=f"{user_id}@example.com", name="bench"
+    )
+    pool = await get_db_pool()
+    await pool.execute(
+        'INSERT INTO "user" (id, name, email) VALUES ($1, $2, $3)',
+        user_id,
+        "bench",
+        f"{user_id}@example.com",
+    )
+    transport = httpx.ASGITransport(app=app)
+    history_disabled = False
+    try:
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench"
+        ) as client:
+            await pool.execute(_DISABLE_HISTORY)
+            history_disabled = True
+            _, baseline = await _save_all(
+                client,
+                synthetic_timeline(args.clips, args.tracks),
+                args.saves,
+                args.tracks,
+            )
+            await pool.execute(_ENABLE_HISTORY)
+            history_disabled = False
+            project_id, recorded = await _save_all(
+                client,
+                synthetic_timeline(args.clips, args.tracks),
+                args.saves,
+                args.tracks,
+            )
+
+            stats = await pool.fetchrow(
+                """
+                SELECT count(*) AS versions,
+                       count(*) FILTER (WHERE v.kind = 'snapshot') AS snapshots,
+                       sum(pg_column_size(v.data)) AS stored,
+                       max(pg_column_size(p.timeline_state)) AS timeline,
+                       max(v.revision) FILTER (WHERE v.kind = 'snapshot')
+                         AS last_snapshot
+                FROM project_versions v JOIN projects p ON p.id = v.project_id
+                WHERE v.project_id = $1
+                """,
+                project_id,
+            )
+
+            print(f"timeline {args.clips} clips, {args.saves} saves")
+            for method in ("PATCH", "PUT"):
+                print(
+                    f"  {method:<5} p50 {statistics.median(baseline[method]) * 1000:>7.2f}"
+                    f" ms without history,"
+                    f" {statistics.median(recorded[method]) * 1000:>7.2f} ms with"
+                )
+            print(
+                f"  history: {stats['versions']} versions,"
+                f" {stats['snapshots']} snapshots,"
+                f" {stats['stored'] / 1024:.1f} KiB stored vs"
+                f" {stats['versions'] * stats['timeline'] / 1024:.1f} KiB"
+                " as full copies"
+            )
+            # The revision just before the last snapshot has the most deltas.
+            snapshot = stats["last_snapshot"]
+            versions = f"/projects/{project_id}/versions"
+            for name, method, url in (
+                ("list", "GET", versions),
+                (f"get rev {snapshot} (snapshot)", "GET", f"{versions}/{snapshot}"),
+                (
+                    f"get rev {snapshot - 1} (most deltas)",
+                    "GET",
+                    f"{versions}/{snapshot - 1}",
+                ),
+                (
+                    f"restore rev {snapshot - 1}",
+                    "POST",
+                    f"{versions}/{snapshot - 1}/restore",
+                ),
+            ):
+                p50 = await _p50_ms(client, method, url, args.repeat)
+                print(f"  {name:<28} p50 {p50:>7.2f} ms")
+    finally:
+        if history_disabled:
+            await pool.execute(_ENABLE_HISTORY)
+        await pool.execute('DELETE FROM "user" WHERE id = $1', user_id)
+        await close_db_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
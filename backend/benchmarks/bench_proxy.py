@@ -0,0 +1,77 @@
+"""
+Proxies (media/proxy.py): the one-off transcode per video, then what seeking
+costs in the proxy against the original.
+
+    FFMPEG_PATH=ffmpeg uv run python -m benchmarks.bench_proxy ~/Videos/*.mp4
+
+For each file: transcode time (and speed against real time), proxy size
+against the original, and the median time to decode the frame at --seeks
+points spread over the video, from the original and from the proxy. A seek
+decodes from the keyframe before the point, as the browser player does when
+scrubbing, so it is where a long-GOP 4K original hurts most. No database
+needed.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+from media.probe import probe_file
+from media.proxy import build_proxy
+
+
+def _seek_seconds(ffmpeg: str, path: str, at: float) -> float:
+    """Decode the frame at `at` seconds, scaled as the player would show it."""
+    started = time.perf_counter()
+    subprocess.run(
+        [ffmpeg, "-nostdin", "-v", "error", "-ss", f"{at:.3f}", "-i", path,
+         "-frames:v", "1", "-vf", "scale=-2:540", "-f", "null", "-"],
+        capture_output=True,
+        check=True,
+    )  # fmt: skip
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("files", nargs="+", type=Path)
+    parser.add_argument("--seeks", type=int, default=20)
+    args = parser.parse_args()
+    ffmpeg = os.getenv("FFMPEG_PATH", "ffmpeg")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for source in args.files:
+            original = probe_file(str(source))
+            duration = original.duration_seconds or 0
+            dest = Path(directory) / f"{source.stem}.mp4"
+            updates: list[float] = []
+            started = time.perf_counter()
+            proxy = asyncio.run(
+                build_proxy(ffmpeg, str(source), str(dest), duration, updates.append)
+            )
+            built = time.perf_counter() - started
+            size, proxy_size = source.stat().st_size, dest.stat().st_size
+            print(
+                f"{source.name}: {original.width}x{original.height}, {duration:,.0f} s;"
+                f" proxy {proxy.width}x{proxy.height} in {built:.1f} s"
+                f" ({duration / built:.1f}x real time, {len(updates)} progress"
+                f" updates), {proxy_size / 2**20:,.1f} MiB against"
+                f" {size / 2**20:,.1f} MiB ({size / proxy_size:.0f}x smaller)"
+            )
+            # Points between keyframes, not on them.
+            points = [duration * (n + 0.37) / args.seeks for n in range(args.seeks)]
+            for label, path in (("original", source), ("proxy", dest)):
+                samples = [_seek_seconds(ffmpeg, str(path), at) for at in points]
+                print(
+                    f"  seek, {label:>8}: {statistics.median(samples) * 1000:>6,.0f} ms"
+                    f" median, {max(samples) * 1000:>6,.0f} ms worst"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Compare the AI rate-limiter backends under concurrent users.
+
+    uv run python -m benchmarks.bench_rate_limit --users 200 --concurrency 50
+
+"legacy" replays the old event-log implementation (advisory lock + DELETE +
+COUNT + INSERT per call) against a scratch table so the numbers are comparable.
+Needs DATABASE_URL pointing at a disposable database.
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+load_dotenv(Path(__file__).resolve().parents[2] / ".env")
+
+from ai.rate_limit import (  # noqa: E402
+    MemoryRateLimiter,
+    PostgresRateLimiter,
+    RateLimiter,
+)
+from db import close_db_pool, get_db_pool  # noqa: E402
+
+_LEGACY_TABLE = "bench_ai_rate_limit_events"
+
+
+class LegacyRateLimiter:
+    """The pre-token-bucket implementation, kept here only for comparison."""
+
+    def __init__(self, max_requests: int, window_seconds: int) -> None:
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+
+    async def setup(self) -> None:
+        pool = await get_db_pool()
+        async with pool.acquire() as conn:
+            await conn.execute(f"DROP TABLE IF EXISTS {_LEGACY_TABLE}")
+            await conn.execute(
+                f"""
+                CREATE TABLE {_LEGACY_TABLE} (
+                    user_id TEXT NOT NULL,
+                    occurred_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                )
+                """
+            )
+            await conn.execute(
+                f"CREATE INDEX ON {_LEGACY_TABLE} (user_id, occurred_at)"
+            )
+            await conn.execute(f"CREATE INDEX ON {_LEGACY_TABLE} (occurred_at)")
+
+    async def warm_up(self) -> None:
+        pass
+
+    async def hit(self, key: str) -> bool:
+        pool = await get_db_pool()
+        async with pool.acquire() as conn, conn.transaction():
+            await conn.execute("SELECT pg_advisory_xact_lock(hashtext($1))", key)
+            await conn.execute(
+                f"""
+                DELETE FROM {_LEGACY_TABLE}
+                WHERE occurred_at < now() - make_interval(secs => $1::int)
+                """,
+                self.window_seconds,
+            )
+            count = await conn.fetchval(
+                f"SELECT COUNT(*)::int FROM {_LEGACY_TABLE} WHERE user_id = $1",
+                key,
+            )
+            if int(count or 0) >= self.max_requests:
+                return False
+            await conn.execute(
+                f"INSERT INTO {_LEGACY_TABLE} (user_id) VALUES ($1)", key
+            )
+        return True
+
+
+async def _run(
+    limiter: RateLimiter, users: int, concurrency: int, requests: int
+) -> dict[str, float]:
+    latencies: list[float] = []
+    rejected = 0
+    queue: asyncio.Queue[str] = asyncio.Queue()
+    for _ in range(requests):
+        queue.put_nowait(f"bench-user-{random.randrange(users)}")
+
+    async def worker() -> None:
+        nonlocal rejected
+        while True:
+            try:
+                key = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            started = time.perf_counter()
+            if not await limiter.hit(key):
+                rejected += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "throughput_rps": requests / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "rejected": rejected,
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--max-requests", type=int, default=60)
+    parser.add_argument("--window-seconds", type=int, default=60)
+    args = parser.parse_args()
+
+    legacy = LegacyRateLimiter(args.max_requests, args.window_seconds)
+    await legacy.setup()
+    postgres = PostgresRateLimiter(args.max_requests, args.window_seconds)
+    await postgres.ensure_table()
+    pool = await get_db_pool()
+    await pool.execute("DELETE FROM ai_rate_limits WHERE user_id LIKE 'bench-user-%'")
+
+    limiters: dict[str, RateLimiter] = {
+        "legacy": legacy,
+        "postgres": postgres,
+        "memory": MemoryRateLimiter(args.max_requests, args.window_seconds),
+    }
+    try:
+        for name, limiter in limiters.items():
+            result = await _run(limiter, args.users, args.concurrency, args.requests)
+            print(
+                f"{name:<9} {result['throughput_rps']:>10.0f} req/s"
+                f"  p50 {result['p50_ms']:>7.2f} ms"
+                f"  p99 {result['p99_ms']:>7.2f} ms"
+                f"  rejected {result['rejected']:.0f}"
+            )
+    finally:
+        await pool.execute(f"DROP TABLE IF EXISTS {_LEGACY_TABLE}")
+        await pool.execute(
+            "DELETE FROM ai_rate_limits WHERE user_id LIKE 'bench-user-%'"
+        )
+        await close_db_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
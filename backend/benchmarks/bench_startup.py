@@ -0,0 +1,198 @@
+"""
+Cold start: how long `import main` takes, how long a fresh server needs
+to answer /beep and /ready, and each route's first request against its
+steady-state latency once the server reports ready.
+
+    uv run python -m benchmarks.bench_startup --imports 5 --repeat 50
+
+The import is timed in fresh interpreters with AI_MODEL_BACKEND=gemini (a
+dummy GEMINI_API_KEY is enough; nothing is sent). The server is uvicorn in
+a subprocess on a free local port with the fake model, so the requests
+measure the app and not the model API. Creates a throwaway user with a
+real session; needs DATABASE_URL pointing at a disposable database with
+the migrations applied.
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from collections.abc import Awaitable, Callable
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+load_dotenv(Path(__file__).resolve().parents[2] / ".env")
+
+import httpx  # noqa: E402
+
+from db import close_db_pool, get_db_pool  # noqa: E402
+
+_BACKEND_DIR = Path(__file__).resolve().parents[1]
+_SESSION_COOKIE = "better-auth.session_token"
+_IMPORT_SCRIPT = (
+    "import time; started = time.perf_counter(); import main;"
+    " print(time.perf_counter() - started)"
+)
+
+
+def _import_seconds(runs: int) -> list[float]:
+    env = {**os.environ, "AI_MODEL_BACKEND": "gemini"}
+    env.setdefault("GEMINI_API_KEY", "bench")
+    return [
+        float(
+            subprocess.run(
+                [sys.executable, "-c", _IMPORT_SCRIPT],
+                cwd=_BACKEND_DIR,
+                env=env,
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+        )
+        for _ in range(runs)
+    ]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port: int = sock.getsockname()[1]
+        return port
+
+
+async def _wait_for(client: httpx.AsyncClient, path: str, deadline: float) -> None:
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get(path)).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.005)
+    raise TimeoutError(f"{path} did not answer 200 in time")
+
+
+_Request = Callable[[httpx.AsyncClient, str], Awaitable[httpx.Response]]
+
+
+async def _me(client: httpx.AsyncClient, _project: str) -> httpx.Response:
+    return await client.get("/auth/me")
+
+
+async def _list(client: httpx.AsyncClient, _project: str) -> httpx.Response:
+    return await client.get("/projects")
+
+
+async def _get(client: httpx.AsyncClient, project: str) -> httpx.Response:
+    return await client.get(f"/projects/{project}")
+
+
+async def _ai(client: httpx.AsyncClient, _project: str) -> httpx.Response:
+    # A new message each time, so the response cache never answers.
+    return await client.post("/ai", json={"message": f"hello {uuid.uuid4()}"})
+
+
+_ROUTES: dict[str, _Request] = {
+    "GET /auth/me": _me,
+    "GET /projects": _list,
+    "GET /projects/{id}": _get,
+    "POST /ai": _ai,
+}
+
+
+async def _timed(request: _Request, client: httpx.AsyncClient, project: str) -> float:
+    started = time.perf_counter()
+    response = await request(client, project)
+    elapsed = time.perf_counter() - started
+    response.raise_for_status()
+    return elapsed
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--imports", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--timeout", type=float, default=60)
+    args = parser.parse_args()
+
+    imports = _import_seconds(args.imports)
+    print(
+        f"import main  median {statistics.median(imports) * 1000:.0f} ms"
+        f"  (min {min(imports) * 1000:.0f} ms, {args.imports} runs)"
+    )
+
+    user_id = f"bench-{uuid.uuid4()}"
+    token = uuid.uuid4().hex
+    pool = await get_db_pool()
+    await pool.execute(
+        'INSERT INTO "user" (id, name, email) VALUES ($1, $2, $3)',
+        user_id,
+        "bench",
+        f"{user_id}@example.com",
+    )
+    await pool.execute(
+        'INSERT INTO session (token, "userId", "expiresAt") VALUES ($1, $2, $3)',
+        token,
+        user_id,
+        datetime.now(UTC) + timedelta(days=1),
+    )
+    port = _free_port()
+    started = time.monotonic()
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "main:app",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+        ],
+        cwd=_BACKEND_DIR,
+        env={**os.environ, "AI_MODEL_BACKEND": "fake"},
+        # The app logs every request; a crash still shows as a timeout.
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{port}",
+            # Better Auth signs the cookie as "<token>.<signature>"; the
+            # backend only reads the token.
+            cookies={_SESSION_COOKIE: f"{token}.bench"},
+            timeout=args.timeout,
+        ) as client:
+            deadline = started + args.timeout
+            await _wait_for(client, "/beep", deadline)
+            print(f"/beep 200   after {(time.monotonic() - started) * 1000:.0f} ms")
+            await _wait_for(client, "/ready", deadline)
+            print(f"/ready 200  after {(time.monotonic() - started) * 1000:.0f} ms")
+
+            created = await client.post("/projects", json={"name": "bench"})
+            created.raise_for_status()
+            project = created.json()["project"]["id"]
+            for name, request in _ROUTES.items():
+                first = await _timed(request, client, project)
+                steady = [
+                    await _timed(request, client, project) for _ in range(args.repeat)
+                ]
+                print(
+                    f"  {name:<18} first {first * 1000:>7.2f} ms"
+                    f"   steady p50 {statistics.median(steady) * 1000:>6.2f} ms"
+                )
+    finally:
+        server.terminate()
+        server.wait()
+        await pool.execute('DELETE FROM "user" WHERE id = $1', user_id)
+        await close_db_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,113 @@
+"""
+/storage cost: SUM over the user's assets vs the trigger-maintained
+user_storage_usage row, plus what the triggers add to asset writes (one bulk
+insert, and single-row inserts as an upload does them).
+
+    uv run python -m benchmarks.bench_storage_usage --assets 100000
+
+Creates a throwaway user with `--assets` ready assets. Needs DATABASE_URL
+pointing at a disposable database with the migrations applied.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+load_dotenv(Path(__file__).resolve().parents[2] / ".env")
+
+import asyncpg  # type: ignore[import-untyped]  # noqa: E402
+
+from db import close_db_pool, get_db_pool  # noqa: E402
+
+_INSERT_ASSETS = """
+    INSERT INTO assets (user_id, file_size, status)
+    SELECT $1, 1000 + n, 'ready' FROM generate_series(1, $2) AS n
+"""
+_INSERT_ASSET = """
+    INSERT INTO assets (user_id, file_size, status) VALUES ($1, 1000, 'ready')
+"""
+
+
+async def _insert_costs(
+    conn: asyncpg.Connection, user_id: str, assets: int, single: int
+) -> tuple[float, float]:
+    """Seconds per row for one bulk insert and for `single` one-row inserts."""
+    started = time.perf_counter()
+    await conn.execute(_INSERT_ASSETS, user_id, assets, timeout=None)
+    bulk = (time.perf_counter() - started) / assets
+    started = time.perf_counter()
+    for _ in range(single):
+        await conn.execute(_INSERT_ASSET, user_id)
+    return bulk, (time.perf_counter() - started) / single
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--assets", type=int, default=100_000)
+    parser.add_argument("--single", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    pool = await get_db_pool()
+    user_id = f"bench-{uuid.uuid4()}"
+    await pool.execute(
+        'INSERT INTO "user" (id, name, email) VALUES ($1, $2, $3)',
+        user_id,
+        "bench",
+        f"{user_id}@example.com",
+    )
+    try:
+        async with pool.acquire() as conn:
+            # Both runs inside a transaction, so per-row commits don't drown
+            # out the trigger cost.
+            async with conn.transaction():
+                with_triggers = await _insert_costs(
+                    conn, user_id, args.assets, args.single
+                )
+            # Same inserts with the triggers off, rolled back together with
+            # the ALTER so the table is left as it was.
+            transaction = conn.transaction()
+            await transaction.start()
+            try:
+                await conn.execute("ALTER TABLE assets DISABLE TRIGGER USER")
+                without_triggers = await _insert_costs(
+                    conn, user_id, args.assets, args.single
+                )
+            finally:
+                await transaction.rollback()
+            await conn.execute("ANALYZE assets")
+
+            queries = {
+                "SUM(file_size)": """
+                    SELECT COALESCE(SUM(file_size), 0) FROM assets
+                     WHERE user_id = $1 AND deleted_at IS NULL AND status = 'ready'
+                """,
+                "usage row": (
+                    "SELECT used_bytes FROM user_storage_usage WHERE user_id = $1"
+                ),
+            }
+            print(f"{args.assets} assets")
+            for name, sql in queries.items():
+                samples = []
+                for _ in range(args.repeat):
+                    started = time.perf_counter()
+                    await conn.fetchval(sql, user_id)
+                    samples.append(time.perf_counter() - started)
+                print(f"  {name:<16} p50 {statistics.median(samples) * 1000:>8.3f} ms")
+            for i, name in enumerate(("bulk", "single")):
+                print(
+                    f"  {name + ' insert':<16} {with_triggers[i] * 1e6:>8.2f} µs/row"
+                    f" with triggers, {without_triggers[i] * 1e6:.2f} without"
+                )
+    finally:
+        await pool.execute('DELETE FROM "user" WHERE id = $1', user_id)
+        await close_db_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
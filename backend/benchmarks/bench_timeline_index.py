@@ -0,0 +1,134 @@
+"""
+Build and lookup cost of the server-side timeline index (ai/timeline_index.py)
+and of resolving tool calls against it (ai/resolve.py).
+
+    uv run python -m benchmarks.bench_timeline_index --clips 50000 --tracks 20
+
+Generates a synthetic timeline of back-to-back clips and reports the one-off
+build cost per request plus the per-lookup cost of id, name and overlap
+queries and of a full resolve_response() call.
+"""
+
+import argparse
+import random
+import statistics
+import time
+from collections.abc import Callable
+from typing import Any
+
+from ai.resolve import resolve_response
+from ai.schema import (
+    FunctionCallResponse,
+    LLMMoveScrubberArgs,
+    LLMSplitScrubberArgs,
+)
+from ai.timeline_index import TimelineIndex
+
+_WORDS = ["intro", "b-roll", "city", "beach", "interview", "voiceover", "music"]
+
+
+def _timeline(clips: int, tracks: int) -> dict[str, Any]:
+    rng = random.Random(7)
+    lanes: list[list[dict[str, Any]]] = [[] for _ in range(tracks)]
+    cursor = [0.0] * tracks
+    for i in range(clips):
+        lane = i % tracks
+        width = rng.randint(50, 800)
+        lanes[lane].append(
+            {
+                "id": f"clip-{i}",
+                "name": f"{rng.choice(_WORDS)} {rng.choice(_WORDS)} {i}.mp4",
+                "mediaType": "video",
+                "left": cursor[lane],
+                "width": width,
+            }
+        )
+        cursor[lane] += width
+    return {
+        "tracks": [
+            {"id": f"track-{n + 1}", "scrubbers": lane, "transitions": []}
+            for n, lane in enumerate(lanes)
+        ]
+    }
+
+
+def _per_call_us(fn: Callable[[], object], repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1e6)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clips", type=int, default=50_000)
+    parser.add_argument("--tracks", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    timeline = _timeline(args.clips, args.tracks)
+    rng = random.Random(11)
+    targets = [f"clip-{rng.randrange(args.clips)}" for _ in range(args.repeat)]
+
+    def timed_ms(fn: Callable[[], object]) -> float:
+        started = time.perf_counter()
+        fn()
+        return (time.perf_counter() - started) * 1e3
+
+    index = TimelineIndex(timeline)
+    id_ms = timed_ms(lambda: index.clip(targets[0]))
+    names_cold_ms = timed_ms(lambda: index.find_by_name("warm-up"))
+    track_ms = timed_ms(lambda: index.overlapping(1, 0.0, 1.0))
+    # The next request for the same project: names unchanged, index rebuilt.
+    index = TimelineIndex(timeline)
+    names_warm_ms = timed_ms(lambda: index.find_by_name("warm-up"))
+
+    def by_id() -> None:
+        index.clip(rng.choice(targets))
+
+    def by_name() -> None:
+        index.find_by_name(f" {rng.randrange(args.clips)}.mp4")
+
+    def overlap() -> None:
+        start = rng.uniform(0, 1000)
+        index.overlapping(1, start, start + 5)
+
+    move = FunctionCallResponse(
+        function_call=LLMMoveScrubberArgs(
+            function_name="LLMMoveScrubber",
+            scrubber_id=targets[0],
+            new_position_seconds=1e6,
+            new_track_number=1,
+        )
+    )
+    split = FunctionCallResponse(
+        function_call=LLMSplitScrubberArgs(
+            function_name="LLMSplitScrubber",
+            scrubber_name=f" {targets[1].removeprefix('clip-')}.mp4",
+            time_seconds=0.0,
+        )
+    )
+
+    print(f"clips / tracks          {len(index)} / {index.track_count}")
+    print("first use, per request (lazy):")
+    print(f"  id map                {id_ms:8.2f} ms")
+    print(f"  name index, cold      {names_cold_ms:8.2f} ms")
+    print(f"  name index, cached    {names_warm_ms:8.2f} ms")
+    print(f"  one track             {track_ms:8.2f} ms")
+    print(f"lookup by id            {_per_call_us(by_id, args.repeat):8.2f} µs")
+    print(f"lookup by name          {_per_call_us(by_name, args.repeat):8.2f} µs")
+    print(f"overlap query           {_per_call_us(overlap, args.repeat):8.2f} µs")
+    print(
+        "resolve move            "
+        f"{_per_call_us(lambda: resolve_response(move, index), args.repeat):8.2f} µs"
+    )
+    print(
+        "resolve split by name   "
+        f"{_per_call_us(lambda: resolve_response(split, index), args.repeat):8.2f} µs"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+Asset uploads (api/uploads.py): one large file sent in --chunk PATCHes, then
+--uploads files of --each bytes uploaded at once. A --duplicates fraction of
+those repeat another file in the batch; each that finishes after its twin
+takes the dedup path.
+
+    uv run python -m benchmarks.bench_upload --size 4G --chunk 64M --uploads 50
+
+Throughput includes hashing, the staging write and the in-process httpx
+client; the reference line is SHA-256 plus a file write alone. Peak RSS
+growth shows that bodies are streamed, not held in memory. Files go to a
+temporary local object store (--dir), and the storage limit is lifted for
+the throwaway user. Needs DATABASE_URL pointing at a disposable database
+with the migrations applied.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import os
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from collections.abc import AsyncIterator
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+load_dotenv(Path(__file__).resolve().parents[2] / ".env")
+
+import httpx  # noqa: E402
+
+from api import uploads  # noqa: E402
+from api.object_store import LocalObjectStore  # noqa: E402
+from auth.routes import get_current_user  # noqa: E402
+from auth.schema import SessionUser  # noqa: E402
+from db import close_db_pool, get_db_pool  # noqa: E402
+from main import app  # noqa: E402
+
+_BLOCK = os.urandom(1 << 20)
+_UNITS = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+
+
+def _size(text: str) -> int:
+    unit = _UNITS.get(text[-1].upper())
+    return int(float(text[:-1]) * unit) if unit else int(text)
+
+
+def _peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, KiB on Linux.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+async def _content(seed: int, start: int, end: int) -> AsyncIterator[bytes]:
+    """Bytes start..end of file `seed`: random blocks, made unique by the seed."""
+    tag = seed.to_bytes(8, "big")
+    for block_start in range(start - start % len(_BLOCK), end, len(_BLOCK)):
+        block = tag + _BLOCK[len(tag) :]
+        yield block[max(start - block_start, 0) : end - block_start]
+
+
+async def _upload(
+    client: httpx.AsyncClient, seed: int, size: int, chunk: int, hashes: set[str]
+) -> bool:
+    """Upload file `seed`; returns whether its bytes were already stored."""
+    created = await client.post(
+        "/uploads",
+        json={"filename": f"{seed}.mp4", "fileSize": size, "mimeType": "video/mp4"},
+    )
+    created.raise_for_status()
+    upload_id = created.json()["uploadId"]
+    for offset in range(0, size, chunk):
+        response = await client.patch(
+            f"/uploads/{upload_id}",
+            content=_content(seed, offset, min(offset + chunk, size)),
+            headers={"Upload-Offset": str(offset)},
+        )
+        response.raise_for_status()
+    result = response.json()
+    hashes.add(result["contentHash"])
+    return bool(result["deduplicated"])
+
+
+def _reference_mib_s(directory: Path, size: int) -> float:
+    """SHA-256 plus write of `size` bytes, with no HTTP or database."""
+    hasher = hashlib.sha256()
+    started = time.perf_counter()
+    with (directory / "reference").open("wb") as file:
+        for _ in range(size // len(_BLOCK)):
+            hasher.update(_BLOCK)
+            file.write(_BLOCK)
+    elapsed = time.perf_counter() - started
+    (directory / "reference").unlink()
+    return size / elapsed / 2**20
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=_size, default=_size("2G"))
+    parser.add_argument("--chunk", type=_size, default=_size("64M"))
+    parser.add_argument("--uploads", type=int, default=50)
+    parser.add_argument("--each", type=_size, default=_size("20M"))
+    parser.add_argument("--duplicates", type=float, default=0.2)
+    parser.add_argument("--dir", type=Path, default=None)
+    args = parser.parse_args()
+
+    directory = Path(tempfile.mkdtemp(dir=args.dir, prefix="bench-upload-"))
+    uploads.object_store = LocalObjectStore(directory / "assets")
+    uploads.UPLOAD_STAGING_DIR = directory / "staging"
+    uploads.STORAGE_LIMIT_BYTES = 1 << 62
+    user_id = f"bench-{uuid.uuid4()}"
+    app.dependency_overrides[get_current_user] = lambda: SessionUser(
+        user_id=user_id, email=f"{user_id}@example.com", name="bench"
+    )
+    pool = await get_db_pool()
+    await pool.execute(
+        'INSERT INTO "user" (id, name, email) VALUES ($1, $2, $3)',
+        user_id,
+        "bench",
+        f"{user_id}@example.com",
+    )
+    transport = httpx.ASGITransport(app=app)
+    run = time.time_ns()
+    hashes: set[str] = set()
+    try:
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench", timeout=None
+        ) as client:
+            print(
+                f"reference sha256 + write: "
+                f"{_reference_mib_s(directory, min(args.size, 1 << 30)):,.0f} MiB/s"
+            )
+
+            rss_before = _peak_rss_bytes()
+            started = time.perf_counter()
+            await _upload(client, run, args.size, args.chunk, hashes)
+            elapsed = time.perf_counter() - started
+            print(
+                f"one file, {args.size / 2**30:.2f} GiB in"
+                f" {args.chunk / 2**20:.0f} MiB chunks:"
+                f" {args.size / elapsed / 2**20:,.0f} MiB/s,"
+                f" peak RSS +{(_peak_rss_bytes() - rss_before) / 2**20:.0f} MiB"
+            )
+
+            duplicates = round(args.uploads * args.duplicates)
+            # The duplicates resend files uploaded in the same batch.
+            seeds = [run + 1 + n for n in range(args.uploads - duplicates)]
+            seeds += seeds[:duplicates]
+            timings: list[float] = []
+
+            async def timed(seed: int) -> bool:
+                started = time.perf_counter()
+                deduplicated = await _upload(
+                    client, seed, args.each, args.chunk, hashes
+                )
+                timings.append(time.perf_counter() - started)
+                return deduplicated
+
+            started = time.perf_counter()
+            deduplicated = await asyncio.gather(*(timed(seed) for seed in seeds))
+            elapsed = time.perf_counter() - started
+            total = args.each * len(seeds)
+            print(
+                f"{len(seeds)} concurrent files of {args.each / 2**20:.0f} MiB:"
+                f" {total / elapsed / 2**20:,.0f} MiB/s overall,"
+                f" p50 {statistics.median(timings):.2f} s,"
+                f" max {max(timings):.2f} s,"
+                f" {sum(deduplicated)} deduplicated"
+            )
+    finally:
+        await pool.execute('DELETE FROM "user" WHERE id = $1', user_id)
+        await pool.execute(
+            "DELETE FROM stored_objects WHERE content_hash = ANY($1::text[])",
+            list(hashes),
+        )
+        await close_db_pool()
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,85 @@
+"""
+Waveform peaks (media/waveform.py): the one-off build per file, then what a
+timeline request costs against what the browser does today.
+
+    FFMPEG_PATH=ffmpeg uv run python -m benchmarks.bench_waveform ~/Music/*.mp3
+
+For each file: build time and peaks file size; then the median time of
+Peaks.query (open + memory-mapped read, as in GET /assets/{id}/waveform)
+for a --pixels wide view at several zoom levels, with the bytes each
+response carries. The "full decode" line is the browser's approach
+(app/hooks/useWaveform.ts): decode all of the audio and reduce it, which the
+client repeats per file and device. No database needed.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from media.waveform import SAMPLE_RATE, Peaks, build_waveform
+
+# Seconds of audio across the view.
+_SPANS = (5.0, 60.0, 600.0, 3600.0)
+
+
+def _full_decode_seconds(ffmpeg: str, path: str) -> float:
+    """Decode everything to float32 and take 2000 RMS values, in one process."""
+    started = time.perf_counter()
+    data = subprocess.run(
+        [ffmpeg, "-nostdin", "-v", "error", "-i", path, "-map", "0:a:0",
+         "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "f32le", "-"],
+        capture_output=True,
+        check=True,
+    ).stdout  # fmt: skip
+    samples = np.frombuffer(data, dtype=np.float32)
+    blocks = samples[: len(samples) // 2000 * 2000].reshape(2000, -1)
+    np.sqrt((blocks**2).mean(axis=1))
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("files", nargs="+", type=Path)
+    parser.add_argument("--pixels", type=int, default=1600)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    ffmpeg = os.getenv("FFMPEG_PATH", "ffmpeg")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for source in args.files:
+            dest = Path(directory) / f"{source.name}.peaks"
+            started = time.perf_counter()
+            duration = build_waveform(ffmpeg, str(source), str(dest))
+            built = time.perf_counter() - started
+            print(
+                f"{source.name}: {duration:,.0f} s of audio, built in {built:.2f} s,"
+                f" peaks file {dest.stat().st_size / 1024:,.0f} KiB"
+            )
+            print(
+                f"  full decode (browser approach) "
+                f"{_full_decode_seconds(ffmpeg, str(source)):.2f} s"
+            )
+            for span in _SPANS:
+                if span > duration * 2:
+                    continue
+                # Views spread over the file, as when scrolling.
+                starts = np.linspace(0, max(duration - span, 0), args.repeat)
+                samples = []
+                for start in starts:
+                    started = time.perf_counter()
+                    body = Peaks(dest).query(start, start + span, args.pixels).tobytes()
+                    samples.append(time.perf_counter() - started)
+                print(
+                    f"  {span:>6,.0f} s view: {statistics.median(samples) * 1e6:>6,.0f} µs,"
+                    f" {len(body) / 1024:.1f} KiB per response"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,512 @@
+"""
+Load run over every backend route: throughput, latency percentiles and
+memory per route, saved as JSON so runs can be compared between commits.
+
+    uv run python -m benchmarks.load --concurrency 8 --requests 400
+    uv run python -m benchmarks.load --compare benchmarks/results/<earlier>.json
+
+Creates one throwaway user with a real session per worker. Each worker has
+its own project holding a synthetic timeline (--tracks x --scrubbers, shapes
+from ai/schema.py) and a media bin of --media items. Then, route by route,
+the workers send --requests requests between them, authenticated by the
+session cookie like the editor. The app runs in-process with its lifespan,
+so the session cache listener and background tasks are live. The model is
+always the local fake (AI_MODEL_BACKEND=fake, --model-delay), and the AI
+rate limit is raised so it never rejects. Numbers include the in-process
+httpx client, but not the network.
+
+Memory is the process RSS after each route, and its growth during that
+route. --tracemalloc adds the peak Python heap per route, at a large cost
+in speed. Needs DATABASE_URL pointing at a disposable database with the
+migrations applied.
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import math
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+import uuid
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+from typing import Any
+
+from dotenv import load_dotenv
+
+load_dotenv(Path(__file__).resolve().parents[2] / ".env")
+os.environ["AI_MODEL_BACKEND"] = "fake"
+
+import httpx  # noqa: E402
+
+from ai import routes as ai_routes  # noqa: E402
+from ai.model import FakeModelClient  # noqa: E402
+from ai.rate_limit import create_rate_limiter  # noqa: E402
+from benchmarks.synthetic import synthetic_media_bin, synthetic_timeline  # noqa: E402
+from db import close_db_pool, get_db_pool  # noqa: E402
+from main import app  # noqa: E402
+
+_RESULTS_DIR = Path(__file__).resolve().parent / "results"
+_SESSION_COOKIE = "better-auth.session_token"
+
+
+@dataclass
+class _Worker:
+    client: httpx.AsyncClient
+    user_id: str
+    project_id: str
+    timeline: dict[str, Any]
+    media_bin: list[dict[str, Any]]
+    revision: int
+    etag: str
+    first_revision: int
+    created: list[str] = field(default_factory=list)
+
+
+_Request = Callable[[_Worker, int], Awaitable[httpx.Response]]
+
+
+async def _me(w: _Worker, _i: int) -> httpx.Response:
+    return await w.client.get("/auth/me")
+
+
+async def _list(w: _Worker, _i: int) -> httpx.Response:
+    return await w.client.get("/projects", params={"limit": 50})
+
+
+async def _create(w: _Worker, i: int) -> httpx.Response:
+    response = await w.client.post("/projects", json={"name": f"load {i}"})
+    if response.is_success:
+        w.created.append(response.json()["project"]["id"])
+    return response
+
+
+async def _get(w: _Worker, _i: int) -> httpx.Response:
+    return await w.client.get(f"/projects/{w.project_id}")
+
+
+async def _revalidate(w: _Worker, _i: int) -> httpx.Response:
+    return await w.client.get(
+        f"/projects/{w.project_id}", headers={"If-None-Match": w.etag}
+    )
+
+
+async def _put(w: _Worker, i: int) -> httpx.Response:
+    w.timeline["tracks"][0]["scrubbers"][0]["left"] = i
+    response = await w.client.put(f"/projects/{w.project_id}", json=w.timeline)
+    if response.is_success:
+        w.revision = response.json()["revision"]
+        w.etag = response.headers["ETag"]
+    return response
+
+
+async def _patch(w: _Worker, i: int) -> httpx.Response:
+    response = await w.client.patch(
+        f"/projects/{w.project_id}/timeline",
+        json={
+            "base_revision": w.revision,
+            "patch": [
+                {"op": "replace", "path": "/tracks/0/scrubbers/0/left", "value": i}
+            ],
+        },
+    )
+    if response.is_success:
+        w.revision = response.json()["revision"]
+    return response
+
+
+async def _rename(w: _Worker, i: int) -> httpx.Response:
+    return await w.client.patch(
+        f"/projects/{w.project_id}", json={"name": f"load project {i}"}
+    )
+
+
+async def _versions(w: _Worker, _i: int) -> httpx.Response:
+    return await w.client.get(f"/projects/{w.project_id}/versions")
+
+
+async def _version(w: _Worker, _i: int) -> httpx.Response:
+    return await w.client.get(f"/projects/{w.project_id}/versions/{w.revision}")
+
+
+async def _restore(w: _Worker, _i: int) -> httpx.Response:
+    response = await w.client.post(
+        f"/projects/{w.project_id}/versions/{w.first_revision}/restore"
+    )
+    if response.is_success:
+        w.revision = response.json()["revision"]
+    return response
+
+
+async def _storage(w: _Worker, _i: int) -> httpx.Response:
+    return await w.client.get("/storage")
+
+
+def _ai_body(w: _Worker, i: int) -> dict[str, Any]:
+    # A new message each time, so the response cache never answers.
+    return {
+        "message": f"Make the opening feel more cinematic, take {i}",
+        "timeline_state": w.timeline,
+        "mediabin_items": w.media_bin,
+    }
+
+
+async def _ai(w: _Worker, i: int) -> httpx.Response:
+    return await w.client.post("/ai", json=_ai_body(w, i))
+
+
+async def _ai_stream(w: _Worker, i: int) -> httpx.Response:
+    async with w.client.stream("POST", "/ai/stream", json=_ai_body(w, i)) as response:
+        await response.aread()
+    return response
+
+
+async def _delete(w: _Worker, _i: int) -> httpx.Response:
+    return await w.client.delete(f"/projects/{w.created.pop()}")
+
+
+# Run in this order: later routes rely on state left by earlier ones (delete
+# removes the projects create made; version and restore need saved revisions).
+_ROUTES: dict[str, tuple[str, _Request]] = {
+    "me": ("GET /auth/me", _me),
+    "list": ("GET /projects", _list),
+    "create": ("POST /projects", _create),
+    "get": ("GET /projects/{id}", _get),
+    "get_304": ("GET /projects/{id} (If-None-Match)", _revalidate),
+    "put": ("PUT /projects/{id}", _put),
+    "patch": ("PATCH /projects/{id}/timeline", _patch),
+    "rename": ("PATCH /projects/{id}", _rename),
+    "versions": ("GET /projects/{id}/versions", _versions),
+    "version": ("GET /projects/{id}/versions/{revision}", _version),
+    "restore": ("POST /projects/{id}/versions/{revision}/restore", _restore),
+    "storage": ("GET /storage", _storage),
+    "ai": ("POST /ai", _ai),
+    "ai_stream": ("POST /ai/stream", _ai_stream),
+    "delete": ("DELETE /projects/{id}", _delete),
+}
+
+
+def _peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # KiB on Linux
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # No procfs (macOS): the peak is the best there is.
+        return _peak_rss_bytes()
+
+
+def _percentile(ordered: list[float], q: float) -> float:
+    """Nearest-rank percentile of sorted samples."""
+    return ordered[max(math.ceil(q * len(ordered)) - 1, 0)]
+
+
+async def _run_route(
+    workers: list[_Worker], request: _Request, requests: int, warmup: int, trace: bool
+) -> dict[str, float | int]:
+    # Requests are split evenly, so each worker deletes as many projects as
+    # it created.
+    shares = [
+        requests // len(workers) + (n < requests % len(workers))
+        for n in range(len(workers))
+    ]
+    samples: list[float] = []
+    errors = 0
+
+    async def drive(worker: _Worker, share: int, offset: int, timed: bool) -> None:
+        nonlocal errors
+        for i in range(offset, offset + share):
+            started = time.perf_counter()
+            response = await request(worker, i)
+            elapsed = time.perf_counter() - started
+            if timed:
+                samples.append(elapsed)
+                errors += response.is_error
+            elif response.is_error:
+                response.raise_for_status()
+
+    offsets = [sum(shares[:n]) for n in range(len(workers))]
+    if warmup:
+        await asyncio.gather(
+            *(
+                drive(w, warmup, requests + warmup * n, False)
+                for n, w in enumerate(workers)
+            )
+        )
+    gc.collect()
+    rss_before = _rss_bytes()
+    if trace:
+        tracemalloc.start()
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(drive(w, shares[n], offsets[n], True) for n, w in enumerate(workers))
+    )
+    seconds = time.perf_counter() - started
+    result: dict[str, float | int] = {}
+    if trace:
+        result["python_peak_mib"] = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    rss = _rss_bytes()
+    samples.sort()
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "seconds": seconds,
+        "throughput_rps": len(samples) / seconds,
+        "p50_ms": _percentile(samples, 0.50) * 1000,
+        "p95_ms": _percentile(samples, 0.95) * 1000,
+        "p99_ms": _percentile(samples, 0.99) * 1000,
+        "max_ms": samples[-1] * 1000,
+        "rss_mib": rss / 2**20,
+        "rss_growth_mib": (rss - rss_before) / 2**20,
+        **result,
+    }
+
+
+async def _setup_worker(
+    transport: httpx.AsyncBaseTransport, args: argparse.Namespace
+) -> _Worker:
+    user_id = f"load-{uuid.uuid4()}"
+    token = uuid.uuid4().hex
+    pool = await get_db_pool()
+    await pool.execute(
+        'INSERT INTO "user" (id, name, email) VALUES ($1, $2, $3)',
+        user_id,
+        "load",
+        f"{user_id}@example.com",
+    )
+    await pool.execute(
+        'INSERT INTO session (token, "userId", "expiresAt") VALUES ($1, $2, $3)',
+        token,
+        user_id,
+        datetime.now(UTC) + timedelta(days=1),
+    )
+    client = httpx.AsyncClient(
+        transport=transport,
+        base_url="http://load",
+        # Better Auth signs the cookie as "<token>.<signature>"; the backend
+        # only reads the token.
+        cookies={_SESSION_COOKIE: f"{token}.load"},
+        timeout=60,
+    )
+    for n in range(args.projects - 1):
+        (await client.post("/projects", json={"name": f"other {n}"})).raise_for_status()
+    created = await client.post("/projects", json={"name": "load"})
+    created.raise_for_status()
+    project_id = created.json()["project"]["id"]
+    timeline = synthetic_timeline(args.tracks * args.scrubbers, args.tracks)
+    saved = await client.put(f"/projects/{project_id}", json=timeline)
+    saved.raise_for_status()
+    revision = saved.json()["revision"]
+    return _Worker(
+        client=client,
+        user_id=user_id,
+        project_id=project_id,
+        timeline=timeline,
+        media_bin=synthetic_media_bin(args.media),
+        revision=revision,
+        etag=saved.headers["ETag"],
+        first_revision=revision,
+    )
+
+
+def _git_commit() -> tuple[str | None, bool]:
+    """HEAD's short hash and whether the tree has uncommitted changes."""
+    cwd = Path(__file__).resolve().parent
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=cwd,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=cwd,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None, False
+    return commit, bool(dirty)
+
+
+def _print_results(routes: dict[str, dict[str, float | int]]) -> None:
+    traced = any("python_peak_mib" in r for r in routes.values())
+    print(
+        f"  {'route':<48} {'req/s':>8} {'p50 ms':>8} {'p95':>8} {'p99':>8}"
+        f" {'errors':>6} {'RSS MiB':>8} {'growth':>7}"
+        + (f" {'heap peak':>9}" if traced else "")
+    )
+    for name, r in routes.items():
+        print(
+            f"  {_ROUTES[name][0]:<48} {r['throughput_rps']:>8.0f}"
+            f" {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f}"
+            f" {r['errors']:>6} {r['rss_mib']:>8.1f} {r['rss_growth_mib']:>+7.1f}"
+            + (f" {r['python_peak_mib']:>9.1f}" if traced else "")
+        )
+
+
+def _compare(
+    baseline: dict[str, Any], current: dict[str, Any], threshold: float
+) -> list[str]:
+    """Print the change per route; return the routes that regressed."""
+    for key in (
+        "tracks",
+        "scrubbers",
+        "media",
+        "projects",
+        "concurrency",
+        "requests",
+        "model_delay",
+        "tracemalloc",
+    ):
+        if baseline["args"].get(key) != current["args"].get(key):
+            print(
+                f"  note: --{key} differs"
+                f" ({baseline['args'].get(key)} vs {current['args'].get(key)})"
+            )
+    print(f"  vs {baseline.get('commit') or 'unknown'} ({baseline['started_at']}):")
+    regressed = []
+    for name, now in current["routes"].items():
+        before = baseline["routes"].get(name)
+        if before is None:
+            continue
+        changes = {
+            "p50": now["p50_ms"] / before["p50_ms"] - 1,
+            "p95": now["p95_ms"] / before["p95_ms"] - 1,
+            "p99": now["p99_ms"] / before["p99_ms"] - 1,
+            "req/s": now["throughput_rps"] / before["throughput_rps"] - 1,
+        }
+        # p99 over a few hundred requests is too noisy to gate on.
+        worse = changes["p95"] > threshold or -changes["req/s"] > threshold
+        if worse:
+            regressed.append(name)
+        print(
+            f"  {_ROUTES[name][0]:<48}"
+            + "".join(f" {k} {v:>+6.0%}" for k, v in changes.items())
+            + ("  REGRESSED" if worse else "")
+        )
+    return regressed
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--tracks", type=int, default=10)
+    parser.add_argument("--scrubbers", type=int, default=100, help="per track")
+    parser.add_argument("--media", type=int, default=200, help="media bin items")
+    parser.add_argument("--projects", type=int, default=20, help="per user")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=400, help="per route")
+    parser.add_argument("--warmup", type=int, default=2, help="per worker")
+    parser.add_argument("--model-delay", type=float, default=0.0, help="seconds")
+    parser.add_argument(
+        "--routes",
+        default=",".join(_ROUTES),
+        help="comma-separated subset of: " + ", ".join(_ROUTES),
+    )
+    parser.add_argument("--tracemalloc", action="store_true")
+    parser.add_argument("--out", type=Path, help=f"default: {_RESULTS_DIR}/...")
+    parser.add_argument("--compare", type=Path, help="earlier results file")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.10,
+        help="p95 / throughput change that counts as a regression",
+    )
+    args = parser.parse_args()
+    selected = args.routes.split(",")
+    unknown = set(selected) - set(_ROUTES)
+    if unknown:
+        parser.error(f"unknown routes: {', '.join(sorted(unknown))}")
+    if "delete" in selected and "create" not in selected:
+        parser.error("delete needs create")
+
+    if not isinstance(ai_routes.model_client, FakeModelClient):
+        raise RuntimeError("the load run must use the fake model client")
+    ai_routes.model_client.delay_seconds = args.model_delay
+    ai_routes.rate_limiter = create_rate_limiter(10**9, 60)
+
+    commit, dirty = _git_commit()
+    results: dict[str, Any] = {
+        "commit": commit,
+        "dirty": dirty,
+        "started_at": datetime.now(UTC).isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "args": {
+            k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items()
+        },
+        "routes": {},
+    }
+    transport = httpx.ASGITransport(app=app)
+    workers: list[_Worker] = []
+    try:
+        async with app.router.lifespan_context(app):
+            workers = [
+                await _setup_worker(transport, args) for _ in range(args.concurrency)
+            ]
+            print(
+                f"{args.concurrency} workers, {args.requests} requests per route,"
+                f" timeline {args.tracks}x{args.scrubbers}, media bin {args.media}"
+            )
+            for name in _ROUTES:
+                if name in selected:
+                    results["routes"][name] = await _run_route(
+                        workers,
+                        _ROUTES[name][1],
+                        args.requests,
+                        args.warmup,
+                        args.tracemalloc,
+                    )
+            results["peak_rss_mib"] = _peak_rss_bytes() / 2**20
+    finally:
+        for worker in workers:
+            await worker.client.aclose()
+        if workers:
+            user_ids = [w.user_id for w in workers]
+            pool = await get_db_pool()
+            await pool.execute(
+                'DELETE FROM "user" WHERE id = ANY($1::text[])', user_ids
+            )
+            if await pool.fetchval("SELECT to_regclass('ai_rate_limits') IS NOT NULL"):
+                await pool.execute(
+                    "DELETE FROM ai_rate_limits WHERE user_id = ANY($1::text[])",
+                    user_ids,
+                )
+        await close_db_pool()
+
+    _print_results(results["routes"])
+    out = args.out or _RESULTS_DIR / (
+        f"{results['started_at'].replace(':', '')}-{commit or 'nogit'}"
+        f"{'-dirty' if dirty else ''}.json"
+    )
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(results, indent=2) + "\n")
+    print(f"  saved {out}")
+
+    if args.compare is not None:
+        baseline = json.loads(args.compare.read_text())
+        if _compare(baseline, results, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,98 @@
+"""
+Synthetic editor state for the benchmarks: timelines and media bins shaped
+like ai/schema.py (TimelineState, ScrubberState, MediaBinItem) plus the extra
+fields the editor stores, so payload sizes and JSON work match real projects.
+
+Everything is derived from the arguments; the same call always returns the
+same document.
+"""
+
+import uuid
+from typing import Any
+
+# Every n-th item is a text overlay / an audio clip; the rest are video.
+_TEXT_EVERY = 10
+_AUDIO_EVERY = 7
+
+
+def _media_type(i: int) -> str:
+    if i % _TEXT_EVERY == _TEXT_EVERY - 1:
+        return "text"
+    if i % _AUDIO_EVERY == _AUDIO_EVERY - 1:
+        return "audio"
+    return "video"
+
+
+def _media(i: int) -> dict[str, Any]:
+    """Fields shared by media-bin items and the scrubbers made from them."""
+    media_type = _media_type(i)
+    text = media_type == "text"
+    return {
+        "mediaType": media_type,
+        "mediaUrlLocal": None,
+        "mediaUrlRemote": None if text else f"https://media.example.com/{i}.mp4",
+        "media_width": 0 if media_type == "audio" else 1920,
+        "media_height": 0 if media_type == "audio" else 1080,
+        "text": {
+            "textContent": f"Title {i}",
+            "fontSize": 48,
+            "fontFamily": "Inter",
+            "color": "#ffffff",
+            "textAlign": "center",
+            "fontWeight": "bold",
+        }
+        if text
+        else None,
+        "name": f"Title {i}" if text else f"clip {i}.mp4",
+        "durationInSeconds": 5,
+    }
+
+
+def synthetic_media_bin(items: int) -> list[dict[str, Any]]:
+    """`items` media-bin entries; scrubber i of synthetic_timeline uses item i."""
+    return [
+        {
+            "id": f"media-{i}",
+            **_media(i),
+            "isUploading": False,
+            "uploadProgress": None,
+        }
+        for i in range(items)
+    ]
+
+
+def synthetic_timeline(clips: int, tracks: int) -> dict[str, Any]:
+    """`clips` five-second clips dealt round-robin onto `tracks` tracks."""
+    lanes: list[list[dict[str, Any]]] = [[] for _ in range(tracks)]
+    for i in range(clips):
+        track = i % tracks
+        lane = lanes[track]
+        lane.append(
+            {
+                "id": str(uuid.UUID(int=i)),
+                **_media(i),
+                "left": len(lane) * 500,
+                "width": 500,
+                "y": track,
+                "left_player": 0,
+                "top_player": 0,
+                "width_player": 1920,
+                "height_player": 1080,
+                "is_dragging": False,
+                "trimBefore": None,
+                "trimAfter": None,
+                "playbackRate": 1,
+                "volume": 1,
+                "uploadProgress": None,
+                "isUploading": False,
+                "sourceMediaBinId": f"media-{i}",
+                "left_transition_id": None,
+                "right_transition_id": None,
+            }
+        )
+    return {
+        "tracks": [
+            {"id": f"track-{n + 1}", "scrubbers": lane, "transitions": []}
+            for n, lane in enumerate(lanes)
+        ]
+    }
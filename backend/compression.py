@@ -0,0 +1,301 @@
+"""
+HTTP body compression, both ways.
+
+Responses: a body of at least COMPRESSION_MIN_BYTES with a JSON or text type
+is compressed with the first of COMPRESSION_ENCODINGS that the client's
+Accept-Encoding allows. zstd needs the `zstandard` package and br the
+`brotli` package; without them those encodings are skipped. Only responses
+sent in one piece are compressed, so streams (/ai/stream) are untouched.
+Strong ETags become weak on compressed responses; api/routes.py ignores the
+W/ prefix when comparing them.
+
+Requests: a body sent with Content-Encoding gzip, zstd or br is decoded
+before the route sees it. Decoding stops with 413 once the output would
+pass COMPRESSION_MAX_DECODED_BYTES, so a small compression bomb cannot fill
+memory. Other encodings get 415.
+"""
+
+import asyncio
+import importlib
+import os
+import time
+import zlib
+from typing import Any
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+import metrics
+
+
+def _optional(module: str) -> Any:
+    try:
+        return importlib.import_module(module)
+    except ImportError:
+        return None
+
+
+_zstd = _optional("zstandard")
+_brotli = _optional("brotli")
+
+_AVAILABLE = {"zstd": _zstd is not None, "br": _brotli is not None, "gzip": True}
+
+# Server preference, best first; any the client accepts beats a higher q.
+ENCODINGS = [
+    encoding
+    for encoding in map(
+        str.strip, os.getenv("COMPRESSION_ENCODINGS", "zstd,br,gzip").split(",")
+    )
+    if _AVAILABLE.get(encoding)
+]
+# About one TCP segment: smaller bodies gain nothing worth the CPU.
+MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1400"))
+MAX_DECODED_BYTES = int(os.getenv("COMPRESSION_MAX_DECODED_BYTES", str(32 << 20)))
+
+# Levels picked with benchmarks/bench_compression.py: most of the size win
+# of higher levels at a fraction of their CPU. On timeline JSON zstd 1 beats
+# zstd 3 on both size and speed.
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 1
+BROTLI_QUALITY = 4
+# Bodies above this are (de)compressed in a thread, off the event loop.
+_THREAD_MIN_BYTES = 256 * 1024
+# zstd's default allows 128 MiB windows; ordinary levels use at most 8 MiB.
+_ZSTD_MAX_WINDOW = 8 << 20
+_CHUNK = 64 * 1024
+
+_COMPRESSIBLE_TYPES = ("application/json", "text/")
+_UNCOMPRESSED_TYPES = ("text/event-stream",)
+
+
+class DecodedTooLargeError(ValueError):
+    pass
+
+
+def compress(encoding: str, data: bytes) -> bytes:
+    if encoding == "gzip":
+        # wbits 31: a gzip member, without the file name and mtime.
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        return compressor.compress(data) + compressor.flush()
+    if encoding == "zstd":
+        return bytes(_zstd.ZstdCompressor(level=ZSTD_LEVEL).compress(data))
+    if encoding == "br":
+        return bytes(_brotli.compress(data, quality=BROTLI_QUALITY))
+    raise ValueError(f"Unsupported encoding {encoding!r}")
+
+
+def decompress(encoding: str, data: bytes, limit: int) -> bytes:
+    """
+    Decode `data`, raising DecodedTooLargeError as soon as the output would
+    pass `limit` bytes and ValueError for a malformed body.
+    """
+    if encoding == "gzip":
+        decoder = zlib.decompressobj(31)
+        try:
+            out = decoder.decompress(data, limit + 1)
+        except zlib.error as exc:
+            raise ValueError("Malformed gzip body") from exc
+        if len(out) > limit:
+            raise DecodedTooLargeError
+        if not decoder.eof or decoder.unused_data:
+            raise ValueError("Malformed gzip body")
+        return out
+    chunks: list[bytes] = []
+    size = 0
+    if encoding == "zstd":
+        # A truncated frame decodes to truncated JSON, which the route refuses.
+        decompressor = _zstd.ZstdDecompressor(max_window_size=_ZSTD_MAX_WINDOW)
+        try:
+            with decompressor.stream_reader(data) as reader:
+                while chunk := reader.read(_CHUNK):
+                    size += len(chunk)
+                    if size > limit:
+                        raise DecodedTooLargeError
+                    chunks.append(chunk)
+        except _zstd.ZstdError as exc:
+            raise ValueError("Malformed zstd body") from exc
+        return b"".join(chunks)
+    if encoding == "br":
+        decoder = _brotli.Decompressor()
+        try:
+            chunk = decoder.process(data, output_buffer_limit=_CHUNK)
+            while True:
+                size += len(chunk)
+                if size > limit:
+                    raise DecodedTooLargeError
+                chunks.append(chunk)
+                if decoder.is_finished():
+                    return b"".join(chunks)
+                chunk = decoder.process(b"", output_buffer_limit=_CHUNK)
+                if not chunk:
+                    raise ValueError("Truncated br body")
+        except _brotli.error as exc:
+            raise ValueError("Malformed br body") from exc
+    raise ValueError(f"Unsupported encoding {encoding!r}")
+
+
+def negotiate(accept_encoding: str) -> str | None:
+    """The first of ENCODINGS the Accept-Encoding header allows, if any."""
+    accepted: dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.partition(";")
+        quality = 1.0
+        name, _, value = params.strip().partition("=")
+        if name == "q":
+            try:
+                quality = float(value)
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip()] = quality
+    for encoding in ENCODINGS:
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+async def _run(func: Any, encoding: str, data: bytes, *args: int) -> bytes:
+    if len(data) < _THREAD_MIN_BYTES:
+        result: bytes = func(encoding, data, *args)
+        return result
+    return await asyncio.to_thread(func, encoding, data, *args)
+
+
+def _compressible(headers: MutableHeaders) -> bool:
+    content_type = headers.get("content-type", "")
+    return content_type.startswith(_COMPRESSIBLE_TYPES) and not (
+        content_type.startswith(_UNCOMPRESSED_TYPES)
+    )
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        content_encoding = headers.get("content-encoding", "identity").lower()
+        if content_encoding != "identity":
+            decoded = await self._decode_request(scope, receive, send, content_encoding)
+            if decoded is None:
+                return
+            scope, receive = decoded
+
+        encoding = None
+        if scope["method"] != "HEAD":
+            encoding = negotiate(headers.get("accept-encoding", ""))
+        await self.app(scope, receive, _CompressingSend(send, encoding))
+
+    async def _decode_request(
+        self, scope: Scope, receive: Receive, send: Send, encoding: str
+    ) -> tuple[Scope, Receive] | None:
+        """
+        The scope and receive for the decoded body, or None once an error
+        response has been sent.
+        """
+        if not _AVAILABLE.get(encoding):
+            supported = ", ".join(e for e, ok in _AVAILABLE.items() if ok)
+            await JSONResponse(
+                {"detail": f"Unsupported Content-Encoding {encoding!r}"},
+                status_code=415,
+                headers={"Accept-Encoding": supported},
+            )(scope, receive, send)
+            return None
+
+        # Compressed input is capped too: it is never larger than its output
+        # by more than a few bytes.
+        body = bytearray()
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if len(body) > MAX_DECODED_BYTES:
+                break
+
+        started = time.perf_counter()
+        try:
+            if len(body) > MAX_DECODED_BYTES:
+                raise DecodedTooLargeError
+            data = await _run(decompress, encoding, bytes(body), MAX_DECODED_BYTES)
+        except DecodedTooLargeError:
+            await JSONResponse({"detail": "Request body too large"}, status_code=413)(
+                scope, receive, send
+            )
+            return None
+        except ValueError as exc:
+            await JSONResponse({"detail": str(exc)}, status_code=400)(
+                scope, receive, send
+            )
+            return None
+        metrics.add_span("decompress", time.perf_counter() - started)
+
+        request_headers = [
+            (name, value)
+            for name, value in scope["headers"]
+            if name not in (b"content-encoding", b"content-length")
+        ]
+        request_headers.append((b"content-length", str(len(data)).encode()))
+        replayed = False
+
+        async def decoded_receive() -> Message:
+            nonlocal replayed
+            if replayed:
+                return await receive()
+            replayed = True
+            return {"type": "http.request", "body": data, "more_body": False}
+
+        return {**scope, "headers": request_headers}, decoded_receive
+
+
+class _CompressingSend:
+    """
+    Holds http.response.start until the first body message shows whether
+    the whole body came in one piece, then compresses it if worthwhile.
+    """
+
+    def __init__(self, send: Send, encoding: str | None) -> None:
+        self.send = send
+        self.encoding = encoding
+        self.pending: tuple[Message, str] | None = None
+
+    async def __call__(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            headers = MutableHeaders(raw=list(message.get("headers", ())))
+            if "content-encoding" in headers or not _compressible(headers):
+                await self.send(message)
+                return
+            headers.add_vary_header("Accept-Encoding")
+            message = {**message, "headers": headers.raw}
+            if self.encoding is None or message["status"] in (204, 304):
+                await self.send(message)
+                return
+            self.pending = message, self.encoding
+            return
+
+        if self.pending is None or message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        (start, encoding), self.pending = self.pending, None
+        body: bytes = message.get("body", b"")
+        if message.get("more_body", False) or len(body) < MIN_BYTES:
+            await self.send(start)
+            await self.send(message)
+            return
+
+        started = time.perf_counter()
+        compressed = await _run(compress, encoding, body)
+        metrics.add_span("compress", time.perf_counter() - started)
+        headers = MutableHeaders(raw=start["headers"])
+        headers["Content-Encoding"] = encoding
+        headers["Content-Length"] = str(len(compressed))
+        etag = headers.get("etag")
+        if etag is not None and not etag.startswith("W/"):
+            headers["ETag"] = f"W/{etag}"
+        await self.send(start)
+        await self.send({**message, "body": compressed})
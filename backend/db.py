@@ -1,37 +1,238 @@
+import asyncio
 import logging
 import os
+import time
+from collections.abc import Generator
+from typing import Any
 
 import asyncpg  # type: ignore[import-untyped]
+import orjson
 
+import metrics
 from utils import require_env
 
 logger = logging.getLogger(__name__)
 
 DATABASE_URL: str = require_env("DATABASE_URL")
 
-_pool: asyncpg.Pool | None = None
+_pool: "_MeteredPool | None" = None
+_pool_lock = asyncio.Lock()
 
 
-async def get_db_pool() -> asyncpg.Pool:
+def _ssl_mode() -> str | None:
+    return "require" if os.getenv("DATABASE_SSL") == "true" else None
+
+
+# Binary JSONB is a version byte followed by the JSON text.
+_JSONB_VERSION = b"\x01"
+
+
+def _encode_json(value: Any) -> bytes:
+    """bytes are taken as already-serialised JSON and sent untouched."""
+    if isinstance(value, bytes | bytearray | memoryview):
+        return bytes(value)
+    return orjson.dumps(value)
+
+
+def _encode_jsonb(value: Any) -> bytes:
+    return _JSONB_VERSION + _encode_json(value)
+
+
+def _decode_jsonb(data: bytes) -> Any:
+    return orjson.loads(memoryview(data)[1:])
+
+
+async def _init_connection(conn: asyncpg.Connection) -> None:
+    """
+    JSON / JSONB parameters and results go through orjson in binary format:
+    Python values in and out, or raw JSON bytes in (see _encode_json).
+    Select `column::text` to get the stored JSON back without decoding it.
+    """
+    await conn.set_type_codec(
+        "json",
+        schema="pg_catalog",
+        encoder=_encode_json,
+        decoder=orjson.loads,
+        format="binary",
+    )
+    await conn.set_type_codec(
+        "jsonb",
+        schema="pg_catalog",
+        encoder=_encode_jsonb,
+        decoder=_decode_jsonb,
+        format="binary",
+    )
+    # asyncpg looks up array types on a connection's first statement that
+    # uses one (~10 ms); the revision lists in the hot project queries are
+    # bigint[]. Pay it here, which for the pool's first connections means
+    # during the startup warm-up rather than in a request.
+    await conn.prepare("SELECT $1::bigint[]")
+
+
+def _observe_query(query: str, started: float) -> None:
+    elapsed = time.perf_counter() - started
+    metrics.db_query_duration.observe(elapsed, metrics.statement_label(query))
+    metrics.add_span("db", elapsed)
+
+
+class _MeteredConnection(asyncpg.Connection):
+    """Pooled connection that times each statement for metrics.py."""
+
+    async def execute(self, query: str, *args: Any, **kwargs: Any) -> Any:
+        started = time.perf_counter()
+        try:
+            return await super().execute(query, *args, **kwargs)
+        finally:
+            _observe_query(query, started)
+
+    async def executemany(self, query: str, *args: Any, **kwargs: Any) -> Any:
+        started = time.perf_counter()
+        try:
+            return await super().executemany(query, *args, **kwargs)
+        finally:
+            _observe_query(query, started)
+
+    async def fetch(self, query: str, *args: Any, **kwargs: Any) -> Any:
+        started = time.perf_counter()
+        try:
+            return await super().fetch(query, *args, **kwargs)
+        finally:
+            _observe_query(query, started)
+
+    async def fetchrow(self, query: str, *args: Any, **kwargs: Any) -> Any:
+        started = time.perf_counter()
+        try:
+            return await super().fetchrow(query, *args, **kwargs)
+        finally:
+            _observe_query(query, started)
+
+    async def fetchval(self, query: str, *args: Any, **kwargs: Any) -> Any:
+        started = time.perf_counter()
+        try:
+            return await super().fetchval(query, *args, **kwargs)
+        finally:
+            _observe_query(query, started)
+
+
+def _observe_acquire(started: float) -> None:
+    elapsed = time.perf_counter() - started
+    metrics.db_pool_acquire_duration.observe(elapsed)
+    metrics.add_span("db_acquire", elapsed)
+
+
+class _TimedAcquire:
+    """pool.acquire(), reporting how long it waited for a connection."""
+
+    def __init__(self, acquiring: Any) -> None:
+        self._acquiring = acquiring
+
+    async def __aenter__(self) -> Any:
+        started = time.perf_counter()
+        try:
+            return await self._acquiring.__aenter__()
+        finally:
+            _observe_acquire(started)
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self._acquiring.__aexit__(*exc_info)
+
+    def __await__(self) -> Generator[Any, None, Any]:
+        return self._wait().__await__()
+
+    async def _wait(self) -> Any:
+        # `conn = await pool.acquire()`, to be handed back with release().
+        started = time.perf_counter()
+        try:
+            return await self._acquiring
+        finally:
+            _observe_acquire(started)
+
+
+class _MeteredPool:
+    """
+    The pool asyncpg.create_pool() made, with acquire() and the query
+    shortcuts timing the wait for a connection; everything else (close(),
+    release(), get_size(), ...) is the pool's own.
+    """
+
+    def __init__(self, pool: asyncpg.Pool) -> None:
+        self._pool = pool
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._pool, name)
+
+    def acquire(self, *, timeout: float | None = None) -> _TimedAcquire:
+        return _TimedAcquire(self._pool.acquire(timeout=timeout))
+
+    # As asyncpg.Pool's, but through the acquire() above.
+    async def execute(self, query: str, *args: Any, **kwargs: Any) -> Any:
+        async with self.acquire() as conn:
+            return await conn.execute(query, *args, **kwargs)
+
+    async def executemany(self, query: str, *args: Any, **kwargs: Any) -> Any:
+        async with self.acquire() as conn:
+            return await conn.executemany(query, *args, **kwargs)
+
+    async def fetch(self, query: str, *args: Any, **kwargs: Any) -> Any:
+        async with self.acquire() as conn:
+            return await conn.fetch(query, *args, **kwargs)
+
+    async def fetchrow(self, query: str, *args: Any, **kwargs: Any) -> Any:
+        async with self.acquire() as conn:
+            return await conn.fetchrow(query, *args, **kwargs)
+
+    async def fetchval(self, query: str, *args: Any, **kwargs: Any) -> Any:
+        async with self.acquire() as conn:
+            return await conn.fetchval(query, *args, **kwargs)
+
+
+async def get_db_pool() -> _MeteredPool:
     """Return the shared asyncpg connection pool, creating it on first call."""
     global _pool
-    if _pool is None:
-        ssl = "require" if os.getenv("DATABASE_SSL") == "true" else None
-        try:
-            _pool = await asyncpg.create_pool(
-                DATABASE_URL,
-                ssl=ssl,
-                min_size=2,
-                max_size=20,
-                command_timeout=30,
-            )
-            logger.info("Database pool created")
-        except Exception:
-            logger.exception("Failed to create database pool")
-            raise
+    if _pool is not None:
+        return _pool
+    # The warm-up and early requests can ask at once; create a single pool.
+    async with _pool_lock:
+        if _pool is None:
+            try:
+                _pool = _MeteredPool(
+                    await asyncpg.create_pool(
+                        DATABASE_URL,
+                        ssl=_ssl_mode(),
+                        min_size=2,
+                        max_size=20,
+                        command_timeout=30,
+                        init=_init_connection,
+                        connection_class=_MeteredConnection,
+                    )
+                )
+                logger.info("Database pool created")
+            except Exception:
+                logger.exception("Failed to create database pool")
+                raise
     return _pool
 
 
+def pool_stats() -> dict[str, int]:
+    """Connections in the pool, for /metrics; empty before the pool exists."""
+    if _pool is None:
+        return {}
+    size, idle = _pool.get_size(), _pool.get_idle_size()
+    return {
+        "size": size,
+        "idle": idle,
+        "in_use": size - idle,
+        "max_size": _pool.get_max_size(),
+    }
+
+
+async def connect_standalone() -> asyncpg.Connection:
+    """Open a dedicated connection outside the pool (e.g. for LISTEN)."""
+    conn = await asyncpg.connect(DATABASE_URL, ssl=_ssl_mode())
+    await _init_connection(conn)
+    return conn
+
+
 async def close_db_pool() -> None:
     """Gracefully close the connection pool on shutdown."""
     global _pool
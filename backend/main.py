@@ -1,20 +1,54 @@
+import asyncio
+import contextlib
 import logging
 import os
+import secrets
+import time
 from collections.abc import AsyncIterator
 from contextlib import asynccontextmanager
 from pathlib import Path
 
 from dotenv import load_dotenv
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException, Response, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
 load_dotenv(Path(__file__).resolve().parents[1] / ".env")
 
 # because env should be loaded before importing the routes. is it a hack? idts.
+import compression  # noqa: E402
+import metrics  # noqa: E402
+from ai.routes import (  # noqa: E402
+    context_cache,
+    model_client,
+    rate_limiter,
+    response_cache,
+)
 from ai.routes import router as ai_router  # noqa: E402
+from api.autosave import autosave  # noqa: E402
+from api.filmstrips import router as filmstrips_router  # noqa: E402
+from api.proxies import router as proxies_router  # noqa: E402
 from api.routes import router as api_router  # noqa: E402
+from api.storage_usage import (  # noqa: E402
+    start_storage_reconciler,
+    stop_storage_reconciler,
+)
+from api.uploads import router as uploads_router  # noqa: E402
+from api.uploads import (  # noqa: E402
+    start_upload_cleanup,
+    stop_upload_cleanup,
+)
+from api.uploads import stats as upload_stats  # noqa: E402
+from api.waveforms import router as waveforms_router  # noqa: E402
 from auth.routes import router as auth_router  # noqa: E402
-from db import close_db_pool  # noqa: E402
+from auth.session_cache import (  # noqa: E402
+    session_cache,
+    start_session_cache_listener,
+    stop_session_cache_listener,
+)
+from db import close_db_pool, get_db_pool, pool_stats  # noqa: E402
+from media.worker import start_media_worker, stop_media_worker  # noqa: E402
+from media.worker import stats as media_worker_stats  # noqa: E402
 
 logging.basicConfig(
     level=logging.INFO,
@@ -22,11 +56,70 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# GET /metrics is off unless set; scrapers send "Authorization: Bearer <token>".
+_METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+metrics.register_stats("db_pool", pool_stats)
+metrics.register_stats("session_cache", session_cache.stats)
+metrics.register_stats("autosave", autosave.stats)
+metrics.register_stats("uploads", upload_stats)
+metrics.register_stats("media_worker", media_worker_stats)
+if context_cache is not None:
+    metrics.register_stats("ai_context_cache", context_cache.stats)
+if response_cache is not None:
+    metrics.register_stats("ai_response_cache", response_cache.stats)
+
+
+_WARM_UP_MAX_RETRY_SECONDS = 30.0
+_warm_up_task: asyncio.Task[None] | None = None
+_ready = False
+
+
+async def _warm_up() -> None:
+    """
+    Do what the first requests would otherwise wait for: open the DB pool,
+    create the rate-limit table and load the model SDK. It runs after
+    startup, so /beep answers at once; /ready turns 200 when this is done.
+    """
+    global _ready
+    started = time.perf_counter()
+    delay = 1.0
+    while True:
+        try:
+            await get_db_pool()
+            await rate_limiter.warm_up()
+            await model_client.warm_up()
+            break
+        except Exception:
+            logger.exception("Warm-up failed; retrying in %.0f s", delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, _WARM_UP_MAX_RETRY_SECONDS)
+    _ready = True
+    logger.info("Warm-up done in %.2f s", time.perf_counter() - started)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    global _ready, _warm_up_task
     logger.info("Starting up")
+    _warm_up_task = asyncio.create_task(_warm_up())
+    await start_session_cache_listener()
+    await start_storage_reconciler()
+    await start_upload_cleanup()
+    await start_media_worker()
     yield
+    _ready = False
+    _warm_up_task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await _warm_up_task
+    # Before the pool goes: acknowledged autosaves must reach the database.
+    await autosave.close()
+    await stop_media_worker()
+    await stop_upload_cleanup()
+    await stop_storage_reconciler()
+    await stop_session_cache_listener()
+    if context_cache is not None:
+        await context_cache.close()
     logger.info("Shutting down — closing DB pool")
     await close_db_pool()
 
@@ -38,13 +131,18 @@ _ALLOWED_ORIGINS = [
     "http://localhost:5173",  # Vite dev server
 ]
 
+# Inside CORS, so its 413/415 refusals still carry the CORS headers.
+app.add_middleware(compression.CompressionMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=_ALLOWED_ORIGINS,
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
-    allow_headers=["Content-Type", "Authorization"],
+    allow_headers=["Content-Type", "Content-Encoding", "Authorization"],
 )
+# Added last, so it is outermost: it times the whole request, including
+# compression, and records body sizes as they go over the wire.
+app.add_middleware(metrics.MetricsMiddleware)
 
 
 @app.get("/beep")
@@ -52,9 +150,37 @@ async def beep() -> dict:
     return {"message": "boop"}
 
 
+@app.get("/ready")
+async def ready(response: Response) -> dict:
+    """Readiness: 503 until the startup warm-up is done (/beep is liveness)."""
+    if not _ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return {"ready": _ready}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics(
+    authorization: str | None = Header(default=None),
+) -> PlainTextResponse:
+    """This process's metrics (see metrics.py), in the Prometheus text format."""
+    if not _METRICS_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    if authorization is None or not secrets.compare_digest(
+        authorization.encode(), f"Bearer {_METRICS_TOKEN}".encode()
+    ):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+    return PlainTextResponse(
+        metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 app.include_router(auth_router)
 app.include_router(ai_router)
 app.include_router(api_router)
+app.include_router(uploads_router)
+app.include_router(waveforms_router)
+app.include_router(filmstrips_router)
+app.include_router(proxies_router)
 
 if __name__ == "__main__":
     import uvicorn
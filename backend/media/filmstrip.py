@@ -0,0 +1,178 @@
+"""
+Filmstrips: video frames at a few densities, packed into JPEG sprite sheets
+for the timeline to draw clips from.
+
+build_filmstrip decodes the video once with ffmpeg. It takes a frame every
+INTERVALS[0] seconds, scaled to TILE_HEIGHT, and keeps every 4th of those for
+the next level, and so on, so level n has a frame every 0.5 * 4**n seconds.
+Levels that would exceed MAX_FRAMES frames are skipped, so a long video
+starts at a coarser level. Each level's frames are tiled COLUMNS x ROWS to a
+sheet, in time order, left to right, then top to bottom. The last sheet of a
+level may be partly filled.
+
+Frame i of a level is at i * interval seconds, on sheet i // (COLUMNS * ROWS);
+Filmstrip.tile does that arithmetic. Like media/probe.py, build_filmstrip
+runs in the worker's processes and imports nothing from the app.
+"""
+
+import math
+import subprocess
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from media.probe import probe_file
+
+# Seconds between frames, densest first; each is 4x the one before.
+INTERVALS = (0.5, 2.0, 8.0, 32.0, 128.0)
+MAX_FRAMES = 3600
+# The timeline's tracks are 52 px high; this leaves room for HiDPI screens.
+TILE_HEIGHT = 72
+COLUMNS = 10
+ROWS = 10
+# ffmpeg's JPEG quality scale: 2 (best) to 31.
+_JPEG_QUALITY = 6
+
+
+class FilmstripError(ValueError):
+    pass
+
+
+def _intervals(duration: float | None) -> list[float]:
+    if duration is None:
+        return list(INTERVALS)
+    # Not so dense that there are too many frames, nor so sparse that there
+    # is only the first one; a level of some sort either way.
+    kept = [
+        interval
+        for interval in INTERVALS
+        if duration / interval <= MAX_FRAMES and interval <= duration
+    ]
+    return kept or [min(INTERVALS[-1], max(INTERVALS[0], duration))]
+
+
+def build_filmstrip(
+    ffmpeg: str, source: str, dest: str, duration: float | None
+) -> dict[str, Any]:
+    """
+    Write the sheets of `source` into directory `dest` as <level>_<n>.jpg;
+    returns their layout (see Filmstrip).
+    """
+    intervals = _intervals(duration)
+    splits = "".join(f"[s{level}]" for level in range(len(intervals)))
+    graph = [
+        f"[0:v]fps=1/{intervals[0]},scale=-2:{TILE_HEIGHT},"
+        f"split={len(intervals)}{splits}"
+    ]
+    outputs: list[str] = []
+    for level, interval in enumerate(intervals):
+        step = round(interval / intervals[0])
+        select = f"select='not(mod(n\\,{step}))'," if step > 1 else ""
+        graph.append(f"[s{level}]{select}tile={COLUMNS}x{ROWS}[o{level}]")
+        outputs += [
+            "-map", f"[o{level}]",
+            "-fps_mode", "passthrough",
+            "-q:v", str(_JPEG_QUALITY),
+            "-start_number", "0",
+            f"{dest}/{level}_%d.jpg",
+        ]  # fmt: skip
+    command = [
+        ffmpeg, "-nostdin", "-v", "error",
+        "-an", "-sn", "-i", source,
+        "-filter_complex", ";".join(graph),
+        *outputs,
+    ]  # fmt: skip
+
+    with tempfile.TemporaryFile() as errors:
+        result = subprocess.run(command, stderr=errors, check=False)
+        sheets = [
+            len(list(Path(dest).glob(f"{level}_*.jpg")))
+            for level in range(len(intervals))
+        ]
+        if result.returncode != 0 or not sheets[0]:
+            errors.seek(0)
+            message = errors.read(2000).decode(errors="replace").strip()
+            if not sheets[0] and (not message or "matches no streams" in message):
+                message = "No video stream"
+            raise FilmstripError(message)
+
+    first = probe_file(f"{dest}/0_0.jpg")
+    assert first.width is not None and first.height is not None
+    per_sheet = COLUMNS * ROWS
+    return {
+        "tile_width": first.width // COLUMNS,
+        "tile_height": first.height // ROWS,
+        "columns": COLUMNS,
+        "rows": ROWS,
+        "levels": [
+            {
+                "interval": interval,
+                # Up to the last frame before the end, when the end is known.
+                "frames": min(
+                    count * per_sheet,
+                    math.floor(duration / interval) + 1
+                    if duration
+                    else count * per_sheet,
+                ),
+                "sheets": count,
+            }
+            for interval, count in zip(intervals, sheets, strict=True)
+        ],
+    }
+
+
+@dataclass(frozen=True)
+class Tile:
+    time: float
+    sheet: int
+    x: int
+    y: int
+
+
+@dataclass(frozen=True)
+class Filmstrip:
+    """The layout build_filmstrip returned, as stored in media_filmstrips."""
+
+    tile_width: int
+    tile_height: int
+    columns: int
+    rows: int
+    levels: list[dict[str, Any]]
+
+    def level_for(self, pixels_per_second: float) -> int:
+        """The densest level whose tiles, drawn at this zoom, do not overlap."""
+        for level, info in enumerate(self.levels):
+            if info["interval"] * pixels_per_second >= self.tile_width:
+                return level
+        return len(self.levels) - 1
+
+    def tile(self, level: int, frame: int) -> Tile:
+        per_sheet = self.columns * self.rows
+        sheet, position = divmod(frame, per_sheet)
+        return Tile(
+            time=frame * self.levels[level]["interval"],
+            sheet=sheet,
+            x=position % self.columns * self.tile_width,
+            y=position // self.columns * self.tile_height,
+        )
+
+    def tiles(
+        self, start_s: float, end_s: float, pixels: int
+    ) -> tuple[int, list[Tile]]:
+        """
+        The level for drawing start_s..end_s across `pixels` pixels, and its
+        tiles covering that range: one per tile width on screen, at most.
+        """
+        pixels_per_second = pixels / (end_s - start_s)
+        level = self.level_for(pixels_per_second)
+        info = self.levels[level]
+        # Zoomed out past the coarsest level: skip frames so tiles fit.
+        step = max(
+            math.ceil(self.tile_width / (info["interval"] * pixels_per_second)), 1
+        )
+        first = math.floor(start_s / info["interval"] / step) * step
+        last = min(math.ceil(end_s / info["interval"]), info["frames"] - 1)
+        return level, [
+            self.tile(level, frame) for frame in range(first, last + 1, step)
+        ]
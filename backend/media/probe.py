@@ -0,0 +1,415 @@
+"""
+Media type, duration and frame size of a file, read from its container
+headers (no decoding, and no sample data is read).
+
+Understood: MP4/MOV/M4A, WebM/Matroska, WAV, MP3, FLAC, PNG, JPEG, GIF and
+WebP. Anything else, or a header that is cut short or malformed, raises
+ProbeError. A field the headers do not carry (a MediaRecorder WebM has no
+duration, say) is None.
+
+probe_file runs in worker processes (media/worker.py), so this module
+imports nothing from the app.
+"""
+
+import os
+import struct
+from dataclasses import dataclass
+from typing import BinaryIO
+
+# moov is read whole; real ones are a few MB even for long recordings.
+_MAX_MOOV_BYTES = 64 * 1024 * 1024
+_MAX_EBML_ELEMENT_BYTES = 16 * 1024 * 1024
+
+
+@dataclass(frozen=True)
+class Probe:
+    container: str
+    media_type: str  # video | audio | image
+    duration_seconds: float | None = None
+    width: int | None = None
+    height: int | None = None
+
+
+class ProbeError(ValueError):
+    pass
+
+
+def probe_file(path: str) -> Probe:
+    with open(path, "rb") as file:
+        head = file.read(64)
+        size = os.fstat(file.fileno()).st_size
+        file.seek(0)
+        try:
+            return _probe(file, size, head)
+        except (struct.error, IndexError) as exc:
+            # A header cut short, or fields pointing past the data read: the
+            # parsers index and unpack on trust, and this is where it ends.
+            raise ProbeError(f"Truncated or malformed header: {exc}") from exc
+
+
+def _probe(file: BinaryIO, size: int, head: bytes) -> Probe:
+    if head[4:8] == b"ftyp":
+        return _probe_iso_bmff(file, size, head)
+    if head[:4] == b"\x1a\x45\xdf\xa3":
+        return _probe_matroska(file, size)
+    if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+        return _probe_wav(file, size)
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return _probe_webp(head)
+    if head[:4] == b"fLaC":
+        return _probe_flac(head)
+    if head[:8] == b"\x89PNG\r\n\x1a\n":
+        width, height = struct.unpack(">II", head[16:24])
+        return Probe("png", "image", width=width, height=height)
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        width, height = struct.unpack("<HH", head[6:10])
+        return Probe("gif", "image", width=width, height=height)
+    if head[:3] == b"\xff\xd8\xff":
+        return _probe_jpeg(file)
+    if head[:3] == b"ID3" or (
+        len(head) >= 2 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0
+    ):
+        return _probe_mp3(file, size)
+    raise ProbeError("Unrecognised file format")
+
+
+def _read_exact(file: BinaryIO, count: int) -> bytes:
+    data = file.read(count)
+    if len(data) != count:
+        raise ProbeError("File ends inside a header")
+    return data
+
+
+# ─── MP4 / MOV (ISO base media file format) ──────────────────────────────────
+
+
+def _boxes(
+    data: bytes, start: int = 0, end: int | None = None
+) -> list[tuple[bytes, int, int]]:
+    """(type, payload start, payload end) of the boxes in data[start:end]."""
+    end = len(data) if end is None else end
+    boxes = []
+    while start + 8 <= end:
+        size, kind = struct.unpack(">I4s", data[start : start + 8])
+        header = 8
+        if size == 1:
+            (size,) = struct.unpack(">Q", data[start + 8 : start + 16])
+            header = 16
+        elif size == 0:
+            size = end - start
+        if size < header or start + size > end:
+            break
+        boxes.append((kind, start + header, start + size))
+        start += size
+    return boxes
+
+
+def _child(data: bytes, start: int, end: int, kind: bytes) -> tuple[int, int] | None:
+    for child, child_start, child_end in _boxes(data, start, end):
+        if child == kind:
+            return child_start, child_end
+    return None
+
+
+def _probe_iso_bmff(file: BinaryIO, size: int, head: bytes) -> Probe:
+    container = "mov" if head[8:12] == b"qt  " else "mp4"
+    # Walk the top-level boxes by their headers; mdat is skipped, not read.
+    moov = None
+    offset = 0
+    while offset + 8 <= size:
+        file.seek(offset)
+        box_size, kind = struct.unpack(">I4s", _read_exact(file, 8))
+        header = 8
+        if box_size == 1:
+            (box_size,) = struct.unpack(">Q", _read_exact(file, 8))
+            header = 16
+        elif box_size == 0:
+            box_size = size - offset
+        if box_size < header:
+            raise ProbeError("Malformed MP4 box")
+        if kind == b"moov":
+            if box_size > _MAX_MOOV_BYTES:
+                raise ProbeError("MP4 moov box too large")
+            moov = _read_exact(file, box_size - header)
+            break
+        offset += box_size
+    if moov is None:
+        raise ProbeError("MP4 file has no moov box")
+
+    duration = None
+    mvhd = _child(moov, 0, len(moov), b"mvhd")
+    if mvhd is not None:
+        start = mvhd[0]
+        if moov[start] == 1:
+            timescale, length = struct.unpack(">IQ", moov[start + 20 : start + 32])
+        else:
+            timescale, length = struct.unpack(">II", moov[start + 12 : start + 20])
+        if timescale and length:
+            duration = length / timescale
+
+    media_type = None
+    width = height = None
+    for kind, start, end in _boxes(moov):
+        if kind != b"trak":
+            continue
+        mdia = _child(moov, start, end, b"mdia")
+        hdlr = mdia and _child(moov, *mdia, b"hdlr")
+        handler = moov[hdlr[0] + 8 : hdlr[0] + 12] if hdlr else b""
+        if handler == b"soun" and media_type is None:
+            media_type = "audio"
+        if handler != b"vide" or width is not None:
+            continue
+        media_type = "video"
+        tkhd = _child(moov, start, end, b"tkhd")
+        if tkhd is None:
+            continue
+        # tkhd: version/flags, then 5 (v0) or 4 + 3 wide (v1) header fields,
+        # 8 reserved, 8 of layer/group/volume, the 3x3 matrix, then the
+        # 16.16 fixed-point width and height.
+        matrix = tkhd[0] + (40 if moov[tkhd[0]] == 0 else 52)
+        a, b = struct.unpack(">ii", moov[matrix : matrix + 8])
+        width, height = (
+            value >> 16
+            for value in struct.unpack(">II", moov[matrix + 36 : matrix + 44])
+        )
+        # Rotated 90° or 270°: the frame is shown on its side.
+        if a == 0 and b != 0:
+            width, height = height, width
+    if media_type is None:
+        raise ProbeError("MP4 file has no audio or video track")
+    return Probe(container, media_type, duration, width, height)
+
+
+# ─── WebM / Matroska (EBML) ──────────────────────────────────────────────────
+
+_SEGMENT = 0x18538067
+_INFO = 0x1549A966
+_TRACKS = 0x1654AE6B
+_CLUSTER = 0x1F43B675
+_UNKNOWN_SIZE = -1
+
+
+def _vint(data: bytes, offset: int, keep_marker: bool) -> tuple[int, int]:
+    """An EBML variable-length integer at `offset`: (value, its length)."""
+    first = data[offset]
+    length = 8 - first.bit_length() + 1
+    if first == 0 or offset + length > len(data):
+        raise ProbeError("Malformed EBML")
+    value = first if keep_marker else first & (0xFF >> length)
+    for byte in data[offset + 1 : offset + length]:
+        value = value << 8 | byte
+    if not keep_marker and value == (1 << (7 * length)) - 1:
+        value = _UNKNOWN_SIZE
+    return value, length
+
+
+def _elements(data: bytes) -> list[tuple[int, bytes]]:
+    elements = []
+    offset = 0
+    while offset < len(data):
+        element_id, id_length = _vint(data, offset, keep_marker=True)
+        size, size_length = _vint(data, offset + id_length, keep_marker=False)
+        start = offset + id_length + size_length
+        if size == _UNKNOWN_SIZE:
+            size = len(data) - start
+        elements.append((element_id, data[start : start + size]))
+        offset = start + size
+    return elements
+
+
+def _uint(data: bytes) -> int:
+    return int.from_bytes(data, "big")
+
+
+def _probe_matroska(file: BinaryIO, size: int) -> Probe:
+    data = _read_exact(file, min(size, 64))
+    _, id_length = _vint(data, 0, keep_marker=True)
+    header_size, size_length = _vint(data, id_length, keep_marker=False)
+    offset = id_length + size_length + header_size
+    file.seek(offset)
+    header = _read_exact(file, 12)
+    element_id, id_length = _vint(header, 0, keep_marker=True)
+    if element_id != _SEGMENT:
+        raise ProbeError("Matroska file has no segment")
+    _, size_length = _vint(header, id_length, keep_marker=False)
+    offset += id_length + size_length
+
+    # The segment's top-level elements, read by header until Info and
+    # Tracks are found; clusters (the media data) are skipped.
+    info = tracks = None
+    while offset < size and (info is None or tracks is None):
+        file.seek(offset)
+        header = file.read(12)
+        if len(header) < 2:
+            break
+        element_id, id_length = _vint(header, 0, keep_marker=True)
+        element_size, size_length = _vint(header, id_length, keep_marker=False)
+        offset += id_length + size_length
+        if element_size == _UNKNOWN_SIZE:
+            if element_id == _CLUSTER:
+                break
+            raise ProbeError("Matroska element of unknown size")
+        if element_id in (_INFO, _TRACKS):
+            if element_size > _MAX_EBML_ELEMENT_BYTES:
+                raise ProbeError("Matroska header element too large")
+            file.seek(offset)
+            body = _read_exact(file, element_size)
+            if element_id == _INFO:
+                info = body
+            else:
+                tracks = body
+        offset += element_size
+
+    duration = None
+    if info is not None:
+        fields = dict(_elements(info))
+        scale = _uint(fields.get(0x2AD7B1, b"")) or 1_000_000
+        if 0x4489 in fields:
+            raw = fields[0x4489]
+            ticks = struct.unpack(">d" if len(raw) == 8 else ">f", raw)[0]
+            duration = ticks * scale / 1e9 or None
+
+    media_type = None
+    width = height = None
+    for element_id, entry in _elements(tracks or b""):
+        if element_id != 0xAE:
+            continue
+        fields = dict(_elements(entry))
+        track_type = _uint(fields.get(0x83, b""))
+        if track_type == 2 and media_type is None:
+            media_type = "audio"
+        if track_type != 1 or width is not None:
+            continue
+        media_type = "video"
+        video = dict(_elements(fields.get(0xE0, b"")))
+        width = _uint(video.get(0x54B0, video.get(0xB0, b""))) or None
+        height = _uint(video.get(0x54BA, video.get(0xBA, b""))) or None
+    if media_type is None:
+        raise ProbeError("Matroska file has no audio or video track")
+    container = "webm" if b"webm" in data else "matroska"
+    return Probe(container, media_type, duration, width, height)
+
+
+# ─── Audio ───────────────────────────────────────────────────────────────────
+
+
+def _probe_wav(file: BinaryIO, size: int) -> Probe:
+    offset = 12
+    byte_rate = None
+    while offset + 8 <= size:
+        file.seek(offset)
+        kind, chunk_size = struct.unpack("<4sI", _read_exact(file, 8))
+        if kind == b"fmt ":
+            (byte_rate,) = struct.unpack("<I", _read_exact(file, 12)[8:12])
+        elif kind == b"data":
+            # Streamed WAVs can leave the data size unset; use what is there.
+            chunk_size = min(chunk_size, size - offset - 8)
+            duration = chunk_size / byte_rate if byte_rate else None
+            return Probe("wav", "audio", duration)
+        offset += 8 + chunk_size + chunk_size % 2
+    raise ProbeError("WAV file has no data chunk")
+
+
+def _probe_flac(head: bytes) -> Probe:
+    # STREAMINFO is always the first metadata block.
+    info = _uint(head[18:26])
+    sample_rate = info >> 44
+    total_samples = info & ((1 << 36) - 1)
+    duration = total_samples / sample_rate if sample_rate and total_samples else None
+    return Probe("flac", "audio", duration)
+
+
+# Bitrates (kbit/s) by index for MPEG-1 and MPEG-2/2.5 Layer III.
+_MP3_BITRATES = {
+    1: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_MP3_SAMPLE_RATES = {
+    1: (44100, 48000, 32000),
+    2: (22050, 24000, 16000),
+    25: (11025, 12000, 8000),
+}
+
+
+def _probe_mp3(file: BinaryIO, size: int) -> Probe:
+    start = 0
+    head = _read_exact(file, 10)
+    if head[:3] == b"ID3":
+        # Syncsafe size: 7 bits per byte.
+        tag_size = 0
+        for byte in head[6:10]:
+            tag_size = tag_size << 7 | byte & 0x7F
+        start = 10 + tag_size
+    file.seek(start)
+    data = file.read(4096)
+    frame = data.find(b"\xff")
+    while frame != -1 and frame + 4 <= len(data):
+        header = _uint(data[frame : frame + 4])
+        if header >> 21 == 0x7FF and (header >> 17) & 3 == 1:  # Layer III
+            break
+        frame = data.find(b"\xff", frame + 1)
+    else:
+        raise ProbeError("No MP3 frame found")
+
+    version = {3: 1, 2: 2, 0: 25}.get((header >> 19) & 3)
+    bitrate_index = (header >> 12) & 0xF
+    rate_index = (header >> 10) & 3
+    if version is None or rate_index == 3 or bitrate_index in (0, 15):
+        raise ProbeError("Malformed MP3 frame header")
+    sample_rate = _MP3_SAMPLE_RATES[version][rate_index]
+    samples_per_frame = 1152 if version == 1 else 576
+    mono = (header >> 6) & 3 == 3
+
+    # A Xing/Info (VBR) header after the side info gives the frame count.
+    side_info = (17 if mono else 32) if version == 1 else (9 if mono else 17)
+    xing = frame + 4 + side_info
+    if (
+        data[xing : xing + 4] in (b"Xing", b"Info")
+        and _uint(data[xing + 4 : xing + 8]) & 1
+    ):
+        frames = _uint(data[xing + 8 : xing + 12])
+        return Probe("mp3", "audio", frames * samples_per_frame / sample_rate)
+    if data[frame + 36 : frame + 40] == b"VBRI":
+        frames = _uint(data[frame + 50 : frame + 54])
+        return Probe("mp3", "audio", frames * samples_per_frame / sample_rate)
+    # Constant bitrate: the audio bytes over the bitrate.
+    bitrate = _MP3_BITRATES[1 if version == 1 else 2][bitrate_index] * 1000
+    return Probe("mp3", "audio", (size - start - frame) * 8 / bitrate)
+
+
+# ─── Images ──────────────────────────────────────────────────────────────────
+
+
+def _probe_webp(head: bytes) -> Probe:
+    kind = head[12:16]
+    if kind == b"VP8X":
+        width = _uint(head[24:27][::-1]) + 1
+        height = _uint(head[27:30][::-1]) + 1
+    elif kind == b"VP8 ":
+        width, height = (v & 0x3FFF for v in struct.unpack("<HH", head[26:30]))
+    elif kind == b"VP8L":
+        bits = struct.unpack("<I", head[21:25])[0]
+        width, height = (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    else:
+        raise ProbeError("Unknown WebP chunk")
+    return Probe("webp", "image", width=width, height=height)
+
+
+# Start-of-frame markers; C4 (DHT), C8 (JPG) and CC (DAC) share the range.
+_JPEG_SOF = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def _probe_jpeg(file: BinaryIO) -> Probe:
+    file.seek(2)
+    while True:
+        marker = _read_exact(file, 2)
+        if marker[0] != 0xFF:
+            raise ProbeError("Malformed JPEG")
+        if marker[1] == 0xFF:
+            file.seek(-1, os.SEEK_CUR)
+            continue
+        (length,) = struct.unpack(">H", _read_exact(file, 2))
+        if marker[1] in _JPEG_SOF:
+            height, width = struct.unpack(">xHH", _read_exact(file, 5))
+            return Probe("jpeg", "image", width=width, height=height)
+        file.seek(length - 2, os.SEEK_CUR)
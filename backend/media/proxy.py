@@ -0,0 +1,98 @@
+"""
+Proxies: small, quick-to-seek renditions of large videos for editing, with
+the original kept for export.
+
+build_proxy transcodes the first video and audio stream with ffmpeg to an
+MP4 of H.264 and AAC: the shorter side scaled down to PROXY_SIZE, a
+keyframe every KEYFRAME_SECONDS so the player can seek to any point without
+decoding far back, no B-frames and the x264 "fastdecode" tuning so scrubbing
+stays cheap, and the index at the front so playback starts before the file
+is fully loaded.
+
+Unlike the other media builders, this does not run in the worker's process
+pool: ffmpeg does the work in its own process, and build_proxy reads its
+progress (-progress) as it goes, on the event loop, to report it. It imports
+nothing from the app all the same.
+"""
+
+import asyncio
+import contextlib
+from collections.abc import Callable
+
+from media.probe import Probe, probe_file
+
+PROXY_SIZE = 540
+KEYFRAME_SECONDS = 1
+_CRF = 26
+_AUDIO_BITRATE = "128k"
+
+
+class ProxyError(ValueError):
+    pass
+
+
+def _command(ffmpeg: str, source: str, dest: str, threads: int) -> list[str]:
+    # The shorter side to PROXY_SIZE, or left alone when already smaller;
+    # -2 keeps the other side even, as H.264 needs.
+    scale = (
+        f"scale='if(gte(iw,ih),-2,min({PROXY_SIZE},iw))'"
+        f":'if(gte(iw,ih),min({PROXY_SIZE},ih),-2)'"
+    )
+    return [
+        ffmpeg, "-nostdin", "-v", "error", "-nostats",
+        "-progress", "pipe:1",
+        "-i", source,
+        "-map", "0:v:0", "-map", "0:a:0?", "-sn", "-dn",
+        "-vf", f"{scale},format=yuv420p",
+        "-c:v", "libx264", "-preset", "veryfast", "-tune", "fastdecode",
+        "-crf", str(_CRF), "-bf", "0",
+        "-force_key_frames", f"expr:gte(t,n_forced*{KEYFRAME_SECONDS})",
+        "-c:a", "aac", "-b:a", _AUDIO_BITRATE, "-ac", "2",
+        "-threads", str(threads),
+        "-movflags", "+faststart",
+        "-f", "mp4", "-y", dest,
+    ]  # fmt: skip
+
+
+async def build_proxy(
+    ffmpeg: str,
+    source: str,
+    dest: str,
+    duration: float | None,
+    on_progress: Callable[[float], None],
+    threads: int = 0,
+) -> Probe:
+    """
+    Write the proxy of `source` to `dest`; returns its probe. on_progress
+    gets the fraction done, 0..1, as ffmpeg reports it (only when the
+    duration is known). `threads` 0 lets ffmpeg pick.
+    """
+    proc = await asyncio.create_subprocess_exec(
+        *_command(ffmpeg, source, dest, threads),
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    assert proc.stdout is not None and proc.stderr is not None
+    # stderr is read alongside, so a chatty ffmpeg never blocks on it.
+    errors = asyncio.create_task(proc.stderr.read())
+    try:
+        async for line in proc.stdout:
+            key, _, value = line.decode(errors="replace").strip().partition("=")
+            if key == "out_time_us" and duration and value.isdigit():
+                on_progress(min(int(value) / 1e6 / duration, 1.0))
+        await proc.wait()
+    except BaseException:
+        # Cancelled (the worker is stopping): do not leave ffmpeg running.
+        with contextlib.suppress(ProcessLookupError):
+            proc.kill()
+        await proc.wait()
+        errors.cancel()
+        raise
+
+    message = (await errors)[:2000].decode(errors="replace").strip()
+    if proc.returncode != 0:
+        if "matches no streams" in message:
+            message = "No video stream"
+        raise ProxyError(message or f"ffmpeg exited with {proc.returncode}")
+    return await asyncio.to_thread(probe_file, dest)
@@ -0,0 +1,874 @@
+"""
+Background work on uploaded files: probing, then waveforms and filmstrips.
+
+A finished upload (api/uploads.py) is an assets row in status 'pending'.
+This worker claims pending rows with FOR UPDATE SKIP LOCKED, so several
+backend processes can run it side by side without taking the same row,
+reads each file's headers (media/probe.py), fills media_type,
+duration_seconds, width and height, and makes the asset 'ready'.
+
+Results are cached in media_probes by content_hash: a file that is already
+stored, uploaded again by anyone, is not probed a second time, and a batch
+probes each distinct file once. A file that is not media the probe
+understands is recorded with the error and its assets become ready with the
+values they had; any other failure (the object is missing, say) leaves the
+asset pending, to be retried after _PROBE_RETRY_SECONDS, doubled with each
+failed attempt. After _PROBE_ATTEMPTS of them the assets are marked
+'failed'.
+
+Probing runs in a pool of MEDIA_PROBE_WORKERS processes (one per CPU by
+default), which also caps the probes in flight, so it neither blocks the
+event loop nor competes for the GIL. Uploads wake the worker when they
+finish; every MEDIA_PROBE_POLL_SECONDS it also looks for rows left behind by
+a restart or by processes not running the worker.
+
+Once a file is probed as audio or video, its waveform peaks
+(media/waveform.py) are built, once per content_hash like the probe, and
+stored next to it in the object store under waveforms/<sha256>.peaks;
+media_waveforms records the key, or why there is none. Videos get
+filmstrips (media/filmstrip.py) the same way: sheets under
+filmstrips/<sha256>/, the layout in media_filmstrips. A build is claimed by
+inserting its row in status 'running' (as proxies are, below) and runs
+outside any transaction, in a pool of its own: at most MEDIA_WAVEFORM_JOBS
+decodes and MEDIA_FILMSTRIP_JOBS filmstrips at once, however busy the probes
+are.
+
+Ready videos larger than the proxy size get a proxy (media/proxy.py), an
+editing-friendly rendition stored under proxies/<sha256>.mp4 and recorded in
+media_proxies. Transcodes take minutes, so they are not claimed by holding a
+row lock: a media_proxies row is inserted in status 'running' instead, and
+its progress is written back every few seconds, which doubles as a
+heartbeat (waveform and filmstrip claims are refreshed just the same). The
+queue goes round the users waiting, least recently served first: a user's
+n-th waiting file comes after every other user's (n-1)-th, counting the
+builds they already have running, so one user's hundred uploads do not hold
+up the next user's one. At most MEDIA_PROXY_JOBS run at
+once per process. All three need ffmpeg (FFMPEG_PATH).
+
+What is built from a stored object is deleted with it, when the upload
+cleanup (api/uploads.py) finds no asset using it any more; derived_keys
+lists the files.
+"""
+
+import asyncio
+import contextlib
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+from collections.abc import Awaitable, Callable
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any
+
+from api.object_store import create_object_store
+from db import get_db_pool
+from media.filmstrip import FilmstripError, build_filmstrip
+from media.probe import Probe, ProbeError, probe_file
+from media.proxy import PROXY_SIZE, ProxyError, build_proxy
+from media.waveform import WaveformError, build_waveform
+
+logger = logging.getLogger(__name__)
+
+# 0 disables the worker (e.g. when other backend processes run it).
+MEDIA_PROBE_WORKERS = int(os.getenv("MEDIA_PROBE_WORKERS", str(os.cpu_count() or 1)))
+MEDIA_PROBE_POLL_SECONDS = float(os.getenv("MEDIA_PROBE_POLL_SECONDS", "30"))
+MEDIA_PROBE_BATCH = int(os.getenv("MEDIA_PROBE_BATCH", "32"))
+# Waveforms and filmstrips built at once per process, each in a process of
+# the builds' own pool (so a backlog of them never holds up probes).
+# 0 disables them.
+MEDIA_WAVEFORM_JOBS = int(
+    os.getenv("MEDIA_WAVEFORM_JOBS", str(max(MEDIA_PROBE_WORKERS // 2, 1)))
+)
+MEDIA_FILMSTRIP_JOBS = int(
+    os.getenv("MEDIA_FILMSTRIP_JOBS", str(max(MEDIA_PROBE_WORKERS // 2, 1)))
+)
+# Proxy transcodes at once per process; ffmpeg spreads each over its share
+# of the CPUs. 0 disables proxies.
+MEDIA_PROXY_JOBS = int(
+    os.getenv("MEDIA_PROXY_JOBS", str(max(MEDIA_PROBE_WORKERS // 4, 1)))
+)
+FFMPEG_PATH = os.getenv("FFMPEG_PATH", "ffmpeg")
+# How often a running build's claim (with a proxy's progress) is refreshed,
+# and how long without an update before it is taken to be abandoned (its
+# worker died).
+_CLAIM_HEARTBEAT_SECONDS = 2.0
+_CLAIM_STALE_SECONDS = 120.0
+# A probe that failed (not on the file's contents) is retried after this,
+# doubled each time, until the assets are failed after _PROBE_ATTEMPTS.
+_PROBE_RETRY_SECONDS = 60.0
+_PROBE_ATTEMPTS = 5
+
+object_store = create_object_store()
+
+# "probes", and "builds" for waveforms and filmstrips.
+_executors: dict[str, ProcessPoolExecutor] = {}
+_tasks: list[asyncio.Task[None]] = []
+_wake = asyncio.Event()
+_waveform_wake = asyncio.Event()
+_filmstrip_wake = asyncio.Event()
+_proxy_wake = asyncio.Event()
+_proxy_builds: set[asyncio.Task[None]] = set()
+# What this process runs the worker for but does not build, for want of
+# ffmpeg or jobs: "waveforms", "filmstrips" or "proxies".
+_disabled: set[str] = set()
+_counts = {
+    "ready": 0,
+    "probed": 0,
+    "cache_hits": 0,
+    "unreadable": 0,
+    "failed": 0,
+    "in_flight": 0,
+    "waveforms": 0,
+    "waveform_errors": 0,
+    "filmstrips": 0,
+    "filmstrip_errors": 0,
+    "proxies": 0,
+    "proxy_errors": 0,
+}
+
+
+def stats() -> dict[str, int]:
+    return {
+        "workers": MEDIA_PROBE_WORKERS if _tasks else 0,
+        **_counts,
+        "proxies_running": len(_proxy_builds),
+    }
+
+
+def disabled(kind: str) -> bool:
+    """
+    Whether `kind` ("waveforms", "filmstrips" or "proxies") is never built
+    here, so the routes can say so instead of asking to retry. False when
+    this process does not run the worker: others may build it.
+    """
+    return kind in _disabled
+
+
+def wake() -> None:
+    """Look for pending assets now rather than at the next poll."""
+    _wake.set()
+
+
+def _new_executor(workers: int) -> ProcessPoolExecutor:
+    # Spawned, not forked: a fork would copy the event loop and its sockets.
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+
+
+async def _probe(key: str) -> Probe | str | None:
+    """
+    What the object under `key` holds, or why it is not readable media; None
+    if probing failed for some other reason and should be retried.
+    """
+    loop = asyncio.get_running_loop()
+    _counts["in_flight"] += 1
+    try:
+        async with object_store.local_copy(key) as path:
+            return await loop.run_in_executor(
+                _executors["probes"], probe_file, str(path)
+            )
+    except ProbeError as exc:
+        return str(exc)
+    except BrokenProcessPool:
+        raise
+    except Exception:
+        logger.exception("Probing %s failed", key)
+        return None
+    finally:
+        _counts["in_flight"] -= 1
+
+
+async def probe_pending() -> int:
+    """Probe a batch of pending assets; returns how many were made ready."""
+    pool = await get_db_pool()
+    async with pool.acquire() as conn, conn.transaction():
+        rows = await conn.fetch(
+            """
+            SELECT a.id, a.stored_hash AS content_hash, o.object_key,
+                   p.content_hash IS NOT NULL AS probed
+            FROM assets a
+            JOIN stored_objects o ON o.content_hash = a.stored_hash
+            LEFT JOIN media_probes p ON p.content_hash = a.stored_hash
+            WHERE a.status = 'pending' AND a.deleted_at IS NULL
+              AND (o.probe_after IS NULL OR o.probe_after <= now())
+            ORDER BY a.created_at
+            LIMIT $1
+            FOR UPDATE OF a SKIP LOCKED
+            """,
+            MEDIA_PROBE_BATCH,
+        )
+        if not rows:
+            return 0
+        keys = {
+            row["content_hash"]: row["object_key"] for row in rows if not row["probed"]
+        }
+        results = dict(
+            zip(keys, await asyncio.gather(*map(_probe, keys.values())), strict=True)
+        )
+        await conn.executemany(
+            """
+            INSERT INTO media_probes
+                (content_hash, container, media_type, duration_seconds, width,
+                 height, error)
+            VALUES ($1, $2, $3, $4, $5, $6, $7)
+            ON CONFLICT (content_hash) DO NOTHING
+            """,
+            [
+                (content_hash, None, None, None, None, None, result)
+                if isinstance(result, str)
+                else (
+                    content_hash,
+                    result.container,
+                    result.media_type,
+                    result.duration_seconds,
+                    result.width,
+                    result.height,
+                    None,
+                )
+                for content_hash, result in results.items()
+                if result is not None
+            ],
+        )
+        retry = [key for key, result in results.items() if result is None]
+        given_up = 0
+        if retry:
+            given_up = await conn.fetchval(
+                """
+                WITH retried AS (
+                    UPDATE stored_objects
+                    SET probe_attempts = probe_attempts + 1,
+                        probe_after = now()
+                            + make_interval(secs => $2 * 2 ^ probe_attempts)
+                    WHERE content_hash = ANY($1::text[])
+                    RETURNING content_hash, probe_attempts
+                ),
+                failed AS (
+                    UPDATE assets a
+                    SET status = 'failed'
+                    FROM retried r
+                    WHERE a.stored_hash = r.content_hash AND r.probe_attempts >= $3
+                      AND a.status = 'pending' AND a.deleted_at IS NULL
+                    RETURNING a.id
+                )
+                SELECT count(*) FROM failed
+                """,
+                retry,
+                _PROBE_RETRY_SECONDS,
+                _PROBE_ATTEMPTS,
+            )
+        # What the file says wins over what the client declared. Assets
+        # whose probe failed have no media_probes row and stay pending
+        # (or were failed above).
+        updated = await conn.execute(
+            """
+            UPDATE assets a
+            SET media_type = coalesce(p.media_type, a.media_type),
+                duration_seconds = coalesce(p.duration_seconds, a.duration_seconds),
+                width = coalesce(p.width, a.width),
+                height = coalesce(p.height, a.height),
+                status = 'ready'
+            FROM media_probes p
+            WHERE a.id = ANY($1::uuid[]) AND p.content_hash = a.stored_hash
+            """,
+            [row["id"] for row in rows],
+        )
+
+    ready = int(updated.split()[-1])
+    unreadable = sum(isinstance(result, str) for result in results.values())
+    failed = sum(result is None for result in results.values())
+    _counts["ready"] += ready
+    _counts["probed"] += len(results) - failed
+    _counts["unreadable"] += unreadable
+    _counts["failed"] += failed
+    _counts["cache_hits"] += len(rows) - len(results)
+    if len(results) > unreadable + failed:
+        _waveform_wake.set()
+        _filmstrip_wake.set()
+    if ready:
+        _proxy_wake.set()
+    logger.info(
+        "Made %d assets ready (%d files probed, %d unreadable, %d failed)",
+        ready,
+        len(results) - failed,
+        unreadable,
+        failed,
+    )
+    if given_up:
+        logger.warning(
+            "Marked %d assets failed after %d probe attempts", given_up, _PROBE_ATTEMPTS
+        )
+    return ready
+
+
+async def _claim_builds(table: str, candidates: str, limit: int) -> list[Any]:
+    """
+    Take up to `limit` of the files the `candidates` query selects ($1 is its
+    LIMIT) by inserting their rows into `table` (media_waveforms or
+    media_filmstrips) in status 'running'; stale claims are deleted first.
+    """
+    pool = await get_db_pool()
+    async with pool.acquire() as conn, conn.transaction():
+        await conn.execute(
+            f"""
+            DELETE FROM {table}
+            WHERE status = 'running'
+              AND updated_at < now() - make_interval(secs => $1)
+            """,
+            _CLAIM_STALE_SECONDS,
+        )
+        # Another process may take the same files; the insert decides.
+        claimed: list[Any] = await conn.fetch(
+            f"""
+            WITH claimed AS (
+                INSERT INTO {table} (content_hash)
+                {candidates}
+                ON CONFLICT (content_hash) DO NOTHING
+                RETURNING content_hash, created_at
+            )
+            SELECT c.content_hash, c.created_at, o.object_key, p.duration_seconds
+            FROM claimed c
+            JOIN stored_objects o ON o.content_hash = c.content_hash
+            JOIN media_probes p ON p.content_hash = c.content_hash
+            """,
+            limit,
+        )
+    return claimed
+
+
+async def _run_builds(
+    table: str, rows: list[Any], build: Callable[[Any], Awaitable[str | None]]
+) -> int:
+    """
+    Run `build` on each claimed row, refreshing the claims meanwhile; returns
+    how many failed.
+    """
+    pool = await get_db_pool()
+
+    async def heartbeat() -> None:
+        while True:
+            await asyncio.sleep(_CLAIM_HEARTBEAT_SECONDS)
+            await pool.execute(
+                f"""
+                UPDATE {table} t SET updated_at = now()
+                FROM unnest($1::text[], $2::timestamptz[]) AS c(content_hash, created_at)
+                WHERE t.content_hash = c.content_hash
+                  AND t.created_at = c.created_at AND t.status = 'running'
+                """,
+                [row["content_hash"] for row in rows],
+                [row["created_at"] for row in rows],
+            )
+
+    beating = asyncio.create_task(heartbeat())
+    try:
+        errors = await asyncio.gather(*map(build, rows))
+    finally:
+        beating.cancel()
+    return sum(error is not None for error in errors)
+
+
+async def _record_build(
+    table: str, row: Any, keys: list[str], assignments: str, *values: Any
+) -> None:
+    """
+    Write a finished build into its claimed row. When the claim is gone, the
+    files built under `keys` are deleted if the stored object was too: the
+    cleanup did not know of them.
+    """
+    pool = await get_db_pool()
+    # The claim is named by its created_at too: after a stale claim was
+    # deleted and the file taken by someone else, this build no longer owns
+    # the row.
+    result = await pool.execute(
+        f"""
+        UPDATE {table}
+        SET status = 'done', updated_at = now(), {assignments}
+        WHERE content_hash = $1 AND created_at = $2 AND status = 'running'
+        """,
+        row["content_hash"],
+        row["created_at"],
+        *values,
+    )
+    if result != "UPDATE 0":
+        return
+    if await pool.fetchval(
+        "SELECT 1 FROM stored_objects WHERE content_hash = $1", row["content_hash"]
+    ):
+        logger.warning(
+            "Build of %s was taken over by another worker", row["object_key"]
+        )
+        return
+    for key in keys:
+        await object_store.delete(key)
+
+
+async def _release_build(table: str, row: Any) -> None:
+    """Give a claimed file back to the queue now rather than when it goes stale."""
+    pool = await get_db_pool()
+    await pool.execute(
+        f"""
+        DELETE FROM {table}
+        WHERE content_hash = $1 AND created_at = $2 AND status = 'running'
+        """,
+        row["content_hash"],
+        row["created_at"],
+    )
+
+
+async def _waveform(row: Any) -> str | None:
+    """Build and record the waveform `row` claimed; returns why there is none."""
+    loop = asyncio.get_running_loop()
+    key = row["object_key"]
+    dest_key = f"waveforms/{row['content_hash']}.peaks"
+    fd, built = tempfile.mkstemp(suffix=".peaks")
+    os.close(fd)
+    result: tuple[str | None, float | None, str | None]
+    try:
+        async with object_store.local_copy(key) as path:
+            duration = await loop.run_in_executor(
+                _executors["builds"], build_waveform, FFMPEG_PATH, str(path), built
+            )
+        await object_store.put_file(dest_key, Path(built))
+        result = dest_key, duration, None
+    except WaveformError as exc:
+        result = None, None, str(exc)
+    except (asyncio.CancelledError, BrokenProcessPool):
+        # Stopping, or the pool is restarted: try again later.
+        await _release_build("media_waveforms", row)
+        raise
+    except Exception as exc:
+        logger.exception("Building the waveform of %s failed", key)
+        result = None, None, f"{type(exc).__name__}: {exc}"
+    finally:
+        await asyncio.to_thread(Path(built).unlink, missing_ok=True)
+    await _record_build(
+        "media_waveforms",
+        row,
+        [dest_key] if result[0] else [],
+        "r2_key = $3, duration_seconds = $4, error = $5",
+        *result,
+    )
+    return result[2]
+
+
+async def derived_keys(conn: Any, hashes: list[str]) -> list[str]:
+    """
+    The object store keys built from these stored objects, for deleting
+    them along with the objects in `conn`'s transaction. Locks the rows that
+    name them first, so a build finishing meanwhile either is listed here or
+    finds its row gone and deletes its own files (_record_build,
+    _build_proxy).
+    """
+    for table in ("media_waveforms", "media_filmstrips", "media_proxies"):
+        await conn.execute(
+            f"SELECT 1 FROM {table} WHERE content_hash = ANY($1::text[]) FOR UPDATE",
+            hashes,
+        )
+    rows = await conn.fetch(
+        """
+        SELECT r2_key FROM media_waveforms
+        WHERE content_hash = ANY($1::text[]) AND r2_key IS NOT NULL
+        """,
+        hashes,
+    )
+    keys = [row["r2_key"] for row in rows]
+    rows = await conn.fetch(
+        """
+        SELECT r2_prefix, layout FROM media_filmstrips
+        WHERE content_hash = ANY($1::text[]) AND r2_prefix IS NOT NULL
+        """,
+        hashes,
+    )
+    keys += [
+        f"{row['r2_prefix']}/{level}_{sheet}.jpg"
+        for row in rows
+        for level, info in enumerate(row["layout"]["levels"])
+        for sheet in range(info["sheets"])
+    ]
+    rows = await conn.fetch(
+        """
+        SELECT r2_key FROM media_proxies
+        WHERE content_hash = ANY($1::text[]) AND r2_key IS NOT NULL
+        """,
+        hashes,
+    )
+    return keys + [row["r2_key"] for row in rows]
+
+
+async def build_waveforms() -> int:
+    """
+    Build the waveforms of up to MEDIA_WAVEFORM_JOBS probed audio and video
+    files that have none; returns how many were attempted.
+    """
+    # Failures are recorded too, so a file is not decoded over and over;
+    # delete the row to try again.
+    rows = await _claim_builds(
+        "media_waveforms",
+        """
+        SELECT p.content_hash
+        FROM media_probes p
+        LEFT JOIN media_waveforms w ON w.content_hash = p.content_hash
+        WHERE p.media_type IN ('audio', 'video') AND w.content_hash IS NULL
+        ORDER BY p.probed_at
+        LIMIT $1
+        """,
+        MEDIA_WAVEFORM_JOBS,
+    )
+    if not rows:
+        return 0
+    errors = await _run_builds("media_waveforms", rows, _waveform)
+    _counts["waveforms"] += len(rows) - errors
+    _counts["waveform_errors"] += errors
+    return len(rows)
+
+
+async def _filmstrip(row: Any) -> str | None:
+    """Build and record the filmstrip `row` claimed; returns why there is none."""
+    loop = asyncio.get_running_loop()
+    key = row["object_key"]
+    prefix = f"filmstrips/{row['content_hash']}"
+    built = Path(tempfile.mkdtemp(prefix="filmstrip-"))
+    stored: list[str] = []
+    result: tuple[str | None, dict[str, Any] | None, str | None]
+    try:
+        async with object_store.local_copy(key) as path:
+            layout = await loop.run_in_executor(
+                _executors["builds"],
+                build_filmstrip,
+                FFMPEG_PATH,
+                str(path),
+                str(built),
+                row["duration_seconds"],
+            )
+        for sheet in await asyncio.to_thread(sorted, built.iterdir()):
+            await object_store.put_file(f"{prefix}/{sheet.name}", sheet)
+            stored.append(f"{prefix}/{sheet.name}")
+        result = prefix, layout, None
+    except FilmstripError as exc:
+        result = None, None, str(exc)
+    except (asyncio.CancelledError, BrokenProcessPool):
+        await _release_build("media_filmstrips", row)
+        raise
+    except Exception as exc:
+        logger.exception("Building the filmstrip of %s failed", key)
+        result = None, None, f"{type(exc).__name__}: {exc}"
+    finally:
+        await asyncio.to_thread(shutil.rmtree, built, ignore_errors=True)
+    await _record_build(
+        "media_filmstrips",
+        row,
+        stored if result[0] else [],
+        "r2_prefix = $3, layout = $4, error = $5",
+        *result,
+    )
+    return result[2]
+
+
+async def build_filmstrips() -> int:
+    """
+    Build the filmstrips of up to MEDIA_FILMSTRIP_JOBS probed videos that
+    have none; returns how many were attempted.
+    """
+    # As for waveforms, failures are recorded too.
+    rows = await _claim_builds(
+        "media_filmstrips",
+        """
+        SELECT p.content_hash
+        FROM media_probes p
+        LEFT JOIN media_filmstrips f ON f.content_hash = p.content_hash
+        WHERE p.media_type = 'video' AND f.content_hash IS NULL
+        ORDER BY p.probed_at
+        LIMIT $1
+        """,
+        MEDIA_FILMSTRIP_JOBS,
+    )
+    if not rows:
+        return 0
+    errors = await _run_builds("media_filmstrips", rows, _filmstrip)
+    _counts["filmstrips"] += len(rows) - errors
+    _counts["filmstrip_errors"] += errors
+    return len(rows)
+
+
+async def claim_proxies(limit: int) -> list[Any]:
+    """
+    Take up to `limit` videos that need a proxy, fairly between the users
+    waiting for one, by inserting their media_proxies rows.
+    """
+    pool = await get_db_pool()
+    async with pool.acquire() as conn, conn.transaction():
+        await conn.execute(
+            """
+            DELETE FROM media_proxies
+            WHERE status = 'running'
+              AND updated_at < now() - make_interval(secs => $1)
+            """,
+            _CLAIM_STALE_SECONDS,
+        )
+        # A file several users have is queued for whoever added it first.
+        candidates = await conn.fetch(
+            """
+            WITH waiting AS (
+                SELECT DISTINCT ON (a.stored_hash)
+                       a.stored_hash AS content_hash, a.user_id, a.created_at
+                FROM assets a
+                JOIN media_probes p ON p.content_hash = a.stored_hash
+                LEFT JOIN media_proxies x ON x.content_hash = a.stored_hash
+                WHERE a.status = 'ready' AND a.deleted_at IS NULL
+                  AND x.content_hash IS NULL AND p.media_type = 'video'
+                  AND (p.width IS NULL OR p.height IS NULL
+                       OR least(p.width, p.height) > $2)
+                ORDER BY a.stored_hash, a.created_at
+            ),
+            users AS (
+                SELECT u.user_id,
+                       (SELECT count(*) FROM media_proxies r
+                        WHERE r.user_id = u.user_id AND r.status = 'running')
+                           AS builds,
+                       (SELECT max(r.started_at) FROM media_proxies r
+                        WHERE r.user_id = u.user_id) AS last_started
+                FROM (SELECT DISTINCT user_id FROM waiting) u
+            )
+            SELECT w.content_hash, w.user_id
+            FROM waiting w
+            JOIN users u ON u.user_id = w.user_id
+            ORDER BY row_number() OVER (
+                         PARTITION BY w.user_id ORDER BY w.created_at
+                     ) + u.builds,
+                     u.last_started NULLS FIRST,
+                     w.created_at
+            LIMIT $1
+            """,
+            limit,
+            PROXY_SIZE,
+        )
+        if not candidates:
+            return []
+        # Another process may have taken some since; the insert decides.
+        claimed: list[Any] = await conn.fetch(
+            """
+            WITH claimed AS (
+                INSERT INTO media_proxies (content_hash, user_id)
+                SELECT * FROM unnest($1::text[], $2::text[])
+                ON CONFLICT (content_hash) DO NOTHING
+                RETURNING content_hash, started_at
+            )
+            SELECT c.content_hash, c.started_at, o.object_key, p.duration_seconds
+            FROM claimed c
+            JOIN stored_objects o ON o.content_hash = c.content_hash
+            JOIN media_probes p ON p.content_hash = c.content_hash
+            """,
+            [row["content_hash"] for row in candidates],
+            [row["user_id"] for row in candidates],
+        )
+    return claimed
+
+
+async def _build_proxy(
+    content_hash: str, started_at: Any, key: str, duration: float | None
+) -> None:
+    """Build one claimed proxy and record how it went."""
+    pool = await get_db_pool()
+    # Every write names the claim too: after a stale claim was deleted and
+    # the file taken by someone else, this build no longer owns the row.
+    claim = "content_hash = $1 AND started_at = $2 AND status = 'running'"
+    dest_key = f"proxies/{content_hash}.mp4"
+    fd, built = tempfile.mkstemp(suffix=".mp4")
+    os.close(fd)
+    fraction = 0.0
+
+    def on_progress(value: float) -> None:
+        nonlocal fraction
+        fraction = value
+
+    async def report_progress() -> None:
+        while True:
+            await asyncio.sleep(_CLAIM_HEARTBEAT_SECONDS)
+            await pool.execute(
+                f"""
+                UPDATE media_proxies SET progress = $3, updated_at = now()
+                WHERE {claim}
+                """,
+                content_hash,
+                started_at,
+                fraction,
+            )
+
+    threads = max((os.cpu_count() or 1) // MEDIA_PROXY_JOBS, 1)
+    reporter = asyncio.create_task(report_progress())
+    try:
+        async with object_store.local_copy(key) as path:
+            probe = await build_proxy(
+                FFMPEG_PATH, str(path), built, duration, on_progress, threads
+            )
+        file_size = (await asyncio.to_thread(os.stat, built)).st_size
+        await object_store.put_file(dest_key, Path(built))
+        result = await pool.execute(
+            f"""
+            UPDATE media_proxies
+            SET status = 'ready', progress = 1, r2_key = $3, width = $4,
+                height = $5, file_size = $6, finished_at = now(),
+                updated_at = now()
+            WHERE {claim}
+            """,
+            content_hash,
+            started_at,
+            dest_key,
+            probe.width,
+            probe.height,
+            file_size,
+        )
+        _counts["proxies"] += 1
+    except asyncio.CancelledError:
+        # The worker is stopping: give the file back to the queue now rather
+        # than when the claim goes stale.
+        await pool.execute(
+            f"DELETE FROM media_proxies WHERE {claim}", content_hash, started_at
+        )
+        raise
+    except Exception as exc:
+        if isinstance(exc, ProxyError):
+            error = str(exc)
+        else:
+            logger.exception("Building the proxy of %s failed", key)
+            error = f"{type(exc).__name__}: {exc}"
+        result = await pool.execute(
+            f"""
+            UPDATE media_proxies
+            SET status = 'failed', error = $3, finished_at = now(),
+                updated_at = now()
+            WHERE {claim}
+            """,
+            content_hash,
+            started_at,
+            error,
+        )
+        _counts["proxy_errors"] += 1
+    finally:
+        reporter.cancel()
+        await asyncio.to_thread(Path(built).unlink, missing_ok=True)
+    if result == "UPDATE 0":
+        if await pool.fetchval(
+            "SELECT 1 FROM stored_objects WHERE content_hash = $1", content_hash
+        ):
+            logger.warning("Proxy of %s was taken over by another worker", key)
+        else:
+            # The object was deleted while this ran, before there was a
+            # proxy for the cleanup to delete with it.
+            await object_store.delete(dest_key)
+
+
+def _proxy_done(build: asyncio.Task[None]) -> None:
+    _proxy_builds.discard(build)
+    # A slot is free.
+    _proxy_wake.set()
+
+
+async def _run_proxies() -> None:
+    while True:
+        _proxy_wake.clear()
+        try:
+            if free := MEDIA_PROXY_JOBS - len(_proxy_builds):
+                for row in await claim_proxies(free):
+                    build = asyncio.create_task(
+                        _build_proxy(
+                            row["content_hash"],
+                            row["started_at"],
+                            row["object_key"],
+                            row["duration_seconds"],
+                        )
+                    )
+                    _proxy_builds.add(build)
+                    build.add_done_callback(_proxy_done)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Claiming proxies failed")
+        with contextlib.suppress(TimeoutError):
+            await asyncio.wait_for(_proxy_wake.wait(), MEDIA_PROBE_POLL_SECONDS)
+
+
+async def _run_forever(
+    job: Callable[[], Awaitable[int]],
+    batch: int,
+    wake: asyncio.Event,
+    executor: str,
+    workers: int,
+) -> None:
+    while True:
+        wake.clear()
+        running = _executors[executor]
+        try:
+            # A full batch means there may be more waiting.
+            while await job() == batch:
+                pass
+        except asyncio.CancelledError:
+            raise
+        except BrokenProcessPool:
+            # Waveforms and filmstrips share a pool; it is restarted once.
+            if _executors[executor] is running:
+                logger.exception("Media worker process died; restarting the pool")
+                running.shutdown(wait=False)
+                _executors[executor] = _new_executor(workers)
+        except Exception:
+            logger.exception("Media job %s failed", job.__name__)
+        with contextlib.suppress(TimeoutError):
+            await asyncio.wait_for(wake.wait(), MEDIA_PROBE_POLL_SECONDS)
+
+
+async def start_media_worker() -> None:
+    """
+    Start probing, and building waveforms, filmstrips and proxies unless
+    their MEDIA_*_JOBS is 0 or there is no ffmpeg; no-op when
+    MEDIA_PROBE_WORKERS is 0.
+    """
+    if MEDIA_PROBE_WORKERS <= 0 or _tasks:
+        return
+    _executors["probes"] = _new_executor(MEDIA_PROBE_WORKERS)
+    _tasks.append(
+        asyncio.create_task(
+            _run_forever(
+                probe_pending, MEDIA_PROBE_BATCH, _wake, "probes", MEDIA_PROBE_WORKERS
+            )
+        )
+    )
+    if shutil.which(FFMPEG_PATH) is None:
+        logger.warning(
+            "ffmpeg not found (FFMPEG_PATH=%s); no waveforms, filmstrips or proxies",
+            FFMPEG_PATH,
+        )
+        _disabled.update(("waveforms", "filmstrips", "proxies"))
+        return
+    builds = max(MEDIA_WAVEFORM_JOBS, 0) + max(MEDIA_FILMSTRIP_JOBS, 0)
+    if builds:
+        _executors["builds"] = _new_executor(builds)
+    for kind, job, jobs, wake in (
+        ("waveforms", build_waveforms, MEDIA_WAVEFORM_JOBS, _waveform_wake),
+        ("filmstrips", build_filmstrips, MEDIA_FILMSTRIP_JOBS, _filmstrip_wake),
+    ):
+        if jobs > 0:
+            _tasks.append(
+                asyncio.create_task(_run_forever(job, jobs, wake, "builds", builds))
+            )
+        else:
+            _disabled.add(kind)
+    if MEDIA_PROXY_JOBS > 0:
+        _tasks.append(asyncio.create_task(_run_proxies()))
+    else:
+        _disabled.add("proxies")
+
+
+async def stop_media_worker() -> None:
+    for task in [*_tasks, *_proxy_builds]:
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+    _tasks.clear()
+    _disabled.clear()
+    for executor in _executors.values():
+        await asyncio.to_thread(executor.shutdown, cancel_futures=True)
+    _executors.clear()
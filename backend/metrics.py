@@ -0,0 +1,286 @@
+"""
+Process-local request, database and model metrics.
+
+Counters and histograms live in this process and are rendered in the
+Prometheus text format by GET /metrics (main.py); with several worker
+processes, each one reports its own. MetricsMiddleware times every HTTP
+request per route template, and db.py reports pool acquires and statements.
+
+With METRICS_SERVER_TIMING=true the same request also gets a Server-Timing
+header: time spent waiting for and in the database, plus the span() blocks
+it ran (e.g. the model call in /ai). Spans that end after the response has
+started (a streamed reply) are only counted in the histograms.
+"""
+
+import os
+import time
+from bisect import bisect_left
+from collections.abc import Callable, Iterator, Mapping
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+SERVER_TIMING_ENABLED = os.getenv("METRICS_SERVER_TIMING", "false") == "true"
+
+_LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+_SIZE_BUCKETS = tuple(float(4**n * 256) for n in range(10))  # 256 B .. 64 MiB
+
+
+class Counter:
+    def __init__(
+        self, name: str, description: str, labels: tuple[str, ...] = ()
+    ) -> None:
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self._values: dict[tuple[str, ...], float] = {}
+        _METRICS.append(self)
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.description}"
+        yield f"# TYPE {self.name} counter"
+        for labels, value in self._values.items():
+            yield f"{self.name}{_labels(self.labels, labels)} {_number(value)}"
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = _LATENCY_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.buckets = buckets
+        # Per label set: a count per bucket (and one for +Inf), then the sum.
+        self._values: dict[tuple[str, ...], list[float]] = {}
+        _METRICS.append(self)
+
+    def observe(self, value: float, *labels: str) -> None:
+        counts = self._values.get(labels)
+        if counts is None:
+            counts = self._values[labels] = [0.0] * (len(self.buckets) + 2)
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.description}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, counts in self._values.items():
+            cumulative = 0.0
+            for bound, count in zip(
+                (*map(_number, self.buckets), "+Inf"), counts[:-1], strict=True
+            ):
+                cumulative += count
+                bucket = _labels((*self.labels, "le"), (*labels, bound))
+                yield f"{self.name}_bucket{bucket} {_number(cumulative)}"
+            suffix = _labels(self.labels, labels)
+            yield f"{self.name}_sum{suffix} {_number(counts[-1])}"
+            yield f"{self.name}_count{suffix} {_number(cumulative)}"
+
+
+_METRICS: list[Counter | Histogram] = []
+# name -> stats() of a cache or buffer, rendered as gauges (see register_stats).
+_STATS: dict[str, Callable[[], Mapping[str, int | float | bool]]] = {}
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds",
+    "Time from request to the end of the response body",
+    ("method", "route", "status"),
+)
+http_request_size = Histogram(
+    "http_request_size_bytes",
+    "Request body size",
+    ("method", "route"),
+    _SIZE_BUCKETS,
+)
+http_response_size = Histogram(
+    "http_response_size_bytes",
+    "Response body size, as sent",
+    ("method", "route"),
+    _SIZE_BUCKETS,
+)
+db_pool_acquire_duration = Histogram(
+    "db_pool_acquire_seconds",
+    "Time spent waiting for a pooled connection",
+)
+db_query_duration = Histogram(
+    "db_query_duration_seconds",
+    "Statement round trip, by statement",
+    ("statement",),
+)
+model_request_duration = Histogram(
+    "model_request_duration_seconds",
+    "Model calls, until the full reply has arrived",
+    ("operation", "outcome"),
+)
+model_tokens = Counter(
+    "model_tokens_total",
+    "Tokens reported by the model API",
+    ("kind",),
+)
+ai_rate_limit_rejections = Counter(
+    "ai_rate_limit_rejections_total",
+    "AI requests refused by the per-user rate limit",
+)
+
+
+def register_stats(
+    name: str, stats: Callable[[], Mapping[str, int | float | bool]]
+) -> None:
+    """Export each key of `stats()` as the gauge `<name>_<key>`."""
+    _STATS[name] = stats
+
+
+def render() -> str:
+    """Every metric and registered stats value, as Prometheus text."""
+    lines: list[str] = []
+    for metric in _METRICS:
+        lines.extend(metric.render())
+    for name, stats in _STATS.items():
+        for key, value in stats().items():
+            lines.append(f"# TYPE {name}_{key} gauge")
+            lines.append(f"{name}_{key} {_number(float(value))}")
+    return "\n".join(lines) + "\n"
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    pairs = (
+        f'{name}="{_escape(value)}"' for name, value in zip(names, values, strict=True)
+    )
+    return "{" + ",".join(pairs) + "}"
+
+
+@lru_cache(maxsize=1024)
+def statement_label(query: str) -> str:
+    """A statement's label: its SQL on one line, cut short."""
+    text = " ".join(query.split())
+    return text if len(text) <= 120 else text[:117] + "..."
+
+
+# Span name -> [seconds, count] for the request being handled.
+_request_timings: ContextVar[dict[str, list[float]] | None] = ContextVar(
+    "request_timings", default=None
+)
+
+
+def add_span(name: str, seconds: float) -> None:
+    """Add `seconds` to the current request's `name` span, if in a request."""
+    timings = _request_timings.get()
+    if timings is not None:
+        span = timings.setdefault(name, [0.0, 0])
+        span[0] += seconds
+        span[1] += 1
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Time the block as part of the current request's Server-Timing."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_span(name, time.perf_counter() - started)
+
+
+def _server_timing(timings: dict[str, list[float]], total: float) -> bytes:
+    entries = [
+        f"{name};dur={seconds * 1000:.2f}"
+        + (f';desc="{int(count)} calls"' if count > 1 else "")
+        for name, (seconds, count) in timings.items()
+    ]
+    entries.append(f"app;dur={total * 1000:.2f}")
+    return ", ".join(entries).encode()
+
+
+class MetricsMiddleware:
+    """
+    Records latency and body sizes per route template; the route is only
+    known once routing is done, so unmatched paths (404s) share one label.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        timings: dict[str, list[float]] = {}
+        token = _request_timings.set(timings)
+        status = 500
+        request_bytes = 0
+        response_bytes = 0
+
+        async def counting_receive() -> Message:
+            nonlocal request_bytes
+            message = await receive()
+            if message["type"] == "http.request":
+                request_bytes += len(message.get("body", b""))
+            return message
+
+        async def timing_send(message: Message) -> None:
+            nonlocal status, response_bytes
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if SERVER_TIMING_ENABLED:
+                    header = _server_timing(timings, time.perf_counter() - started)
+                    message = {
+                        **message,
+                        "headers": [
+                            *message.get("headers", ()),
+                            (b"server-timing", header),
+                        ],
+                    }
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, counting_receive, timing_send)
+        finally:
+            _request_timings.reset(token)
+            route: Any = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            method = scope["method"]
+            http_request_duration.observe(
+                time.perf_counter() - started, method, path, str(status)
+            )
+            http_request_size.observe(request_bytes, method, path)
+            http_response_size.observe(response_bytes, method, path)
@@ -0,0 +1,26 @@
+-- Push invalidation for the backend's in-process session cache.
+-- The FastAPI backend LISTENs on this channel and drops cached sessions when the
+-- underlying session or user row changes. Payloads carry row ids, never tokens.
+
+CREATE OR REPLACE FUNCTION notify_session_invalidation() RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_TABLE_NAME = 'session' THEN
+    PERFORM pg_notify('auth_session_invalidate', 'session:' || OLD.id);
+  ELSE
+    PERFORM pg_notify('auth_session_invalidate', 'user:' || OLD.id);
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_session_invalidate ON session;
+CREATE TRIGGER trg_session_invalidate
+  AFTER UPDATE OR DELETE ON session
+  FOR EACH ROW
+  EXECUTE FUNCTION notify_session_invalidation();
+
+DROP TRIGGER IF EXISTS trg_user_invalidate ON "user";
+CREATE TRIGGER trg_user_invalidate
+  AFTER UPDATE OR DELETE ON "user"
+  FOR EACH ROW
+  EXECUTE FUNCTION notify_session_invalidation();
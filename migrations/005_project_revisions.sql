@@ -0,0 +1,178 @@
+-- Per-project timeline revision, bumped on every timeline write. Delta saves
+-- (PATCH /projects/{id}/timeline) are applied against a base revision and
+-- rejected when another write got there first.
+ALTER TABLE projects ADD COLUMN IF NOT EXISTS revision BIGINT NOT NULL DEFAULT 0;
+
+-- RFC 6902 JSON Patch, applied inside Postgres so a small edit never ships the
+-- whole timeline to the app and back. Failures raise SQLSTATE 22023
+-- (invalid_parameter_value) and abort the statement, so a patch applies
+-- entirely or not at all.
+
+-- RFC 6901 JSON Pointer → text[] path ('' is the document root).
+CREATE OR REPLACE FUNCTION jsonb_patch_path(pointer TEXT) RETURNS TEXT[] AS $$
+BEGIN
+  IF pointer = '' THEN
+    RETURN '{}'::TEXT[];
+  END IF;
+  IF pointer IS NULL OR left(pointer, 1) <> '/' THEN
+    RAISE EXCEPTION USING ERRCODE = '22023',
+      MESSAGE = format('JSON patch: invalid pointer %L', pointer);
+  END IF;
+  RETURN ARRAY(
+    SELECT replace(replace(token, '~1', '/'), '~0', '~')
+      FROM unnest(string_to_array(substr(pointer, 2), '/')) WITH ORDINALITY AS t(token, n)
+     ORDER BY n
+  );
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION jsonb_patch_array_index(token TEXT, len INT, allow_end BOOLEAN)
+RETURNS INT AS $$
+BEGIN
+  IF allow_end AND token = '-' THEN
+    RETURN len;
+  END IF;
+  IF token !~ '^(0|[1-9][0-9]{0,8})$'
+     OR token::INT > len
+     OR (token::INT = len AND NOT allow_end) THEN
+    RAISE EXCEPTION USING ERRCODE = '22023',
+      MESSAGE = format('JSON patch: array index %s out of range', token);
+  END IF;
+  RETURN token::INT;
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION jsonb_patch_add(doc JSONB, path TEXT[], value JSONB)
+RETURNS JSONB AS $$
+DECLARE
+  depth  INT := coalesce(array_length(path, 1), 0);
+  parent JSONB;
+  idx    INT;
+BEGIN
+  IF depth = 0 THEN
+    RETURN value;
+  END IF;
+  parent := doc #> path[1:depth - 1];
+  CASE jsonb_typeof(parent)
+    WHEN 'object' THEN
+      RETURN jsonb_set(doc, path, value, true);
+    WHEN 'array' THEN
+      idx := jsonb_patch_array_index(path[depth], jsonb_array_length(parent), true);
+      IF idx < jsonb_array_length(parent) THEN
+        RETURN jsonb_insert(doc, path[1:depth - 1] || idx::TEXT, value);
+      END IF;
+      IF depth = 1 THEN
+        RETURN parent || jsonb_build_array(value);
+      END IF;
+      RETURN jsonb_set(doc, path[1:depth - 1], parent || jsonb_build_array(value));
+    ELSE
+      RAISE EXCEPTION USING ERRCODE = '22023',
+        MESSAGE = format('JSON patch: no container at %s', path[1:depth - 1]);
+  END CASE;
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+-- Raise unless `path` names an existing member / element (not the root).
+CREATE OR REPLACE FUNCTION jsonb_patch_require(doc JSONB, path TEXT[]) RETURNS VOID AS $$
+DECLARE
+  depth  INT := coalesce(array_length(path, 1), 0);
+  parent JSONB;
+BEGIN
+  IF depth = 0 THEN
+    RAISE EXCEPTION USING ERRCODE = '22023', MESSAGE = 'JSON patch: cannot remove the root';
+  END IF;
+  parent := doc #> path[1:depth - 1];
+  IF jsonb_typeof(parent) = 'array' THEN
+    PERFORM jsonb_patch_array_index(path[depth], jsonb_array_length(parent), false);
+  ELSIF jsonb_typeof(parent) IS DISTINCT FROM 'object' OR NOT parent ? path[depth] THEN
+    RAISE EXCEPTION USING ERRCODE = '22023',
+      MESSAGE = format('JSON patch: path %s not found', path);
+  END IF;
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION jsonb_patch_remove(doc JSONB, path TEXT[]) RETURNS JSONB AS $$
+BEGIN
+  PERFORM jsonb_patch_require(doc, path);
+  RETURN doc #- path;
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION jsonb_patch_apply(doc JSONB, patch JSONB) RETURNS JSONB AS $$
+DECLARE
+  op        JSONB;
+  path      TEXT[];
+  from_path TEXT[];
+  value     JSONB;
+BEGIN
+  FOR op IN SELECT * FROM jsonb_array_elements(patch) LOOP
+    path := jsonb_patch_path(op->>'path');
+    CASE op->>'op'
+      WHEN 'add' THEN
+        doc := jsonb_patch_add(doc, path, op->'value');
+      WHEN 'remove' THEN
+        doc := jsonb_patch_remove(doc, path);
+      WHEN 'replace' THEN
+        IF coalesce(array_length(path, 1), 0) = 0 THEN
+          doc := op->'value';
+        ELSE
+          -- One jsonb_set instead of remove + add: a single copy of the doc.
+          PERFORM jsonb_patch_require(doc, path);
+          doc := jsonb_set(doc, path, op->'value', false);
+        END IF;
+      WHEN 'test' THEN
+        IF (doc #> path) IS DISTINCT FROM op->'value' THEN
+          RAISE EXCEPTION USING ERRCODE = '22023',
+            MESSAGE = format('JSON patch: test failed at %s', op->>'path');
+        END IF;
+      WHEN 'move', 'copy' THEN
+        from_path := jsonb_patch_path(op->>'from');
+        value := doc #> from_path;
+        IF value IS NULL THEN
+          RAISE EXCEPTION USING ERRCODE = '22023',
+            MESSAGE = format('JSON patch: path %s not found', op->>'from');
+        END IF;
+        IF op->>'op' = 'move' THEN
+          IF path[1:coalesce(array_length(from_path, 1), 0)] = from_path
+             AND path <> from_path THEN
+            RAISE EXCEPTION USING ERRCODE = '22023',
+              MESSAGE = 'JSON patch: cannot move a value into itself';
+          END IF;
+          doc := jsonb_patch_remove(doc, from_path);
+        END IF;
+        doc := jsonb_patch_add(doc, path, value);
+      ELSE
+        RAISE EXCEPTION USING ERRCODE = '22023',
+          MESSAGE = format('JSON patch: unknown op %L', op->>'op');
+    END CASE;
+  END LOOP;
+  RETURN doc;
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+-- Same shape rule as TimelinePayload in backend/api/schema.py: an object whose
+-- "tracks" is an array of objects, each with an optional array of object
+-- "scrubbers". Guards both delta saves and full saves (PUT passes the request
+-- body through unparsed).
+CREATE OR REPLACE FUNCTION assert_timeline_shape(doc JSONB) RETURNS JSONB AS $$
+BEGIN
+  IF jsonb_typeof(doc->'tracks') IS DISTINCT FROM 'array' OR EXISTS (
+    SELECT 1
+      FROM jsonb_array_elements(doc->'tracks') AS t(track)
+     WHERE CASE
+             WHEN jsonb_typeof(track) <> 'object' THEN true
+             WHEN NOT track ? 'scrubbers' THEN false
+             WHEN jsonb_typeof(track->'scrubbers') <> 'array' THEN true
+             ELSE EXISTS (
+               SELECT 1
+                 FROM jsonb_array_elements(track->'scrubbers') AS s(scrubber)
+                WHERE jsonb_typeof(scrubber) <> 'object'
+             )
+           END
+  ) THEN
+    RAISE EXCEPTION USING ERRCODE = '22023',
+      MESSAGE = 'Invalid timeline: expected {"tracks": [{"scrubbers": [...]}, ...]}';
+  END IF;
+  RETURN doc;
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
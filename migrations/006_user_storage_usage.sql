@@ -0,0 +1,134 @@
+-- Per-user storage usage, kept in step with assets by triggers so /storage
+-- (and any quota check) is a primary-key lookup instead of a SUM over the
+-- user's assets. An asset counts while it is 'ready' and not soft-deleted,
+-- the same rule the old SUM used.
+CREATE TABLE IF NOT EXISTS user_storage_usage (
+  user_id     TEXT PRIMARY KEY REFERENCES "user"(id) ON DELETE CASCADE,
+  used_bytes  BIGINT NOT NULL DEFAULT 0,
+  updated_at  TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE OR REPLACE FUNCTION asset_counted_bytes(status TEXT, deleted_at TIMESTAMPTZ, file_size BIGINT)
+RETURNS BIGINT AS $$
+  SELECT CASE WHEN status = 'ready' AND deleted_at IS NULL THEN coalesce(file_size, 0) ELSE 0 END;
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION add_user_storage_usage(uid TEXT, delta BIGINT) RETURNS VOID AS $$
+BEGIN
+  IF delta > 0 THEN
+    INSERT INTO user_storage_usage (user_id, used_bytes)
+    VALUES (uid, delta)
+    ON CONFLICT (user_id) DO UPDATE
+      SET used_bytes = user_storage_usage.used_bytes + EXCLUDED.used_bytes,
+          updated_at = now();
+  ELSIF delta < 0 THEN
+    -- No upsert here: when a user is deleted, the cascade may already have
+    -- removed their usage row (or the user) by the time their assets go.
+    UPDATE user_storage_usage
+       SET used_bytes = used_bytes + delta, updated_at = now()
+     WHERE user_id = uid;
+  END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Statement-level, with transition tables: a bulk insert or update touches
+-- each user's counter once with the net change, not once per asset row.
+CREATE OR REPLACE FUNCTION track_user_storage_usage() RETURNS TRIGGER AS $$
+DECLARE
+  change RECORD;
+BEGIN
+  -- Users in id order, so concurrent statements lock counters in one order.
+  IF TG_OP = 'INSERT' THEN
+    FOR change IN
+      SELECT user_id, sum(asset_counted_bytes(status, deleted_at, file_size))::BIGINT AS delta
+        FROM new_assets GROUP BY user_id ORDER BY user_id
+    LOOP
+      PERFORM add_user_storage_usage(change.user_id, change.delta);
+    END LOOP;
+  ELSIF TG_OP = 'DELETE' THEN
+    FOR change IN
+      SELECT user_id, -sum(asset_counted_bytes(status, deleted_at, file_size))::BIGINT AS delta
+        FROM old_assets GROUP BY user_id ORDER BY user_id
+    LOOP
+      PERFORM add_user_storage_usage(change.user_id, change.delta);
+    END LOOP;
+  ELSE
+    FOR change IN
+      SELECT user_id, sum(delta)::BIGINT AS delta
+        FROM (
+          SELECT user_id, asset_counted_bytes(status, deleted_at, file_size) AS delta
+            FROM new_assets
+          UNION ALL
+          SELECT user_id, -asset_counted_bytes(status, deleted_at, file_size)
+            FROM old_assets
+        ) AS changes
+       GROUP BY user_id ORDER BY user_id
+    LOOP
+      PERFORM add_user_storage_usage(change.user_id, change.delta);
+    END LOOP;
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Transition tables need one trigger per event.
+DROP TRIGGER IF EXISTS trg_assets_storage_usage_insert ON assets;
+CREATE TRIGGER trg_assets_storage_usage_insert
+  AFTER INSERT ON assets
+  REFERENCING NEW TABLE AS new_assets
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION track_user_storage_usage();
+
+DROP TRIGGER IF EXISTS trg_assets_storage_usage_update ON assets;
+CREATE TRIGGER trg_assets_storage_usage_update
+  AFTER UPDATE ON assets
+  REFERENCING OLD TABLE AS old_assets NEW TABLE AS new_assets
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION track_user_storage_usage();
+
+DROP TRIGGER IF EXISTS trg_assets_storage_usage_delete ON assets;
+CREATE TRIGGER trg_assets_storage_usage_delete
+  AFTER DELETE ON assets
+  REFERENCING OLD TABLE AS old_assets
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION track_user_storage_usage();
+
+-- Repair drift (rows written with the trigger disabled, manual fixes, ...).
+-- Returns the users that were off, with the recorded and the actual value.
+-- Each candidate is re-checked under its usage row lock, which the triggers
+-- also take, so a concurrent upload cannot be double-counted or lost.
+CREATE OR REPLACE FUNCTION reconcile_user_storage_usage()
+RETURNS TABLE (user_id TEXT, recorded_bytes BIGINT, actual_bytes BIGINT) AS $$
+DECLARE
+  uid TEXT;
+BEGIN
+  FOR uid IN
+    SELECT coalesce(u.user_id, a.user_id)
+      FROM user_storage_usage u
+      FULL JOIN (
+        SELECT assets.user_id,
+               sum(asset_counted_bytes(status, deleted_at, file_size))::BIGINT AS used_bytes
+          FROM assets
+         GROUP BY assets.user_id
+      ) a ON a.user_id = u.user_id
+     WHERE coalesce(u.used_bytes, 0) <> coalesce(a.used_bytes, 0)
+  LOOP
+    INSERT INTO user_storage_usage AS s (user_id) VALUES (uid) ON CONFLICT DO NOTHING;
+    SELECT s.used_bytes INTO recorded_bytes
+      FROM user_storage_usage s WHERE s.user_id = uid FOR UPDATE;
+    SELECT coalesce(sum(asset_counted_bytes(a.status, a.deleted_at, a.file_size)), 0)::BIGINT
+      INTO actual_bytes
+      FROM assets a WHERE a.user_id = uid;
+    IF recorded_bytes <> actual_bytes THEN
+      UPDATE user_storage_usage s
+         SET used_bytes = actual_bytes, updated_at = now()
+       WHERE s.user_id = uid;
+      user_id := uid;
+      RETURN NEXT;
+    END IF;
+  END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Backfill for existing assets.
+SELECT count(*) FROM reconcile_user_storage_usage();
@@ -0,0 +1,135 @@
+-- Timeline history: one row per project revision (migration 005), written by
+-- record_project_version() in the same statement as each timeline save. Most
+-- rows hold an RFC 6902 delta from the previous revision; every
+-- project_snapshot_interval() revisions (or when the delta would not be much
+-- smaller) the full timeline is stored instead, so rebuilding any revision
+-- (api/project_versions.py) applies at most interval - 1 deltas to a snapshot.
+CREATE TABLE IF NOT EXISTS project_versions (
+  project_id  UUID NOT NULL REFERENCES projects(id) ON DELETE CASCADE,
+  revision    BIGINT NOT NULL,
+  kind        TEXT NOT NULL CHECK (kind IN ('snapshot', 'delta')),
+  -- Full timeline for a snapshot, JSON Patch array for a delta.
+  data        JSONB NOT NULL,
+  created_at  TIMESTAMPTZ NOT NULL DEFAULT now(),
+  PRIMARY KEY (project_id, revision)
+);
+
+-- TOAST compresses values once a row passes toast_tuple_target (~2 kB by
+-- default); lower it so mid-sized deltas are compressed too.
+ALTER TABLE project_versions SET (toast_tuple_target = 256);
+
+CREATE INDEX IF NOT EXISTS idx_project_versions_snapshots
+  ON project_versions(project_id, revision)
+  WHERE kind = 'snapshot';
+
+CREATE OR REPLACE FUNCTION project_snapshot_interval() RETURNS INT AS $$
+  SELECT 50;
+$$ LANGUAGE sql IMMUTABLE;
+
+-- RFC 6902 patch turning `prev` into `next`, one op per row, for saves that
+-- don't come with a patch of their own. Same rules as diffTimeline in
+-- app/utils/timeline-persist.ts: unchanged subtrees are skipped, objects are
+-- walked key by key, arrays keep their common prefix and suffix (inserting or
+-- deleting a clip is one op), and anything else is replaced wholesale.
+CREATE OR REPLACE FUNCTION jsonb_patch_diff(prev JSONB, next JSONB, pointer TEXT DEFAULT '')
+RETURNS SETOF JSONB AS $$
+DECLARE
+  key        TEXT;
+  child      TEXT;
+  prev_value JSONB;
+  next_value JSONB;
+  i          INT;
+  prev_len   INT;
+  next_len   INT;
+  head       INT := 0;
+  tail       INT := 0;
+  paired     INT;
+BEGIN
+  IF prev = next THEN
+    RETURN;
+  END IF;
+  IF jsonb_typeof(prev) = 'array' AND jsonb_typeof(next) = 'array' THEN
+    prev_len := jsonb_array_length(prev);
+    next_len := jsonb_array_length(next);
+    WHILE head < prev_len AND head < next_len AND prev->head = next->head LOOP
+      head := head + 1;
+    END LOOP;
+    WHILE tail < prev_len - head AND tail < next_len - head
+          AND prev->(prev_len - 1 - tail) = next->(next_len - 1 - tail) LOOP
+      tail := tail + 1;
+    END LOOP;
+    -- Elements between head and tail: diff pairwise, then drop or insert the rest.
+    paired := least(prev_len, next_len) - head - tail;
+    FOR i IN head .. head + paired - 1 LOOP
+      RETURN QUERY SELECT * FROM jsonb_patch_diff(prev->i, next->i, pointer || '/' || i);
+    END LOOP;
+    FOR i IN 1 .. prev_len - next_len LOOP
+      RETURN NEXT jsonb_build_object('op', 'remove', 'path', pointer || '/' || (head + paired));
+    END LOOP;
+    FOR i IN head + paired .. next_len - tail - 1 LOOP
+      RETURN NEXT jsonb_build_object('op', 'add', 'path', pointer || '/' || i, 'value', next->i);
+    END LOOP;
+    RETURN;
+  END IF;
+  IF jsonb_typeof(prev) = 'object' AND jsonb_typeof(next) = 'object' THEN
+    -- One pass over each side: every prev->key / next ? key would unpack the
+    -- whole (possibly compressed) value again.
+    FOR key, prev_value, next_value IN
+      SELECT coalesce(p.key, n.key), p.value, n.value
+        FROM jsonb_each(prev) AS p FULL JOIN jsonb_each(next) AS n ON n.key = p.key
+    LOOP
+      child := pointer || '/' || replace(replace(key, '~', '~0'), '/', '~1');
+      IF next_value IS NULL THEN
+        RETURN NEXT jsonb_build_object('op', 'remove', 'path', child);
+      ELSIF prev_value IS NULL THEN
+        RETURN NEXT jsonb_build_object('op', 'add', 'path', child, 'value', next_value);
+      ELSE
+        RETURN QUERY SELECT * FROM jsonb_patch_diff(prev_value, next_value, child);
+      END IF;
+    END LOOP;
+    RETURN;
+  END IF;
+  RETURN NEXT jsonb_build_object('op', 'replace', 'path', pointer, 'value', next);
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+-- `delta` is the patch from `prev` to `next` when the caller already has one
+-- (delta saves); otherwise it is computed here, and only if it will be kept.
+CREATE OR REPLACE FUNCTION record_project_version(
+  pid UUID, rev BIGINT, prev JSONB, next JSONB, delta JSONB DEFAULT NULL
+) RETURNS VOID AS $$
+DECLARE
+  last_snapshot BIGINT;
+BEGIN
+  SELECT max(revision) INTO last_snapshot
+    FROM project_versions
+   WHERE project_id = pid AND kind = 'snapshot';
+
+  -- A delta needs an unbroken chain back to a recent snapshot: the previous
+  -- revision must be recorded (it is not for a project's first save, or for
+  -- projects last saved before this migration).
+  IF rev - last_snapshot < project_snapshot_interval()
+     AND EXISTS (
+       SELECT 1 FROM project_versions WHERE project_id = pid AND revision = rev - 1
+     ) THEN
+    IF delta IS NULL THEN
+      SELECT coalesce(jsonb_agg(op), '[]'::jsonb) INTO delta
+        FROM jsonb_patch_diff(prev, next) AS op;
+    END IF;
+    IF pg_column_size(delta) < pg_column_size(next) / 2 THEN
+      INSERT INTO project_versions (project_id, revision, kind, data)
+      VALUES (pid, rev, 'delta', delta);
+      RETURN;
+    END IF;
+  END IF;
+
+  INSERT INTO project_versions (project_id, revision, kind, data)
+  VALUES (pid, rev, 'snapshot', next);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Existing projects start their history at the current revision.
+INSERT INTO project_versions (project_id, revision, kind, data)
+SELECT id, revision, 'snapshot', timeline_state FROM projects
+ WHERE revision > 0
+ON CONFLICT DO NOTHING;
@@ -0,0 +1,37 @@
+-- Coalesced autosaves (AUTOSAVE_COALESCE_SECONDS, backend/api/autosave.py)
+-- acknowledge a revision for every save but store only the last one per
+-- interval, so revisions can skip. A delta used to require rev - 1 to be
+-- recorded; now it only needs the project's latest recorded revision, which
+-- is the timeline being replaced since every timeline write records one.
+CREATE OR REPLACE FUNCTION record_project_version(
+  pid UUID, rev BIGINT, prev JSONB, next JSONB, delta JSONB DEFAULT NULL
+) RETURNS VOID AS $$
+DECLARE
+  last_snapshot BIGINT;
+  last_recorded BIGINT;
+BEGIN
+  SELECT max(revision) INTO last_snapshot
+    FROM project_versions
+   WHERE project_id = pid AND kind = 'snapshot';
+  SELECT max(revision) INTO last_recorded
+    FROM project_versions
+   WHERE project_id = pid;
+
+  -- No history yet (a project's first save, or one not saved since migration
+  -- 007): start with a snapshot.
+  IF rev - last_snapshot < project_snapshot_interval() AND last_recorded < rev THEN
+    IF delta IS NULL THEN
+      SELECT coalesce(jsonb_agg(op), '[]'::jsonb) INTO delta
+        FROM jsonb_patch_diff(prev, next) AS op;
+    END IF;
+    IF pg_column_size(delta) < pg_column_size(next) / 2 THEN
+      INSERT INTO project_versions (project_id, revision, kind, data)
+      VALUES (pid, rev, 'delta', delta);
+      RETURN;
+    END IF;
+  END IF;
+
+  INSERT INTO project_versions (project_id, revision, kind, data)
+  VALUES (pid, rev, 'snapshot', next);
+END;
+$$ LANGUAGE plpgsql;
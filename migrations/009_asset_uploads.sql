@@ -0,0 +1,4 @@
+-- Resumable uploads (backend/api/uploads.py): an upload in progress is its
+-- assets row in status 'uploading'. The expiry job looks them up by age.
+CREATE INDEX IF NOT EXISTS idx_assets_uploading_created_at
+  ON assets(created_at) WHERE status = 'uploading';
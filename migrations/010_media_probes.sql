@@ -0,0 +1,22 @@
+-- Media probing (backend/media/worker.py): a finished upload is an assets row
+-- in status 'pending' until the worker has read its type, duration and frame
+-- size from the file and made it 'ready'.
+--
+-- media_probes caches what was read per stored object, so a file uploaded
+-- again (by anyone) is not probed twice. `error` is set when the file could
+-- not be read; such assets keep the values they were created with.
+
+CREATE TABLE IF NOT EXISTS media_probes (
+  content_hash     TEXT PRIMARY KEY REFERENCES r2_objects(content_hash) ON DELETE CASCADE,
+  container        TEXT,                    -- mp4 | mov | webm | matroska | wav | mp3 | ...
+  media_type       TEXT,                    -- video | audio | image
+  duration_seconds FLOAT,
+  width            INT,
+  height           INT,
+  error            TEXT,
+  probed_at        TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- The worker claims pending assets oldest first.
+CREATE INDEX IF NOT EXISTS idx_assets_pending_created_at
+  ON assets(created_at) WHERE status = 'pending' AND deleted_at IS NULL;
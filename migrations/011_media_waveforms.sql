@@ -0,0 +1,13 @@
+-- Waveform peaks (backend/media/waveform.py), built once per stored object by
+-- the media worker for files probed as audio or video. r2_key names the
+-- peaks file in the object store (waveforms/<sha256>.peaks); it is NULL, and
+-- `error` says why, when there is none (e.g. a video without sound). Delete
+-- a row to have it built again.
+
+CREATE TABLE IF NOT EXISTS media_waveforms (
+  content_hash     TEXT PRIMARY KEY REFERENCES r2_objects(content_hash) ON DELETE CASCADE,
+  r2_key           TEXT,
+  duration_seconds FLOAT,
+  error            TEXT,
+  created_at       TIMESTAMPTZ NOT NULL DEFAULT now()
+);
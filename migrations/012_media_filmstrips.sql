@@ -0,0 +1,16 @@
+-- Filmstrips (backend/media/filmstrip.py): timeline thumbnails of a video as
+-- JPEG sprite sheets, built once per stored object by the media worker.
+-- Sheets are stored as <r2_prefix>/<level>_<n>.jpg; `layout` is the JSON
+-- that maps a time to a sheet and the tile's offset in it:
+--   {"tile_width", "tile_height", "columns", "rows",
+--    "levels": [{"interval", "frames", "sheets"}, ...]}
+-- r2_prefix and layout are NULL, and `error` says why, when there is none.
+-- Delete a row to have it built again.
+
+CREATE TABLE IF NOT EXISTS media_filmstrips (
+  content_hash  TEXT PRIMARY KEY REFERENCES r2_objects(content_hash) ON DELETE CASCADE,
+  r2_prefix     TEXT,                      -- filmstrips/<sha256>
+  layout        JSONB,
+  error         TEXT,
+  created_at    TIMESTAMPTZ NOT NULL DEFAULT now()
+);
@@ -0,0 +1,36 @@
+-- Proxies (backend/media/proxy.py): low-resolution renditions of large videos
+-- for smooth editing, built once per stored object by the media worker; the
+-- original stays in r2_objects for export.
+--
+-- A row is inserted when a worker takes the file on ('running'), which is
+-- how workers in different processes avoid building the same proxy. While
+-- it runs, `progress` (0..1) and `updated_at` are refreshed every few
+-- seconds; a running row left stale by a crashed worker is deleted and the
+-- file queued again. `user_id` is the user the build was scheduled for: the
+-- queue goes round the users waiting, least recently served first, and a
+-- user's running builds count against their turn.
+--
+-- r2_key (proxies/<sha256>.mp4) and the proxy's size are set once 'ready';
+-- `error` says why when 'failed'. Delete a row to have it built again.
+
+CREATE TABLE IF NOT EXISTS media_proxies (
+  content_hash  TEXT PRIMARY KEY REFERENCES r2_objects(content_hash) ON DELETE CASCADE,
+  user_id       TEXT REFERENCES "user"(id) ON DELETE SET NULL,
+  status        TEXT NOT NULL DEFAULT 'running'
+                CHECK (status IN ('running', 'ready', 'failed')),
+  progress      REAL NOT NULL DEFAULT 0,
+  r2_key        TEXT,
+  width         INT,
+  height        INT,
+  file_size     BIGINT,
+  error         TEXT,
+  started_at    TIMESTAMPTZ NOT NULL DEFAULT now(),
+  updated_at    TIMESTAMPTZ NOT NULL DEFAULT now(),
+  finished_at   TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS idx_media_proxies_user_started_at
+  ON media_proxies(user_id, started_at DESC);
+
+CREATE INDEX IF NOT EXISTS idx_media_proxies_running_user
+  ON media_proxies(user_id) WHERE status = 'running';
@@ -0,0 +1,68 @@
+-- Objects in the backend's own object store (backend/api/object_store.py),
+-- one row per unique file, as r2_objects is for the renderer's R2 bucket.
+-- While that store is not R2, its objects must not be in r2_objects: the
+-- renderer would deduplicate uploads against bytes it cannot read (and the
+-- backend against bytes only R2 has), and delete rows the backend's assets
+-- still use. An asset uploaded through the backend points here through
+-- `stored_hash` and has no content_hash or r2_key.
+--
+-- The backend's cleanup job (backend/api/uploads.py) deletes an object, and
+-- with it the media_* rows built from it, once no live asset refers to it.
+
+CREATE TABLE IF NOT EXISTS stored_objects (
+  content_hash  TEXT PRIMARY KEY,           -- SHA-256 hex (64 chars)
+  object_key    TEXT NOT NULL UNIQUE,       -- e.g. objects/abc123.mp4
+  file_size     BIGINT NOT NULL,
+  mime_type     TEXT NOT NULL,
+  status        TEXT NOT NULL DEFAULT 'pending'
+                CHECK (status IN ('pending', 'ready')),
+  created_at    TIMESTAMPTZ NOT NULL DEFAULT now(),
+  updated_at    TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+DROP TRIGGER IF EXISTS trg_stored_objects_updated_at ON stored_objects;
+CREATE TRIGGER trg_stored_objects_updated_at
+  BEFORE UPDATE ON stored_objects
+  FOR EACH ROW
+  EXECUTE FUNCTION set_updated_at_snake();
+
+ALTER TABLE assets
+  ADD COLUMN IF NOT EXISTS stored_hash TEXT
+  REFERENCES stored_objects(content_hash) ON DELETE SET NULL;
+
+CREATE INDEX IF NOT EXISTS idx_assets_stored_hash
+  ON assets(stored_hash) WHERE deleted_at IS NULL;
+
+-- Objects the backend stored before this table: those the media worker has
+-- probed or has still to probe (the renderer's uploads are never probed).
+-- Their assets keep the r2_objects reference too; only new uploads are kept
+-- apart.
+INSERT INTO stored_objects (content_hash, object_key, file_size, mime_type, status, created_at)
+SELECT o.content_hash, o.r2_key, o.file_size, o.mime_type, o.status, o.created_at
+  FROM r2_objects o
+ WHERE EXISTS (SELECT 1 FROM media_probes p WHERE p.content_hash = o.content_hash)
+    OR EXISTS (SELECT 1 FROM assets a
+                WHERE a.content_hash = o.content_hash AND a.status = 'pending')
+ON CONFLICT (content_hash) DO NOTHING;
+
+UPDATE assets a
+   SET stored_hash = a.content_hash
+  FROM stored_objects s
+ WHERE s.content_hash = a.content_hash AND a.stored_hash IS NULL;
+
+-- What the media worker builds is per stored object.
+ALTER TABLE media_probes DROP CONSTRAINT IF EXISTS media_probes_content_hash_fkey;
+ALTER TABLE media_probes ADD CONSTRAINT media_probes_content_hash_fkey
+  FOREIGN KEY (content_hash) REFERENCES stored_objects(content_hash) ON DELETE CASCADE;
+
+ALTER TABLE media_waveforms DROP CONSTRAINT IF EXISTS media_waveforms_content_hash_fkey;
+ALTER TABLE media_waveforms ADD CONSTRAINT media_waveforms_content_hash_fkey
+  FOREIGN KEY (content_hash) REFERENCES stored_objects(content_hash) ON DELETE CASCADE;
+
+ALTER TABLE media_filmstrips DROP CONSTRAINT IF EXISTS media_filmstrips_content_hash_fkey;
+ALTER TABLE media_filmstrips ADD CONSTRAINT media_filmstrips_content_hash_fkey
+  FOREIGN KEY (content_hash) REFERENCES stored_objects(content_hash) ON DELETE CASCADE;
+
+ALTER TABLE media_proxies DROP CONSTRAINT IF EXISTS media_proxies_content_hash_fkey;
+ALTER TABLE media_proxies ADD CONSTRAINT media_proxies_content_hash_fkey
+  FOREIGN KEY (content_hash) REFERENCES stored_objects(content_hash) ON DELETE CASCADE;
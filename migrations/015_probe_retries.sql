@@ -0,0 +1,9 @@
+-- Probe retries (backend/media/worker.py): when probing a stored object fails
+-- for a reason other than its contents (the object store was unreachable,
+-- say), its pending assets are left out of the worker's claim until
+-- `probe_after`, a delay that doubles with each of `probe_attempts`. After a
+-- few failed attempts the assets are marked 'failed'. Uploading the same
+-- bytes again starts the count afresh.
+ALTER TABLE stored_objects
+  ADD COLUMN IF NOT EXISTS probe_attempts INT NOT NULL DEFAULT 0,
+  ADD COLUMN IF NOT EXISTS probe_after    TIMESTAMPTZ;
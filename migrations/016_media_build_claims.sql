@@ -0,0 +1,19 @@
+-- Waveform and filmstrip builds are claimed by their row, as proxies are
+-- (013): the media worker inserts it in status 'running' when it takes the
+-- file on and builds outside any transaction, so no lock is held for the
+-- whole decode. `updated_at` is refreshed every few seconds while it runs;
+-- a running row left stale by a crashed worker is deleted and the file
+-- queued again. `created_at` is when the build was claimed. Rows from before
+-- this were written once built, and are 'done'.
+
+ALTER TABLE media_waveforms
+  ADD COLUMN IF NOT EXISTS status TEXT NOT NULL DEFAULT 'done'
+    CHECK (status IN ('running', 'done')),
+  ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now();
+ALTER TABLE media_waveforms ALTER COLUMN status SET DEFAULT 'running';
+
+ALTER TABLE media_filmstrips
+  ADD COLUMN IF NOT EXISTS status TEXT NOT NULL DEFAULT 'done'
+    CHECK (status IN ('running', 'done')),
+  ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now();
+ALTER TABLE media_filmstrips ALTER COLUMN status SET DEFAULT 'running';